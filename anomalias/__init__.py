@@ -0,0 +1,2 @@
+# Paquete con los subsistemas del dashboard de anomalías térmicas.
+# Se mantiene sin imports pesados: cada módulo se importa bajo demanda.
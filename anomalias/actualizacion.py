@@ -0,0 +1,185 @@
+"""
+Actualización incremental con una publicación nueva de Berkeley Earth.
+
+BEST publica cada mes el NetCDF con la serie completa. En lugar de rehacer
+todo desde 1850, `actualizar` averigua qué meses le faltan a cada artefacto y
+solo procesa esos:
+
+- almacén de características: un Parquet más con las filas de los meses
+  nuevos; de los anteriores solo se leen los HISTORIA que necesitan lags y
+  ventanas;
+- índice, pirámide y cubo de series regionales: los meses se añaden al final
+  de sus arrays;
+- tabla del EDA: el estado guardado (Welford + KLL) se fusiona con el de los
+  meses nuevos;
+- figuras: los agregados guardados se amplían con los meses y ficheros nuevos;
+- opcionalmente (`--rondas`), el modelo se continúa con árboles ajustados a
+  las filas nuevas, tras medir su error en ellas antes de haberlas visto. Las
+  métricas y figuras de prueba siguen siendo las del modelo evaluado: el
+  continuado ya ha visto esos meses.
+
+El coste depende de los meses nuevos, no de la longitud de la serie, salvo en
+las figuras del modelo cuando se evalúa uno nuevo (se recorre de nuevo el
+periodo de prueba) y en la primera ejecución de los pasos que aún no tienen estado
+guardado. Cada artefacto sabe hasta qué mes llega, así que una actualización
+interrumpida se puede repetir. Se asume que la publicación solo añade meses:
+si BEST revisa meses anteriores hay que reconstruir con los pasos completos.
+
+    python -m anomalias.actualizacion data/Land_and_Ocean_LatLong1.nc --features data/features \\
+        --indice data/indice --piramide data/piramide --cubo data/cubo --manifiesto resultados/manifiesto.json
+"""
+import argparse
+import logging
+import os
+import time
+
+from anomalias.features import aaaamm
+
+logger = logging.getLogger(__name__)
+
+
+def _paso(resumen, nombre, funcion, *args, **kwargs):
+    t0 = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    resumen[nombre] = {**resultado, 'segundos': round(time.perf_counter() - t0, 3)}
+    logger.info("%s: %s", nombre, resumen[nombre])
+    return resultado
+
+
+def _abrir(ruta_netcdf):
+    import xarray as xr
+
+    return xr.open_dataset(ruta_netcdf, decode_times=False, cache=False)
+
+
+def _features(ruta_netcdf, dir_features, anio_min):
+    from anomalias import datos
+    from anomalias.entrenamiento import partes
+    from anomalias.features import anexar_features, ultimo_mes
+
+    with _abrir(ruta_netcdf) as ds:
+        nt = ds.sizes['time']
+        ultimo = ultimo_mes(dir_features)
+        desde = 0 if ultimo is None else datos.indice_tiempo(ds, *ultimo) + 1
+    antes = set(partes(dir_features))
+    filas = anexar_features(ruta_netcdf, dir_features, desde, anio_min)
+    return {'meses': max(nt - desde, 0), 'filas': filas, 'ficheros': sorted(set(partes(dir_features)) - antes)}
+
+
+def _indice(ruta_netcdf, dir_indice):
+    from anomalias.indice import anexar_indice
+
+    return {'meses': anexar_indice(ruta_netcdf, dir_indice)}
+
+
+def _piramide(ruta_netcdf, dir_piramide):
+    from anomalias.piramide import anexar_piramide
+
+    return {'meses': anexar_piramide(ruta_netcdf, dir_piramide)}
+
+
+def _cubo(ruta_netcdf, dir_cubo):
+    from anomalias.cubo import anexar_cubo
+
+    return {'meses': anexar_cubo(ruta_netcdf, dir_cubo)}
+
+
+def _estadisticas(ruta_netcdf, ruta_manifiesto, variable, procesos):
+    from anomalias.estadisticas import actualizar_estadisticas
+    from anomalias.manifiesto import directorio_agregados, publicar
+
+    ruta_estado = os.path.join(directorio_agregados(ruta_manifiesto), f'eda_{variable}.npz')
+    estadisticas, meses, _ = actualizar_estadisticas(ruta_netcdf, ruta_estado, variable, procesos)
+    publicar({'eda': {variable: estadisticas.tabla()}}, ruta_manifiesto)
+    return {'meses': meses}
+
+
+def _modelo(ficheros, ruta_manifiesto, rondas, dir_modelo):
+    from anomalias.entrenamiento import continuar
+    from anomalias.manifiesto import Manifiesto
+
+    modelo = Manifiesto(ruta_manifiesto).datos().get('modelo') or {}
+    artefacto = modelo.get('artefacto')
+    if not artefacto or not os.path.exists(artefacto):
+        return {'estado': 'sin modelo'}
+    if artefacto.endswith('.json'):
+        # Los ensembles por región se reentrenan con `anomalias.regiones`
+        return {'estado': 'ensemble por regiones, no se continúa'}
+    ruta, fuera_de_muestra = continuar(artefacto, ficheros, dir_modelo or os.path.dirname(artefacto), rondas,
+                                       modelo.get('parametros'), ruta_manifiesto=ruta_manifiesto)
+    return {'artefacto': ruta, 'mae_meses_nuevos': fuera_de_muestra['mae']}
+
+
+def _figuras(ruta_netcdf, dir_features, ruta_manifiesto, dir_figuras):
+    from anomalias.figuras import DIRECTORIO_FIGURAS, construir_figuras
+
+    return construir_figuras(ruta_netcdf, dir_features, ruta_manifiesto=ruta_manifiesto,
+                             directorio=dir_figuras or DIRECTORIO_FIGURAS)
+
+
+def actualizar(ruta_netcdf, dir_features=None, dir_indice=None, dir_piramide=None, ruta_manifiesto=None,
+               rondas=0, dir_modelo=None, anio_min=1900, variable='temperature', procesos=1, dir_figuras=None,
+               dir_cubo=None):
+    """
+    Lleva hasta el último mes de `ruta_netcdf` los artefactos indicados (los
+    que se pasan como None no se tocan) y devuelve un resumen por paso. Con
+    manifiesto se actualizan también la tabla del EDA, las figuras y, si
+    `rondas` > 0, el modelo publicado.
+    """
+    from anomalias.manifiesto import publicar
+
+    t0 = time.perf_counter()
+    resumen = {}
+    nuevos = []
+    if dir_features:
+        nuevos = _paso(resumen, 'features', _features, ruta_netcdf, dir_features, anio_min)['ficheros']
+    if dir_indice and os.path.exists(os.path.join(dir_indice, 'meta.json')):
+        _paso(resumen, 'indice', _indice, ruta_netcdf, dir_indice)
+    if dir_piramide and os.path.exists(os.path.join(dir_piramide, 'meta.json')):
+        _paso(resumen, 'piramide', _piramide, ruta_netcdf, dir_piramide)
+    if dir_cubo and os.path.exists(os.path.join(dir_cubo, 'meta.json')):
+        _paso(resumen, 'cubo', _cubo, ruta_netcdf, dir_cubo)
+    if ruta_manifiesto:
+        _paso(resumen, 'estadisticas', _estadisticas, ruta_netcdf, ruta_manifiesto, variable, procesos)
+        if rondas and nuevos:
+            _paso(resumen, 'modelo', _modelo, nuevos, ruta_manifiesto, rondas, dir_modelo)
+        _paso(resumen, 'figuras', _figuras, ruta_netcdf, dir_features, ruta_manifiesto, dir_figuras)
+
+        with _abrir(ruta_netcdf) as ds:
+            tiempo = ds['time'].values
+        publicar({'actualizacion': {
+            'netcdf': os.path.abspath(ruta_netcdf),
+            'meses': len(tiempo),
+            'ultimo_mes': aaaamm(tiempo[-1]),
+            'pasos': resumen,
+            'segundos': round(time.perf_counter() - t0, 3),
+        }}, ruta_manifiesto)
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('netcdf')
+    parser.add_argument('--features', help='almacén de características al que añadir los meses nuevos')
+    parser.add_argument('--indice')
+    parser.add_argument('--piramide')
+    parser.add_argument('--cubo')
+    parser.add_argument('--manifiesto', help='actualiza la tabla del EDA, las figuras y el modelo publicados')
+    parser.add_argument('--rondas', type=int, default=0,
+                        help='continúa el modelo publicado con estas rondas sobre las filas nuevas')
+    parser.add_argument('--modelo-destino', help='directorio del modelo continuado (por defecto, el del actual)')
+    parser.add_argument('--anio-min', type=int, default=1900)
+    parser.add_argument('--procesos', type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    t0 = time.perf_counter()
+    resumen = actualizar(args.netcdf, args.features, args.indice, args.piramide, args.manifiesto, args.rondas,
+                         args.modelo_destino, args.anio_min, procesos=args.procesos, dir_cubo=args.cubo)
+    for paso, resultado in resumen.items():
+        print(f"{paso:<14}{resultado}")
+    print(f"{time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
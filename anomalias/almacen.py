@@ -0,0 +1,228 @@
+"""
+Almacén columnar canónico del dataset limpio: una fila por celda y mes con
+anomalía, con los tipos mínimos en lugar de CSV o DataFrames float64.
+
+- t: uint16, meses desde el primero del NetCDF;
+- i, j: int16, fila (latitud) y columna (longitud) de la rejilla;
+- anomalia, climatologia: float32 (la climatología imputada con la mediana
+  global, como en las características);
+- tierra: bool (land_mask >= 0.5), que Parquet guarda empaquetado a un bit.
+
+Las coordenadas y la fracción de tierra exacta se guardan una sola vez por
+celda (`_meta.json`, `_mascara.npy`). Las filas se particionan por década
+(`decada=1900/parte.parquet`), con un row group por año y orden (t, i, j):
+un filtro por fechas descarta particiones y row groups sin leerlos, y cada
+columna se lee por separado.
+
+    python -m anomalias.almacen data/Land_and_Ocean_LatLong1.nc data/almacen --comprobar
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from anomalias.features import climatologia_imputada
+
+RUTA_POR_DEFECTO = os.path.join('data', 'almacen')
+UMBRAL_TIERRA = 0.5
+
+
+def esquema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('t', pa.uint16()), ('i', pa.int16()), ('j', pa.int16()),
+        ('anomalia', pa.float32()), ('climatologia', pa.float32()), ('tierra', pa.bool_()),
+    ])
+
+
+def decadas(tiempo):
+    """Tramos [t0, t1) de índices de tiempo de cada década: {década: (t0, t1)}."""
+    decada = (np.floor(tiempo).astype(int) // 10) * 10
+    cortes = np.flatnonzero(np.diff(decada)) + 1
+    inicios = np.r_[0, cortes]
+    finales = np.r_[cortes, len(tiempo)]
+    return {int(decada[a]): (int(a), int(b)) for a, b in zip(inicios, finales)}
+
+
+def construir_almacen(ruta_netcdf, destino, anio_min=None, meses_por_grupo=12):
+    """
+    Escribe el almacén en `destino` leyendo el NetCDF por bloques de
+    `meses_por_grupo` meses (un row group cada uno). Devuelve filas, bytes y segundos.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import xarray as xr
+
+    t0 = time.perf_counter()
+    filas = 0
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        tiempo = ds['time'].values
+        if len(tiempo) > np.iinfo(np.uint16).max:
+            raise ValueError(f"{len(tiempo)} meses no caben en t (uint16)")
+        mascara = ds['land_mask'].values.astype(np.float32)
+        tierra = mascara >= UMBRAL_TIERRA
+        clima = climatologia_imputada(ds)
+        mes = np.floor((tiempo - np.floor(tiempo)) * 12).astype(int).clip(0, 11)
+
+        os.makedirs(destino, exist_ok=True)
+        for decada, (a, b) in decadas(tiempo).items():
+            if anio_min is not None:
+                a = max(a, int(np.searchsorted(np.floor(tiempo), anio_min)))
+                if a >= b:
+                    continue
+            directorio = os.path.join(destino, f'decada={decada}')
+            os.makedirs(directorio, exist_ok=True)
+            ruta = os.path.join(directorio, 'parte.parquet')
+            with pq.ParquetWriter(ruta + '.tmp', esquema(), compression='zstd', compression_level=3,
+                                  use_dictionary=['t', 'i'], use_byte_stream_split=['anomalia', 'climatologia'],
+                                  write_statistics=['t', 'i', 'j'],
+                                  sorting_columns=[pq.SortingColumn(c) for c in range(3)]) as escritor:
+                for inicio in range(a, b, meses_por_grupo):
+                    bloque = ds['temperature'][inicio:min(inicio + meses_por_grupo, b)].values
+                    validos = ~np.isnan(bloque)
+                    tt, ii, jj = np.nonzero(validos)
+                    tabla = pa.table({
+                        't': (tt + inicio).astype(np.uint16), 'i': ii.astype(np.int16), 'j': jj.astype(np.int16),
+                        'anomalia': bloque[validos].astype(np.float32),
+                        'climatologia': clima[mes[tt + inicio], ii, jj],
+                        'tierra': tierra[ii, jj],
+                    }, schema=esquema())
+                    escritor.write_table(tabla, row_group_size=max(len(tabla), 1))
+                    filas += len(tabla)
+            os.replace(ruta + '.tmp', ruta)
+
+        np.save(os.path.join(destino, '_mascara.npy'), mascara)
+        meta = {
+            'tiempo_inicial': float(tiempo[0]),
+            'meses': int(len(tiempo)),
+            'anio_min': anio_min,
+            'latitud': ds['latitude'].values.astype(float).tolist(),
+            'longitud': ds['longitude'].values.astype(float).tolist(),
+        }
+    with open(os.path.join(destino, '_meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    tamano = sum(os.path.getsize(r) for r in glob.glob(os.path.join(destino, '**', '*'), recursive=True)
+                 if os.path.isfile(r))
+    return {'filas': filas, 'bytes': tamano, 'segundos': time.perf_counter() - t0}
+
+
+class Almacen:
+    """Lectura del almacén como dataset Arrow particionado por década."""
+
+    def __init__(self, directorio):
+        import pyarrow as pa
+        import pyarrow.dataset as pads
+
+        with open(os.path.join(directorio, '_meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.directorio = directorio
+        self.tiempo_inicial = meta['tiempo_inicial']
+        self.meses = meta['meses']
+        self.lat = np.asarray(meta['latitud'])
+        self.lon = np.asarray(meta['longitud'])
+        self.mascara = np.load(os.path.join(directorio, '_mascara.npy'))
+        self.anio_inicial = int(np.floor(self.tiempo_inicial))
+        self.mes_inicial = int(np.floor((self.tiempo_inicial - self.anio_inicial) * 12)) + 1
+        # Los ficheros con prefijo '_' (meta y máscara) quedan fuera del dataset
+        self.dataset = pads.dataset(directorio, format='parquet',
+                                    partitioning=pads.partitioning(pa.schema([('decada', pa.int16())]),
+                                                                   flavor='hive'))
+
+    def indice_tiempo(self, anio, mes):
+        return (anio - self.anio_inicial) * 12 + mes - self.mes_inicial
+
+    def tiempo(self, t):
+        """Años decimales de los índices t."""
+        return self.tiempo_inicial + np.asarray(t) / 12
+
+    def filtro(self, desde=None, hasta=None, solo_tierra=False):
+        """Expresión para `leer`: meses entre `desde` y `hasta` ((año, mes), incluidos)."""
+        import pyarrow.dataset as pads
+
+        condiciones = []
+        if desde is not None:
+            condiciones += [pads.field('decada') >= (desde[0] // 10) * 10,
+                            pads.field('t') >= max(self.indice_tiempo(*desde), 0)]
+        if hasta is not None:
+            condiciones += [pads.field('decada') <= (hasta[0] // 10) * 10,
+                            pads.field('t') <= self.indice_tiempo(*hasta)]
+        if solo_tierra:
+            condiciones.append(pads.field('tierra'))
+        filtro = None
+        for condicion in condiciones:
+            filtro = condicion if filtro is None else filtro & condicion
+        return filtro
+
+    def leer(self, columnas=None, desde=None, hasta=None, solo_tierra=False):
+        """Tabla Arrow con `columnas` (todas por defecto) de las filas del rango pedido."""
+        return self.dataset.to_table(columns=columnas, filter=self.filtro(desde, hasta, solo_tierra))
+
+    def rejilla(self, desde=None, hasta=None):
+        """Anomalías (tiempo, lat, lon) del rango, con NaN donde no hay fila: la inversa de construir."""
+        tabla = self.leer(['t', 'i', 'j', 'anomalia'], desde, hasta)
+        t0 = 0 if desde is None else max(self.indice_tiempo(*desde), 0)
+        t1 = self.meses if hasta is None else min(self.indice_tiempo(*hasta) + 1, self.meses)
+        datos = np.full((t1 - t0, len(self.lat), len(self.lon)), np.nan, dtype=np.float32)
+        t = tabla.column('t').to_numpy().astype(np.int64) - t0
+        datos[t, tabla.column('i').to_numpy(), tabla.column('j').to_numpy()] = tabla.column('anomalia').to_numpy()
+        return datos
+
+
+def comprobar(directorio, ruta_netcdf):
+    """
+    Ida y vuelta: reconstruye cada década del almacén y la compara con el
+    NetCDF (anomalías, climatología imputada y máscara). Devuelve {comprobación: bool}.
+    """
+    import xarray as xr
+
+    almacen = Almacen(directorio)
+    resultado = {'anomalia': True, 'climatologia': True, 'tierra': True}
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        tiempo = ds['time'].values
+        clima = climatologia_imputada(ds)
+        tierra = ds['land_mask'].values >= UMBRAL_TIERRA
+        mes = np.floor((tiempo - np.floor(tiempo)) * 12).astype(int).clip(0, 11)
+        anio_min = json.load(open(os.path.join(directorio, '_meta.json'), encoding='utf-8'))['anio_min']
+        resultado['mascara'] = np.array_equal(almacen.mascara, ds['land_mask'].values.astype(np.float32),
+                                              equal_nan=True)
+        for decada, (a, b) in decadas(tiempo).items():
+            if anio_min is not None:
+                a = max(a, int(np.searchsorted(np.floor(tiempo), anio_min)))
+                if a >= b:
+                    continue
+            desde = (int(np.floor(tiempo[a])), int(mes[a]) + 1)
+            hasta = (int(np.floor(tiempo[b - 1])), int(mes[b - 1]) + 1)
+            resultado['anomalia'] &= np.array_equal(almacen.rejilla(desde, hasta),
+                                                    ds['temperature'][a:b].values.astype(np.float32), equal_nan=True)
+            tabla = almacen.leer(['t', 'i', 'j', 'climatologia', 'tierra'], desde, hasta)
+            t, i, j = (tabla.column(c).to_numpy().astype(np.int64) for c in ('t', 'i', 'j'))
+            resultado['climatologia'] &= np.array_equal(tabla.column('climatologia').to_numpy(), clima[mes[t], i, j])
+            resultado['tierra'] &= np.array_equal(tabla.column('tierra').to_numpy(zero_copy_only=False), tierra[i, j])
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('netcdf')
+    parser.add_argument('destino', nargs='?', default=RUTA_POR_DEFECTO)
+    parser.add_argument('--anio-min', type=int)
+    parser.add_argument('--comprobar', action='store_true', help='compara el almacén escrito con el NetCDF')
+    args = parser.parse_args()
+
+    resumen = construir_almacen(args.netcdf, args.destino, args.anio_min)
+    print(f"{resumen['filas']:,} filas, {resumen['bytes'] / 2**20:.1f} MB "
+          f"({resumen['bytes'] / max(resumen['filas'], 1):.2f} B/fila), {resumen['segundos']:.1f} s")
+    if args.comprobar:
+        resultado = comprobar(args.destino, args.netcdf)
+        for nombre, igual in resultado.items():
+            print(f"{nombre:<14}{'igual' if igual else 'DISTINTO'}")
+        if not all(resultado.values()):
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+"""
+API REST de predicción sobre el servidor Flask del dashboard.
+
+    POST /api/predict
+    {"puntos": [{"lat": 11.0, "lon": -74.8, "anio": 2020, "mes": 7}, ...]}
+    {"lat": [...], "lon": [...], "anio": [...], "mes": [...]}          (columnar)
+    {"bbox": [lat_min, lat_max, lon_min, lon_max], "anio": 2020, "mes": 7}
+
+Cada punto se asigna a la celda más cercana del índice (`anomalias.indice`),
+cuyas ventanas de historia dan las características del modelo. Las peticiones
+concurrentes de un worker se agrupan en micro-lotes: el primer punto que llega
+abre una ventana de `ANOMALIAS_VENTANA_MS` milisegundos y todo lo que entra en
+ella se ensambla y predice con una sola llamada vectorizada. Para que haya
+concurrencia dentro del worker, gunicorn debe usar hilos (`--threads`).
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from flask import jsonify, request
+
+from anomalias.indice import abrir_indice
+from anomalias.modelos import registro
+
+logger = logging.getLogger(__name__)
+
+MAX_PUNTOS = 100_000
+MAX_FILAS_LOTE = 200_000
+
+
+def ventana_por_defecto():
+    return float(os.environ.get('ANOMALIAS_VENTANA_MS', '2'))
+
+
+class ErrorPeticion(ValueError):
+    """Petición mal formada o fuera del rango del índice (HTTP 400)."""
+
+
+class MicroLotes:
+    """
+    Agrupa llamadas concurrentes a `funcion(*columnas)` en una sola. Cada
+    llamada pasa arrays 1D de la misma longitud y recibe su tramo del resultado.
+    """
+
+    def __init__(self, funcion, ventana_ms=None, max_filas=MAX_FILAS_LOTE):
+        self.funcion = funcion
+        self.ventana = (ventana_por_defecto() if ventana_ms is None else ventana_ms) / 1000
+        self.max_filas = max_filas
+        self.lotes = 0
+        self.filas = 0
+        self._cola = queue.Queue()
+        self._hilo = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _arrancar(self):
+        # El hilo no sobrevive al fork de gunicorn: se arranca en cada worker
+        with self._lock:
+            if self._pid != os.getpid():
+                self._cola = queue.Queue()
+                self._hilo = threading.Thread(target=self._bucle, name='micro-lotes', daemon=True)
+                self._hilo.start()
+                self._pid = os.getpid()
+
+    def enviar(self, *columnas):
+        if self._pid != os.getpid():
+            self._arrancar()
+        futuro = Future()
+        self._cola.put((columnas, futuro))
+        return futuro
+
+    def __call__(self, *columnas):
+        return self.enviar(*columnas).result()
+
+    def _bucle(self):
+        while True:
+            pendientes = [self._cola.get()]
+            filas = len(pendientes[0][0][0])
+            limite = time.monotonic() + self.ventana
+            while filas < self.max_filas:
+                try:
+                    restante = limite - time.monotonic()
+                    pendiente = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                pendientes.append(pendiente)
+                filas += len(pendiente[0][0])
+            self._procesar(pendientes)
+
+    def _procesar(self, pendientes):
+        try:
+            columnas = [np.concatenate(c) for c in zip(*(p[0] for p in pendientes))]
+            resultado = self.funcion(*columnas)
+        except Exception as e:
+            for _, futuro in pendientes:
+                futuro.set_exception(e)
+            return
+        self.lotes += 1
+        self.filas += len(resultado)
+        cortes = np.cumsum([len(p[0][0]) for p in pendientes])[:-1]
+        for (_, futuro), parte in zip(pendientes, np.split(resultado, cortes)):
+            futuro.set_result(parte)
+
+
+def predecir_celdas(celda, t):
+    """Predicción vectorizada para arrays de celdas e índices de tiempo del índice."""
+    booster, _ = registro.obtener()
+    return booster.inplace_predict(abrir_indice().features(celda, t)).astype(np.float32)
+
+
+predictor = MicroLotes(predecir_celdas)
+
+
+def _columna(cuerpo, nombre, n=None):
+    valor = cuerpo.get(nombre)
+    if valor is None:
+        raise ErrorPeticion(f"Falta '{nombre}'")
+    try:
+        valor = np.asarray(valor, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ErrorPeticion(f"'{nombre}' debe ser numérico") from None
+    if n is not None:
+        valor = np.broadcast_to(valor, (n,)) if valor.ndim == 0 else valor
+    return valor.ravel()
+
+
+def puntos_peticion(cuerpo, indice):
+    """Convierte el JSON de la petición en arrays (lat, lon, anio, mes)."""
+    if not isinstance(cuerpo, dict):
+        raise ErrorPeticion("El cuerpo debe ser un objeto JSON")
+    if 'bbox' in cuerpo:
+        try:
+            lat_min, lat_max, lon_min, lon_max = (float(v) for v in cuerpo['bbox'])
+        except (TypeError, ValueError):
+            raise ErrorPeticion("'bbox' debe ser [lat_min, lat_max, lon_min, lon_max]") from None
+        lat, lon = indice.celdas_caja(lat_min, lat_max, lon_min, lon_max)
+    elif 'puntos' in cuerpo:
+        puntos = cuerpo['puntos']
+        if not isinstance(puntos, list) or not all(isinstance(p, dict) for p in puntos):
+            raise ErrorPeticion("'puntos' debe ser una lista de objetos {lat, lon, anio, mes}")
+        cuerpo = {c: [p.get(c) for p in puntos] for c in ('lat', 'lon', 'anio', 'mes')}
+        lat, lon = _columna(cuerpo, 'lat'), _columna(cuerpo, 'lon')
+    else:
+        lat, lon = _columna(cuerpo, 'lat'), _columna(cuerpo, 'lon')
+    if len(lat) != len(lon):
+        raise ErrorPeticion("'lat' y 'lon' deben tener la misma longitud")
+    anio, mes = _columna(cuerpo, 'anio', len(lat)), _columna(cuerpo, 'mes', len(lat))
+    if len(anio) != len(lat) or len(mes) != len(lat):
+        raise ErrorPeticion("'anio' y 'mes' deben ser escalares o tener un valor por punto")
+    if len(lat) > MAX_PUNTOS:
+        raise ErrorPeticion(f"Como máximo {MAX_PUNTOS} puntos por petición")
+    if np.isnan(np.concatenate([lat, lon, anio, mes])).any():
+        raise ErrorPeticion("Hay valores nulos en la petición")
+    if ((mes < 1) | (mes > 12)).any():
+        raise ErrorPeticion("'mes' debe estar entre 1 y 12")
+    return lat, lon, anio.astype(np.int64), mes.astype(np.int64)
+
+
+def registrar_api(server):
+    @server.route('/api/predict', methods=['POST'])
+    def api_predict():
+        indice = abrir_indice()
+        booster, version = registro.obtener()
+        if indice is None or booster is None:
+            return jsonify(error="Modelo o índice de historia no disponibles"), 503
+        try:
+            lat, lon, anio, mes = puntos_peticion(request.get_json(silent=True), indice)
+            i, j, celda = indice.celdas(lat, lon)
+            t = indice.indices_tiempo(anio, mes)
+            t_min, t_max = indice.rango_prediccion()
+            if ((t < t_min) | (t > t_max)).any():
+                raise ErrorPeticion("Meses fuera del rango con historia completa del índice")
+        except ErrorPeticion as e:
+            return jsonify(error=str(e)), 400
+        prediccion = predictor(celda, t) if len(celda) else np.zeros(0, dtype=np.float32)
+        return jsonify(
+            modelo=version,
+            lat=indice.lat[i].tolist(), lon=indice.lon[j].tolist(),
+            anio=anio.tolist(), mes=mes.tolist(),
+            prediccion=np.round(prediccion.astype(np.float64), 4).tolist(),
+        )
+
+    @server.route('/api/modelo', methods=['GET'])
+    def api_modelo():
+        registro.obtener()
+        return jsonify(registro.info())
@@ -0,0 +1,99 @@
+"""
+Arranque del dashboard en dos fases.
+
+Importar `app` solo carga Dash y la carcasa de presentación (las pestañas de
+texto y métricas, que salen del manifiesto JSON). Los subsistemas de datos y
+modelo (xgboost, xarray y el NetCDF, el índice, la pirámide, el cubo de
+series, las capas de tendencia, las contribuciones del modelo y la pestaña
+del explorador) se cargan la primera vez que se usan o, antes, en un hilo de
+calentamiento por worker que no bloquea las peticiones:
+
+- con gunicorn, `when_ready` (maestro, tras `--preload`) carga el modelo una
+  vez para que los workers lo hereden copy-on-write, y `post_fork` arranca el
+  calentamiento de cada worker;
+- con cualquier otro servidor, el calentamiento arranca en la primera petición.
+"""
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def precargar():
+    """Carga el modelo en el proceso actual (el maestro de gunicorn, antes del fork)."""
+    from anomalias.modelos import registro
+
+    t0 = time.perf_counter()
+    if registro.cargar():
+        logger.info("Modelo precargado en %.2f s", time.perf_counter() - t0)
+
+
+class Calentamiento:
+    """Hilo que carga en segundo plano lo que el primer clic necesitaría, una vez por proceso."""
+
+    def __init__(self):
+        self.registro_layouts = None
+        self.segundos = {}
+        self.terminado = threading.Event()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def pasos(self):
+        from anomalias import datos
+        from anomalias.contribuciones import abrir_contribuciones
+        from anomalias.cubo import abrir_cubo
+        from anomalias.descomposicion import abrir_tendencias
+        from anomalias.indice import abrir_indice
+        from anomalias.modelos import registro
+        from anomalias.piramide import abrir_piramide
+
+        yield 'modelo', registro.obtener
+        yield 'indice', abrir_indice
+        yield 'piramide', abrir_piramide
+        yield 'cubo', abrir_cubo
+        yield 'tendencias', abrir_tendencias
+        yield 'contribuciones', abrir_contribuciones
+        if datos.dataset_disponible():
+            yield 'dataset', datos.abrir_dataset
+        if self.registro_layouts is not None:
+            yield 'layouts', lambda: self.registro_layouts.precalentar(diferidas=True)
+
+    def _calentar(self):
+        for nombre, paso in self.pasos():
+            t0 = time.perf_counter()
+            try:
+                paso()
+            except Exception:
+                logger.exception("Fallo al calentar '%s'", nombre)
+            self.segundos[nombre] = time.perf_counter() - t0
+        logger.info("Calentamiento del worker: %s",
+                    ', '.join(f'{n} {s:.2f} s' for n, s in self.segundos.items()))
+        self.terminado.set()
+
+    def iniciar(self):
+        # Los hilos no sobreviven al fork: como los micro-lotes, uno por proceso
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self.segundos = {}
+                self.terminado = threading.Event()
+                threading.Thread(target=self._calentar, name='calentamiento', daemon=True).start()
+                self._pid = os.getpid()
+
+
+calentamiento = Calentamiento()
+
+
+def registrar_arranque(server, registro_layouts):
+    """Calienta las pestañas diferidas de `registro_layouts` y los datos desde la primera petición."""
+    calentamiento.registro_layouts = registro_layouts
+
+    @server.before_request
+    def _iniciar_calentamiento():
+        if calentamiento._pid != os.getpid():
+            calentamiento.iniciar()
+
+    return calentamiento
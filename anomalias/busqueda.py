@@ -0,0 +1,261 @@
+"""
+Búsqueda de hiperparámetros temporal, paralela y con successive halving.
+
+Sustituye al `RandomizedSearchCV` (20 candidatos × 3 pliegues aleatorios):
+
+- Los pliegues son de ventana expansiva: se entrena con los años anteriores a
+  cada ventana de validación, así que nunca se valida con el pasado.
+- Los candidatos se evalúan en un pool de procesos; cada uno limita XGBoost a
+  `hilos_por_candidato` hilos para no sobre-suscribir la CPU.
+- Successive halving sobre el número de rondas: todos los candidatos empiezan
+  con pocas rondas, solo el mejor 1/eta pasa al siguiente escalón (continuando
+  el booster ya entrenado) y, dentro de cada escalón, el early stopping corta
+  las configuraciones que dejan de mejorar.
+
+    python -m anomalias.busqueda data/features data/busqueda.json --candidatos 20
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from anomalias.entrenamiento import ANIO_CORTE, PARAMETROS_POR_DEFECTO, leer_lotes, partes
+
+logger = logging.getLogger(__name__)
+
+ESPACIO = {
+    'learning_rate': ('log', 0.01, 0.3),
+    'max_depth': ('int', 4, 12),
+    'subsample': ('float', 0.5, 1.0),
+    'colsample_bytree': ('float', 0.5, 1.0),
+    'min_child_weight': ('log', 1, 100),
+    'gamma': ('float', 0.0, 5.0),
+    'reg_alpha': ('log', 1e-3, 10),
+    'reg_lambda': ('log', 1e-2, 100),
+}
+
+# Datos de la búsqueda: se cargan en el proceso padre antes del fork y los
+# workers los comparten copy-on-write
+_DATOS = {}
+_MATRICES = {}
+
+
+def muestrear_candidatos(n, semilla=0):
+    rng = np.random.default_rng(semilla)
+    candidatos = []
+    for _ in range(n):
+        params = {}
+        for nombre, (tipo, lo, hi) in ESPACIO.items():
+            if tipo == 'log':
+                params[nombre] = float(np.exp(rng.uniform(np.log(lo), np.log(hi))))
+            elif tipo == 'int':
+                params[nombre] = int(rng.integers(lo, hi + 1))
+            else:
+                params[nombre] = float(rng.uniform(lo, hi))
+        candidatos.append(params)
+    return candidatos
+
+
+def pliegues_expansivos(anio_inicio, anio_corte, n_pliegues=3):
+    """
+    Lista de (fin_entrenamiento, fin_validacion): el pliegue k entrena con
+    [anio_inicio, fin_entrenamiento) y valida con [fin_entrenamiento, fin_validacion).
+    """
+    largo = (anio_corte - anio_inicio) // (n_pliegues + 1)
+    return [(anio_inicio + largo * (k + 1), anio_inicio + largo * (k + 2) if k < n_pliegues - 1 else anio_corte)
+            for k in range(n_pliegues)]
+
+
+def cargar_datos(directorio_features, anio_corte, max_filas=None, semilla=0):
+    """
+    Filas anteriores a `anio_corte` en memoria. Con `max_filas`, una muestra
+    uniforme tomada en una sola pasada, sin cargar antes todas las filas.
+    """
+    from anomalias.features import COLUMNAS_FEATURES, OBJETIVO
+    from anomalias.muestreo import muestrear
+
+    if max_filas:
+        columnas, _ = muestrear(directorio_features, max_filas, semilla, uniforme=True,
+                                columnas=COLUMNAS_FEATURES + [OBJETIVO], anio_hasta=anio_corte)
+        X = np.column_stack([columnas[c] for c in COLUMNAS_FEATURES]).astype(np.float32, copy=False)
+        y = columnas[OBJETIVO]
+    else:
+        X_partes, y_partes = [], []
+        for X, y in leer_lotes(partes(directorio_features), anio_hasta=anio_corte):
+            X_partes.append(X)
+            y_partes.append(y)
+        X = np.concatenate(X_partes)
+        y = np.concatenate(y_partes)
+    anio = X[:, COLUMNAS_FEATURES.index('anio')].astype(np.int16)
+    return X, y, anio
+
+
+def _matrices_pliegue(k, hilos):
+    # DMatrix de cada pliegue, construidas una sola vez por worker
+    import xgboost as xgb
+
+    if k not in _MATRICES:
+        fin_entrenamiento, fin_validacion = _DATOS['pliegues'][k]
+        X, y, anio = _DATOS['X'], _DATOS['y'], _DATOS['anio']
+        entrenamiento = anio < fin_entrenamiento
+        validacion = (anio >= fin_entrenamiento) & (anio < fin_validacion)
+        dtrain = xgb.QuantileDMatrix(X[entrenamiento], y[entrenamiento], nthread=hilos, max_bin=256)
+        dvalid = xgb.DMatrix(X[validacion], y[validacion], nthread=hilos)
+        _MATRICES[k] = (dtrain, dvalid)
+    return _MATRICES[k]
+
+
+def _evaluar_candidato(args):
+    """Entrena (o continúa) un candidato hasta `rondas` en todos los pliegues."""
+    import xgboost as xgb
+
+    indice, params, rondas, estados, hilos, paciencia = args
+    t_cpu = time.process_time()
+    parametros = {**PARAMETROS_POR_DEFECTO, **params, 'nthread': hilos}
+    maes, nuevos_estados, rondas_usadas = [], [], []
+    for k in range(len(_DATOS['pliegues'])):
+        dtrain, dvalid = _matrices_pliegue(k, hilos)
+        previo = estados[k] if estados else None
+        modelo_previo = xgb.Booster(model_file=bytearray(previo)) if previo else None
+        rondas_previas = modelo_previo.num_boosted_rounds() if modelo_previo else 0
+        booster = xgb.train(parametros, dtrain, num_boost_round=max(rondas - rondas_previas, 1),
+                            evals=[(dvalid, 'validacion')], early_stopping_rounds=paciencia,
+                            xgb_model=modelo_previo, verbose_eval=False)
+        mejor = booster.best_iteration + 1
+        prediccion = booster.predict(dvalid, iteration_range=(0, mejor))
+        maes.append(float(np.mean(np.abs(prediccion - dvalid.get_label()))))
+        nuevos_estados.append(bytes(booster.save_raw('ubj')))
+        rondas_usadas.append(mejor)
+    return {
+        'indice': indice,
+        'mae': float(np.mean(maes)),
+        'estados': nuevos_estados,
+        'rondas': int(max(rondas_usadas)),
+        'segundos_cpu': time.process_time() - t_cpu,
+    }
+
+
+def _mapear(pool, tareas):
+    return pool.map(_evaluar_candidato, tareas) if pool else [_evaluar_candidato(t) for t in tareas]
+
+
+def successive_halving(candidatos, rondas_min=50, rondas_max=800, eta=3, hilos=1, procesos=1, paciencia=20):
+    """
+    Devuelve (mejor, historial, segundos_cpu). `mejor` incluye parámetros,
+    rondas efectivas y MAE medio de validación temporal.
+    """
+    contexto = multiprocessing.get_context('fork')
+    vivos = [{'indice': i, 'params': p, 'estados': None} for i, p in enumerate(candidatos)]
+    historial, cpu_total = [], 0.0
+    rondas = rondas_min
+    pool = contexto.Pool(procesos) if procesos > 1 else None
+    try:
+        while True:
+            tareas = [(c['indice'], c['params'], rondas, c['estados'], hilos, paciencia) for c in vivos]
+            resultados = _mapear(pool, tareas)
+            for c, r in zip(vivos, resultados):
+                c.update(mae=r['mae'], estados=r['estados'], rondas=r['rondas'])
+                cpu_total += r['segundos_cpu']
+            vivos.sort(key=lambda c: c['mae'])
+            historial.append({'rondas': rondas, 'candidatos': len(vivos),
+                              'mae': [round(c['mae'], 5) for c in vivos]})
+            logger.info("Escalón de %d rondas: %d candidatos, mejor MAE %.4f", rondas, len(vivos), vivos[0]['mae'])
+            # El último superviviente sigue hasta rondas_max (con su parada temprana)
+            if rondas >= rondas_max:
+                break
+            vivos = vivos[:max(1, len(vivos) // eta)]
+            rondas = min(rondas * eta, rondas_max)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    mejor = vivos[0]
+    return ({'params': mejor['params'], 'rondas': mejor['rondas'], 'mae': mejor['mae']},
+            historial, cpu_total)
+
+
+def fuerza_bruta(candidatos, rondas_max=800, hilos=1, procesos=1):
+    """Referencia equivalente a RandomizedSearchCV: cada candidato con todas sus rondas."""
+    contexto = multiprocessing.get_context('fork')
+    tareas = [(i, p, rondas_max, None, hilos, rondas_max) for i, p in enumerate(candidatos)]
+    pool = contexto.Pool(procesos) if procesos > 1 else None
+    try:
+        resultados = _mapear(pool, tareas)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+    mejor = min(resultados, key=lambda r: r['mae'])
+    return mejor['mae'], sum(r['segundos_cpu'] for r in resultados)
+
+
+def buscar(directorio_features, anio_inicio=1900, anio_corte=ANIO_CORTE, n_candidatos=20, n_pliegues=3,
+           rondas_min=50, rondas_max=800, eta=3, hilos_por_candidato=None, max_filas=None,
+           comparar=False, semilla=0):
+    hilos = hilos_por_candidato or max(1, (os.cpu_count() or 1) // 4)
+    procesos = max(1, (os.cpu_count() or 1) // hilos)
+
+    X, y, anio = cargar_datos(directorio_features, anio_corte, max_filas, semilla)
+    _DATOS.update(X=X, y=y, anio=anio, pliegues=pliegues_expansivos(anio_inicio, anio_corte, n_pliegues))
+    _MATRICES.clear()
+    candidatos = muestrear_candidatos(n_candidatos, semilla)
+
+    t0 = time.perf_counter()
+    mejor, historial, cpu = successive_halving(candidatos, rondas_min, rondas_max, eta, hilos, procesos)
+    resumen = {
+        'mejores_parametros': mejor['params'],
+        'mejores_rondas': mejor['rondas'],
+        'mae_validacion': mejor['mae'],
+        'pliegues': _DATOS['pliegues'],
+        'filas': int(len(y)),
+        'historial': historial,
+        'horas_cpu': cpu / 3600,
+        'segundos': time.perf_counter() - t0,
+        'hilos_por_candidato': hilos,
+        'procesos': procesos,
+    }
+    if comparar:
+        mae_bruta, cpu_bruta = fuerza_bruta(candidatos, rondas_max, hilos, procesos)
+        resumen['fuerza_bruta'] = {'mae_validacion': mae_bruta, 'horas_cpu': cpu_bruta / 3600}
+        resumen['horas_cpu_ahorradas'] = (cpu_bruta - cpu) / 3600
+    return resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('features')
+    parser.add_argument('salida', help='JSON con los mejores parámetros y el historial')
+    parser.add_argument('--anio-inicio', type=int, default=1900)
+    parser.add_argument('--anio-corte', type=int, default=ANIO_CORTE)
+    parser.add_argument('--candidatos', type=int, default=20)
+    parser.add_argument('--pliegues', type=int, default=3)
+    parser.add_argument('--rondas-min', type=int, default=50)
+    parser.add_argument('--rondas-max', type=int, default=800)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--hilos-por-candidato', type=int)
+    parser.add_argument('--max-filas', type=int, help='submuestra de filas para la búsqueda')
+    parser.add_argument('--comparar', action='store_true',
+                        help='ejecuta también la búsqueda exhaustiva para medir el ahorro')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    resumen = buscar(args.features, args.anio_inicio, args.anio_corte, args.candidatos, args.pliegues,
+                     args.rondas_min, args.rondas_max, args.eta, args.hilos_por_candidato, args.max_filas,
+                     args.comparar, args.semilla)
+    with open(args.salida, 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, indent=2)
+    print(f"MAE validación {resumen['mae_validacion']:.4f} con {resumen['mejores_rondas']} rondas, "
+          f"{resumen['horas_cpu']:.3f} h CPU")
+    if 'fuerza_bruta' in resumen:
+        print(f"Fuerza bruta: MAE {resumen['fuerza_bruta']['mae_validacion']:.4f}, "
+              f"{resumen['fuerza_bruta']['horas_cpu']:.3f} h CPU "
+              f"(ahorro {resumen['horas_cpu_ahorradas']:.3f} h CPU)")
+
+
+if __name__ == '__main__':
+    main()
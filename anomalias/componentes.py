@@ -0,0 +1,98 @@
+import os
+
+from dash import html
+
+from anomalias.estaticos import variantes_estaticas
+from anomalias.figuras import DIR_ASSETS
+
+# =====================================
+# Paleta de Colores Mejorada
+# =====================================
+COLORS = {
+    'background': '#1a2634',
+    'card_background': '#243447',
+    'text': '#ffffff',
+    'accent': '#3cbaec',
+    'highlight': '#ff6b6b',
+    'accent_subtle': '#2c3e50'
+}
+
+TEXT_STYLE = {'color': COLORS['text'], 'textAlign': 'justify', 'lineHeight': '1.8'}
+
+# Texto de una métrica que el manifiesto no tiene (p. ej. R² con varianza nula)
+SIN_DATO = '—'
+
+# =====================================
+# Componentes Personalizados
+# =====================================
+def formato(valor, especificacion, sufijo=''):
+    """`valor` con el formato `especificacion` (p. ej. '.2%') y `sufijo`, o SIN_DATO si es None o NaN."""
+    if valor is None or valor != valor:
+        return SIN_DATO
+    return f"{valor:{especificacion}}{sufijo}"
+
+
+def create_section(title, content):
+    return html.Div([
+        html.H3(title, style={
+            'color': COLORS['accent'],
+            'borderBottom': f'2px solid {COLORS["highlight"]}',
+            'paddingBottom': '10px',
+            'fontFamily': 'Roboto, sans-serif'
+        }),
+        html.Div(content, style={'marginTop': '20px'})
+    ], className='section-card', style={'padding': '25px'})
+
+
+# PNG estáticos de assets/ que se muestran mientras no se hayan generado las
+# figuras con `python -m anomalias.figuras`
+FIGURAS_ESTATICAS = {
+    'histograma': 'histograma.png',
+    'descomposicion': 'descomposición.png',
+    'tendencia': 'tendencia.png',
+    'correlacion': 'correlacion.png',
+    'feature_importance': 'feature_importance_enhanced.png',
+    'predictions_vs_actual': 'predictions_vs_actual_enhanced.png',
+}
+
+
+# Ancho de presentación de las figuras: media columna desde md, todo el ancho en móvil
+TAMANOS_FIGURA = '(min-width: 768px) 50vw, 100vw'
+
+
+class ImgNativa(html.Img):
+    """
+    html.Img con los atributos nativos `loading` y `decoding`, que dash no
+    declara; el componente de React pasa todas sus props al <img>.
+    """
+    def __init__(self, loading=None, decoding=None, **kwargs):
+        super().__init__(**kwargs)
+        self._prop_names = self._prop_names + ['loading', 'decoding']
+        self.loading, self.decoding = loading, decoding
+
+
+def imagen(entrada, style=None, sizes=TAMANOS_FIGURA):
+    """
+    <picture> con las variantes AVIF/WebP de `entrada` (ver `anomalias.estaticos`)
+    y el PNG de respaldo, con carga diferida y decodificación asíncrona del
+    navegador: las de pestañas ocultas no se descargan hasta que se muestran.
+    """
+    fuentes = [
+        html.Source(type=tipo, sizes=sizes, srcSet=', '.join(f'/assets/{url} {w}w' for url, w in urls))
+        for tipo, urls in entrada.get('fuentes', {}).items()
+    ]
+    img = ImgNativa(src='/assets/' + entrada['src'], width=entrada.get('ancho'), height=entrada.get('alto'),
+                    loading='lazy', decoding='async', className='img-fluid rounded shadow', style=style)
+    return html.Picture(fuentes + [img])
+
+
+def figura(figuras, nombre, style=None, sizes=TAMANOS_FIGURA):
+    """Imagen de una figura publicada en el manifiesto (sección `figuras`) o su PNG estático."""
+    if nombre in figuras:
+        entrada = figuras[nombre]
+    elif nombre in FIGURAS_ESTATICAS and os.path.exists(os.path.join(DIR_ASSETS, FIGURAS_ESTATICAS[nombre])):
+        entrada = variantes_estaticas().get(FIGURAS_ESTATICAS[nombre]) or {'src': FIGURAS_ESTATICAS[nombre]}
+    else:
+        return html.P(f"Figura '{nombre}' pendiente de generar (python -m anomalias.figuras).",
+                      style={**TEXT_STYLE, 'fontStyle': 'italic', 'marginTop': '20px'})
+    return imagen(entrada, style, sizes)
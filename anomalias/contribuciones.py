@@ -0,0 +1,308 @@
+"""
+Contribuciones de cada característica a las predicciones del periodo de prueba.
+
+La importancia global por ganancia no dice cuánto aporta cada variable a una
+predicción concreta. Aquí se calculan con TreeSHAP nativo de XGBoost
+(`pred_contribs`, exacto sobre los árboles `hist`): para cada fila, la
+aportación de cada característica más un sesgo común, que suman la
+predicción. Las filas de prueba (desde `anio_corte`) se recorren fichero a
+fichero del almacén de características, en lotes de `max_filas` que XGBoost
+reparte entre `nthread` hilos, y solo se guardan agregados:
+
+- por región de `anomalias.cubo.REGIONES` y mes: sumas ponderadas por cos(lat)
+  de las contribuciones y de su valor absoluto, de las que salen las medias
+  por región y década;
+- por celda y década: suma de contribuciones y número de filas.
+
+El resultado es un `.npz` de unos MB que la pestaña Resultados consulta sin
+volver a tocar las filas de prueba. La explicación exacta de una celda y un
+mes concretos se calcula al vuelo con el índice de historia (`explicar`).
+
+    python -m anomalias.contribuciones data/features resultados/modelo/modelo.ubj data/contribuciones.npz \\
+        --anio-corte 2001 --nthread 8
+"""
+import argparse
+import functools
+import hashlib
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias import cubo
+from anomalias.entrenamiento import ANIO_CORTE, leer_lotes, partes
+from anomalias.features import COLUMNAS_FEATURES, COLUMNAS_ID, rss_max_mb
+from anomalias.regiones import UMBRAL_TIERRA
+
+logger = logging.getLogger(__name__)
+
+RUTA_POR_DEFECTO = os.path.join('data', 'contribuciones.npz')
+# Columna del sesgo (valor esperado del modelo) tras las de las características
+SESGO = 'sesgo'
+# Filas por llamada a pred_contribs: la salida es (filas, características + 1) float32
+MAX_FILAS_LOTE = 250_000
+
+# nombre: (etiqueta, características)
+GRUPOS = {
+    'lags': ('Lags (1, 3 y 12 meses)', ['lag_1', 'lag_3', 'lag_12']),
+    'moviles': ('Estadísticas móviles', ['media_movil_3', 'media_movil_12', 'std_movil_3', 'std_movil_12']),
+    'diferencias': ('Diferencias', ['diff_1', 'diff_12']),
+    'tendencia': ('Año (tendencia)', ['anio']),
+    'estacionalidad': ('Estacionalidad', ['mes_sin', 'mes_cos', 'lat_x_mes_sin', 'lat_x_mes_cos']),
+    'geografia': ('Geografía', ['latitud', 'longitud', 'land_mask']),
+    'climatologia': ('Climatología', ['climatology']),
+}
+
+
+def ruta_contribuciones():
+    return os.environ.get('ANOMALIAS_CONTRIBUCIONES', RUTA_POR_DEFECTO)
+
+
+def contribuciones_filas(modelo, X, nthread=None, aproximadas=False):
+    """
+    TreeSHAP de las filas de X: (n, n_features + 1) float32, con el sesgo en la
+    última columna; cada fila suma su predicción. `modelo` es un `xgb.Booster`
+    o un `EnsembleRegional` (cada fila con el booster de su región).
+    """
+    import xgboost as xgb
+
+    def tree_shap(booster, filas):
+        matriz = xgb.DMatrix(filas, nthread=nthread or -1)
+        return booster.predict(matriz, pred_contribs=True, approx_contribs=aproximadas).astype(np.float32, copy=False)
+
+    if hasattr(modelo, 'por_region'):
+        return modelo.por_region(X, tree_shap)
+    return tree_shap(modelo, X)
+
+
+def agrupar(valores, caracteristicas=None):
+    """Suma por GRUPOS el último eje de `valores` (características + sesgo); el sesgo queda aparte."""
+    caracteristicas = list(caracteristicas if caracteristicas is not None else COLUMNAS_FEATURES + [SESGO])
+    columnas = [[caracteristicas.index(c) for c in miembros] for _, miembros in GRUPOS.values()]
+    columnas.append([caracteristicas.index(SESGO)])
+    return np.stack([valores[..., c].sum(axis=-1) for c in columnas], axis=-1)
+
+
+def _sumar(acumulado, clave, valores):
+    # Suma en acumulado[clave], alargando el primer eje si `valores` tiene más celdas
+    previo = acumulado.get(clave)
+    if previo is None:
+        acumulado[clave] = valores
+        return
+    if len(valores) > len(previo):
+        previo, valores = valores, previo
+    previo[:len(valores)] += valores
+    acumulado[clave] = previo
+
+
+def _acumular_lote(acumulados, X, celda, mes, contribuciones, anio_corte, regiones):
+    columna = COLUMNAS_FEATURES.index
+    anio = X[:, columna('anio')].astype(np.int64)
+    t = (anio - anio_corte) * 12 + mes - 1
+    pesos = cubo.pesos_puntos(X[:, columna('latitud')], X[:, columna('longitud')],
+                              X[:, columna('land_mask')] >= UMBRAL_TIERRA, regiones)
+
+    # Región × mes: ordenadas por mes, cada mes es un producto (región, fila) × (fila, columna)
+    orden = np.argsort(t, kind='stable')
+    t, pesos, ordenadas = t[orden], pesos[orden], contribuciones[orden]
+    cortes = np.r_[0, np.flatnonzero(np.diff(t)) + 1, len(t)]
+    for a, b in zip(cortes[:-1], cortes[1:]):
+        _sumar(acumulados['suma'], t[a], pesos[a:b].T @ ordenadas[a:b])
+        _sumar(acumulados['abs'], t[a], pesos[a:b].T @ np.abs(ordenadas[a:b]))
+        _sumar(acumulados['peso'], t[a], pesos[a:b].sum(axis=0))
+
+    # Celda × década
+    decada = anio // 10 * 10
+    for d in np.unique(decada):
+        seleccion = decada == d
+        c = celda[seleccion]
+        suma = np.column_stack([np.bincount(c, contribuciones[seleccion, k]) for k in range(contribuciones.shape[1])])
+        _sumar(acumulados['celda_suma'], int(d), suma)
+        _sumar(acumulados['celda_filas'], int(d), np.bincount(c))
+    _sumar(acumulados['posicion'], 'lat', np.bincount(celda, X[:, columna('latitud')]))
+    _sumar(acumulados['posicion'], 'lon', np.bincount(celda, X[:, columna('longitud')]))
+    _sumar(acumulados['posicion'], 'filas', np.bincount(celda).astype(np.float64))
+
+
+def _version_modelo(modelo, ruta_modelo):
+    # La misma versión que muestra el registro de modelos
+    if ruta_modelo.endswith('.json'):
+        return modelo.version
+    with open(ruta_modelo, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+
+def calcular_contribuciones(directorio_features, ruta_modelo, destino=None, anio_corte=ANIO_CORTE, nthread=None,
+                            max_filas=MAX_FILAS_LOTE, aproximadas=False, regiones=None):
+    """
+    Calcula las contribuciones de todas las filas de prueba (año >= `anio_corte`)
+    del almacén y guarda sus agregados en el `.npz` `destino`. Devuelve filas,
+    segundos, filas/s y RSS máximo.
+    """
+    from anomalias.regiones import cargar_modelo
+
+    rutas = partes(directorio_features)
+    if not rutas:
+        raise FileNotFoundError(f"No hay ficheros Parquet en '{directorio_features}'")
+    destino = destino or ruta_contribuciones()
+    regiones = cubo.REGIONES if regiones is None else regiones
+    nthread = nthread or os.cpu_count()
+    modelo = cargar_modelo(ruta_modelo)
+    modelo.set_param({'nthread': nthread})
+
+    n_features = len(COLUMNAS_FEATURES)
+    acumulados = {clave: {} for clave in ('suma', 'abs', 'peso', 'celda_suma', 'celda_filas', 'posicion')}
+    t_inicio = time.perf_counter()
+    filas = 0
+    for X_completo, _ in leer_lotes(rutas, anio_desde=anio_corte, columnas=COLUMNAS_FEATURES + COLUMNAS_ID):
+        for inicio in range(0, len(X_completo), max_filas):
+            bloque = X_completo[inicio:inicio + max_filas]
+            X = np.ascontiguousarray(bloque[:, :n_features])
+            celda = bloque[:, n_features].astype(np.int64)
+            mes = bloque[:, n_features + 1].astype(np.int64)
+            contribuciones = contribuciones_filas(modelo, X, nthread, aproximadas).astype(np.float64)
+            _acumular_lote(acumulados, X, celda, mes, contribuciones, anio_corte, regiones)
+            filas += len(X)
+        logger.debug("%d filas de prueba explicadas", filas)
+    if not filas:
+        raise ValueError(f"No hay filas de prueba desde {anio_corte} en '{directorio_features}'")
+
+    n_meses = max(acumulados['suma']) + 1
+    forma = (n_meses, len(regiones), n_features + 1)
+    mes_suma, mes_abs = np.zeros(forma), np.zeros(forma)
+    mes_peso = np.zeros(forma[:2])
+    for t in acumulados['suma']:
+        mes_suma[t], mes_abs[t], mes_peso[t] = acumulados['suma'][t], acumulados['abs'][t], acumulados['peso'][t]
+    decadas = sorted(acumulados['celda_suma'])
+    posicion = acumulados['posicion']
+    n_celdas = len(posicion['filas'])
+    celda_suma = np.zeros((len(decadas), n_celdas, n_features + 1), dtype=np.float32)
+    celda_filas = np.zeros((len(decadas), n_celdas), dtype=np.int32)
+    for k, d in enumerate(decadas):
+        suma, cuenta = acumulados['celda_suma'][d], acumulados['celda_filas'][d]
+        celda_suma[k, :len(suma)] = suma
+        celda_filas[k, :len(cuenta)] = cuenta
+    with np.errstate(invalid='ignore', divide='ignore'):
+        celda_lat = (posicion['lat'] / posicion['filas']).astype(np.float32)
+        celda_lon = (posicion['lon'] / posicion['filas']).astype(np.float32)
+
+    directorio = os.path.dirname(os.path.abspath(destino))
+    os.makedirs(directorio, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.npz')
+    with os.fdopen(descriptor, 'wb') as f:
+        np.savez(f, caracteristicas=np.array(COLUMNAS_FEATURES + [SESGO]), regiones=np.array(list(regiones)),
+                 version_modelo=np.array(_version_modelo(modelo, ruta_modelo)), anio_corte=anio_corte, filas=filas,
+                 tiempo=anio_corte + (np.arange(n_meses) + 0.5) / 12, mes_suma=mes_suma, mes_abs=mes_abs,
+                 mes_peso=mes_peso, decadas=np.array(decadas), celda_suma=celda_suma, celda_filas=celda_filas,
+                 celda_lat=celda_lat, celda_lon=celda_lon)
+    os.replace(temporal, destino)
+
+    segundos = time.perf_counter() - t_inicio
+    return {'filas': filas, 'segundos': segundos, 'filas_por_segundo': filas / segundos, 'rss_max_mb': rss_max_mb(),
+            'bytes': os.path.getsize(destino)}
+
+
+class Contribuciones:
+    """Agregados ya calculados, cargados en memoria."""
+
+    def __init__(self, ruta):
+        with np.load(ruta) as f:
+            datos = {nombre: f[nombre] for nombre in f.files}
+        self.caracteristicas = datos['caracteristicas'].tolist()
+        self.regiones = datos['regiones'].tolist()
+        self.version_modelo = str(datos['version_modelo'])
+        self.anio_corte = int(datos['anio_corte'])
+        self.filas = int(datos['filas'])
+        self.tiempo = datos['tiempo']
+        self.decadas = datos['decadas'].tolist()
+        self.mes_suma, self.mes_abs, self.mes_peso = datos['mes_suma'], datos['mes_abs'], datos['mes_peso']
+        self.celda_suma, self.celda_filas = datos['celda_suma'], datos['celda_filas']
+        self.celda_lat, self.celda_lon = datos['celda_lat'], datos['celda_lon']
+        self._vistas = np.flatnonzero(~np.isnan(self.celda_lat))
+
+    def _meses(self, decada):
+        if decada is None:
+            return slice(None)
+        return np.floor(self.tiempo).astype(int) // 10 * 10 == decada
+
+    def resumen(self, region, decada=None):
+        """
+        (media, media de |contribución|) por característica y sesgo de la región
+        en la década, o en todo el periodo de prueba si `decada` es None.
+        """
+        k = self.regiones.index(region)
+        meses = self._meses(decada)
+        peso = self.mes_peso[meses, k].sum()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.mes_suma[meses, k].sum(axis=0) / peso, self.mes_abs[meses, k].sum(axis=0) / peso
+
+    def serie(self, region):
+        """(tiempo, medias (mes, característica)) de la región en cada mes de prueba."""
+        k = self.regiones.index(region)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.tiempo, self.mes_suma[:, k] / self.mes_peso[:, k, None]
+
+    def celda(self, lat, lon, decada=None):
+        """(lat, lon, media por característica, filas) de la celda con filas de prueba más cercana al punto."""
+        distancia = np.abs(self.celda_lat[self._vistas] - lat) \
+            + np.abs((self.celda_lon[self._vistas] - lon + 180) % 360 - 180)
+        celda = self._vistas[np.argmin(distancia)]
+        decadas = slice(None) if decada is None else [self.decadas.index(decada)]
+        filas = int(self.celda_filas[decadas, celda].sum())
+        suma = self.celda_suma[decadas, celda].sum(axis=0, dtype=np.float64)
+        return float(self.celda_lat[celda]), float(self.celda_lon[celda]), suma / max(filas, 1), filas
+
+
+@functools.lru_cache(maxsize=2)
+def _abrir(ruta, _mtime):
+    return Contribuciones(ruta)
+
+
+def abrir_contribuciones(ruta=None):
+    """Agregados de contribuciones, o None si aún no se han calculado. Se recargan si cambia el fichero."""
+    ruta = ruta or ruta_contribuciones()
+    try:
+        mtime = os.stat(ruta).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _abrir(ruta, mtime)
+
+
+def explicar(modelo, indice, lat, lon, anio, mes):
+    """
+    Contribuciones exactas de la predicción de una celda y un mes, con las
+    características del índice de historia: (lat, lon, contribuciones (n_features + 1,), observado).
+    """
+    i, j, celda = indice.celdas([lat], [lon])
+    t = indice.indices_tiempo([anio], [mes])
+    t_min, t_max = indice.rango_prediccion()
+    if not t_min <= t[0] <= t_max:
+        raise ValueError(f"{anio}-{mes:02d} fuera del rango con historia completa del índice")
+    contribuciones = contribuciones_filas(modelo, indice.features(celda, t), nthread=1)[0]
+    observado = float(indice.temperatura[t[0], celda[0]]) if t[0] < indice.meses else float('nan')
+    return float(indice.lat[i[0]]), float(indice.lon[j[0]]), contribuciones, observado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('features')
+    parser.add_argument('modelo', help='modelo.ubj o regiones.json')
+    parser.add_argument('destino', nargs='?', default=RUTA_POR_DEFECTO)
+    parser.add_argument('--anio-corte', type=int, default=ANIO_CORTE)
+    parser.add_argument('--nthread', type=int)
+    parser.add_argument('--max-filas', type=int, default=MAX_FILAS_LOTE, help='filas por lote de pred_contribs')
+    parser.add_argument('--aproximadas', action='store_true',
+                        help='contribuciones aproximadas (Saabas) en lugar de TreeSHAP exacto; más rápidas')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    r = calcular_contribuciones(args.features, args.modelo, args.destino, args.anio_corte, args.nthread,
+                                args.max_filas, args.aproximadas)
+    print(f"{r['filas']:,} filas de prueba en {r['segundos']:.1f} s ({r['filas_por_segundo']:,.0f} filas/s), "
+          f"{r['bytes'] / 2**20:.1f} MB, RSS máx. {r['rss_max_mb']:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,334 @@
+"""
+Cubo de series regionales precalculadas.
+
+Paso offline que lee el NetCDF por bloques de 12 meses y guarda, para cada
+región de REGIONES (el globo, los hemisferios, las bandas de latitud de
+`anomalias.regiones`, tierra y océano, y cajas de países y océanos), la media
+mensual de la anomalía ponderada por cos(lat), la fracción del área de la
+región con datos y su climatología mensual. Todas las regiones salen de un
+único producto (mes, celda) × (celda, región) por bloque, así que cada mes se
+lee una sola vez.
+
+El cubo ocupa unos KB por región y se carga entero en memoria: la serie de
+una región es una indexación, sin tocar la rejilla. Las cajas que no están en
+el cubo (p. ej. la zona visible del mapa del explorador) se calculan bajo
+demanda con el índice espacio-temporal, o el NetCDF si no hay índice, y se
+guardan en una caché LRU. Los meses de una publicación nueva se añaden con
+`anexar_cubo`.
+
+    python -m anomalias.cubo data/Land_and_Ocean_LatLong1.nc data/cubo
+"""
+import argparse
+import functools
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from anomalias import datos
+from anomalias.regiones import BANDAS_LATITUD, UMBRAL_TIERRA
+
+RUTA_POR_DEFECTO = os.path.join('data', 'cubo')
+
+GLOBO = (-90, 90, -180, 180)
+
+# nombre: (etiqueta, (lat_min, lat_max, lon_min, lon_max), superficie); los países son cajas sobre tierra
+REGIONES = {
+    'global': ('Global', GLOBO, None),
+    'tierra': ('Tierra', GLOBO, 'tierra'),
+    'oceano': ('Océano', GLOBO, 'oceano'),
+    'hemisferio_norte': ('Hemisferio norte', (0, 90, -180, 180), None),
+    'hemisferio_sur': ('Hemisferio sur', (-90, 0, -180, 180), None),
+    **{f'lat{lo}_{hi}': (f'Latitud {lo}° a {hi}°', (lo, hi, -180, 180), None)
+       for lo, hi in zip(BANDAS_LATITUD[:-1], BANDAS_LATITUD[1:])},
+    'artico': ('Ártico (> 66.5° N)', (66.5, 90, -180, 180), None),
+    'nino34': ('Niño 3.4', (-5, 5, -170, -120), None),
+    'caribe': ('Mar Caribe', (9, 22, -88, -60), 'oceano'),
+    'colombia': ('Colombia', (-4.3, 12.5, -79, -66.8), 'tierra'),
+    'norteamerica': ('Norteamérica', (15, 72, -168, -52), 'tierra'),
+    'sudamerica': ('Sudamérica', (-56, 13, -82, -34), 'tierra'),
+    'europa': ('Europa', (35, 71, -10, 40), 'tierra'),
+    'africa': ('África', (-35, 37, -18, 52), 'tierra'),
+    'asia': ('Asia', (5, 77, 60, 180), 'tierra'),
+    'australia': ('Australia', (-44, -10, 112, 154), 'tierra'),
+    'antartida': ('Antártida', (-90, -60, -180, 180), 'tierra'),
+}
+
+
+def ruta_cubo():
+    return os.environ.get('ANOMALIAS_CUBO', RUTA_POR_DEFECTO)
+
+
+def mascara_caja(lat, lon, caja):
+    """(lat, lon) bool de las celdas cuyo centro cae en la caja; con lon_min > lon_max cruza el antimeridiano."""
+    lat_min, lat_max, lon_min, lon_max = caja
+    filas = (lat >= lat_min) & (lat <= lat_max)
+    if lon_min <= lon_max:
+        columnas = (lon >= lon_min) & (lon <= lon_max)
+    else:
+        columnas = (lon >= lon_min) | (lon <= lon_max)
+    return filas[:, None] & columnas[None, :]
+
+
+def pesos_region(lat, lon, tierra, caja, superficie=None):
+    """Pesos (lat, lon) de una región: cos(lat) en sus celdas y 0 fuera; `tierra` es la máscara bool."""
+    mascara = mascara_caja(lat, lon, caja)
+    if superficie == 'tierra':
+        mascara &= tierra
+    elif superficie == 'oceano':
+        mascara &= ~tierra
+    return np.where(mascara, np.cos(np.radians(lat))[:, None], 0.0)
+
+
+def matriz_pesos(lat, lon, tierra, regiones):
+    """(celda, región) float64 con los pesos de cada región de `regiones` ({nombre: definición})."""
+    return np.column_stack([pesos_region(lat, lon, tierra, caja, superficie).ravel()
+                            for _, caja, superficie in regiones.values()])
+
+
+def pesos_puntos(lat, lon, tierra, regiones):
+    """(punto, región) float64 como `matriz_pesos`, para puntos sueltos (p. ej. las filas del almacén)."""
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    coseno = np.cos(np.radians(lat))
+    columnas = []
+    for _, (lat_min, lat_max, lon_min, lon_max), superficie in regiones.values():
+        dentro = (lat >= lat_min) & (lat <= lat_max)
+        if lon_min <= lon_max:
+            dentro &= (lon >= lon_min) & (lon <= lon_max)
+        else:
+            dentro &= (lon >= lon_min) | (lon <= lon_max)
+        if superficie == 'tierra':
+            dentro &= tierra
+        elif superficie == 'oceano':
+            dentro &= ~tierra
+        columnas.append(np.where(dentro, coseno, 0.0))
+    return np.column_stack(columnas)
+
+
+def medias_regionales(bloque, pesos):
+    """
+    Medias ponderadas de un bloque (t, lat, lon) para todas las regiones a la
+    vez, ignorando NaN: (medias (t, región), cobertura (t, región)) en float32.
+    """
+    plano = bloque.reshape(len(bloque), -1)
+    validos = ~np.isnan(plano)
+    suma = np.where(validos, plano, 0).astype(np.float64) @ pesos
+    peso = validos.astype(np.float64) @ pesos
+    with np.errstate(invalid='ignore', divide='ignore'):
+        medias = suma / peso
+        cobertura = peso / pesos.sum(axis=0)
+    return medias.astype(np.float32), cobertura.astype(np.float32)
+
+
+def _pesos_dataset(ds, regiones):
+    lat = ds['latitude'].values.astype(np.float64)
+    lon = ds['longitude'].values.astype(np.float64)
+    tierra = ds['land_mask'].values >= UMBRAL_TIERRA
+    return matriz_pesos(lat, lon, tierra, regiones)
+
+
+def construir_cubo(ruta_netcdf, destino, regiones=None, meses_por_bloque=12):
+    """Construye el cubo de `regiones` (por defecto REGIONES) en `destino`."""
+    import xarray as xr
+
+    regiones = REGIONES if regiones is None else regiones
+    os.makedirs(destino, exist_ok=True)
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        tiempo = ds['time'].values
+        nt = len(tiempo)
+        pesos = _pesos_dataset(ds, regiones)
+        series = np.lib.format.open_memmap(os.path.join(destino, 'series.npy'), mode='w+',
+                                           dtype=np.float32, shape=(nt, len(regiones)))
+        cobertura = np.lib.format.open_memmap(os.path.join(destino, 'cobertura.npy'), mode='w+',
+                                              dtype=np.float32, shape=(nt, len(regiones)))
+        for inicio in range(0, nt, meses_por_bloque):
+            fin = min(inicio + meses_por_bloque, nt)
+            bloque = ds['temperature'][inicio:fin].values.astype(np.float32)
+            series[inicio:fin], cobertura[inicio:fin] = medias_regionales(bloque, pesos)
+        series.flush()
+        cobertura.flush()
+        del series, cobertura
+        _escribir_climatologia(ds, pesos, destino)
+
+    meta = {
+        'version': 1,
+        'tiempo': tiempo.tolist(),
+        'regiones': {nombre: {'etiqueta': etiqueta, 'caja': list(caja), 'superficie': superficie}
+                     for nombre, (etiqueta, caja, superficie) in regiones.items()},
+    }
+    _escribir_meta(destino, meta)
+    return destino
+
+
+def _escribir_meta(destino, meta):
+    descriptor, temporal = tempfile.mkstemp(dir=destino, suffix='.json')
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(temporal, os.path.join(destino, 'meta.json'))
+
+
+def _escribir_climatologia(ds, pesos, destino):
+    # Climatología mensual (12, región) del NetCDF, si la trae; las series absolutas la necesitan
+    if 'climatology' not in ds:
+        return
+    climatologia = medias_regionales(ds['climatology'].values.astype(np.float32), pesos)[0]
+    descriptor, temporal = tempfile.mkstemp(dir=destino, suffix='.npy')
+    with os.fdopen(descriptor, 'wb') as f:
+        np.save(f, climatologia)
+    os.replace(temporal, os.path.join(destino, 'climatologia.npy'))
+
+
+def anexar_cubo(ruta_netcdf, destino, meses_por_bloque=12):
+    """
+    Añade al cubo los meses del NetCDF posteriores a los que ya tiene, con las
+    regiones con las que se construyó, y vuelve a calcular la climatología
+    regional (o la crea si el cubo no la tenía). Devuelve cuántos meses añade.
+    """
+    import xarray as xr
+
+    with open(os.path.join(destino, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    regiones = {nombre: (r['etiqueta'], tuple(r['caja']), r['superficie']) for nombre, r in meta['regiones'].items()}
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        tiempo = ds['time'].values
+        desde = len(meta['tiempo'])
+        falta_climatologia = 'climatology' in ds and not os.path.exists(os.path.join(destino, 'climatologia.npy'))
+        if len(tiempo) <= desde and not falta_climatologia:
+            return 0
+        if len(tiempo) < desde or not np.allclose(tiempo[:desde], meta['tiempo']):
+            raise ValueError(f"Los meses de '{ruta_netcdf}' no continúan el cubo de '{destino}'")
+        pesos = _pesos_dataset(ds, regiones)
+        _escribir_climatologia(ds, pesos, destino)
+        for inicio in range(desde, len(tiempo), meses_por_bloque):
+            bloque = ds['temperature'][inicio:inicio + meses_por_bloque].values.astype(np.float32)
+            medias, cobertura = medias_regionales(bloque, pesos)
+            datos.anexar_npy(os.path.join(destino, 'series.npy'), medias)
+            datos.anexar_npy(os.path.join(destino, 'cobertura.npy'), cobertura)
+    meta['tiempo'] = tiempo.tolist()
+    _escribir_meta(destino, meta)
+    return len(tiempo) - desde
+
+
+class Cubo:
+    """Cubo ya construido, cargado en memoria (son unos KB por región)."""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        with open(os.path.join(directorio, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.tiempo = np.asarray(meta['tiempo'])
+        self.regiones = meta['regiones']
+        self._columnas = {nombre: k for k, nombre in enumerate(self.regiones)}
+        # Los arrays pueden tener ya meses de una actualización en curso: manda meta.json
+        nt = len(self.tiempo)
+        self.series = np.load(os.path.join(directorio, 'series.npy'))[:nt]
+        self.cobertura = np.load(os.path.join(directorio, 'cobertura.npy'))[:nt]
+        ruta_clima = os.path.join(directorio, 'climatologia.npy')
+        self.climatologia = np.load(ruta_clima) if os.path.exists(ruta_clima) else None
+
+    def serie(self, nombre, absoluta=False):
+        """
+        (tiempo, anomalía media) de la región; con `absoluta`, temperatura
+        media (anomalía + climatología regional del mes).
+        """
+        k = self._columnas[nombre]
+        valores = self.series[:, k].astype(np.float64)
+        if absoluta:
+            if self.climatologia is None:
+                raise ValueError(f"El cubo de '{self.directorio}' no tiene climatología (el NetCDF con el que "
+                                 "se construyó no la traía): solo hay series de anomalías")
+            meses = np.floor((self.tiempo - np.floor(self.tiempo)) * 12).astype(int).clip(0, 11)
+            valores = valores + self.climatologia[meses, k]
+        return self.tiempo, valores
+
+
+@functools.lru_cache(maxsize=2)
+def _abrir(directorio, _mtime):
+    return Cubo(directorio)
+
+
+def abrir_cubo(directorio=None):
+    """
+    El cubo configurado, o None si aún no se ha construido. Se vuelve a abrir
+    cuando cambia `meta.json` (lo último que escribe una actualización).
+    """
+    directorio = directorio or ruta_cubo()
+    try:
+        mtime = os.stat(os.path.join(directorio, 'meta.json')).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _abrir(directorio, mtime)
+
+
+def _media_caja(valores, lat, tierra, superficie):
+    # valores (t, lat, lon) de la caja; pesos cos(lat) solo donde hay dato y la superficie coincide
+    validos = ~np.isnan(valores)
+    if superficie == 'tierra':
+        validos &= tierra[None]
+    elif superficie == 'oceano':
+        validos &= ~tierra[None]
+    pesos = np.cos(np.radians(lat))[None, :, None] * validos
+    suma = (np.where(validos, valores, 0) * pesos).sum(axis=(1, 2), dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return suma / pesos.sum(axis=(1, 2))
+
+
+@functools.lru_cache(maxsize=64)
+def _serie_caja(fuente, caja, superficie):
+    # `fuente` es el Indice abierto (cambia al reabrirse) o la ruta del NetCDF
+    if isinstance(fuente, str):
+        ds = datos.abrir_dataset(fuente)
+        lat, lon = ds['latitude'].values, ds['longitude'].values
+        mascara = mascara_caja(lat, lon, caja)
+        filas, columnas = np.nonzero(mascara.any(axis=1))[0], np.nonzero(mascara.any(axis=0))[0]
+        if not len(filas) or not len(columnas):
+            return ds['time'].values, np.full(ds.sizes['time'], np.nan)
+        # Un solo hiperplano contiguo en latitud; las longitudes fuera de la caja se descartan después
+        tramo_lat = slice(filas[0], filas[-1] + 1)
+        valores = ds['temperature'][:, tramo_lat].values[:, :, columnas]
+        tierra = ds['land_mask'].values[tramo_lat][:, columnas] >= UMBRAL_TIERRA
+        return ds['time'].values, _media_caja(valores, lat[tramo_lat], tierra, superficie)
+    tiempo, lat, lon, valores = fuente.caja(*caja)
+    mascara = fuente.mascara.reshape(len(fuente.lat), len(fuente.lon))
+    tierra = mascara[np.ix_(np.searchsorted(fuente.lat, lat), np.searchsorted(fuente.lon, lon))] >= UMBRAL_TIERRA
+    return tiempo, _media_caja(valores, lat, tierra, superficie)
+
+
+def serie_caja(lat_min, lat_max, lon_min, lon_max, superficie=None):
+    """
+    (tiempo, media ponderada por cos(lat)) de una caja que no está en el cubo,
+    calculada bajo demanda. La caja se amplía a grados enteros para que cajas
+    casi iguales (zooms del mapa) compartan la entrada de la caché.
+    """
+    from anomalias.indice import abrir_indice
+
+    caja = (max(int(np.floor(lat_min)), -90), min(int(np.ceil(lat_max)), 90),
+            max(int(np.floor(lon_min)), -180), min(int(np.ceil(lon_max)), 180))
+    indice = abrir_indice()
+    return _serie_caja(indice if indice is not None else datos.ruta_dataset(), caja, superficie)
+
+
+def serie_region(nombre):
+    """(tiempo, anomalía media) de una región de REGIONES: del cubo si la tiene, si no bajo demanda."""
+    cubo = abrir_cubo()
+    if cubo is not None and nombre in cubo.regiones:
+        return cubo.serie(nombre)
+    _, caja, superficie = REGIONES[nombre]
+    return serie_caja(*caja, superficie=superficie)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('netcdf')
+    parser.add_argument('destino', nargs='?', default=RUTA_POR_DEFECTO)
+    parser.add_argument('--anexar', action='store_true', help='solo añade los meses nuevos del NetCDF')
+    args = parser.parse_args()
+    if args.anexar:
+        anexar_cubo(args.netcdf, args.destino)
+    else:
+        construir_cubo(args.netcdf, args.destino)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Acceso perezoso al cubo Berkeley Earth (BEST) 1° × 1° mensual.
+
+El NetCDF se abre una vez por worker con xarray sin cargar nada en memoria:
+cada consulta indexa solo el hiperplano que necesita (un mes completo o la
+serie de una celda) y netCDF4 lee únicamente los trozos del fichero afectados.
+"""
+import functools
+import os
+
+import numpy as np
+
+RUTA_POR_DEFECTO = os.path.join('data', 'Land_and_Ocean_LatLong1.nc')
+
+
+def ruta_dataset():
+    return os.environ.get('ANOMALIAS_NETCDF', RUTA_POR_DEFECTO)
+
+
+def dataset_disponible(ruta=None):
+    return os.path.exists(ruta or ruta_dataset())
+
+
+@functools.lru_cache(maxsize=4)
+def abrir_dataset(ruta=None):
+    """
+    Abre el NetCDF en modo perezoso. `cache=False` evita que xarray retenga en
+    memoria los arrays ya leídos; el tiempo se deja en años decimales como en BEST.
+    """
+    import xarray as xr
+
+    return xr.open_dataset(ruta or ruta_dataset(), decode_times=False, cache=False)
+
+
+def rango_anios(ds):
+    tiempo = ds['time'].values
+    return int(np.floor(tiempo[0])), int(np.floor(tiempo[-1]))
+
+
+def indice_tiempo(ds, anio, mes):
+    """Índice del registro más cercano a (anio, mes); mes en 1..12."""
+    tiempo = ds['time'].values
+    objetivo = anio + (mes - 0.5) / 12
+    i = int(np.searchsorted(tiempo, objetivo))
+    if i == len(tiempo) or (i > 0 and objetivo - tiempo[i - 1] < tiempo[i] - objetivo):
+        i -= 1
+    return i
+
+
+def indice_celda(ds, lat, lon):
+    """Índices (i, j) de la celda más cercana a (lat, lon)."""
+    i = int(np.abs(ds['latitude'].values - lat).argmin())
+    j = int(np.abs(ds['longitude'].values - lon).argmin())
+    return i, j
+
+
+def mapa_mes(ds, anio, mes):
+    """Anomalías de un mes para toda la rejilla: un solo hiperplano (lat, lon)."""
+    i = indice_tiempo(ds, anio, mes)
+    return ds['temperature'][i].values
+
+
+def serie_celda(ds, lat, lon):
+    """
+    Serie temporal de la celda más cercana: tiempo (años decimales), anomalía y
+    temperatura absoluta (anomalía + climatología del mes).
+    """
+    i, j = indice_celda(ds, lat, lon)
+    tiempo = ds['time'].values
+    anomalia = ds['temperature'][:, i, j].values
+    clima = ds['climatology'][:, i, j].values
+    meses = np.floor((tiempo - np.floor(tiempo)) * 12).astype(int).clip(0, 11)
+    return tiempo, anomalia, anomalia + clima[meses]
+
+
+def media_movil(valores, ventana=12):
+    """Media móvil centrada que ignora NaN (vectorizada con sumas acumuladas)."""
+    validos = ~np.isnan(valores)
+    suma = np.concatenate([[0.0], np.cumsum(np.where(validos, valores, 0.0))])
+    cuenta = np.concatenate([[0], np.cumsum(validos)])
+    mitad = ventana // 2
+    idx = np.arange(len(valores))
+    hi = np.minimum(idx + ventana - mitad, len(valores))
+    lo = np.maximum(idx - mitad, 0)
+    n = cuenta[hi] - cuenta[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(n > 0, (suma[hi] - suma[lo]) / n, np.nan)
+
+
+def descomponer(serie, mes=None):
+    """
+    Descomposición aditiva mensual: tendencia con la media móvil centrada 2×12,
+    estacionalidad como la media de cada mes sin tendencia (centrada en cero) y
+    residuo. `serie` es (tiempo,) o (tiempo, celdas...): todas las columnas se
+    descomponen a la vez, sin bucles por celda. `mes` (0..11) por defecto supone
+    que la serie empieza en enero. Devuelve (tendencia, estacional, residuo).
+    """
+    serie = np.asarray(serie, dtype=np.float64)
+    mes = np.arange(len(serie)) % 12 if mes is None else np.asarray(mes)
+    tendencia = np.full_like(serie, np.nan)
+    if len(serie) >= 13:
+        # Suma de 13 desplazamientos en lugar de np.convolve, que solo admite 1-D
+        pesos = np.r_[0.5, np.ones(11), 0.5] / 12
+        n = len(serie) - 12
+        tendencia[6:-6] = pesos[0] * serie[:n]
+        for k, peso in enumerate(pesos[1:], start=1):
+            tendencia[6:-6] += peso * serie[k:k + n]
+    sin_tendencia = serie - tendencia
+    # Media de cada mes ignorando NaN; 0 en los meses sin ningún dato
+    estacional = np.zeros((12,) + serie.shape[1:])
+    for m in range(12):
+        valores = sin_tendencia[mes == m]
+        validos = ~np.isnan(valores)
+        cuenta = validos.sum(axis=0)
+        estacional[m] = np.where(validos, valores, 0).sum(axis=0) / np.maximum(cuenta, 1)
+    estacional = (estacional - estacional.mean(axis=0))[mes]
+    return tendencia, estacional, serie - tendencia - estacional
+
+
+def tendencia_anual(tiempo, serie):
+    """
+    Medias anuales de una serie mensual y su recta de tendencia: (años, medias,
+    pendiente en °C/año, ordenada). La pendiente es NaN con menos de dos años con datos.
+    """
+    anios = np.floor(tiempo).astype(int)
+    unicos, inverso = np.unique(anios, return_inverse=True)
+    validos = ~np.isnan(serie)
+    suma = np.bincount(inverso, weights=np.where(validos, serie, 0), minlength=len(unicos))
+    cuenta = np.bincount(inverso, weights=validos, minlength=len(unicos))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        medias = suma / cuenta
+    con_datos = ~np.isnan(medias)
+    if con_datos.sum() < 2:
+        return unicos, medias, np.nan, np.nan
+    pendiente, ordenada = np.polyfit(unicos[con_datos], medias[con_datos], 1)
+    return unicos, medias, pendiente, ordenada
+
+
+def anexar_npy(ruta, filas):
+    """
+    Añade `filas` al final del eje 0 de un .npy sin reescribir lo que ya tiene.
+    Los datos se escriben antes que la cabecera con la nueva forma, así que
+    quien abra el fichero mientras tanto ve la forma anterior. Devuelve la forma.
+    """
+    import io
+
+    from numpy.lib import format as npformat
+
+    with open(ruta, 'r+b') as f:
+        version = npformat.read_magic(f)
+        leer_cabecera = npformat.read_array_header_1_0 if version == (1, 0) else npformat.read_array_header_2_0
+        forma, fortran, dtype = leer_cabecera(f)
+        inicio = f.tell()
+        filas = np.ascontiguousarray(filas, dtype=dtype)
+        if fortran or filas.shape[1:] != forma[1:]:
+            raise ValueError(f"No se pueden añadir filas {filas.shape} a un array {forma} en '{ruta}'")
+        nueva = (forma[0] + len(filas),) + tuple(forma[1:])
+        cabecera = io.BytesIO()
+        escribir_cabecera = npformat.write_array_header_1_0 if version == (1, 0) \
+            else npformat.write_array_header_2_0
+        escribir_cabecera(cabecera, {'descr': npformat.dtype_to_descr(dtype), 'fortran_order': False,
+                                     'shape': nueva})
+        if len(cabecera.getvalue()) == inicio:
+            # Tras el final lógico: descarta lo que dejara una escritura interrumpida
+            f.seek(inicio + int(np.prod(forma)) * dtype.itemsize)
+            f.write(filas.tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+            f.seek(0)
+            f.write(cabecera.getvalue())
+            return nueva
+    # Cabecera sin hueco para crecer (ficheros de versiones antiguas de numpy): se reescribe
+    anterior = np.load(ruta, mmap_mode='r')
+    temporal = ruta + '.tmp'
+    salida = np.lib.format.open_memmap(temporal, mode='w+', dtype=anterior.dtype, shape=nueva)
+    salida[:len(anterior)] = anterior
+    salida[len(anterior):] = filas
+    salida.flush()
+    del salida, anterior
+    os.replace(temporal, ruta)
+    return nueva
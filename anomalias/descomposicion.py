@@ -0,0 +1,209 @@
+"""
+Descomposición estacional de todas las celdas de la rejilla en una pasada.
+
+Cada tesela de la rejilla (trozos (lat, lon) enteros del NetCDF, para
+descomprimir cada uno una sola vez, o bandas de un trozo grande) se lee como
+una matriz (tiempo, celda) y se descompone con `datos.descomponer` (media
+móvil 2×12, estacionalidad mensual y residuo) por bloques de columnas, sin
+bucles por celda. De cada celda se guardan tres capas de mapa:
+
+- `tendencia`: pendiente por mínimos cuadrados de la serie sin estacionalidad,
+  en °C/década;
+- `amplitud_estacional`: diferencia entre el mes más cálido y el más frío de
+  la componente estacional;
+- `residuo_std`: desviación típica del residuo.
+
+Las celdas con menos de `min_anios` años de datos quedan en NaN. Las teselas
+se reparten entre procesos; cada una tiene a lo sumo `max_valores_tesela`
+valores (meses × celdas, leídos en float32) y cada bloque descompuesto (en
+float64), a lo sumo `max_valores`. El resultado es un `.npz` pequeño que el
+explorador dibuja como capa del mapa.
+
+    python -m anomalias.descomposicion data/Land_and_Ocean_LatLong1.nc data/tendencias.npz --procesos 4
+"""
+import argparse
+import functools
+import logging
+import os
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from anomalias import datos
+from anomalias.features import rss_max_mb
+
+logger = logging.getLogger(__name__)
+
+RUTA_POR_DEFECTO = os.path.join('data', 'tendencias.npz')
+CAPAS = ('tendencia', 'amplitud_estacional', 'residuo_std')
+MIN_ANIOS = 30
+# Valores (meses × celdas) por bloque descompuesto: acota la memoria de cada proceso (unos 6 arrays float64)
+MAX_VALORES_BLOQUE = 1_000_000
+# Valores por tesela leída (float32)
+MAX_VALORES_TESELA = 16_000_000
+
+
+def ruta_tendencias():
+    return os.environ.get('ANOMALIAS_TENDENCIAS', RUTA_POR_DEFECTO)
+
+
+def pendientes(tiempo, valores):
+    """Pendiente por mínimos cuadrados de cada columna de `valores` (tiempo, celdas) frente a `tiempo`, ignorando NaN."""
+    validos = ~np.isnan(valores)
+    n = validos.sum(axis=0)
+    x = np.where(validos, tiempo[:, None], 0.0)
+    y = np.where(validos, valores, 0.0)
+    sx, sy = x.sum(axis=0), y.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (n * (x * y).sum(axis=0) - sx * sy) / (n * (x * x).sum(axis=0) - sx * sx)
+
+
+def capas_celdas(tiempo, valores, min_meses):
+    """{capa: (celdas,)} de la matriz (tiempo, celdas) de anomalías, más los meses con dato de cada celda."""
+    meses = np.floor((tiempo - np.floor(tiempo)) * 12).astype(int).clip(0, 11)
+    _, estacional, residuo = datos.descomponer(valores, meses)
+    cuenta = (~np.isnan(valores)).sum(axis=0)
+    # Las celdas sin datos dan avisos de nanstd; se descartan abajo
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        capas = {
+            'tendencia': pendientes(tiempo, valores - estacional) * 10,
+            'amplitud_estacional': estacional.max(axis=0) - estacional.min(axis=0),
+            'residuo_std': np.nanstd(residuo, axis=0),
+        }
+    escasas = cuenta < min_meses
+    capas = {nombre: np.where(escasas, np.nan, capa).astype(np.float32) for nombre, capa in capas.items()}
+    capas['meses'] = cuenta.astype(np.int32)
+    return capas
+
+
+def _cortes(n, trozo, paso):
+    # [(a, b)] de a lo sumo `paso` sobre n; si `paso` es menor que el trozo, sin cruzar sus bordes
+    if paso >= trozo:
+        return [(a, min(a + paso, n)) for a in range(0, n, paso)]
+    return [(a, min(a + paso, c + trozo, n)) for c in range(0, n, trozo) for a in range(c, min(c + trozo, n), paso)]
+
+
+def teselas(forma, trozos=None, max_valores=MAX_VALORES_TESELA):
+    """
+    [(i0, i1, j0, j1)] que cubren la rejilla de `forma` (tiempo, lat, lon) con a
+    lo sumo `max_valores // tiempo` celdas cada una. Si los trozos (lat, lon)
+    del NetCDF son pequeños, cada tesela es un múltiplo alineado de ellos (cada
+    trozo se descomprime una sola vez); si son grandes (p. ej. (1, lat, lon)) o
+    el fichero no está troceado, bandas de filas dentro de cada trozo.
+    """
+    nt, nlat, nlon = forma
+    celdas = max(1, max_valores // nt)
+    trozo_lat, trozo_lon = (trozos or (nt, 1, nlon))[1:]
+    if trozo_lat * trozo_lon <= celdas:
+        filas, columnas = trozo_lat * (celdas // (trozo_lat * trozo_lon)), trozo_lon
+    else:
+        columnas = min(trozo_lon, celdas)
+        filas = max(1, min(trozo_lat, celdas // columnas))
+    return [(i0, i1, j0, j1) for i0, i1 in _cortes(nlat, trozo_lat, filas)
+            for j0, j1 in _cortes(nlon, trozo_lon, columnas)]
+
+
+def _descomponer_tesela(args):
+    ruta_netcdf, (i0, i1, j0, j1), t0, min_meses, max_valores = args
+    import xarray as xr
+
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        tiempo = ds['time'].values[t0:]
+        bloque = ds['temperature'][t0:, i0:i1, j0:j1].values
+    nt, filas, columnas = bloque.shape
+    matriz = bloque.reshape(nt, filas * columnas)
+    # La tesela se lee entera (float32) y se descompone por bloques de celdas (float64)
+    paso = max(1, max_valores // nt)
+    partes = [capas_celdas(tiempo, matriz[:, k:k + paso], min_meses) for k in range(0, matriz.shape[1], paso)]
+    capas = {nombre: np.concatenate([p[nombre] for p in partes]).reshape(filas, columnas) for nombre in partes[0]}
+    return (i0, i1, j0, j1), capas, rss_max_mb()
+
+
+def descomponer_rejilla(ruta_netcdf, destino, anio_min=1900, min_anios=MIN_ANIOS, procesos=1,
+                        max_valores=MAX_VALORES_BLOQUE, max_valores_tesela=MAX_VALORES_TESELA):
+    """
+    Descompone todas las celdas de `ruta_netcdf` desde `anio_min` y guarda las
+    capas en el `.npz` `destino`. Devuelve celdas, teselas, segundos, celdas/s y RSS.
+    """
+    import netCDF4
+
+    t_inicio = time.perf_counter()
+    with netCDF4.Dataset(ruta_netcdf) as nc:
+        nc.set_auto_mask(False)
+        tiempo, lat, lon = nc['time'][:], nc['latitude'][:], nc['longitude'][:]
+        forma = nc['temperature'].shape
+        trozos = nc['temperature'].chunking()
+    nlat, nlon = forma[1:]
+    t0 = int(np.searchsorted(tiempo, anio_min))
+    lista = teselas((len(tiempo) - t0, nlat, nlon), None if trozos == 'contiguous' else trozos, max_valores_tesela)
+    tareas = [(ruta_netcdf, tesela, t0, min_anios * 12, max_valores) for tesela in lista]
+
+    salida = {nombre: np.full((nlat, nlon), np.nan, dtype=np.float32) for nombre in CAPAS}
+    salida['meses'] = np.zeros((nlat, nlon), dtype=np.int32)
+    rss = rss_max_mb()
+    pool = ProcessPoolExecutor(procesos) if procesos > 1 else None
+    try:
+        resultados = pool.map(_descomponer_tesela, tareas) if pool else map(_descomponer_tesela, tareas)
+        for (i0, i1, j0, j1), capas, rss_tesela in resultados:
+            for nombre, capa in capas.items():
+                salida[nombre][i0:i1, j0:j1] = capa
+            rss = max(rss, rss_tesela)
+            logger.debug("Tesela %d-%d × %d-%d descompuesta", i0, i1, j0, j1)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    directorio = os.path.dirname(os.path.abspath(destino))
+    os.makedirs(directorio, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.npz')
+    with os.fdopen(descriptor, 'wb') as f:
+        np.savez(f, lat=lat, lon=lon, anio_inicio=int(np.floor(tiempo[t0])), anio_fin=int(np.floor(tiempo[-1])),
+                 **salida)
+    os.replace(temporal, destino)
+
+    segundos = time.perf_counter() - t_inicio
+    celdas = nlat * nlon
+    return {'celdas': celdas, 'meses': len(tiempo) - t0, 'teselas': len(tareas), 'segundos': segundos,
+            'celdas_por_segundo': celdas / segundos, 'rss_max_mb': rss}
+
+
+@functools.lru_cache(maxsize=2)
+def _abrir(ruta, _mtime):
+    with np.load(ruta) as f:
+        return {nombre: f[nombre] for nombre in f.files}
+
+
+def abrir_tendencias(ruta=None):
+    """
+    Capas de la descomposición ({nombre: array}, con `lat`, `lon`, `anio_inicio`
+    y `anio_fin`), o None si aún no se han calculado. Se recargan si cambia el fichero.
+    """
+    ruta = ruta or ruta_tendencias()
+    try:
+        mtime = os.stat(ruta).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _abrir(ruta, mtime)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('netcdf')
+    parser.add_argument('destino', nargs='?', default=RUTA_POR_DEFECTO)
+    parser.add_argument('--anio-min', type=int, default=1900)
+    parser.add_argument('--min-anios', type=int, default=MIN_ANIOS, help='años con dato mínimos por celda')
+    parser.add_argument('--procesos', type=int, default=1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    r = descomponer_rejilla(args.netcdf, args.destino, args.anio_min, args.min_anios, args.procesos)
+    print(f"{r['celdas']:,} celdas × {r['meses']:,} meses en {r['teselas']} teselas: {r['segundos']:.1f} s, "
+          f"{r['celdas_por_segundo']:,.0f} celdas/s, RSS máx. {r['rss_max_mb']:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
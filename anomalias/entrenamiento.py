@@ -0,0 +1,306 @@
+"""
+Entrenamiento de XGBoost sobre el almacén de características completo.
+
+En lugar de la muestra de 8M filas, el modelo se alimenta con un `DataIter`
+que recorre los Parquet de `anomalias.features` fichero a fichero. XGBoost
+construye con él una `ExtMemQuantileDMatrix` (histogramas `hist` cuantizados y
+paginados en disco), así que nunca se tienen todas las filas en RAM. La
+evaluación en el periodo de prueba también es por lotes y acumula MAE, RMSE y
+R² exactos.
+
+`continuar` añade árboles a un modelo ya entrenado con las filas de los meses
+de una actualización (ver `anomalias.actualizacion`) sin volver a recorrer el
+almacén completo.
+
+    python -m anomalias.entrenamiento data/features data/modelo --anio-corte 2001
+"""
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias.features import COLUMNAS_FEATURES, OBJETIVO, rss_max_mb
+
+logger = logging.getLogger(__name__)
+
+# Corte temporal de la pestaña Metodología: ~1900-2001 entrenamiento, ~2001-2024 prueba
+ANIO_CORTE = 2001
+
+PARAMETROS_POR_DEFECTO = {
+    'objective': 'reg:squarederror',
+    'tree_method': 'hist',
+    'eval_metric': 'mae',
+    'max_depth': 8,
+    'learning_rate': 0.1,
+    'subsample': 0.8,
+    'colsample_bytree': 0.8,
+    'min_child_weight': 5,
+    'reg_lambda': 1.0,
+    'max_bin': 256,
+}
+
+
+def cargar_parametros(valor):
+    """JSON en línea, o ruta a un JSON (p. ej. la salida de `anomalias.busqueda`)."""
+    if valor is None:
+        return None
+    if os.path.exists(valor):
+        with open(valor, encoding='utf-8') as f:
+            datos = json.load(f)
+        return datos.get('mejores_parametros', datos)
+    return json.loads(valor)
+
+
+def cargar_rondas(valor):
+    """Rondas elegidas por `anomalias.busqueda` (`mejores_rondas`) si `valor` es su salida; si no, None."""
+    if valor is None or not os.path.exists(valor):
+        return None
+    with open(valor, encoding='utf-8') as f:
+        return json.load(f).get('mejores_rondas')
+
+
+def partes(directorio):
+    return sorted(glob.glob(os.path.join(directorio, '*.parquet')))
+
+
+def leer_lotes(rutas, anio_desde=None, anio_hasta=None, columnas=COLUMNAS_FEATURES, filtros=None):
+    """
+    Genera (X, y) por fichero, con X float32 (n, n_features) y filtrando por
+    año en [anio_desde, anio_hasta) y por los `filtros` adicionales de pyarrow
+    (p. ej. los de una región). Los row groups fuera del rango no se leen.
+    """
+    import pyarrow.parquet as pq
+
+    filtros = list(filtros or [])
+    if anio_desde is not None:
+        filtros.append(('anio', '>=', anio_desde))
+    if anio_hasta is not None:
+        filtros.append(('anio', '<', anio_hasta))
+    for ruta in rutas:
+        tabla = pq.read_table(ruta, columns=list(columnas) + [OBJETIVO], filters=filtros or None)
+        if tabla.num_rows == 0:
+            continue
+        X = np.column_stack([tabla.column(c).to_numpy() for c in columnas]).astype(np.float32, copy=False)
+        y = tabla.column(OBJETIVO).to_numpy()
+        yield X, y
+
+
+def _clase_iterador():
+    import xgboost as xgb
+
+    class IteradorParquet(xgb.DataIter):
+        """Entrega a XGBoost un fichero Parquet (filtrado por año) en cada paso."""
+
+        def __init__(self, rutas, anio_desde=None, anio_hasta=None, cache_prefix=None, filtros=None):
+            self.rutas = rutas
+            self.anio_desde = anio_desde
+            self.anio_hasta = anio_hasta
+            self.filtros = filtros
+            self.filas = 0
+            self._lotes = None
+            super().__init__(cache_prefix=cache_prefix)
+
+        def reset(self):
+            self._lotes = None
+
+        def next(self, input_data):
+            if self._lotes is None:
+                self._lotes = leer_lotes(self.rutas, self.anio_desde, self.anio_hasta, filtros=self.filtros)
+                self.filas = 0
+            try:
+                X, y = next(self._lotes)
+            except StopIteration:
+                return False
+            self.filas += len(y)
+            input_data(data=X, label=y)
+            return True
+
+    return IteradorParquet
+
+
+def evaluar(booster, rutas, anio_desde=None, anio_hasta=None, filtros=None):
+    """MAE, RMSE y R² exactos acumulados lote a lote."""
+    n, suma_abs, suma_cuad, suma_y, suma_y2 = 0, 0.0, 0.0, 0.0, 0.0
+    for X, y in leer_lotes(rutas, anio_desde, anio_hasta, filtros=filtros):
+        error = booster.inplace_predict(X) - y
+        y = y.astype(np.float64)
+        n += len(y)
+        suma_abs += float(np.abs(error).sum(dtype=np.float64))
+        suma_cuad += float(np.square(error, dtype=np.float64).sum())
+        suma_y += float(y.sum())
+        suma_y2 += float(np.square(y).sum())
+    if n == 0:
+        return {'mae': None, 'rmse': None, 'r2': None, 'filas': 0}
+    total = suma_y2 - suma_y ** 2 / n
+    return {
+        'mae': suma_abs / n,
+        'rmse': (suma_cuad / n) ** 0.5,
+        'r2': 1 - suma_cuad / total if total > 0 else None,
+        'filas': n,
+    }
+
+
+def entrenar(directorio_features, destino, anio_corte=ANIO_CORTE, parametros=None,
+             num_rondas=500, nthread=None, ruta_manifiesto=None):
+    """
+    Entrena con todas las filas anteriores a `anio_corte`, evalúa en las
+    posteriores y guarda `modelo.ubj` y `metricas.json` en `destino`. Si se
+    indica `ruta_manifiesto`, publica además las métricas para el dashboard.
+    """
+    import xgboost as xgb
+
+    os.makedirs(destino, exist_ok=True)
+    rutas = partes(directorio_features)
+    if not rutas:
+        raise FileNotFoundError(f"No hay ficheros Parquet en '{directorio_features}'")
+    parametros = {**PARAMETROS_POR_DEFECTO, **(parametros or {})}
+    parametros['nthread'] = nthread or os.cpu_count()
+
+    IteradorParquet = _clase_iterador()
+    t0 = time.perf_counter()
+    # Las páginas de la matriz van a un directorio temporal junto al modelo (en
+    # disco, no en /tmp, que puede estar en RAM) y se borran al terminar
+    with tempfile.TemporaryDirectory(prefix='cache-', dir=destino) as cache:
+        iterador = IteradorParquet(rutas, anio_hasta=anio_corte, cache_prefix=os.path.join(cache, 'cache'))
+        dtrain = xgb.ExtMemQuantileDMatrix(iterador, max_bin=parametros['max_bin'], nthread=parametros['nthread'])
+        t_matriz = time.perf_counter() - t0
+
+        booster = xgb.train(parametros, dtrain, num_boost_round=num_rondas)
+        filas_entrenamiento = dtrain.num_row()
+        del dtrain
+    t_entrenamiento = time.perf_counter() - t0
+
+    metricas_prueba = evaluar(booster, rutas, anio_desde=anio_corte)
+    metricas_entrenamiento = evaluar(booster, rutas, anio_hasta=anio_corte)
+    t_total = time.perf_counter() - t0
+
+    booster.save_model(os.path.join(destino, 'modelo.ubj'))
+    resumen = {
+        'final_mae_resultados': metricas_prueba['mae'],
+        'final_rmse_resultados': metricas_prueba['rmse'],
+        'final_r2_resultados': metricas_prueba['r2'],
+        'prueba': metricas_prueba,
+        'entrenamiento': metricas_entrenamiento,
+        'anio_corte': anio_corte,
+        'filas_entrenamiento': filas_entrenamiento,
+        'parametros': parametros,
+        'num_rondas': num_rondas,
+        'segundos': {'matriz': t_matriz, 'entrenamiento': t_entrenamiento, 'total': t_total},
+        'rss_max_mb': rss_max_mb(),
+    }
+    with open(os.path.join(destino, 'metricas.json'), 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, indent=2)
+    if ruta_manifiesto:
+        publicar_metricas(resumen, os.path.join(destino, 'modelo.ubj'), ruta_manifiesto)
+    return booster, resumen
+
+
+def publicar_metricas(resumen, ruta_modelo, ruta_manifiesto=None, regiones=None):
+    """Publica modelo y métricas; `regiones` son las métricas por región de un ensemble (None si es global)."""
+    from anomalias.manifiesto import publicar
+
+    prueba, entrenamiento = resumen['prueba'], resumen['entrenamiento']
+    return publicar({
+        'modelo': {
+            'artefacto': os.path.abspath(ruta_modelo),
+            'evaluado': os.path.abspath(ruta_modelo),
+            'anio_corte': resumen['anio_corte'],
+            'filas_entrenamiento': resumen['filas_entrenamiento'],
+            'parametros': resumen['parametros'],
+            'num_rondas': resumen['num_rondas'],
+        },
+        'metricas': {
+            'prueba': {'mae': prueba['mae'], 'rmse': prueba['rmse'], 'r2': prueba['r2'], 'filas': prueba['filas']},
+            'entrenamiento': {'mae': entrenamiento['mae'], 'rmse': entrenamiento['rmse'],
+                              'r2': entrenamiento['r2'], 'filas': entrenamiento['filas']},
+            'regiones': regiones,
+        },
+    }, ruta_manifiesto)
+
+
+def continuar(ruta_modelo, rutas, destino, num_rondas=50, parametros=None, nthread=None, ruta_manifiesto=None):
+    """
+    Continúa el entrenamiento de `ruta_modelo` con `num_rondas` árboles más
+    ajustados a las filas de `rutas` (p. ej. los Parquet de una actualización).
+    Antes evalúa el modelo anterior en esas filas, que aún no ha visto: es el
+    error fuera de muestra de los meses nuevos. Guarda `modelo-<versión>.ubj`
+    en `destino`, con un nombre nuevo para que los workers lo recarguen.
+
+    Las métricas de prueba publicadas no se recalculan: las filas nuevas caen
+    después del año de corte y el modelo continuado ya las ha visto. Siguen
+    describiendo el modelo `evaluado` del manifiesto, que es también el que
+    usan las figuras del periodo de prueba.
+    """
+    import xgboost as xgb
+
+    booster = xgb.Booster(model_file=ruta_modelo)
+    fuera_de_muestra = evaluar(booster, rutas)
+    if not fuera_de_muestra['filas']:
+        return ruta_modelo, fuera_de_muestra
+    parametros = {**PARAMETROS_POR_DEFECTO, **(parametros or {})}
+    parametros['nthread'] = nthread or os.cpu_count()
+
+    t0 = time.perf_counter()
+    datos = xgb.QuantileDMatrix(_clase_iterador()(rutas), max_bin=parametros['max_bin'],
+                                nthread=parametros['nthread'])
+    booster = xgb.train(parametros, datos, num_boost_round=num_rondas, xgb_model=booster)
+    contenido = booster.save_raw('ubj')
+    os.makedirs(destino, exist_ok=True)
+    ruta = os.path.join(destino, f"modelo-{hashlib.sha256(contenido).hexdigest()[:12]}.ubj")
+    with open(ruta, 'wb') as f:
+        f.write(contenido)
+    logger.info("Modelo continuado con %d rondas sobre %d filas en %.1f s: %s",
+                num_rondas, fuera_de_muestra['filas'], time.perf_counter() - t0, ruta)
+
+    if ruta_manifiesto:
+        from anomalias.manifiesto import Manifiesto, publicar
+
+        modelo = Manifiesto(ruta_manifiesto).datos().get('modelo') or {}
+        publicar({
+            'modelo': {
+                'artefacto': os.path.abspath(ruta),
+                'num_rondas': booster.num_boosted_rounds(),
+                'continuaciones': modelo.get('continuaciones', []) + [{
+                    'ficheros': [os.path.basename(r) for r in rutas],
+                    'rondas': num_rondas,
+                    'filas': fuera_de_muestra['filas'],
+                }],
+            },
+            'metricas': {'meses_nuevos': fuera_de_muestra},
+        }, ruta_manifiesto)
+    return ruta, fuera_de_muestra
+
+
+def main():
+    from anomalias.componentes import formato
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('features')
+    parser.add_argument('destino')
+    parser.add_argument('--anio-corte', type=int, default=ANIO_CORTE)
+    parser.add_argument('--rondas', type=int,
+                        help='por defecto, las mejores_rondas de --parametros si es una búsqueda, o 500')
+    parser.add_argument('--nthread', type=int)
+    parser.add_argument('--manifiesto', help='publica las métricas en este manifiesto de resultados')
+    parser.add_argument('--parametros',
+                        help='JSON (o ruta a JSON, p. ej. la salida de anomalias.busqueda) '
+                             'con hiperparámetros que sustituyen a los por defecto')
+    args = parser.parse_args()
+    rondas = args.rondas or cargar_rondas(args.parametros) or 500
+    _, r = entrenar(args.features, args.destino, args.anio_corte, cargar_parametros(args.parametros), rondas,
+                    args.nthread, args.manifiesto)
+    # Sin filas de prueba las métricas son None
+    print(f"MAE {formato(r['final_mae_resultados'], '.4f', ' °C')}  "
+          f"RMSE {formato(r['final_rmse_resultados'], '.4f', ' °C')}  "
+          f"R² {formato(r['final_r2_resultados'], '.4f')}  ({r['filas_entrenamiento']:,} filas de entrenamiento, "
+          f"{r['segundos']['total']:.0f} s, RSS máx. {r['rss_max_mb']:.0f} MB)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,308 @@
+"""
+Recursos estáticos del dashboard: variantes responsivas de las imágenes y
+compresión y caché HTTP.
+
+Paso de construcción: cada PNG de `assets/` se escribe en `assets/variantes/`
+como AVIF y WebP en varios anchos (`ANCHOS`, sin ampliar el original) y como
+PNG de respaldo, todos con el hash del contenido en el nombre; `indice.json`
+asocia cada PNG original con sus variantes. Las figuras que genera
+`anomalias.figuras` reciben las mismas variantes al publicarse. Los
+componentes (`componentes.figura`) las sirven en un <picture> con srcset y
+carga diferida.
+
+En el servidor, las respuestas de texto (CSS, JS, HTML y el JSON del layout y
+de los callbacks) se comprimen con brotli si está instalado y el cliente lo
+acepta, o con gzip; las de ficheros estáticos y bundles de Dash se comprimen
+una vez por versión y se guardan en memoria. Los ficheros con huella (variantes, figuras y los assets
+que Dash enlaza con `?m=<mtime>`) se sirven con caché inmutable.
+
+    python -m anomalias.estaticos
+    python -m anomalias.estaticos --manifiesto resultados/manifiesto.json
+"""
+import argparse
+import collections
+import functools
+import glob
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import unicodedata
+
+from anomalias.figuras import CACHE_CONTROL, DIR_ASSETS
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_VARIANTES = os.path.join(DIR_ASSETS, 'variantes')
+RUTA_URL_VARIANTES = '/assets/variantes/'
+RUTA_COMPONENTES_DASH = '/_dash-component-suites/'
+ANCHOS = (400, 800, 1200)
+# Calidad por formato: AVIF da el mismo aspecto con una calidad nominal menor
+FORMATOS = {'avif': ('image/avif', {'quality': 55}), 'webp': ('image/webp', {'quality': 80, 'method': 6})}
+
+TIPOS_COMPRIMIBLES = {'text/css', 'text/html', 'text/plain', 'text/javascript', 'application/javascript',
+                      'application/json', 'image/svg+xml'}
+MIN_BYTES_COMPRESION = 1024
+MAX_ESTATICOS_EN_MEMORIA = 256
+
+
+# =====================================
+# Variantes de imágenes
+# =====================================
+def _nombre_base(nombre):
+    # Sin tildes ni espacios en las URL: 'descomposición' -> 'descomposicion'
+    ascii_ = unicodedata.normalize('NFKD', nombre).encode('ascii', 'ignore').decode()
+    return ''.join(c if c.isalnum() or c in '-_' else '_' for c in ascii_)
+
+
+def _escribir(contenido, directorio, base, sufijo, extension):
+    """Escribe `<base>.<sufijo><hash>.<extensión>` de forma atómica si no existe; devuelve el nombre."""
+    archivo = f"{base}.{sufijo}{hashlib.sha256(contenido).hexdigest()[:12]}.{extension}"
+    destino = os.path.join(directorio, archivo)
+    if not os.path.exists(destino):
+        descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.' + extension)
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(contenido)
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, destino)
+    return archivo
+
+
+def anchos_variantes(ancho_original):
+    """Anchos de las variantes: los de ANCHOS menores que el original, más el original."""
+    return [a for a in ANCHOS if a < ancho_original] + [ancho_original]
+
+
+def variantes_imagen(ruta_png, directorio, prefijo_url, copiar_png=False):
+    """
+    Escribe en `directorio` las variantes AVIF/WebP de `ruta_png` y borra las
+    anteriores de la misma imagen. Devuelve la entrada que usan los
+    componentes: {'src', 'ancho', 'alto', 'fuentes': {tipo MIME: [[url, ancho], ...]}},
+    con las URL relativas a /assets/. Con `copiar_png`, el PNG de respaldo se
+    recomprime y se copia con huella (para los PNG sin hash de assets/).
+    """
+    from PIL import Image, features
+
+    os.makedirs(directorio, exist_ok=True)
+    base = _nombre_base(os.path.splitext(os.path.basename(ruta_png))[0])
+    with Image.open(ruta_png) as original:
+        original.load()
+    ancho, alto = original.size
+    escritos = set()
+    fuentes = {}
+    for extension, (tipo, opciones) in FORMATOS.items():
+        if not features.check(extension):
+            logger.warning("Pillow sin soporte %s: se omiten esas variantes", extension.upper())
+            continue
+        fuentes[tipo] = []
+        for w in anchos_variantes(ancho):
+            imagen = original if w == ancho else original.resize((w, round(alto * w / ancho)), Image.LANCZOS)
+            buffer = io.BytesIO()
+            imagen.save(buffer, format=extension.upper(), **opciones)
+            archivo = _escribir(buffer.getvalue(), directorio, base, f'{w}w.', extension)
+            escritos.add(archivo)
+            fuentes[tipo].append([prefijo_url + archivo, w])
+    if copiar_png:
+        buffer = io.BytesIO()
+        original.save(buffer, format='PNG', optimize=True)
+        archivo = _escribir(buffer.getvalue(), directorio, base, '', 'png')
+        escritos.add(archivo)
+        src = prefijo_url + archivo
+    else:
+        src = prefijo_url + os.path.basename(ruta_png)
+    patrones = [f'{glob.escape(base)}.*w.*.{e}' for e in FORMATOS] + ([f'{glob.escape(base)}.*.png'] if copiar_png else [])
+    for patron in patrones:
+        for anterior in glob.glob(os.path.join(directorio, patron)):
+            if os.path.basename(anterior) not in escritos:
+                os.remove(anterior)
+    return {'src': src, 'ancho': ancho, 'alto': alto, 'fuentes': fuentes}
+
+
+def _huella_fichero(ruta):
+    with open(ruta, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def construir_variantes(origen=DIR_ASSETS, directorio=DIRECTORIO_VARIANTES, forzar=False):
+    """
+    Variantes de los PNG de `origen` (sin subdirectorios) en `directorio` e
+    `indice.json` {nombre del PNG: entrada}. Solo se rehacen los PNG que han
+    cambiado. Devuelve {nombre: 'regenerado' | 'al día'}.
+    """
+    ruta_indice = os.path.join(directorio, 'indice.json')
+    try:
+        with open(ruta_indice, encoding='utf-8') as f:
+            indice = json.load(f)
+    except FileNotFoundError:
+        indice = {}
+    estado, nuevo = {}, {}
+    prefijo = os.path.relpath(directorio, DIR_ASSETS).replace(os.sep, '/') + '/'
+    for ruta in sorted(glob.glob(os.path.join(origen, '*.png'))):
+        nombre = os.path.basename(ruta)
+        huella = _huella_fichero(ruta)
+        previa = indice.get(nombre)
+        if (not forzar and previa and previa.get('origen') == huella
+                and os.path.exists(os.path.join(DIR_ASSETS, previa['src']))):
+            nuevo[nombre] = previa
+            estado[nombre] = 'al día'
+            continue
+        nuevo[nombre] = {**variantes_imagen(ruta, directorio, prefijo, copiar_png=True), 'origen': huella}
+        estado[nombre] = 'regenerado'
+    os.makedirs(directorio, exist_ok=True)
+    with open(ruta_indice + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(nuevo, f, indent=2, ensure_ascii=False)
+    os.replace(ruta_indice + '.tmp', ruta_indice)
+    _leer_indice.cache_clear()
+    return estado
+
+
+def completar_figuras(ruta_manifiesto=None, directorio=None):
+    """Añade variantes a las figuras publicadas en el manifiesto que aún no las tienen."""
+    from anomalias.figuras import DIRECTORIO_FIGURAS
+    from anomalias.manifiesto import Manifiesto, publicar, ruta_manifiesto as ruta_por_defecto
+
+    directorio = directorio or DIRECTORIO_FIGURAS
+    publicado = Manifiesto(ruta_manifiesto or ruta_por_defecto()).datos()
+    actualizacion = {}
+    for nombre, entrada in publicado.get('figuras', {}).items():
+        ruta = os.path.join(directorio, os.path.basename(entrada['src']))
+        if entrada.get('fuentes') or not os.path.exists(ruta):
+            continue
+        actualizacion[nombre] = {**entrada, **variantes_imagen(ruta, directorio, 'figuras/')}
+    if actualizacion:
+        publicar({'figuras': actualizacion}, ruta_manifiesto, ejecucion=publicado.get('ejecucion'))
+    return sorted(actualizacion)
+
+
+@functools.lru_cache(maxsize=1)
+def _leer_indice(_mtime):
+    with open(os.path.join(DIRECTORIO_VARIANTES, 'indice.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def variantes_estaticas():
+    """{PNG de assets/: entrada} del último `construir_variantes`, o {} si no se ha ejecutado."""
+    try:
+        mtime = os.stat(os.path.join(DIRECTORIO_VARIANTES, 'indice.json')).st_mtime_ns
+    except FileNotFoundError:
+        return {}
+    return _leer_indice(mtime)
+
+
+# =====================================
+# Compresión y caché HTTP
+# =====================================
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def comprimir(datos, codificacion, nivel=None):
+    if codificacion == 'br':
+        return _brotli().compress(datos, quality=5 if nivel is None else nivel)
+    return gzip.compress(datos, compresslevel=6 if nivel is None else nivel, mtime=0)
+
+
+def codificacion_aceptada(aceptadas):
+    """'br', 'gzip' o None según Accept-Encoding (werkzeug MIMEAccept) y brotli disponible."""
+    if _brotli() is not None and aceptadas['br']:
+        return 'br'
+    if aceptadas['gzip']:
+        return 'gzip'
+    return None
+
+
+class CacheComprimidos:
+    """Respuestas estáticas ya comprimidas por (ruta, ETag, codificación), con desalojo LRU."""
+
+    def __init__(self, maximo=MAX_ESTATICOS_EN_MEMORIA):
+        self.maximo = maximo
+        self._datos = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, calcular):
+        with self._lock:
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return self._datos[clave]
+        valor = calcular()
+        with self._lock:
+            self.fallos += 1
+            self._datos[clave] = valor
+            while len(self._datos) > self.maximo:
+                self._datos.popitem(last=False)
+        return valor
+
+
+cache_comprimidos = CacheComprimidos()
+
+
+def con_huella(ruta, argumentos):
+    """Si la URL identifica una versión concreta del fichero (y se puede cachear para siempre)."""
+    return (ruta.startswith(RUTA_URL_VARIANTES)
+            or (ruta.startswith('/assets/') and 'm' in argumentos))
+
+
+def registrar_estaticos(server):
+    """Compresión de las respuestas de texto y caché inmutable de los ficheros con huella."""
+    from flask import request
+
+    @server.after_request
+    def _estaticos(respuesta):
+        if respuesta.status_code != 200:
+            return respuesta
+        if con_huella(request.path, request.args):
+            respuesta.headers['Cache-Control'] = CACHE_CONTROL
+        if (respuesta.mimetype not in TIPOS_COMPRIMIBLES or 'Content-Encoding' in respuesta.headers
+                or 'no-transform' in respuesta.headers.get('Cache-Control', '')):
+            return respuesta
+        respuesta.vary.add('Accept-Encoding')
+        codificacion = codificacion_aceptada(request.accept_encodings)
+        if codificacion is None:
+            return respuesta
+        estatica = respuesta.direct_passthrough or request.path.startswith(RUTA_COMPONENTES_DASH)
+        if respuesta.direct_passthrough:
+            respuesta.direct_passthrough = False
+        original = respuesta.get_data()
+        if len(original) < MIN_BYTES_COMPRESION:
+            return respuesta
+        if estatica:
+            # Ficheros y bundles de Dash (versionados en la URL): se comprimen una vez por versión
+            etag, debil = respuesta.get_etag()
+            datos = cache_comprimidos.obtener((request.full_path, etag, codificacion),
+                                              lambda: comprimir(original, codificacion))
+            if etag:
+                respuesta.set_etag(f'{etag}-{codificacion}', weak=debil)
+        else:
+            datos = comprimir(original, codificacion)
+        respuesta.set_data(datos)
+        respuesta.headers['Content-Encoding'] = codificacion
+        return respuesta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--forzar', action='store_true', help='rehace todas las variantes')
+    parser.add_argument('--manifiesto', help='añade también variantes a las figuras publicadas en este manifiesto')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    for nombre, estado in construir_variantes(forzar=args.forzar).items():
+        print(f"{nombre:<40}{estado}")
+    if args.manifiesto:
+        for nombre in completar_figuras(args.manifiesto):
+            print(f"figura {nombre:<33}variantes añadidas")
+
+
+if __name__ == '__main__':
+    main()
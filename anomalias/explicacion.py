@@ -0,0 +1,209 @@
+"""
+Contribuciones de las características a las predicciones en la pestaña
+Resultados: medias por región y década y evolución mensual, leídas de los
+agregados de `anomalias.contribuciones`, y la explicación de una celda (media
+del periodo, o exacta para un mes elegido en la serie, con el modelo cargado
+y el índice de historia).
+"""
+import dash_bootstrap_components as dbc
+import numpy as np
+from dash import dcc, html, no_update
+from dash.dependencies import Input, Output
+
+from anomalias import cubo
+from anomalias.componentes import COLORS, TEXT_STYLE
+from anomalias.contribuciones import GRUPOS, abrir_contribuciones, agrupar, explicar
+from anomalias.explorador import CELDA_INICIAL, LAYOUT_FIGURA, MESES, con_presupuesto, figura_vacia
+from anomalias.indice import abrir_indice
+from anomalias.modelos import registro
+
+TODO_EL_PERIODO = 'todo'
+SIN_CONTRIBUCIONES = "Contribuciones no calculadas: ejecute python -m anomalias.contribuciones"
+
+
+def layout_contribuciones():
+    return html.Div([
+        html.H5("Contribuciones por Predicción (TreeSHAP)", style={'color': COLORS['accent'], 'marginBottom': '15px'}),
+        html.P("Aportación media de cada grupo de características a las predicciones del periodo de prueba, "
+               "por región y década. Haga clic en un mes de la serie para explicar esa predicción en la celda "
+               "elegida.", style=TEXT_STYLE),
+        dbc.Row([
+            dbc.Col([
+                html.Label("Región", style={'color': COLORS['accent']}),
+                dcc.Dropdown(id='contribuciones-region', value='global', clearable=False,
+                             options=[{'label': etiqueta, 'value': nombre}
+                                      for nombre, (etiqueta, _, _) in cubo.REGIONES.items()]),
+            ], md=5),
+            dbc.Col([
+                html.Label("Década", style={'color': COLORS['accent']}),
+                dcc.Dropdown(id='contribuciones-decada', value=TODO_EL_PERIODO, clearable=False,
+                             options=[{'label': 'Todo el periodo de prueba', 'value': TODO_EL_PERIODO}]),
+            ], md=4),
+            dbc.Col([
+                html.Label("Detalle", style={'color': COLORS['accent']}),
+                dbc.RadioItems(id='contribuciones-detalle', value='grupos', inline=True,
+                               options=[{'label': 'Grupos', 'value': 'grupos'},
+                                        {'label': 'Características', 'value': 'caracteristicas'}]),
+            ], md=3),
+        ], className='mb-3'),
+        dcc.Loading(dcc.Graph(id='contribuciones-resumen', config={'displayModeBar': False})),
+        dcc.Loading(dcc.Graph(id='contribuciones-meses', config={'displayModeBar': False})),
+        dbc.Row([
+            dbc.Col([
+                html.Label("Latitud", style={'color': COLORS['accent']}),
+                dcc.Input(id='contribuciones-lat', type='number', value=CELDA_INICIAL[0], min=-90, max=90,
+                          debounce=True, className='form-control'),
+            ], md=3),
+            dbc.Col([
+                html.Label("Longitud", style={'color': COLORS['accent']}),
+                dcc.Input(id='contribuciones-lon', type='number', value=CELDA_INICIAL[1], min=-180, max=180,
+                          debounce=True, className='form-control'),
+            ], md=3),
+            dbc.Col([
+                html.Label("Celda", style={'color': COLORS['accent']}),
+                dbc.RadioItems(id='contribuciones-modo', value='media', inline=True,
+                               options=[{'label': 'Media del periodo', 'value': 'media'},
+                                        {'label': 'Mes elegido en la serie', 'value': 'mes'}]),
+            ], md=6),
+        ], className='mb-3'),
+        dcc.Loading(dcc.Graph(id='contribuciones-celda', config={'displayModeBar': False})),
+    ], className='info-card', style={'marginTop': '20px'})
+
+
+def detalle(valores, caracteristicas, nivel):
+    """(etiquetas, valores sin el sesgo, sesgo) por grupo o por característica."""
+    if nivel == 'grupos':
+        agrupados = agrupar(valores, caracteristicas)
+        return [etiqueta for etiqueta, _ in GRUPOS.values()], agrupados[..., :-1], agrupados[..., -1]
+    return caracteristicas[:-1], valores[..., :-1], valores[..., -1]
+
+
+def figura_resumen(contribuciones, region, decada, nivel):
+    import plotly.graph_objects as go
+
+    media, media_abs = contribuciones.resumen(region, decada)
+    if np.isnan(media).all():
+        return figura_vacia("Sin filas de prueba en la región")
+    etiquetas, media, sesgo = detalle(media, contribuciones.caracteristicas, nivel)
+    media_abs = detalle(media_abs, contribuciones.caracteristicas, nivel)[1]
+    orden = np.argsort(media_abs)
+    etiquetas = [etiquetas[k] for k in orden]
+    fig = go.Figure([
+        go.Bar(y=etiquetas, x=media_abs[orden], orientation='h', name='Media |contribución|',
+               marker_color=COLORS['accent'], opacity=0.5),
+        go.Bar(y=etiquetas, x=media[orden], orientation='h', name='Contribución media',
+               marker_color=COLORS['highlight']),
+    ])
+    periodo = 'periodo de prueba' if decada is None else f'década de {decada}'
+    fig.update_layout(**LAYOUT_FIGURA, barmode='overlay', height=120 + 28 * len(etiquetas), xaxis_title='°C',
+                      legend={'orientation': 'h', 'y': -0.2},
+                      title=f"{cubo.REGIONES[region][0]}, {periodo}: sesgo {float(sesgo):+.2f} °C, "
+                            f"predicción media {float(media.sum() + sesgo):+.2f} °C")
+    return fig
+
+
+def figura_meses(contribuciones, region):
+    import plotly.graph_objects as go
+
+    tiempo, medias = contribuciones.serie(region)
+    etiquetas, grupos, sesgo = detalle(medias, contribuciones.caracteristicas, 'grupos')
+    trazas = [go.Scatter(x=tiempo, y=grupos[:, k], mode='lines', name=etiqueta, line={'width': 1})
+              for k, etiqueta in enumerate(etiquetas)]
+    trazas.append(go.Scatter(x=tiempo, y=grupos.sum(axis=1) + sesgo, mode='lines', name='Predicción media',
+                             line={'color': COLORS['text'], 'width': 2, 'dash': 'dot'}))
+    fig = go.Figure(trazas)
+    fig.update_layout(**LAYOUT_FIGURA, height=380, yaxis_title='°C', hovermode='x',
+                      title=f"Contribución media por grupo y mes: {cubo.REGIONES[region][0]}",
+                      legend={'orientation': 'h', 'y': -0.2})
+    return fig
+
+
+def figura_celda(valores, caracteristicas, nivel, titulo, observado=None):
+    import plotly.graph_objects as go
+
+    etiquetas, aportes, sesgo = detalle(valores, caracteristicas, nivel)
+    orden = np.argsort(-np.abs(aportes))
+    fig = go.Figure(go.Waterfall(
+        x=['Sesgo'] + [etiquetas[k] for k in orden] + ['Predicción'],
+        y=[float(sesgo)] + [float(aportes[k]) for k in orden] + [0.0],
+        measure=['absolute'] + ['relative'] * len(orden) + ['total'],
+        increasing={'marker': {'color': COLORS['highlight']}}, decreasing={'marker': {'color': COLORS['accent']}},
+        totals={'marker': {'color': COLORS['accent_subtle']}},
+    ))
+    if observado is not None and not np.isnan(observado):
+        fig.add_hline(y=observado, line_dash='dot', line_color=COLORS['text'],
+                      annotation_text=f"Observado {observado:+.2f} °C")
+    fig.update_layout(**LAYOUT_FIGURA, height=420, yaxis_title='°C', title=titulo, showlegend=False)
+    return fig
+
+
+def mes_elegido(click):
+    # (año, mes) del punto pulsado en la serie mensual
+    x = click['points'][0]['x']
+    anio = int(np.floor(x))
+    return anio, int(np.floor((x - anio) * 12)) + 1
+
+
+def registrar_callbacks(app):
+    @app.callback(
+        [Output('contribuciones-resumen', 'figure'), Output('contribuciones-meses', 'figure'),
+         Output('contribuciones-decada', 'options')],
+        [Input('contribuciones-region', 'value'), Input('contribuciones-decada', 'value'),
+         Input('contribuciones-detalle', 'value')]
+    )
+    @con_presupuesto('contribuciones-resumen')
+    def actualizar_resumen(region, decada, nivel):
+        contribuciones = abrir_contribuciones()
+        opciones = [{'label': 'Todo el periodo de prueba', 'value': TODO_EL_PERIODO}]
+        if contribuciones is None:
+            vacia = figura_vacia(SIN_CONTRIBUCIONES)
+            return vacia, vacia, opciones
+        opciones += [{'label': f'{d}s', 'value': d} for d in contribuciones.decadas]
+        decada = None if decada == TODO_EL_PERIODO else decada
+        return (figura_resumen(contribuciones, region, decada, nivel), figura_meses(contribuciones, region),
+                opciones)
+
+    @app.callback(
+        Output('contribuciones-modo', 'value'),
+        [Input('contribuciones-meses', 'clickData')],
+        prevent_initial_call=True
+    )
+    def elegir_mes(click):
+        # Un clic en la serie pasa la celda a la explicación de ese mes
+        return 'mes' if click else no_update
+
+    @app.callback(
+        Output('contribuciones-celda', 'figure'),
+        [Input('contribuciones-lat', 'value'), Input('contribuciones-lon', 'value'),
+         Input('contribuciones-modo', 'value'), Input('contribuciones-meses', 'clickData'),
+         Input('contribuciones-decada', 'value'), Input('contribuciones-detalle', 'value')]
+    )
+    @con_presupuesto('contribuciones-celda')
+    def actualizar_celda(lat, lon, modo, click, decada, nivel):
+        contribuciones = abrir_contribuciones()
+        if contribuciones is None:
+            return figura_vacia(SIN_CONTRIBUCIONES)
+        lat = CELDA_INICIAL[0] if lat is None else lat
+        lon = CELDA_INICIAL[1] if lon is None else lon
+        if modo == 'mes':
+            if not click:
+                return figura_vacia("Haga clic en un mes de la serie de contribuciones")
+            anio, mes = mes_elegido(click)
+            modelo, version = registro.obtener()
+            indice = abrir_indice()
+            if modelo is None or indice is None:
+                return figura_vacia("La explicación de un mes necesita el modelo y el índice de historia")
+            try:
+                lat_c, lon_c, valores, observado = explicar(modelo, indice, lat, lon, anio, mes)
+            except ValueError as e:
+                return figura_vacia(str(e))
+            titulo = f"Celda ({lat_c:.1f}, {lon_c:.1f}), {MESES[mes - 1]} {anio} (modelo {version})"
+            return figura_celda(valores, contribuciones.caracteristicas, nivel, titulo, observado)
+
+        decada = None if decada == TODO_EL_PERIODO else decada
+        lat_c, lon_c, valores, filas = contribuciones.celda(lat, lon, decada)
+        if not filas:
+            return figura_vacia(f"Sin filas de prueba en la celda ({lat_c:.1f}, {lon_c:.1f}) en esa década")
+        periodo = 'periodo de prueba' if decada is None else f'década de {decada}'
+        titulo = f"Celda ({lat_c:.1f}, {lon_c:.1f}): media de {filas} meses, {periodo}"
+        return figura_celda(valores, contribuciones.caracteristicas, nivel, titulo)
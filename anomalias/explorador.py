@@ -0,0 +1,321 @@
+"""
+Pestaña "Explorador": mapa mensual de anomalías y serie temporal de una celda,
+leídos bajo demanda de la pirámide o del índice espacio-temporal si existen, y
+si no del NetCDF de Berkeley Earth (ver `anomalias.datos`), capas por celda de
+la descomposición estacional (`anomalias.descomposicion`), y tendencia o
+descomposición de la serie de una región (del cubo de `anomalias.cubo`) o de
+la zona visible del mapa.
+"""
+import functools
+import logging
+import os
+import time
+
+import dash_bootstrap_components as dbc
+import numpy as np
+from dash import callback_context, dcc, html, no_update
+from dash.dependencies import Input, Output
+
+from anomalias import cubo, datos
+from anomalias.componentes import COLORS, TEXT_STYLE, create_section
+from anomalias.descomposicion import abrir_tendencias
+from anomalias.indice import abrir_indice
+from anomalias.piramide import abrir_piramide
+
+logger = logging.getLogger(__name__)
+
+MESES = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 'Jul', 'Ago', 'Sep', 'Oct', 'Nov', 'Dic']
+
+# Celda por defecto: Barranquilla (Universidad del Norte)
+CELDA_INICIAL = (11.0, -74.8)
+
+# Capas del mapa además de la anomalía del mes: (etiqueta, unidades, escala de color, rango)
+CAPAS_MAPA = {
+    'tendencia': ('Tendencia', '°C/década', 'RdBu_r', (-1, 1)),
+    'amplitud_estacional': ('Amplitud estacional', '°C', 'Viridis', (0, 2)),
+    'residuo_std': ('Desviación del residuo', '°C', 'Viridis', (0, 2)),
+}
+
+# Valor del desplegable de regiones que usa la caja del zoom del mapa
+ZONA_VISIBLE = 'zona-visible'
+
+# Presupuesto de latencia por respuesta; se registra un aviso si se supera
+PRESUPUESTO_MS = float(os.environ.get('ANOMALIAS_PRESUPUESTO_MS', '300'))
+
+LAYOUT_FIGURA = {
+    'paper_bgcolor': COLORS['card_background'],
+    'plot_bgcolor': COLORS['card_background'],
+    'font': {'color': COLORS['text']},
+    'margin': {'l': 40, 'r': 20, 't': 50, 'b': 40},
+}
+
+
+def con_presupuesto(nombre):
+    # Mide la duración del callback y avisa si excede PRESUPUESTO_MS
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                ms = (time.perf_counter() - t0) * 1000
+                if ms > PRESUPUESTO_MS:
+                    logger.warning("%s tardó %.0f ms (presupuesto %.0f ms)", nombre, ms, PRESUPUESTO_MS)
+                else:
+                    logger.debug("%s tardó %.0f ms", nombre, ms)
+        return envoltura
+    return decorador
+
+
+def extension_longitud(relayout):
+    # Grados de longitud visibles según el último zoom del mapa (360 sin zoom)
+    if relayout and 'xaxis.range[0]' in relayout and 'xaxis.range[1]' in relayout:
+        return abs(relayout['xaxis.range[1]'] - relayout['xaxis.range[0]'])
+    return 360.0
+
+
+def caja_visible(relayout):
+    # (lat_min, lat_max, lon_min, lon_max) del último zoom del mapa (el globo sin zoom)
+    lat_min, lat_max, lon_min, lon_max = cubo.GLOBO
+    if relayout and 'xaxis.range[0]' in relayout and 'xaxis.range[1]' in relayout:
+        lon_min, lon_max = sorted((relayout['xaxis.range[0]'], relayout['xaxis.range[1]']))
+    if relayout and 'yaxis.range[0]' in relayout and 'yaxis.range[1]' in relayout:
+        lat_min, lat_max = sorted((relayout['yaxis.range[0]'], relayout['yaxis.range[1]']))
+    return max(lat_min, -90), min(lat_max, 90), max(lon_min, -180), min(lon_max, 180)
+
+
+def figura_vacia(mensaje):
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    fig.update_layout(**LAYOUT_FIGURA, xaxis={'visible': False}, yaxis={'visible': False},
+                      annotations=[{'text': mensaje, 'showarrow': False, 'font': {'size': 16}}])
+    return fig
+
+
+# =====================================
+# Layout
+# =====================================
+def layout_explorador():
+    if not datos.dataset_disponible():
+        return create_section("Explorador de Anomalías", [
+            dbc.Alert(f"No se encontró el NetCDF de Berkeley Earth en '{datos.ruta_dataset()}'. "
+                      "Defina ANOMALIAS_NETCDF con la ruta del fichero.", color='warning')
+        ])
+
+    anio_min, anio_max = datos.rango_anios(datos.abrir_dataset())
+    paso_marcas = 25 if anio_max - anio_min > 50 else 5
+    return create_section("Explorador de Anomalías", [
+        html.P("Seleccione un mes para ver el mapa global de anomalías y haga clic en una celda "
+               "para ver su serie histórica.", style=TEXT_STYLE),
+        dbc.Row([
+            dbc.Col([
+                html.Label("Año", style={'color': COLORS['accent']}),
+                dcc.Slider(id='explorador-anio', min=anio_min, max=anio_max, step=1, value=anio_max,
+                           marks={a: str(a) for a in range(anio_min, anio_max + 1, paso_marcas)},
+                           tooltip={'placement': 'bottom'}, updatemode='mouseup'),
+            ], md=9),
+            dbc.Col([
+                html.Label("Mes", style={'color': COLORS['accent']}),
+                dcc.Dropdown(id='explorador-mes', value=1, clearable=False,
+                             options=[{'label': m, 'value': i + 1} for i, m in enumerate(MESES)]),
+            ], md=3),
+        ], className='mb-4'),
+        dbc.RadioItems(id='explorador-capa', value='anomalia', inline=True, className='mb-2',
+                       options=[{'label': 'Anomalía del mes', 'value': 'anomalia'}]
+                       + [{'label': f'{etiqueta} ({unidades})', 'value': capa}
+                          for capa, (etiqueta, unidades, _, _) in CAPAS_MAPA.items()]),
+        dcc.Loading(dcc.Graph(id='explorador-mapa', config={'displayModeBar': False})),
+        dcc.Loading(dcc.Graph(id='explorador-serie', config={'displayModeBar': False})),
+        html.H5("Series regionales", style={'color': COLORS['accent'], 'marginTop': '30px'}),
+        html.P("Media mensual ponderada por área de una región, o de la zona visible del mapa.", style=TEXT_STYLE),
+        dbc.Row([
+            dbc.Col([
+                html.Label("Región", style={'color': COLORS['accent']}),
+                dcc.Dropdown(id='explorador-region', value='global', clearable=False,
+                             options=[{'label': etiqueta, 'value': nombre}
+                                      for nombre, (etiqueta, _, _) in cubo.REGIONES.items()]
+                             + [{'label': 'Zona visible del mapa', 'value': ZONA_VISIBLE}]),
+            ], md=6),
+            dbc.Col([
+                html.Label("Vista", style={'color': COLORS['accent']}),
+                dbc.RadioItems(id='explorador-vista', value='tendencia', inline=True,
+                               options=[{'label': 'Tendencia', 'value': 'tendencia'},
+                                        {'label': 'Descomposición', 'value': 'descomposicion'}]),
+            ], md=6),
+        ], className='mb-4'),
+        dcc.Loading(dcc.Graph(id='explorador-region-grafico', config={'displayModeBar': False})),
+    ])
+
+
+def figura_tendencia(tiempo, serie, titulo):
+    import plotly.graph_objects as go
+
+    anios, anual, pendiente, ordenada = datos.tendencia_anual(tiempo, serie)
+    trazas = [
+        go.Scatter(x=tiempo, y=serie, mode='lines', name='Mensual',
+                   line={'color': COLORS['accent'], 'width': 1}, opacity=0.4),
+        go.Scatter(x=anios + 0.5, y=anual, mode='lines+markers', name='Media anual',
+                   line={'color': COLORS['accent'], 'width': 2}, marker={'size': 4}),
+    ]
+    if not np.isnan(pendiente):
+        trazas.append(go.Scatter(x=anios + 0.5, y=pendiente * anios + ordenada, mode='lines',
+                                 name=f'Tendencia lineal ({pendiente * 10:+.3f} °C/década)',
+                                 line={'color': COLORS['highlight'], 'width': 2}))
+    fig = go.Figure(trazas)
+    fig.update_layout(**LAYOUT_FIGURA, height=400, yaxis_title='°C', title=titulo,
+                      legend={'orientation': 'h', 'y': -0.15})
+    return fig
+
+
+def figura_descomposicion(tiempo, serie, titulo):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    meses = np.floor((tiempo - np.floor(tiempo)) * 12).astype(int).clip(0, 11)
+    componentes = dict(zip(['Serie', 'Tendencia', 'Estacionalidad', 'Residuo'],
+                           [serie, *datos.descomponer(serie, meses)]))
+    fig = make_subplots(rows=4, cols=1, shared_xaxes=True, vertical_spacing=0.03)
+    for fila, (nombre, valores) in enumerate(componentes.items(), start=1):
+        fig.add_trace(go.Scatter(x=tiempo, y=valores, mode='lines', name=nombre, showlegend=False,
+                                 line={'color': COLORS['accent'], 'width': 1}), row=fila, col=1)
+        fig.update_yaxes(title_text=nombre, row=fila, col=1)
+    fig.update_layout(**LAYOUT_FIGURA, height=650, title=titulo)
+    return fig
+
+
+def mapa_capa(capa, piramide, relayout):
+    import plotly.graph_objects as go
+
+    from anomalias.piramide import agregar_bloques
+
+    capas = abrir_tendencias()
+    if capas is None:
+        return figura_vacia("Capa no calculada: ejecute python -m anomalias.descomposicion")
+    etiqueta, unidades, escala, (zmin, zmax) = CAPAS_MAPA[capa]
+    # Con pirámide, la misma resolución que el mapa de anomalías para ese zoom
+    nivel = piramide.elegir_nivel(extension_longitud(relayout)) if piramide is not None else 1
+    lat, lon, z = capas['lat'], capas['lon'], capas[capa]
+    if nivel > 1 and len(lat) % nivel == 0 and len(lon) % nivel == 0:
+        lat, lon = lat.reshape(-1, nivel).mean(axis=1), lon.reshape(-1, nivel).mean(axis=1)
+        z = agregar_bloques(z[None], nivel)[0]
+    else:
+        nivel = 1
+    fig = go.Figure(go.Heatmap(
+        z=z, x=lon, y=lat, colorscale=escala, zmin=zmin, zmax=zmax,
+        zmid=0 if capa == 'tendencia' else None, colorbar={'title': unidades},
+        hovertemplate=f'lat %{{y}}, lon %{{x}}<br>%{{z:.2f}} {unidades}<extra></extra>'
+    ))
+    fig.update_layout(**LAYOUT_FIGURA, title=f"{etiqueta} {capas['anio_inicio']}–{capas['anio_fin']} ({nivel}°)",
+                      height=450, yaxis={'scaleanchor': 'x'}, uirevision='explorador-mapa')
+    return fig
+
+
+# =====================================
+# Callbacks
+# =====================================
+def registrar_callbacks(app):
+    @app.callback(
+        Output('explorador-mapa', 'figure'),
+        [Input('explorador-anio', 'value'), Input('explorador-anio', 'drag_value'),
+         Input('explorador-mes', 'value'), Input('explorador-mapa', 'relayoutData'),
+         Input('explorador-capa', 'value')]
+    )
+    @con_presupuesto('explorador-mapa')
+    def actualizar_mapa(anio, anio_arrastre, mes, relayout, capa):
+        import plotly.graph_objects as go
+
+        disparadores = {t['prop_id'] for t in callback_context.triggered}
+        arrastrando = 'explorador-anio.drag_value' in disparadores
+        piramide = abrir_piramide()
+        if capa in CAPAS_MAPA:
+            # Las capas no dependen del mes: solo se redibujan al cambiar de capa o de zoom
+            if disparadores <= {'explorador-anio.value', 'explorador-anio.drag_value', 'explorador-mes.value'}:
+                return no_update
+            return mapa_capa(capa, piramide, relayout)
+        if piramide is not None:
+            # Con pirámide: nivel según el zoom, y el más grueso mientras se arrastra
+            if arrastrando and anio_arrastre is not None:
+                anio = anio_arrastre
+            nivel = piramide.elegir_nivel(extension_longitud(relayout), arrastrando)
+            lat, lon, z = piramide.mapa(anio, mes, nivel)
+        elif arrastrando:
+            # Sin pirámide solo se lee la resolución completa al soltar el slider
+            return no_update
+        elif abrir_indice() is not None:
+            nivel = 1
+            lat, lon, z = abrir_indice().mes(anio, mes)
+        else:
+            ds = datos.abrir_dataset()
+            nivel = 1
+            lat, lon, z = ds['latitude'].values, ds['longitude'].values, datos.mapa_mes(ds, anio, mes)
+
+        fig = go.Figure(go.Heatmap(
+            z=z, x=lon, y=lat,
+            colorscale='RdBu_r', zmid=0, zmin=-4, zmax=4,
+            colorbar={'title': '°C'}, hovertemplate='lat %{y}, lon %{x}<br>%{z:.2f} °C<extra></extra>'
+        ))
+        fig.update_layout(**LAYOUT_FIGURA, title=f"Anomalía {MESES[mes - 1]} {anio} ({nivel}°)", height=450,
+                          yaxis={'scaleanchor': 'x'}, uirevision='explorador-mapa')
+        return fig
+
+    @app.callback(
+        Output('explorador-serie', 'figure'),
+        [Input('explorador-mapa', 'clickData'),
+         Input('explorador-anio', 'value'), Input('explorador-mes', 'value')]
+    )
+    @con_presupuesto('explorador-serie')
+    def actualizar_serie(click, anio, mes):
+        import plotly.graph_objects as go
+
+        if click:
+            lat, lon = click['points'][0]['y'], click['points'][0]['x']
+        else:
+            lat, lon = CELDA_INICIAL
+        indice = abrir_indice()
+        if indice is not None:
+            # Historia de la celda en el orden por celda del índice: una lectura contigua
+            tiempo, anomalia, lat_c, lon_c = indice.historia(lat, lon)
+        else:
+            ds = datos.abrir_dataset()
+            tiempo, anomalia, _ = datos.serie_celda(ds, lat, lon)
+            i, j = datos.indice_celda(ds, lat, lon)
+            lat_c, lon_c = float(ds['latitude'][i]), float(ds['longitude'][j])
+        if np.isnan(anomalia).all():
+            return figura_vacia(f"Sin datos en la celda ({lat_c:.1f}, {lon_c:.1f})")
+
+        fig = go.Figure([
+            go.Scatter(x=tiempo, y=anomalia, mode='lines', name='Mensual',
+                       line={'color': COLORS['accent'], 'width': 1}, opacity=0.6),
+            go.Scatter(x=tiempo, y=datos.media_movil(anomalia, 12), mode='lines', name='Media 12 meses',
+                       line={'color': COLORS['highlight'], 'width': 2}),
+        ])
+        fig.add_vline(x=anio + (mes - 0.5) / 12, line_dash='dot', line_color=COLORS['text'])
+        fig.update_layout(**LAYOUT_FIGURA, height=350, yaxis_title='°C',
+                          title=f"Serie de la celda ({lat_c:.1f}, {lon_c:.1f})")
+        return fig
+
+    @app.callback(
+        Output('explorador-region-grafico', 'figure'),
+        [Input('explorador-region', 'value'), Input('explorador-vista', 'value'),
+         Input('explorador-mapa', 'relayoutData')]
+    )
+    @con_presupuesto('explorador-region')
+    def actualizar_region(region, vista, relayout):
+        zoom = any(t['prop_id'] == 'explorador-mapa.relayoutData' for t in callback_context.triggered)
+        if region == ZONA_VISIBLE:
+            caja = caja_visible(relayout)
+            tiempo, serie = cubo.serie_caja(*caja)
+            titulo = "Zona visible: lat {:.0f}° a {:.0f}°, lon {:.0f}° a {:.0f}°".format(*caja)
+        elif zoom:
+            # El zoom del mapa solo afecta a la zona visible
+            return no_update
+        else:
+            tiempo, serie = cubo.serie_region(region)
+            titulo = cubo.REGIONES[region][0]
+        if np.isnan(serie).all():
+            return figura_vacia("Sin datos en la región")
+        if vista == 'descomposicion':
+            return figura_descomposicion(tiempo, serie, f"Descomposición: {titulo}")
+        return figura_tendencia(tiempo, serie, f"Tendencia: {titulo}")
@@ -0,0 +1,325 @@
+"""
+Ingeniería de características por trozos espaciales.
+
+Implementa las características descritas en la pestaña Metodología: lags de
+1, 3 y 12 meses, medias y desviaciones móviles de 3 y 12 meses, diferencias,
+año como tendencia, estacionalidad seno/coseno, coordenadas, máscara
+tierra-océano, climatología e interacciones latitud × estación.
+
+El NetCDF se recorre por bandas de latitud: cada trozo contiene la historia
+completa de un grupo de celdas como una matriz (tiempo, celda), y todas las
+operaciones son vectorizadas sobre el eje del tiempo. Cada trozo se escribe
+como un fichero Parquet independiente, así que la memoria depende del tamaño
+del trozo y no del número total de filas.
+
+Los meses nuevos de una publicación se añaden con `anexar_features` en un
+Parquet aparte, leyendo de los meses anteriores solo los HISTORIA que
+necesitan lags y ventanas (ver `anomalias.actualizacion`).
+
+    python -m anomalias.features data/Land_and_Ocean_LatLong1.nc data/features
+"""
+import argparse
+import glob
+import logging
+import os
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LAGS = (1, 3, 12)
+VENTANAS = (3, 12)
+# Meses anteriores que necesita la característica más larga (diff_12 usa t - 13)
+HISTORIA = max(LAGS) + 1
+
+COLUMNAS_FEATURES = [
+    'lag_1', 'lag_3', 'lag_12',
+    'media_movil_3', 'media_movil_12', 'std_movil_3', 'std_movil_12',
+    'diff_1', 'diff_12',
+    'anio', 'mes_sin', 'mes_cos',
+    'latitud', 'longitud', 'land_mask', 'climatology',
+    'lat_x_mes_sin', 'lat_x_mes_cos',
+]
+OBJETIVO = 'temperature'
+# Columnas de identificación que acompañan a cada fila
+COLUMNAS_ID = ['celda', 'mes']
+
+# Solo las columnas de baja cardinalidad usan codificación por diccionario; en
+# las continuas encarece la escritura sin reducir el tamaño
+COLUMNAS_DICCIONARIO = ['anio', 'mes', 'mes_sin', 'mes_cos', 'latitud', 'longitud', 'land_mask', 'celda']
+
+# Filas (tiempo × celdas) por trozo: ~20 columnas float32 → ~160 MB por trozo
+MAX_FILAS_POR_TROZO = 2_000_000
+
+
+def rss_max_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def desplazar(x, k):
+    """x[t - k] sobre el eje 0, con NaN en los primeros k pasos."""
+    y = np.full_like(x, np.nan)
+    y[k:] = x[:-k]
+    return y
+
+
+def estadisticas_moviles(x, ventana):
+    """
+    Media y desviación (ddof=1) de los `ventana` meses anteriores a t, sin
+    incluir t para no filtrar el objetivo. NaN si falta algún valor en la ventana.
+    """
+    nt = x.shape[0]
+    nulos = np.isnan(x)
+    x0 = np.where(nulos, 0.0, x).astype(np.float64)
+    ceros = np.zeros((1,) + x.shape[1:])
+    suma = np.concatenate([ceros, np.cumsum(x0, axis=0)])
+    suma2 = np.concatenate([ceros, np.cumsum(x0 * x0, axis=0)])
+    n_nulos = np.concatenate([ceros, np.cumsum(nulos, axis=0)])
+
+    media = np.full(x.shape, np.nan)
+    desv = np.full(x.shape, np.nan)
+    # Ventana [t - ventana, t): índices de suma acumulada t y t - ventana
+    hi, lo = slice(ventana, nt), slice(0, nt - ventana)
+    s = suma[hi] - suma[lo]
+    s2 = suma2[hi] - suma2[lo]
+    completos = (n_nulos[hi] - n_nulos[lo]) == 0
+    with np.errstate(invalid='ignore'):
+        media[ventana:] = np.where(completos, s / ventana, np.nan)
+        var = np.maximum((s2 - s * s / ventana) / (ventana - 1), 0)
+        desv[ventana:] = np.where(completos, np.sqrt(var), np.nan)
+    return media.astype(np.float32), desv.astype(np.float32)
+
+
+def columnas_trozo(temp, tiempo, lat, lon, mascara, clima, celdas):
+    """
+    Todas las columnas de un trozo de celdas como matrices (T, C), sin filtrar.
+
+    temp: (T, C) anomalías; tiempo: (T,) años decimales, o (T, C) si cada
+    columna tiene su propio eje de tiempo (ventanas de predicción); lat, lon,
+    mascara, celdas: (C,); clima: (12, C) con la climatología ya imputada. Las
+    características de la fila t solo usan valores anteriores a t.
+    """
+    nt, nc = temp.shape
+    temp = temp.astype(np.float32, copy=False)
+    anio = np.floor(tiempo).astype(np.int16)
+    mes = (np.floor((tiempo - anio) * 12).astype(np.int8).clip(0, 11) + 1)
+    angulo = 2 * np.pi * (mes - 1) / 12
+    mes_sin = np.sin(angulo).astype(np.float32)
+    mes_cos = np.cos(angulo).astype(np.float32)
+
+    columnas = {f'lag_{k}': desplazar(temp, k) for k in LAGS}
+    for w in VENTANAS:
+        columnas[f'media_movil_{w}'], columnas[f'std_movil_{w}'] = estadisticas_moviles(temp, w)
+    # Diferencias sobre valores pasados (mes anterior frente a su mes previo / al año anterior)
+    columnas['diff_1'] = columnas['lag_1'] - desplazar(temp, 2)
+    columnas['diff_12'] = columnas['lag_1'] - desplazar(temp, 13)
+
+    def por_tiempo(v):
+        return np.broadcast_to(v[:, None] if v.ndim == 1 else v, (nt, nc))
+
+    def por_celda(v):
+        return np.broadcast_to(v[None, :], (nt, nc))
+
+    lat32 = lat.astype(np.float32)
+    columnas['anio'] = por_tiempo(anio)
+    columnas['mes_sin'] = por_tiempo(mes_sin)
+    columnas['mes_cos'] = por_tiempo(mes_cos)
+    columnas['latitud'] = por_celda(lat32)
+    columnas['longitud'] = por_celda(lon.astype(np.float32))
+    columnas['land_mask'] = por_celda(mascara.astype(np.float32))
+    columnas['climatology'] = np.take_along_axis(clima, por_tiempo(mes - 1).astype(np.intp),
+                                                 axis=0).astype(np.float32)
+    columnas['lat_x_mes_sin'] = lat32[None, :] * por_tiempo(mes_sin)
+    columnas['lat_x_mes_cos'] = lat32[None, :] * por_tiempo(mes_cos)
+    columnas['celda'] = por_celda(celdas.astype(np.int32))
+    columnas['mes'] = por_tiempo(mes)
+    columnas[OBJETIVO] = temp
+    return columnas
+
+
+def features_trozo(temp, tiempo, lat, lon, mascara, clima, celdas, anio_min=None, desde=0):
+    """
+    Características de un trozo de celdas (argumentos como `columnas_trozo`).
+    Devuelve un dict columna → array 1D en orden (tiempo, celda), sin las filas
+    con NaN en el objetivo o en alguna característica. Las filas de tiempo
+    anteriores a `desde` solo aportan historia y no se devuelven.
+    """
+    columnas = columnas_trozo(temp, tiempo, lat, lon, mascara, clima, celdas)
+    validas = ~np.isnan(columnas[OBJETIVO])
+    validas[:desde] = False
+    for nombre in ('lag_12', 'media_movil_12', 'std_movil_12', 'diff_12', 'lag_3', 'lag_1'):
+        validas &= ~np.isnan(columnas[nombre])
+    if anio_min is not None:
+        validas &= columnas['anio'] >= anio_min
+
+    return {nombre: np.ascontiguousarray(v)[validas] for nombre, v in columnas.items()}
+
+
+def climatologia_imputada(ds):
+    # Climatología (12, lat, lon) con los NaN sustituidos por la mediana global
+    clima = ds['climatology'].values.astype(np.float32)
+    return np.where(np.isnan(clima), np.nanmedian(clima), clima)
+
+
+def bandas_latitud(nlat, nlon, nt, max_filas=MAX_FILAS_POR_TROZO):
+    filas_lat = max(1, max_filas // (nt * nlon))
+    return [(i, min(i + filas_lat, nlat)) for i in range(0, nlat, filas_lat)]
+
+
+def _leer_banda(ds, i0, i1, t0=0, t1=None):
+    """Argumentos de `features_trozo` para las filas de latitud [i0, i1) y los meses [t0, t1)."""
+    nlon = ds.sizes['longitude']
+    tiempo = ds['time'].values[t0:t1]
+    temp = ds['temperature'][t0:t1, i0:i1, :].values.reshape(len(tiempo), -1)
+    lat = np.repeat(ds['latitude'].values[i0:i1], nlon)
+    lon = np.tile(ds['longitude'].values, i1 - i0)
+    mascara = ds['land_mask'][i0:i1].values.reshape(-1)
+    clima = climatologia_imputada(ds)[:, i0:i1, :].reshape(12, -1)
+    celdas = np.arange(i0 * nlon, i1 * nlon)
+    return temp, tiempo, lat, lon, mascara, clima, celdas
+
+
+def _procesar_banda(args):
+    ruta_netcdf, destino, banda, i0, i1, anio_min = args
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import xarray as xr
+
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        trozo = _leer_banda(ds, i0, i1)
+
+    columnas = features_trozo(*trozo, anio_min)
+    n = len(columnas[OBJETIVO])
+    if n:
+        tabla = pa.table(columnas)
+        pq.write_table(tabla, os.path.join(destino, f'parte-{banda:05d}.parquet'),
+                       row_group_size=256_000, compression='zstd', compression_level=1,
+                       use_dictionary=COLUMNAS_DICCIONARIO)
+    return n, rss_max_mb()
+
+
+def construir_features(ruta_netcdf, destino, anio_min=1900, max_filas=MAX_FILAS_POR_TROZO, procesos=1):
+    """
+    Escribe el almacén de características en `destino` (un Parquet por banda de
+    latitud) y devuelve un resumen con filas, filas/s y RSS máximo por proceso.
+    """
+    import xarray as xr
+
+    os.makedirs(destino, exist_ok=True)
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        nt, nlat, nlon = ds['temperature'].shape
+    tareas = [(ruta_netcdf, destino, b, i0, i1, anio_min)
+              for b, (i0, i1) in enumerate(bandas_latitud(nlat, nlon, nt, max_filas))]
+
+    t0 = time.perf_counter()
+    filas, rss = 0, rss_max_mb()
+    if procesos > 1:
+        with ProcessPoolExecutor(procesos) as pool:
+            resultados = pool.map(_procesar_banda, tareas)
+            for n, rss_hijo in resultados:
+                filas += n
+                rss = max(rss, rss_hijo)
+    else:
+        for tarea in tareas:
+            n, rss_actual = _procesar_banda(tarea)
+            filas += n
+            rss = max(rss, rss_actual)
+            logger.debug("Banda %d: %d filas", tarea[2], n)
+    segundos = time.perf_counter() - t0
+    return {
+        'filas': filas,
+        'trozos': len(tareas),
+        'segundos': segundos,
+        'filas_por_segundo': filas / segundos if segundos else 0.0,
+        'rss_max_mb': rss,
+    }
+
+
+def aaaamm(tiempo):
+    """'aaaamm' de un tiempo en años decimales."""
+    anio = int(np.floor(tiempo))
+    return f"{anio}{min(int((tiempo - anio) * 12), 11) + 1:02d}"
+
+
+def ultimo_mes(destino):
+    """
+    (año, mes) más reciente del almacén, o None si está vacío. Las estadísticas
+    de los row groups acotan la búsqueda: solo se leen los del último año.
+    """
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    grupos, anio_max = [], None
+    for ruta in sorted(glob.glob(os.path.join(destino, '*.parquet'))):
+        fichero = pq.ParquetFile(ruta)
+        columna = fichero.schema_arrow.get_field_index('anio')
+        for g in range(fichero.num_row_groups):
+            maximo = fichero.metadata.row_group(g).column(columna).statistics.max
+            grupos.append((fichero, g, maximo))
+            anio_max = maximo if anio_max is None else max(anio_max, maximo)
+    if anio_max is None:
+        return None
+    mes_max = 0
+    for fichero, g, maximo in grupos:
+        if maximo == anio_max:
+            tabla = fichero.read_row_group(g, columns=['anio', 'mes'])
+            tabla = tabla.filter(pc.equal(tabla['anio'], anio_max))
+            mes_max = max(mes_max, pc.max(tabla['mes']).as_py())
+    return int(anio_max), int(mes_max)
+
+
+def anexar_features(ruta_netcdf, destino, desde, anio_min=1900, max_filas=MAX_FILAS_POR_TROZO):
+    """
+    Añade al almacén las filas de los meses `desde`.. del NetCDF, en un único
+    Parquet `incremento-<aaaamm>-<aaaamm>.parquet` con un row group por banda.
+    De los meses anteriores solo se leen los HISTORIA que necesitan lags y
+    ventanas, así que el coste depende de los meses nuevos. Devuelve las filas.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import xarray as xr
+
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        nt, nlat, nlon = ds['temperature'].shape
+        if desde >= nt:
+            return 0
+        tiempo = ds['time'].values
+        inicio = max(desde - HISTORIA, 0)
+        ruta = os.path.join(destino, f'incremento-{aaaamm(tiempo[desde])}-{aaaamm(tiempo[-1])}.parquet')
+        temporal = ruta + '.tmp'
+        escritor, filas = None, 0
+        for i0, i1 in bandas_latitud(nlat, nlon, nt - inicio, max_filas):
+            columnas = features_trozo(*_leer_banda(ds, i0, i1, inicio, nt), anio_min, desde - inicio)
+            if not len(columnas[OBJETIVO]):
+                continue
+            tabla = pa.table(columnas)
+            if escritor is None:
+                escritor = pq.ParquetWriter(temporal, tabla.schema, compression='zstd', compression_level=1,
+                                            use_dictionary=COLUMNAS_DICCIONARIO)
+            escritor.write_table(tabla, row_group_size=256_000)
+            filas += tabla.num_rows
+    if escritor is not None:
+        escritor.close()
+        os.replace(temporal, ruta)
+    return filas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('netcdf')
+    parser.add_argument('destino')
+    parser.add_argument('--anio-min', type=int, default=1900)
+    parser.add_argument('--max-filas', type=int, default=MAX_FILAS_POR_TROZO,
+                        help='filas (tiempo × celdas) por trozo; acota la memoria')
+    parser.add_argument('--procesos', type=int, default=1)
+    args = parser.parse_args()
+    resumen = construir_features(args.netcdf, args.destino, args.anio_min, args.max_filas, args.procesos)
+    print(f"{resumen['filas']:,} filas en {resumen['trozos']} trozos, {resumen['segundos']:.1f} s "
+          f"({resumen['filas_por_segundo']:,.0f} filas/s), RSS máx. {resumen['rss_max_mb']:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,566 @@
+"""
+Construcción de las figuras de la pestaña Resultados.
+
+Sustituye a los PNG estáticos de `assets/` por figuras generadas a partir de
+los artefactos del pipeline:
+
+- NetCDF: histograma, descomposición temporal y tendencia global;
+- almacén de características: matriz de correlación;
+- modelo: importancia de características;
+- modelo + características (periodo de prueba): reales vs. predichos,
+  residuos vs. predichos, mapa del MAE por celda y serie del MAE mensual.
+
+Los diagramas de dispersión de millones de puntos se agregan en rejillas 2D
+(histogramas por lotes) y se dibujan como densidad, así que ni la memoria ni
+el tiempo de dibujo dependen del número de filas.
+
+Cada PNG se escribe como `assets/figuras/<nombre>.<hash>.png` (hash del
+contenido), con sus variantes AVIF/WebP (`anomalias.estaticos`), y se publica
+en la sección `figuras` del manifiesto junto con la huella de sus entradas; un
+grupo de figuras solo se regenera cuando cambia esa huella. Los nombres con hash se sirven con caché de larga duración.
+
+    python -m anomalias.figuras --netcdf data/Land_and_Ocean_LatLong1.nc \\
+        --features data/features --manifiesto resultados/manifiesto.json
+"""
+import argparse
+import glob
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias.datos import descomponer, tendencia_anual
+
+logger = logging.getLogger(__name__)
+
+DIR_ASSETS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets')
+DIRECTORIO_FIGURAS = os.path.join(DIR_ASSETS, 'figuras')
+RUTA_URL = '/assets/figuras/'
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Cambiar al modificar el dibujo de las figuras: invalida todas las huellas
+VERSION_FIGURAS = 1
+
+# Figuras por grupo de entradas
+GRUPOS = {
+    'netcdf': ['histograma', 'descomposicion', 'tendencia'],
+    'features': ['correlacion'],
+    'modelo': ['feature_importance'],
+    'prediccion': ['predictions_vs_actual', 'residuals_vs_predicted', 'map_mae_error', 'timeseries_mae_error'],
+}
+
+# Rejillas de agregación de los diagramas de dispersión (°C)
+LIMITES_TEMPERATURA = (-8.0, 8.0)
+LIMITES_RESIDUO = (-5.0, 5.0)
+BINS_DISPERSION = 300
+BINS_HISTOGRAMA = np.linspace(-15, 15, 601)
+
+ESTILO = {
+    'figure.facecolor': '#1a2634', 'axes.facecolor': '#243447', 'savefig.facecolor': '#1a2634',
+    'axes.edgecolor': '#8fa3b8', 'axes.labelcolor': '#ffffff', 'axes.titlecolor': '#3cbaec',
+    'xtick.color': '#d0dae4', 'ytick.color': '#d0dae4', 'text.color': '#ffffff',
+    'grid.color': '#3a4d63', 'axes.grid': True, 'axes.axisbelow': True, 'font.size': 10,
+}
+
+
+# =====================================
+# Huellas de las entradas
+# =====================================
+def huella_ficheros(rutas):
+    """Huella barata de un conjunto de ficheros: nombre, tamaño y mtime."""
+    h = hashlib.sha256()
+    for ruta in sorted(rutas):
+        st = os.stat(ruta)
+        h.update(f"{os.path.basename(ruta)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()
+
+
+def huella_contenido(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for bloque in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def huellas_grupos(ruta_netcdf=None, dir_features=None, ruta_modelo=None, anio_corte=None):
+    """Huella de las entradas de cada grupo, o None si falta alguna entrada."""
+    def combinar(*partes):
+        if any(p is None for p in partes):
+            return None
+        return hashlib.sha256(json.dumps([VERSION_FIGURAS, *partes]).encode()).hexdigest()[:16]
+
+    netcdf = huella_ficheros([ruta_netcdf]) if ruta_netcdf and os.path.exists(ruta_netcdf) else None
+    rutas = sorted(glob.glob(os.path.join(dir_features, '*.parquet'))) if dir_features else []
+    features = huella_ficheros(rutas) if rutas else None
+    modelo = huella_contenido(ruta_modelo) if ruta_modelo and os.path.exists(ruta_modelo) else None
+    return {
+        'netcdf': combinar(netcdf),
+        'features': combinar(features),
+        'modelo': combinar(modelo),
+        'prediccion': combinar(modelo, features, anio_corte),
+    }
+
+
+# =====================================
+# Agregación
+# =====================================
+def agregar_netcdf(ruta_netcdf, meses_por_bloque=12, previos=None):
+    """
+    Histograma de anomalías y serie global mensual (ponderada por cos(lat)), por
+    bloques. Si `previos` (de una ejecución anterior) cubre un prefijo de los
+    meses del NetCDF, solo se recorren los meses siguientes.
+    """
+    from anomalias.estadisticas import _abrir
+    from anomalias.piramide import medias_zonal_global
+
+    with _abrir(ruta_netcdf) as ds:
+        tiempo = ds['time'].values
+        lat = ds['latitude'].values.astype(np.float64)
+        conteos = np.zeros(len(BINS_HISTOGRAMA) - 1, dtype=np.int64)
+        serie = np.empty(len(tiempo), dtype=np.float64)
+        desde = 0
+        if previos is not None and len(previos['tiempo']) <= len(tiempo) \
+                and np.allclose(previos['tiempo'], tiempo[:len(previos['tiempo'])]):
+            desde = len(previos['tiempo'])
+            conteos += previos['conteos']
+            serie[:desde] = previos['global']
+        for i in range(desde, len(tiempo), meses_por_bloque):
+            bloque = ds['temperature'][i:i + meses_por_bloque].values
+            conteos += np.histogram(bloque[~np.isnan(bloque)], BINS_HISTOGRAMA)[0]
+            serie[i:i + len(bloque)] = medias_zonal_global(bloque, lat)[1]
+    return {'conteos': conteos, 'tiempo': tiempo, 'global': serie}
+
+
+def _firmas(rutas):
+    return {os.path.basename(r): f"{os.stat(r).st_size}:{os.stat(r).st_mtime_ns}" for r in rutas}
+
+
+def sumas_features(rutas, booster=None, anio_corte=None, filas_por_lote=500_000, previas=None,
+                   clave_modelo=None):
+    """
+    Sumas fusionables sobre el almacén: momentos cruzados para la correlación
+    (todas las filas) y, si hay modelo, rejillas de reales/predichos/residuos y
+    errores por celda y por mes en el periodo de prueba.
+
+    Con `previas` (de una ejecución anterior) solo se recorren los ficheros
+    nuevos, siempre que los ya sumados no hayan cambiado y, si hay modelo, que
+    se sumaran con el mismo (`clave_modelo`); si no, se recorre todo.
+    """
+    import pyarrow.parquet as pq
+
+    from anomalias.features import COLUMNAS_FEATURES, OBJETIVO
+
+    columnas = COLUMNAS_FEATURES + [OBJETIVO]
+    k = len(columnas)
+    firmas = _firmas(rutas)
+    if previas is not None:
+        sumadas = json.loads(str(previas['ficheros']))
+        validas = all(firmas.get(f) == firma for f, firma in sumadas.items()) and (
+            booster is None or ('error_celda' in previas and str(previas['modelo']) == clave_modelo))
+        if validas:
+            rutas = [r for r in rutas if os.path.basename(r) not in sumadas]
+        else:
+            previas = None
+    sumas = {'n': 0, 'suma': np.zeros(k), 'cruzados': np.zeros((k, k))}
+    if booster is not None:
+        sumas.update(
+            reales_predichos=np.zeros((BINS_DISPERSION, BINS_DISPERSION), dtype=np.int64),
+            residuos_predichos=np.zeros((BINS_DISPERSION, BINS_DISPERSION), dtype=np.int64),
+            error_celda=np.zeros(0), filas_celda=np.zeros(0),
+            lat_celda=np.zeros(0, dtype=np.float32), lon_celda=np.zeros(0, dtype=np.float32),
+            periodos=np.zeros(0, dtype=np.int64), error_periodo=np.zeros(0), filas_periodo=np.zeros(0),
+        )
+    bordes_t = np.linspace(*LIMITES_TEMPERATURA, BINS_DISPERSION + 1)
+    bordes_r = np.linspace(*LIMITES_RESIDUO, BINS_DISPERSION + 1)
+
+    lotes = (lote for ruta in rutas
+             for lote in pq.ParquetFile(ruta).iter_batches(filas_por_lote, columns=columnas + ['celda', 'mes']))
+    for tabla in lotes:
+        M = np.column_stack([tabla.column(c).to_numpy() for c in columnas]).astype(np.float64)
+        sumas['n'] += len(M)
+        sumas['suma'] += M.sum(axis=0)
+        sumas['cruzados'] += M.T @ M
+        if booster is None:
+            continue
+        prueba = M[:, COLUMNAS_FEATURES.index('anio')] >= anio_corte
+        if not prueba.any():
+            continue
+        X = M[prueba, :-1].astype(np.float32)
+        y = M[prueba, -1]
+        prediccion = booster.inplace_predict(X).astype(np.float64)
+        residuo = y - prediccion
+        error = np.abs(residuo)
+        sumas['reales_predichos'] += np.histogram2d(y, prediccion, [bordes_t, bordes_t])[0].astype(np.int64)
+        sumas['residuos_predichos'] += np.histogram2d(prediccion, residuo, [bordes_t, bordes_r])[0].astype(np.int64)
+
+        celda = tabla.column('celda').to_numpy()[prueba]
+        _sumar_celdas(sumas, celda, np.bincount(celda, weights=error), np.bincount(celda),
+                      M[prueba, COLUMNAS_FEATURES.index('latitud')], M[prueba, COLUMNAS_FEATURES.index('longitud')])
+        periodo = (M[prueba, COLUMNAS_FEATURES.index('anio')].astype(np.int64) * 12
+                   + tabla.column('mes').to_numpy()[prueba].astype(np.int64) - 1)
+        unicos, inverso = np.unique(periodo, return_inverse=True)
+        _sumar_periodos(sumas, unicos, np.bincount(inverso, weights=error), np.bincount(inverso))
+
+    if previas is not None:
+        sumas['n'] += int(previas['n'])
+        sumas['suma'] += previas['suma']
+        sumas['cruzados'] += previas['cruzados']
+        if booster is not None:
+            sumas['reales_predichos'] += previas['reales_predichos']
+            sumas['residuos_predichos'] += previas['residuos_predichos']
+            filas = previas['filas_celda'] > 0
+            celdas = np.nonzero(filas)[0]
+            _sumar_celdas(sumas, celdas, previas['error_celda'], previas['filas_celda'],
+                          previas['lat_celda'][filas], previas['lon_celda'][filas])
+            _sumar_periodos(sumas, previas['periodos'], previas['error_periodo'], previas['filas_periodo'])
+    sumas['ficheros'] = json.dumps(firmas)
+    sumas['modelo'] = clave_modelo if booster is not None else ''
+    return sumas
+
+
+def _sumar_celdas(sumas, celda, error, filas, lat, lon):
+    # error y filas indexados por celda (bincount); lat y lon, uno por elemento de `celda`
+    tamano = max(len(error), len(sumas['error_celda']))
+    for clave in ('error_celda', 'filas_celda'):
+        sumas[clave] = np.pad(sumas[clave], (0, tamano - len(sumas[clave])))
+    for clave in ('lat_celda', 'lon_celda'):
+        sumas[clave] = np.pad(sumas[clave], (0, tamano - len(sumas[clave])), constant_values=np.nan)
+    sumas['error_celda'][:len(error)] += error
+    sumas['filas_celda'][:len(filas)] += filas
+    sumas['lat_celda'][celda] = lat
+    sumas['lon_celda'][celda] = lon
+
+
+def _sumar_periodos(sumas, periodos, error, filas):
+    todos = np.union1d(sumas['periodos'], periodos)
+    for clave, valores, nuevos in (('error_periodo', sumas['error_periodo'], error),
+                                   ('filas_periodo', sumas['filas_periodo'], filas)):
+        acumulado = np.zeros(len(todos))
+        acumulado[np.searchsorted(todos, sumas['periodos'])] += valores
+        acumulado[np.searchsorted(todos, periodos)] += nuevos
+        sumas[clave] = acumulado
+    sumas['periodos'] = todos
+
+
+def resumir_features(sumas):
+    """Correlación y, si se sumaron con modelo, las rejillas y los MAE que dibujan las figuras."""
+    from anomalias.features import COLUMNAS_FEATURES, OBJETIVO
+
+    n = sumas['n']
+    media = sumas['suma'] / n
+    covarianza = sumas['cruzados'] / n - np.outer(media, media)
+    desviacion = np.sqrt(np.maximum(np.diag(covarianza), 0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlacion = covarianza / np.outer(desviacion, desviacion)
+    resultado = {'columnas': COLUMNAS_FEATURES + [OBJETIVO], 'correlacion': correlacion, 'filas': n}
+    if 'error_celda' in sumas:
+        resultado.update(
+            bordes_t=np.linspace(*LIMITES_TEMPERATURA, BINS_DISPERSION + 1),
+            bordes_r=np.linspace(*LIMITES_RESIDUO, BINS_DISPERSION + 1),
+            reales_predichos=sumas['reales_predichos'], residuos_predichos=sumas['residuos_predichos'],
+            error_celda=sumas['error_celda'], filas_celda=sumas['filas_celda'],
+            lat_celda=sumas['lat_celda'], lon_celda=sumas['lon_celda'],
+            meses=sumas['periodos'], mae_mes=sumas['error_periodo'] / sumas['filas_periodo'],
+        )
+    return resultado
+
+
+def agregar_features(dir_features, booster=None, anio_corte=None, filas_por_lote=500_000):
+    """Agregados de `sumas_features` sobre todo el almacén, listos para dibujar."""
+    from anomalias.entrenamiento import partes
+
+    return resumir_features(sumas_features(partes(dir_features), booster, anio_corte, filas_por_lote))
+
+
+def _cargar_agregados(ruta):
+    if not ruta or not os.path.exists(ruta):
+        return None
+    with np.load(ruta) as f:
+        return {clave: f[clave] for clave in f.files}
+
+
+def _guardar_agregados(ruta, agregados):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    temporal = ruta + '.tmp.npz'
+    np.savez(temporal, **agregados)
+    os.replace(temporal, ruta)
+
+
+# =====================================
+# Dibujo
+# =====================================
+def _pyplot():
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    plt.rcParams.update(ESTILO)
+    return plt
+
+
+def _densidad(ax, rejilla, bordes_x, bordes_y, etiqueta):
+    from matplotlib.colors import LogNorm
+
+    imagen = ax.pcolormesh(bordes_x, bordes_y, np.ma.masked_equal(rejilla.T, 0), cmap='viridis',
+                           norm=LogNorm(), shading='flat', rasterized=True)
+    ax.figure.colorbar(imagen, ax=ax, label=etiqueta)
+
+
+def dibujar_netcdf(agregados):
+    plt = _pyplot()
+    figuras = {}
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    centros = (BINS_HISTOGRAMA[:-1] + BINS_HISTOGRAMA[1:]) / 2
+    usados = np.nonzero(agregados['conteos'])[0]
+    rango = slice(usados.min(), usados.max() + 1) if len(usados) else slice(None)
+    ax.bar(centros[rango], agregados['conteos'][rango], width=np.diff(BINS_HISTOGRAMA)[0], color='#3cbaec')
+    ax.set(title='Distribución de anomalías', xlabel='Anomalía (°C)', ylabel='Frecuencia')
+    figuras['histograma'] = fig
+
+    tiempo, serie = agregados['tiempo'], agregados['global']
+    tendencia, estacional, residuo = descomponer(serie)
+    fig, ejes = plt.subplots(4, 1, figsize=(12, 8), sharex=True)
+    for ax, valores, titulo in zip(ejes, [serie, tendencia, estacional, residuo],
+                                   ['Serie global', 'Tendencia', 'Estacionalidad', 'Residuo']):
+        ax.plot(tiempo, valores, color='#3cbaec', linewidth=0.8)
+        ax.set_ylabel(titulo)
+    ejes[-1].set_xlabel('Año')
+    fig.tight_layout()
+    figuras['descomposicion'] = fig
+
+    unicos, anual, pendiente, ordenada = tendencia_anual(tiempo, serie)
+    fig, ax = plt.subplots(figsize=(10, 5.4))
+    ax.plot(unicos, anual, color='#3cbaec', marker='.', linewidth=1, label='Media anual')
+    if not np.isnan(pendiente):
+        ax.plot(unicos, pendiente * unicos + ordenada, color='#ff6b6b',
+                label=f'Tendencia lineal ({pendiente * 10:+.3f} °C/década)')
+    ax.set(title='Tendencia de la anomalía global', xlabel='Año', ylabel='Anomalía (°C)')
+    ax.legend()
+    figuras['tendencia'] = fig
+    return figuras
+
+
+def dibujar_correlacion(agregados):
+    plt = _pyplot()
+    columnas = agregados['columnas']
+    fig, ax = plt.subplots(figsize=(9, 7.5))
+    imagen = ax.imshow(agregados['correlacion'], cmap='RdBu_r', vmin=-1, vmax=1)
+    ax.set_xticks(range(len(columnas)), columnas, rotation=90, fontsize=7)
+    ax.set_yticks(range(len(columnas)), columnas, fontsize=7)
+    ax.grid(False)
+    fig.colorbar(imagen, ax=ax, label='Correlación de Pearson')
+    ax.set_title(f"Correlaciones ({agregados['filas']:,} filas)")
+    fig.tight_layout()
+    return {'correlacion': fig}
+
+
+def dibujar_importancia(booster):
+    from anomalias.features import COLUMNAS_FEATURES
+
+    plt = _pyplot()
+    ganancia = booster.get_score(importance_type='gain')
+    nombres = {f'f{i}': c for i, c in enumerate(COLUMNAS_FEATURES)}
+    pares = sorted(((nombres.get(f, f), g) for f, g in ganancia.items()), key=lambda p: p[1])
+    fig, ax = plt.subplots(figsize=(10, 9))
+    ax.barh([p[0] for p in pares], [p[1] for p in pares], color='#3cbaec')
+    ax.set(title='Importancia de las características (ganancia)', xlabel='Ganancia media')
+    fig.tight_layout()
+    return {'feature_importance': fig}
+
+
+def dibujar_prediccion(agregados):
+    plt = _pyplot()
+    figuras = {}
+    bordes_t, bordes_r = agregados['bordes_t'], agregados['bordes_r']
+
+    fig, ax = plt.subplots(figsize=(10, 10))
+    _densidad(ax, agregados['reales_predichos'], bordes_t, bordes_t, 'Filas por celda (log)')
+    ax.plot(LIMITES_TEMPERATURA, LIMITES_TEMPERATURA, color='#ff6b6b', linewidth=1, label='Ideal')
+    ax.set(title='Reales vs. predichos (prueba)', xlabel='Real (°C)', ylabel='Predicho (°C)', aspect='equal')
+    # Posición fija: con loc='best' matplotlib recorre las 90.000 celdas de la rejilla
+    ax.legend(loc='upper left')
+    figuras['predictions_vs_actual'] = fig
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    _densidad(ax, agregados['residuos_predichos'], bordes_t, bordes_r, 'Filas por celda (log)')
+    ax.axhline(0, color='#ff6b6b', linewidth=1)
+    ax.set(title='Residuos vs. predichos (prueba)', xlabel='Predicho (°C)', ylabel='Residuo (°C)')
+    figuras['residuals_vs_predicted'] = fig
+
+    filas = agregados['filas_celda']
+    con_datos = filas > 0
+    lat_u = np.unique(agregados['lat_celda'][con_datos])
+    lon_u = np.unique(agregados['lon_celda'][con_datos])
+    mapa = np.full((len(lat_u), len(lon_u)), np.nan)
+    mapa[np.searchsorted(lat_u, agregados['lat_celda'][con_datos]),
+         np.searchsorted(lon_u, agregados['lon_celda'][con_datos])] = \
+        agregados['error_celda'][con_datos] / filas[con_datos]
+    fig, ax = plt.subplots(figsize=(8, 4.5))
+    imagen = ax.pcolormesh(lon_u, lat_u, mapa, cmap='magma', shading='nearest', rasterized=True)
+    fig.colorbar(imagen, ax=ax, label='MAE (°C)')
+    ax.set(title='MAE por celda (prueba)', xlabel='Longitud', ylabel='Latitud')
+    ax.grid(False)
+    figuras['map_mae_error'] = fig
+
+    meses = agregados['meses']
+    fig, ax = plt.subplots(figsize=(14, 4))
+    ax.plot(meses / 12 + 1 / 24, agregados['mae_mes'], color='#3cbaec', linewidth=1)
+    ax.set(title='MAE mensual (prueba)', xlabel='Año', ylabel='MAE (°C)')
+    fig.tight_layout()
+    figuras['timeseries_mae_error'] = fig
+    return figuras
+
+
+# =====================================
+# Escritura y publicación
+# =====================================
+def guardar_png(fig, nombre, directorio=DIRECTORIO_FIGURAS):
+    """Escribe `<nombre>.<hash>.png` de forma atómica y borra las versiones anteriores."""
+    import matplotlib.pyplot as plt
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=100)
+    plt.close(fig)
+    contenido = buffer.getvalue()
+    archivo = f"{nombre}.{hashlib.sha256(contenido).hexdigest()[:12]}.png"
+    os.makedirs(directorio, exist_ok=True)
+    destino = os.path.join(directorio, archivo)
+    if not os.path.exists(destino):
+        descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.png')
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(contenido)
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, destino)
+    for anterior in glob.glob(os.path.join(directorio, f'{glob.escape(nombre)}.*.png')):
+        if os.path.basename(anterior) != archivo:
+            os.remove(anterior)
+    return archivo
+
+
+def construir_figuras(ruta_netcdf=None, dir_features=None, ruta_modelo=None, anio_corte=None,
+                      ruta_manifiesto=None, forzar=False, directorio=DIRECTORIO_FIGURAS, dir_agregados=None):
+    """
+    Regenera los grupos de figuras cuyas entradas han cambiado respecto a lo
+    publicado en el manifiesto y publica las nuevas rutas. Los agregados se
+    guardan en `dir_agregados` y, cuando solo se han añadido meses al NetCDF o
+    ficheros al almacén, se amplían en lugar de recalcularse. Devuelve
+    {grupo: 'regenerado' | 'al día' | 'sin entradas'}.
+    """
+    from anomalias.entrenamiento import partes
+    from anomalias.manifiesto import Manifiesto, directorio_agregados, publicar, ruta_manifiesto as ruta_por_defecto
+
+    # Lectura directa (sin la vista cacheada de los workers) para ver la última publicación
+    publicado = Manifiesto(ruta_manifiesto or ruta_por_defecto()).datos()
+    modelo_publicado = publicado.get('modelo') or {}
+    # Las figuras del periodo de prueba son las del modelo evaluado, no las de sus continuaciones
+    ruta_modelo = ruta_modelo or modelo_publicado.get('evaluado') or modelo_publicado.get('artefacto')
+    anio_corte = anio_corte or modelo_publicado.get('anio_corte')
+    figuras_publicadas = publicado.get('figuras', {})
+    huellas = huellas_grupos(ruta_netcdf, dir_features, ruta_modelo, anio_corte)
+    dir_agregados = dir_agregados or directorio_agregados(ruta_manifiesto)
+
+    estado, pendientes = {}, []
+    for grupo, nombres in GRUPOS.items():
+        if huellas[grupo] is None:
+            estado[grupo] = 'sin entradas'
+        elif not forzar and all(
+                figuras_publicadas.get(n, {}).get('entradas') == huellas[grupo]
+                and os.path.exists(os.path.join(directorio, os.path.basename(figuras_publicadas[n]['src'])))
+                for n in nombres):
+            estado[grupo] = 'al día'
+        else:
+            pendientes.append(grupo)
+
+    booster = None
+    if {'modelo', 'prediccion'} & set(pendientes):
+        from anomalias.regiones import cargar_modelo
+        booster = cargar_modelo(ruta_modelo)
+
+    dibujadas = {}
+    if 'netcdf' in pendientes:
+        ruta = os.path.join(dir_agregados, 'netcdf.npz')
+        agregados = agregar_netcdf(ruta_netcdf, previos=None if forzar else _cargar_agregados(ruta))
+        _guardar_agregados(ruta, agregados)
+        dibujadas['netcdf'] = dibujar_netcdf(agregados)
+    if {'features', 'prediccion'} & set(pendientes):
+        ruta = os.path.join(dir_agregados, 'features.npz')
+        sumas = sumas_features(partes(dir_features), booster if 'prediccion' in pendientes else None, anio_corte,
+                               previas=None if forzar else _cargar_agregados(ruta),
+                               clave_modelo=f"{huellas['modelo']}:{anio_corte}")
+        _guardar_agregados(ruta, sumas)
+        agregados = resumir_features(sumas)
+        if 'features' in pendientes:
+            dibujadas['features'] = dibujar_correlacion(agregados)
+        if 'prediccion' in pendientes:
+            dibujadas['prediccion'] = dibujar_prediccion(agregados)
+    if 'modelo' in pendientes:
+        dibujadas['modelo'] = dibujar_importancia(booster)
+
+    from anomalias.estaticos import variantes_imagen
+
+    actualizacion = {}
+    for grupo, figs in dibujadas.items():
+        for nombre, fig in figs.items():
+            archivo = guardar_png(fig, nombre, directorio)
+            anterior = figuras_publicadas.get(nombre)
+            if anterior and os.path.basename(anterior['src']) == archivo and all(
+                    os.path.exists(os.path.join(directorio, os.path.basename(f))) for f in _ficheros(anterior)):
+                # El PNG no ha cambiado (p. ej. un mes más no mueve ningún píxel): sus variantes siguen valiendo
+                actualizacion[nombre] = {**anterior, 'entradas': huellas[grupo]}
+                continue
+            actualizacion[nombre] = {**variantes_imagen(os.path.join(directorio, archivo), directorio, 'figuras/'),
+                                     'entradas': huellas[grupo]}
+            if anterior:
+                for obsoleto in set(_ficheros(anterior)) - set(_ficheros(actualizacion[nombre])):
+                    ruta = os.path.join(directorio, os.path.basename(obsoleto))
+                    if os.path.exists(ruta):
+                        os.remove(ruta)
+        estado[grupo] = 'regenerado'
+    if actualizacion:
+        publicar({'figuras': actualizacion}, ruta_manifiesto, ejecucion=publicado.get('ejecucion'))
+    return estado
+
+
+def _ficheros(entrada):
+    # URL de las variantes AVIF/WebP de una figura publicada
+    return [url for fuentes in entrada.get('fuentes', {}).values() for url, _ in fuentes]
+
+
+def registrar_cache(server):
+    """Caché de larga duración para las figuras: su nombre cambia con el contenido."""
+    from flask import request
+
+    @server.after_request
+    def _cache_figuras(respuesta):
+        if request.path.startswith(RUTA_URL) and respuesta.status_code in (200, 304):
+            respuesta.headers['Cache-Control'] = CACHE_CONTROL
+        return respuesta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--netcdf', help='NetCDF de anomalías (figuras del EDA)')
+    parser.add_argument('--features', help='almacén de características (correlación y figuras del modelo)')
+    parser.add_argument('--modelo', help='modelo.ubj; por defecto, el modelo evaluado del manifiesto')
+    parser.add_argument('--anio-corte', type=int, help='por defecto, el del manifiesto')
+    parser.add_argument('--manifiesto')
+    parser.add_argument('--forzar', action='store_true', help='regenera aunque las entradas no hayan cambiado')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    t0 = time.perf_counter()
+    estado = construir_figuras(args.netcdf, args.features, args.modelo, args.anio_corte, args.manifiesto,
+                               args.forzar)
+    for grupo, situacion in estado.items():
+        print(f"{grupo:<12}{situacion}")
+    print(f"{time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+"""
+Índice espacio-temporal de la rejilla de anomalías.
+
+Guarda la anomalía en dos `.npy` que se abren con memmap:
+
+- `temperatura.npy`, por tiempo (tiempo, celda): un mes de todo el globo es
+  una lectura contigua;
+- `temperatura_celdas.npy`, por celda (celda, tiempo): la historia completa
+  de una celda es una lectura contigua.
+
+Las coordenadas son crecientes, así que (lat, lon) → celda y las cajas se
+resuelven con búsquedas binarias, y las consultas de celda, caja y rango de
+fechas leen solo lo que devuelven, no el dataset.
+
+Los meses de una publicación nueva se añaden con `anexar_indice` al final del
+orden por tiempo. El orden por celda no se puede ampliar sin reescribirlo
+entero, así que cubre los primeros `meses_celdas` meses y el resto (como mucho
+MAX_COLA) se lee del orden por tiempo; al superar ese margen se reescribe.
+
+También alimenta la API de predicción: las características de (celda, mes t)
+solo dependen de los 13 meses anteriores y de datos estáticos (coordenadas,
+máscara, climatología), así que se calculan con `features.columnas_trozo`
+sobre esas ventanas, igual que en el entrenamiento.
+
+    python -m anomalias.indice data/Land_and_Ocean_LatLong1.nc data/indice
+"""
+import argparse
+import functools
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias.datos import anexar_npy
+from anomalias.features import (COLUMNAS_FEATURES, HISTORIA, MAX_FILAS_POR_TROZO, bandas_latitud,
+                                 climatologia_imputada, columnas_trozo)
+
+RUTA_POR_DEFECTO = 'data/indice'
+# Meses más recientes que puede faltar en el orden por celda antes de reescribirlo
+MAX_COLA = 120
+
+
+def ruta_indice():
+    return os.environ.get('ANOMALIAS_INDICE', RUTA_POR_DEFECTO)
+
+
+def _escribir_por_celda(ds, destino, max_filas):
+    # Por bandas de latitud con toda su historia; se sustituye de forma atómica
+    nt, nlat, nlon = ds['temperature'].shape
+    ruta = os.path.join(destino, 'temperatura_celdas.npy')
+    temporal = ruta + '.tmp'
+    por_celda = np.lib.format.open_memmap(temporal, mode='w+', dtype=np.float32, shape=(nlat * nlon, nt))
+    for i0, i1 in bandas_latitud(nlat, nlon, nt, max_filas):
+        banda = ds['temperature'][:, i0:i1, :].values
+        por_celda[i0 * nlon:i1 * nlon] = banda.reshape(nt, -1).T
+    por_celda.flush()
+    del por_celda
+    os.replace(temporal, ruta)
+    return nt
+
+
+def _escribir_meta(destino, meta):
+    descriptor, temporal = tempfile.mkstemp(dir=destino, suffix='.json')
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(temporal, os.path.join(destino, 'meta.json'))
+
+
+def construir_indice(ruta_netcdf, destino, meses_por_bloque=120, max_filas=MAX_FILAS_POR_TROZO):
+    """
+    Escribe el índice en `destino` y devuelve `destino`. El orden por tiempo se
+    escribe por bloques de meses y el orden por celda por bandas de latitud con
+    toda su historia, así que la memoria está acotada en ambos casos.
+    """
+    import xarray as xr
+
+    os.makedirs(destino, exist_ok=True)
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        nt, nlat, nlon = ds['temperature'].shape
+        temperatura = np.lib.format.open_memmap(os.path.join(destino, 'temperatura.npy'), mode='w+',
+                                                dtype=np.float32, shape=(nt, nlat * nlon))
+        for i in range(0, nt, meses_por_bloque):
+            bloque = ds['temperature'][i:i + meses_por_bloque].values
+            temperatura[i:i + len(bloque)] = bloque.reshape(len(bloque), -1)
+        temperatura.flush()
+        del temperatura
+        _escribir_por_celda(ds, destino, max_filas)
+        np.save(os.path.join(destino, 'climatologia.npy'), climatologia_imputada(ds).reshape(12, -1))
+        np.save(os.path.join(destino, 'mascara.npy'), ds['land_mask'].values.reshape(-1).astype(np.float32))
+        meta = {
+            'tiempo_inicial': float(ds['time'].values[0]),
+            'meses': int(nt),
+            'meses_celdas': int(nt),
+            'latitud': ds['latitude'].values.astype(float).tolist(),
+            'longitud': ds['longitude'].values.astype(float).tolist(),
+        }
+    _escribir_meta(destino, meta)
+    return destino
+
+
+def anexar_indice(ruta_netcdf, destino, meses_por_bloque=120, max_cola=MAX_COLA,
+                  max_filas=MAX_FILAS_POR_TROZO):
+    """
+    Añade al índice los meses del NetCDF posteriores a los que ya tiene y
+    devuelve cuántos. Solo lee y escribe esos meses, salvo cuando la cola del
+    orden por celda supera `max_cola` y este se reescribe.
+    """
+    import xarray as xr
+
+    with open(os.path.join(destino, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        nt = ds.sizes['time']
+        desde = meta['meses']
+        if nt <= desde:
+            return 0
+        if not np.isclose(ds['time'].values[0], meta['tiempo_inicial']):
+            raise ValueError(f"'{ruta_netcdf}' no empieza en el mismo mes que el índice de '{destino}'")
+        for i in range(desde, nt, meses_por_bloque):
+            bloque = ds['temperature'][i:min(i + meses_por_bloque, nt)].values
+            anexar_npy(os.path.join(destino, 'temperatura.npy'), bloque.reshape(len(bloque), -1))
+        meta['meses'] = int(nt)
+        if nt - meta.get('meses_celdas', desde) > max_cola:
+            meta['meses_celdas'] = _escribir_por_celda(ds, destino, max_filas)
+    _escribir_meta(destino, meta)
+    return nt - desde
+
+
+def _mas_cercano(coordenadas, valores):
+    """Índice de la coordenada más cercana (coordenadas crecientes)."""
+    j = np.clip(np.searchsorted(coordenadas, valores), 1, len(coordenadas) - 1)
+    return np.where(np.abs(valores - coordenadas[j - 1]) <= np.abs(coordenadas[j] - valores), j - 1, j)
+
+
+class Indice:
+    """Índice abierto en modo lectura; las matrices de anomalías se comparten vía memmap."""
+
+    def __init__(self, directorio):
+        with open(os.path.join(directorio, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.directorio = directorio
+        self.tiempo_inicial = meta['tiempo_inicial']
+        self.meses = meta['meses']
+        self.lat = np.asarray(meta['latitud'])
+        self.lon = np.asarray(meta['longitud'])
+        self.meses_celdas = meta.get('meses_celdas', self.meses)
+        # El fichero puede tener ya filas de una actualización en curso: manda meta.json
+        self.temperatura = np.load(os.path.join(directorio, 'temperatura.npy'), mmap_mode='r')[:self.meses]
+        self.temperatura_celdas = np.load(os.path.join(directorio, 'temperatura_celdas.npy'),
+                                          mmap_mode='r')[:, :self.meses_celdas]
+        self.climatologia = np.load(os.path.join(directorio, 'climatologia.npy'))
+        self.mascara = np.load(os.path.join(directorio, 'mascara.npy'))
+        self.anio_inicial = int(np.floor(self.tiempo_inicial))
+        self.mes_inicial = int(np.floor((self.tiempo_inicial - self.anio_inicial) * 12)) + 1
+        self.tiempo = self.tiempo_inicial + np.arange(self.meses) / 12
+
+    def celdas(self, lat, lon):
+        """Índices (fila, columna) y de celda de la rejilla más cercanos a cada punto."""
+        i = _mas_cercano(self.lat, np.asarray(lat, dtype=np.float64))
+        j = _mas_cercano(self.lon, np.asarray(lon, dtype=np.float64))
+        return i, j, i * len(self.lon) + j
+
+    def _filas(self, lat_min, lat_max):
+        return slice(int(np.searchsorted(self.lat, lat_min, 'left')), int(np.searchsorted(self.lat, lat_max, 'right')))
+
+    def _columnas(self, lon_min, lon_max):
+        # Con lon_min > lon_max la caja cruza el antimeridiano: dos tramos
+        if lon_min <= lon_max:
+            return [slice(int(np.searchsorted(self.lon, lon_min, 'left')),
+                          int(np.searchsorted(self.lon, lon_max, 'right')))]
+        return [slice(int(np.searchsorted(self.lon, lon_min, 'left')), len(self.lon)),
+                slice(0, int(np.searchsorted(self.lon, lon_max, 'right')))]
+
+    def celdas_caja(self, lat_min, lat_max, lon_min, lon_max):
+        """Celdas cuyo centro cae en la caja; devuelve (lat, lon) de cada una."""
+        lat = self.lat[self._filas(lat_min, lat_max)]
+        lon = np.concatenate([self.lon[c] for c in self._columnas(lon_min, lon_max)])
+        return np.repeat(lat, len(lon)), np.tile(lon, len(lat))
+
+    def indices_tiempo(self, anio, mes):
+        return (np.asarray(anio, dtype=np.int64) - self.anio_inicial) * 12 + np.asarray(mes, dtype=np.int64) \
+            - self.mes_inicial
+
+    def rango_tiempo(self, desde=None, hasta=None):
+        """Tramo [t0, t1) de los meses entre `desde` y `hasta` ((año, mes), ambos incluidos)."""
+        t0 = 0 if desde is None else int(self.indices_tiempo(*desde))
+        t1 = self.meses if hasta is None else int(self.indices_tiempo(*hasta)) + 1
+        return max(t0, 0), min(max(t1, 0), self.meses)
+
+    def _por_celda(self, celdas, t0, t1):
+        """Anomalías (celdas..., t1 - t0) del orden por celda más la cola reciente del orden por tiempo."""
+        corte = min(max(t0, self.meses_celdas), t1)
+        partes = [np.asarray(self.temperatura_celdas[celdas, t0:corte])]
+        if corte < t1:
+            partes.append(np.moveaxis(np.asarray(self.temperatura[corte:t1, celdas]), 0, -1))
+        return np.concatenate(partes, axis=-1)
+
+    def historia(self, lat, lon, desde=None, hasta=None):
+        """(tiempo, anomalía, lat, lon de la celda) de la celda más cercana: una lectura contigua."""
+        i, j, celda = self.celdas(lat, lon)
+        t0, t1 = self.rango_tiempo(desde, hasta)
+        return self.tiempo[t0:t1], self._por_celda(int(celda), t0, t1), float(self.lat[i]), float(self.lon[j])
+
+    def mes(self, anio, mes):
+        """
+        (lat, lon, anomalía (lat, lon)) de un mes en todo el globo: una lectura
+        contigua. Fuera del índice (un año aún incompleto, o un NetCDF más nuevo
+        que el índice) se usa el mes más cercano, como en el NetCDF y la pirámide.
+        """
+        t = min(max(int(self.indices_tiempo(anio, mes)), 0), self.meses - 1)
+        return self.lat, self.lon, np.array(self.temperatura[t]).reshape(len(self.lat), len(self.lon))
+
+    def caja(self, lat_min, lat_max, lon_min, lon_max, desde=None, hasta=None):
+        """
+        (tiempo, lat, lon, anomalía (tiempo, lat, lon)) de una caja y un rango de
+        fechas. Usa el orden que necesita menos tramos contiguos: por tiempo
+        (un tramo por mes y fila de latitud) o por celda (uno por celda).
+        """
+        filas = self._filas(lat_min, lat_max)
+        columnas = self._columnas(lon_min, lon_max)
+        t0, t1 = self.rango_tiempo(desde, hasta)
+        nlat, nlon = len(self.lat), len(self.lon)
+        n_filas = filas.stop - filas.start
+        n_columnas = sum(c.stop - c.start for c in columnas)
+        if (t1 - t0) * n_filas * len(columnas) <= n_filas * n_columnas:
+            rejilla = self.temperatura.reshape(self.meses, nlat, nlon)
+            datos = np.concatenate([rejilla[t0:t1, filas, c] for c in columnas], axis=2)
+        else:
+            celdas = np.arange(nlat * nlon).reshape(nlat, nlon)
+            datos = np.concatenate([self._por_celda(celdas[filas, c], t0, t1) for c in columnas],
+                                   axis=1).transpose(2, 0, 1)
+        lon = np.concatenate([self.lon[c] for c in columnas])
+        return self.tiempo[t0:t1], self.lat[filas], lon, np.ascontiguousarray(datos)
+
+    def media_region(self, lat_min, lat_max, lon_min, lon_max, desde=None, hasta=None):
+        """(tiempo, media regional ponderada por cos(lat)) ignorando NaN."""
+        tiempo, lat, _, datos = self.caja(lat_min, lat_max, lon_min, lon_max, desde, hasta)
+        validos = ~np.isnan(datos)
+        pesos = np.cos(np.radians(lat))[None, :, None] * validos
+        suma = (np.where(validos, datos, 0) * pesos).sum(axis=(1, 2), dtype=np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return tiempo, suma / pesos.sum(axis=(1, 2))
+
+    def rango_prediccion(self):
+        """Índices de tiempo t con historia completa: de HISTORIA hasta el mes siguiente al último."""
+        return HISTORIA, self.meses
+
+    def features(self, celda, t):
+        """
+        Matriz (n, n_features) float32 para las celdas y meses pedidos. Los meses
+        deben estar en `rango_prediccion()`; el objetivo del mes t no se lee.
+        """
+        celda = np.asarray(celda, dtype=np.int64)
+        t = np.asarray(t, dtype=np.int64)
+        filas = t[None, :] + np.arange(-HISTORIA, 1)[:, None]
+        ventana = np.full(filas.shape, np.nan, dtype=np.float32)
+        ventana[:-1] = self.temperatura[filas[:-1], celda[None, :]]
+        tiempo = self.tiempo_inicial + filas / 12
+        nlon = len(self.lon)
+        columnas = columnas_trozo(ventana, tiempo, self.lat[celda // nlon], self.lon[celda % nlon],
+                                  self.mascara[celda], self.climatologia[:, celda], celda)
+        return np.column_stack([columnas[c][-1] for c in COLUMNAS_FEATURES]).astype(np.float32, copy=False)
+
+
+@functools.lru_cache(maxsize=4)
+def _abrir(directorio, _mtime):
+    return Indice(directorio)
+
+
+def abrir_indice(directorio=None):
+    """
+    Índice por defecto, o None si no se ha construido. Se vuelve a abrir cuando
+    cambia `meta.json`, que es lo último que escribe una actualización.
+    """
+    directorio = directorio or ruta_indice()
+    try:
+        mtime = os.stat(os.path.join(directorio, 'meta.json')).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _abrir(directorio, mtime)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('netcdf')
+    parser.add_argument('destino')
+    parser.add_argument('--anexar', action='store_true', help='solo añade los meses nuevos del NetCDF')
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    if args.anexar:
+        meses = anexar_indice(args.netcdf, args.destino)
+        print(f"{meses} meses añadidos a {args.destino} ({time.perf_counter() - t0:.1f} s)")
+    else:
+        construir_indice(args.netcdf, args.destino)
+        print(f"Índice escrito en {args.destino} ({time.perf_counter() - t0:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,277 @@
+"""
+Instrumentación del servidor del dashboard, expuesta en `/metrics` con el
+formato de texto de Prometheus:
+
+- anomalias_callback_segundos / anomalias_callback_bytes: latencia y tamaño de
+  la respuesta de cada callback de Dash (etiqueta `callback`, su salida);
+- anomalias_peticion_segundos / anomalias_peticion_bytes: lo mismo por ruta
+  de Flask (`/api/predict`, `/_dash-layout`, ...);
+- anomalias_cache_total: aciertos y fallos de las cachés (layouts por pestaña,
+  datasets abiertos, pirámide, índice), leídos de sus contadores al exponer;
+- anomalias_microlotes_total, anomalias_modelo_info.
+
+Todas las series llevan la etiqueta `worker` (el pid). Cada worker de gunicorn
+acumula las suyas; con `ANOMALIAS_METRICAS_DIR` además las vuelca a ese
+directorio cada `INTERVALO_VOLCADO` segundos y `/metrics` expone las de todos
+los workers vivos. Registrar una petición cuesta un `perf_counter`, una
+búsqueda binaria en las cubetas y unas sumas bajo un lock.
+"""
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CUBETAS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CUBETAS_BYTES = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+INTERVALO_VOLCADO = 5.0
+# Los volcados de workers que llevan más de esto sin escribir se dan por muertos
+CADUCIDAD_VOLCADO = 60.0
+RUTA_CALLBACK = '/_dash-update-component'
+
+
+def metricas_activas():
+    """ANOMALIAS_METRICAS=0 desactiva la instrumentación y la ruta /metrics."""
+    return os.environ.get('ANOMALIAS_METRICAS', '1').lower() not in ('0', 'false', 'no')
+
+
+def configurar_logging(nivel=None):
+    """Nivel de log del proceso desde ANOMALIAS_LOG_NIVEL (WARNING por defecto), con el pid en cada línea."""
+    nivel = (nivel or os.environ.get('ANOMALIAS_LOG_NIVEL', 'WARNING')).upper()
+    logging.basicConfig(level=nivel, format='%(asctime)s [%(process)d] %(levelname)s %(name)s: %(message)s')
+    logging.getLogger().setLevel(nivel)
+
+
+class Histograma:
+    """Histograma de Prometheus con cubetas fijas; las series se indexan por la tupla de etiquetas."""
+
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiquetas, cubetas):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas) + ('worker',)
+        self.cubetas = tuple(cubetas)
+        self.series = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *etiquetas):
+        clave = etiquetas + (str(os.getpid()),)
+        posicion = bisect.bisect_left(self.cubetas, valor)
+        with self._lock:
+            serie = self.series.get(clave)
+            if serie is None:
+                # Conteos no acumulados por cubeta (+Inf al final), suma y número
+                serie = self.series[clave] = [[0] * (len(self.cubetas) + 1), 0.0, 0]
+            serie[0][posicion] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def instantanea(self):
+        with self._lock:
+            return [(list(k), [list(v[0]), v[1], v[2]]) for k, v in self.series.items()]
+
+    def lineas(self, series):
+        for clave, (conteos, suma, n) in series:
+            etiquetas = _etiquetas(self.etiquetas, clave)
+            acumulado = 0
+            for limite, conteo in zip(self.cubetas + ('+Inf',), conteos):
+                acumulado += conteo
+                yield f'{self.nombre}_bucket{{{etiquetas},le="{limite}"}} {acumulado}'
+            yield f'{self.nombre}_sum{{{etiquetas}}} {suma!r}'
+            yield f'{self.nombre}_count{{{etiquetas}}} {n}'
+
+
+class Contador:
+    """Contador (o gauge) cuyas series se fijan al exponer, a partir de contadores de otros objetos."""
+
+    def __init__(self, nombre, ayuda, etiquetas, tipo='counter'):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.tipo = tipo
+        self.etiquetas = tuple(etiquetas) + ('worker',)
+        self.series = {}
+
+    def fijar(self, valor, *etiquetas):
+        self.series[etiquetas] = valor
+
+    def instantanea(self):
+        pid = str(os.getpid())
+        return [(list(k) + [pid], v) for k, v in list(self.series.items())]
+
+    def lineas(self, series):
+        for clave, valor in series:
+            yield f'{self.nombre}{{{_etiquetas(self.etiquetas, clave)}}} {valor}'
+
+
+def _etiquetas(nombres, valores):
+    return ','.join(f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores))
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metricas:
+    """Métricas de un proceso, los recolectores que las actualizan al exponer y el volcado entre workers."""
+
+    def __init__(self, directorio=None):
+        self.directorio = directorio
+        self.callback_segundos = Histograma('anomalias_callback_segundos', 'Latencia de los callbacks de Dash',
+                                            ('callback',), CUBETAS_SEGUNDOS)
+        self.callback_bytes = Histograma('anomalias_callback_bytes', 'Tamaño de la respuesta de los callbacks',
+                                         ('callback',), CUBETAS_BYTES)
+        self.peticion_segundos = Histograma('anomalias_peticion_segundos', 'Latencia de las peticiones HTTP',
+                                            ('ruta', 'estado'), CUBETAS_SEGUNDOS)
+        self.peticion_bytes = Histograma('anomalias_peticion_bytes', 'Tamaño de las respuestas HTTP',
+                                         ('ruta',), CUBETAS_BYTES)
+        self.cache = Contador('anomalias_cache_total', 'Aciertos y fallos de las cachés', ('cache', 'resultado'))
+        self.microlotes = Contador('anomalias_microlotes_total', 'Micro-lotes y filas predichas por /api/predict',
+                                   ('magnitud',))
+        self.modelo = Contador('anomalias_modelo_info', 'Modelo cargado en el worker', ('version',), tipo='gauge')
+        self.todas = [self.callback_segundos, self.callback_bytes, self.peticion_segundos, self.peticion_bytes,
+                      self.cache, self.microlotes, self.modelo]
+        self.recolectores = []
+        self._pid_volcado = None
+        self._lock = threading.Lock()
+
+    def recolector(self, funcion):
+        """Registra `funcion(metricas)`, que se llama antes de cada exposición o volcado."""
+        self.recolectores.append(funcion)
+        return funcion
+
+    def cache_lru(self, nombre, funcion):
+        """Expone los aciertos/fallos de una función con functools.lru_cache."""
+        def recolectar(metricas):
+            info = funcion.cache_info()
+            metricas.cache.fijar(info.hits, nombre, 'acierto')
+            metricas.cache.fijar(info.misses, nombre, 'fallo')
+        self.recolector(recolectar)
+
+    def instantanea(self):
+        """{nombre: [(etiquetas, valor)]} de este proceso, tras pasar los recolectores."""
+        for recolector in self.recolectores:
+            try:
+                recolector(self)
+            except Exception:
+                logger.exception("Fallo en el recolector de métricas %r", recolector)
+        return {metrica.nombre: metrica.instantanea() for metrica in self.todas}
+
+    def _volcados(self):
+        # Instantáneas de los demás workers vivos (la propia se toma en caliente)
+        if not self.directorio:
+            return []
+        propio = os.path.join(self.directorio, f'{os.getpid()}.json')
+        instantaneas = []
+        for ruta in glob.glob(os.path.join(self.directorio, '*.json')):
+            try:
+                if ruta == propio or time.time() - os.path.getmtime(ruta) > CADUCIDAD_VOLCADO:
+                    continue
+                with open(ruta, encoding='utf-8') as f:
+                    instantaneas.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return instantaneas
+
+    def volcar(self):
+        """Escribe la instantánea de este proceso en el directorio compartido (reemplazo atómico)."""
+        ruta = os.path.join(self.directorio, f'{os.getpid()}.json')
+        with open(ruta + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(self.instantanea(), f)
+        os.replace(ruta + '.tmp', ruta)
+
+    def _bucle_volcado(self):
+        while True:
+            try:
+                self.volcar()
+            except OSError:
+                logger.warning("No se pudieron volcar las métricas en %s", self.directorio, exc_info=True)
+            time.sleep(INTERVALO_VOLCADO)
+
+    def arrancar_volcado(self):
+        # Como los micro-lotes: el hilo no sobrevive al fork, se arranca en cada worker
+        if not self.directorio or self._pid_volcado == os.getpid():
+            return
+        with self._lock:
+            if self._pid_volcado != os.getpid():
+                os.makedirs(self.directorio, exist_ok=True)
+                threading.Thread(target=self._bucle_volcado, name='metricas', daemon=True).start()
+                self._pid_volcado = os.getpid()
+
+    def exponer(self):
+        """Texto de exposición de Prometheus (versión 0.0.4) con las series de todos los workers."""
+        instantaneas = [self.instantanea()] + self._volcados()
+        lineas = []
+        for metrica in self.todas:
+            lineas.append(f'# HELP {metrica.nombre} {metrica.ayuda}')
+            lineas.append(f'# TYPE {metrica.nombre} {metrica.tipo}')
+            for instantanea in instantaneas:
+                lineas.extend(metrica.lineas((tuple(k), v) for k, v in instantanea.get(metrica.nombre, [])))
+        return '\n'.join(lineas) + '\n'
+
+
+metricas = Metricas(os.environ.get('ANOMALIAS_METRICAS_DIR'))
+
+
+def registrar_metricas(server, registro_layouts=None):
+    """
+    Mide cada petición del servidor Flask de `app`, conecta los contadores de
+    las cachés, micro-lotes y modelo, y añade la ruta GET /metrics.
+    """
+    from flask import Response, g, request
+
+    from anomalias import api, contribuciones, cubo, datos, descomposicion, indice, modelos, piramide
+
+    metricas.cache_lru('dataset', datos.abrir_dataset)
+    metricas.cache_lru('piramide', piramide._abrir)
+    metricas.cache_lru('indice', indice._abrir)
+    metricas.cache_lru('cubo', cubo._abrir)
+    metricas.cache_lru('cubo_cajas', cubo._serie_caja)
+    metricas.cache_lru('tendencias', descomposicion._abrir)
+    metricas.cache_lru('contribuciones', contribuciones._abrir)
+
+    @metricas.recolector
+    def _componentes(m):
+        if registro_layouts is not None:
+            m.cache.fijar(registro_layouts.aciertos, 'layouts', 'acierto')
+            m.cache.fijar(registro_layouts.fallos, 'layouts', 'fallo')
+        m.microlotes.fijar(api.predictor.lotes, 'lotes')
+        m.microlotes.fijar(api.predictor.filas, 'filas')
+        if modelos.registro.version is not None:
+            m.modelo.series = {}
+            m.modelo.fijar(1, modelos.registro.version)
+
+    @server.before_request
+    def _inicio_peticion():
+        g.t0_metricas = time.perf_counter()
+        if metricas.directorio and metricas._pid_volcado != os.getpid():
+            metricas.arrancar_volcado()
+
+    @server.after_request
+    def _fin_peticion(respuesta):
+        t0 = g.pop('t0_metricas', None)
+        if t0 is None:
+            return respuesta
+        segundos = time.perf_counter() - t0
+        # Las respuestas en streaming (ficheros estáticos) no tienen longitud hasta enviarse
+        tamano = respuesta.content_length or 0
+        regla = request.url_rule.rule if request.url_rule is not None else 'sin_ruta'
+        metricas.peticion_segundos.observar(segundos, regla, str(respuesta.status_code))
+        metricas.peticion_bytes.observar(tamano, regla)
+        if request.path.endswith(RUTA_CALLBACK):
+            # Dash ya ha leído el cuerpo: get_json devuelve el valor en caché
+            cuerpo = request.get_json(silent=True) or {}
+            callback = cuerpo.get('output', 'desconocido')
+            metricas.callback_segundos.observar(segundos, callback)
+            metricas.callback_bytes.observar(tamano, callback)
+        return respuesta
+
+    @server.route('/metrics', methods=['GET'])
+    def _metrics():
+        return Response(metricas.exponer(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    return metricas
@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import threading
+
+from dash import html
+from plotly.io.json import to_json_plotly
+
+logger = logging.getLogger(__name__)
+
+
+# =====================================
+# Registro de Layouts por Pestaña
+# =====================================
+def reconstruir_por_defecto():
+    """Modo desarrollo: ANOMALIAS_RECONSTRUIR_LAYOUTS=1 reconstruye en cada clic."""
+    return os.environ.get('ANOMALIAS_RECONSTRUIR_LAYOUTS', '0').lower() in ('1', 'true', 'si', 'sí')
+
+
+def modo_cliente_por_defecto():
+    """ANOMALIAS_MODO_CLIENTE=1 envía todas las pestañas en el layout inicial."""
+    return os.environ.get('ANOMALIAS_MODO_CLIENTE', '0').lower() in ('1', 'true', 'si', 'sí')
+
+
+# Tipo del id con patrón que usa el callback de cliente para alternar secciones
+TIPO_SECCION = 'seccion-tab'
+
+
+class RegistroLayouts:
+    """
+    Asocia el valor de cada pestaña con la función que construye su contenido.
+
+    Cada pestaña se construye una sola vez por worker y se guarda ya convertida
+    a JSON plano (dict/list), de modo que el callback solo devuelve la carga
+    cacheada y Dash la serializa sin recorrer de nuevo el árbol de componentes.
+
+    Las pestañas registradas con `depende_de` (una función que devuelve un
+    identificador de versión, p. ej. la del manifiesto de resultados) se
+    reconstruyen cuando ese identificador cambia. Las `diferidas` (las que
+    abren datos pesados) no se construyen al precalentar, sino en el primer
+    uso o en el calentamiento en segundo plano (`anomalias.arranque`).
+    """
+
+    def __init__(self, reconstruir=None):
+        self.reconstruir = reconstruir_por_defecto() if reconstruir is None else reconstruir
+        self._constructores = {}
+        self._dependencias = {}
+        self._diferidas = set()
+        self._cache = {}
+        self._lock = threading.Lock()
+        # Contadores de la caché que expone /metrics (anomalias.instrumentacion)
+        self.aciertos = 0
+        self.fallos = 0
+
+    def tab(self, valor, depende_de=None, diferida=False):
+        # Decorador: @registro.tab('tab-intro')
+        def decorador(funcion):
+            self._constructores[valor] = funcion
+            if depende_de is not None:
+                self._dependencias[valor] = depende_de
+            if diferida:
+                self._diferidas.add(valor)
+            return funcion
+        return decorador
+
+    def valores(self):
+        return list(self._constructores)
+
+    def construir(self, valor):
+        # Construye el árbol de componentes sin pasar por la caché
+        constructor = self._constructores.get(valor)
+        if constructor is None:
+            return None
+        return constructor()
+
+    def serializar(self, valor):
+        componente = self.construir(valor)
+        if componente is None:
+            return None
+        return json.loads(to_json_plotly(componente))
+
+    def obtener(self, valor):
+        if self.reconstruir:
+            self.fallos += 1
+            return self.construir(valor)
+        dependencia = self._dependencias.get(valor)
+        version = dependencia() if dependencia else None
+        try:
+            cacheada, version_cacheada = self._cache[valor]
+            if version_cacheada == version:
+                self.aciertos += 1
+                return cacheada
+        except KeyError:
+            pass
+        with self._lock:
+            if valor not in self._cache or self._cache[valor][1] != version:
+                logger.debug("Construyendo layout de la pestaña '%s'", valor)
+                self.fallos += 1
+                self._cache[valor] = (self.serializar(valor), version)
+            return self._cache[valor][0]
+
+    def precalentar(self, diferidas=False):
+        # Construye las pestañas de una vez (p. ej. antes de que gunicorn haga fork); las diferidas, solo si se piden
+        if self.reconstruir:
+            return
+        for valor in self._constructores:
+            if diferidas or valor not in self._diferidas:
+                self.obtener(valor)
+
+    def secciones(self, valor_inicial):
+        """
+        Todas las pestañas envueltas en un Div con id de patrón, para el modo
+        cliente: solo la inicial es visible y el navegador alterna el resto.
+        """
+        return [
+            html.Div(self.obtener(valor),
+                     id={'type': TIPO_SECCION, 'index': valor},
+                     style=None if valor == valor_inicial else {'display': 'none'})
+            for valor in self._constructores
+        ]
+
+    def invalidar(self, valor=None):
+        with self._lock:
+            if valor is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(valor, None)
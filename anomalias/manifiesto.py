@@ -0,0 +1,118 @@
+"""
+Manifiesto de resultados: métricas del modelo y estadísticas del EDA que
+muestra el dashboard, emitidos por el pipeline en un JSON versionado.
+
+Cada worker lo carga una vez y solo vuelve a leerlo si cambia su mtime, que
+se comprueba como mucho cada `INTERVALO_COMPROBACION` segundos. Como el pipeline
+lo reemplaza de forma atómica, basta con escribir un manifiesto nuevo para que
+los workers de gunicorn pasen a la nueva ejecución sin reiniciarse.
+"""
+import copy
+import datetime
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+VERSION_ESQUEMA = 1
+RUTA_POR_DEFECTO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                'resultados', 'manifiesto.json')
+INTERVALO_COMPROBACION = 2.0
+
+# Filas de la tabla de estadísticas descriptivas del EDA: (etiqueta, clave)
+FILAS_EDA = [
+    ('Count', 'count'), ('Mean', 'mean'), ('Std', 'std'), ('Min', 'min'),
+    ('1%', 'p01'), ('25% (Q1)', 'p25'), ('50% (Median)', 'p50'), ('75% (Q3)', 'p75'),
+    ('99%', 'p99'), ('Max', 'max'),
+]
+
+
+def ruta_manifiesto():
+    return os.environ.get('ANOMALIAS_MANIFIESTO', RUTA_POR_DEFECTO)
+
+
+def directorio_agregados(ruta=None):
+    """Junto al manifiesto: estados fusionables que permiten actualizar estadísticas y figuras por meses."""
+    return os.path.join(os.path.dirname(os.path.abspath(ruta or ruta_manifiesto())), 'agregados')
+
+
+class Manifiesto:
+    """Vista cacheada de un manifiesto en disco, con invalidación por mtime."""
+
+    def __init__(self, ruta, intervalo=INTERVALO_COMPROBACION):
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self._datos = None
+        self._mtime = None
+        self._ultima_comprobacion = 0.0
+        self._lock = threading.Lock()
+
+    def _comprobar(self):
+        ahora = time.monotonic()
+        if self._datos is not None and ahora - self._ultima_comprobacion < self.intervalo:
+            return
+        with self._lock:
+            self._ultima_comprobacion = ahora
+            mtime = os.stat(self.ruta).st_mtime_ns
+            if mtime == self._mtime:
+                return
+            with open(self.ruta, encoding='utf-8') as f:
+                datos = json.load(f)
+            if datos.get('version') != VERSION_ESQUEMA:
+                raise ValueError(f"Versión de manifiesto no soportada: {datos.get('version')}")
+            if self._mtime is not None:
+                logger.info("Manifiesto recargado: ejecución '%s'", datos.get('ejecucion'))
+            self._datos, self._mtime = datos, mtime
+
+    def datos(self):
+        self._comprobar()
+        return self._datos
+
+    def version(self):
+        """Identifica la ejecución cargada; cambia cuando se publica un manifiesto nuevo."""
+        self._comprobar()
+        return self._mtime
+
+    def __getitem__(self, clave):
+        return self.datos()[clave]
+
+
+@functools.lru_cache(maxsize=None)
+def manifiesto(ruta=None):
+    return Manifiesto(ruta or ruta_manifiesto())
+
+
+def publicar(actualizacion, ruta=None, ejecucion=None):
+    """
+    Fusiona `actualizacion` (por secciones de primer nivel, p. ej. 'metricas'
+    o 'eda') en el manifiesto y lo reemplaza de forma atómica.
+    """
+    ruta = ruta or ruta_manifiesto()
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            datos = json.load(f)
+    except FileNotFoundError:
+        datos = {'version': VERSION_ESQUEMA}
+    datos = copy.deepcopy(datos)
+    for seccion, valor in actualizacion.items():
+        if isinstance(valor, dict) and isinstance(datos.get(seccion), dict):
+            datos[seccion].update(valor)
+        else:
+            datos[seccion] = valor
+    datos['version'] = VERSION_ESQUEMA
+    datos['generado'] = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+    datos['ejecucion'] = ejecucion or datos['generado']
+
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(directorio, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.json')
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+        json.dump(datos, f, indent=2, ensure_ascii=False)
+    os.chmod(temporal, 0o644)
+    os.replace(temporal, ruta)
+    return datos
@@ -0,0 +1,117 @@
+"""
+Registro del modelo que sirve la API.
+
+El booster se carga una sola vez por proceso desde el artefacto UBJSON (el de
+`ANOMALIAS_MODELO` o el publicado en el manifiesto) y se calienta con una
+predicción antes de servir tráfico. Con `gunicorn --preload` la carga ocurre en
+el proceso maestro (hook `when_ready` de `gunicorn.conf.py`, ya importada la
+app) y los workers heredan el modelo copy-on-write; `post_fork` repite el
+calentamiento en cada worker antes de que acepte conexiones. Sin gunicorn, el
+modelo se carga en la primera petición que lo necesita o en el calentamiento
+en segundo plano (`anomalias.arranque`).
+
+Si el manifiesto pasa a apuntar a otro artefacto, la siguiente petición carga
+el nuevo modelo. Un artefacto `regiones.json` es un ensemble por regiones
+(`anomalias.regiones`), que se usa igual que un booster.
+"""
+import datetime
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def ruta_modelo():
+    from anomalias.manifiesto import manifiesto
+
+    ruta = os.environ.get('ANOMALIAS_MODELO')
+    if ruta:
+        return ruta
+    try:
+        return (manifiesto().datos().get('modelo') or {}).get('artefacto')
+    except FileNotFoundError:
+        return None
+
+
+class RegistroModelo:
+    """Booster compartido por los hilos de un worker, con su versión y tiempos de carga."""
+
+    def __init__(self, nthread=1):
+        self.nthread = nthread
+        self.booster = None
+        self.ruta = None
+        self.version = None
+        self.segundos_carga = None
+        self.segundos_calentamiento = None
+        self.cargado = None
+        self.pid_carga = None
+        self._lock = threading.Lock()
+
+    def cargar(self, ruta=None, recargar=True):
+        """
+        Carga (o recarga) el modelo de `ruta` y lo calienta. Devuelve False si no
+        hay artefacto. Con `recargar=False` no hace nada si ese artefacto ya está
+        cargado (p. ej. porque otro hilo lo cargó mientras se esperaba el lock).
+        """
+        import xgboost as xgb
+
+        ruta = ruta or ruta_modelo()
+        if not ruta or not os.path.exists(ruta):
+            return False
+        with self._lock:
+            if not recargar and self.booster is not None and ruta == self.ruta:
+                return True
+            t0 = time.perf_counter()
+            if ruta.endswith('.json'):
+                from anomalias.regiones import EnsembleRegional
+
+                booster = EnsembleRegional.cargar(ruta)
+                self.version = booster.version
+            else:
+                with open(ruta, 'rb') as f:
+                    contenido = f.read()
+                booster = xgb.Booster(model_file=bytearray(contenido))
+                self.version = hashlib.sha256(contenido).hexdigest()[:12]
+                del contenido
+            booster.set_param({'nthread': self.nthread})
+            self.segundos_carga = time.perf_counter() - t0
+            self.booster, self.ruta = booster, ruta
+            self.cargado = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')
+            self.pid_carga = os.getpid()
+            self.calentar()
+        logger.info("Modelo %s cargado en %.2f s (%s)", self.version, self.segundos_carga, ruta)
+        return True
+
+    def calentar(self):
+        """Predicción de prueba: inicializa el predictor y los hilos en este proceso."""
+        if self.booster is None:
+            return
+        t0 = time.perf_counter()
+        self.booster.inplace_predict(np.zeros((1, self.booster.num_features()), dtype=np.float32))
+        self.segundos_calentamiento = time.perf_counter() - t0
+
+    def obtener(self):
+        """(booster, versión); carga el modelo si aún no está o si ha cambiado el artefacto."""
+        ruta = ruta_modelo()
+        if self.booster is None or (ruta and ruta != self.ruta):
+            self.cargar(ruta, recargar=False)
+        return self.booster, self.version
+
+    def info(self):
+        return {
+            'version': self.version,
+            'ruta': self.ruta,
+            'segundos_carga': self.segundos_carga,
+            'segundos_calentamiento': self.segundos_calentamiento,
+            'cargado': self.cargado,
+            'pid_carga': self.pid_carga,
+            'pid': os.getpid(),
+        }
+
+
+registro = RegistroModelo()
@@ -0,0 +1,279 @@
+"""
+Muestreo estratificado en una sola pasada sobre el almacén de características.
+
+Sustituye a la muestra aleatoria simple de 8M filas sacada de la tabla
+completa en memoria, que además deja casi sin filas los estratos escasos
+(celdas polares, primeras décadas):
+
+- Estratos: banda de latitud × década × tierra/océano. Su número se conoce
+  antes de leer nada (estadísticas de los row groups), así que cada estrato
+  recibe una cuota igual; lo que no usan los estratos pequeños se reparte
+  entre los demás al final (con `sobremuestreo` de margen por estrato).
+- Dentro de cada estrato se guardan las filas con las claves más bajas
+  (bottom-k), con una clave pseudoaleatoria que es un hash de (semilla,
+  celda, mes): la muestra es una muestra aleatoria simple del estrato y no
+  depende del orden de lectura ni de cómo se reparta el trabajo.
+- Cada proceso muestrea sus ficheros por lotes y los resultados se fusionan
+  (la fusión de dos bottom-k es el bottom-k de la unión). La memoria es la de
+  la muestra, no la de la tabla.
+
+Cada fila lleva `peso` = filas del estrato / filas muestreadas del estrato,
+para que medias y errores sobre la muestra estimen los de la población.
+Con `--uniforme` hay un único estrato: muestreo de reservorio simple.
+
+    python -m anomalias.muestreo data/features data/muestra.parquet --filas 8000000 --procesos 4
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from anomalias.entrenamiento import partes
+from anomalias.features import COLUMNAS_FEATURES, COLUMNAS_ID, OBJETIVO
+
+logger = logging.getLogger(__name__)
+
+ANCHO_BANDA = 30
+UMBRAL_TIERRA = 0.5
+SOBREMUESTREO = 2.0
+FILAS_POR_LOTE = 500_000
+COLUMNAS = COLUMNAS_FEATURES + COLUMNAS_ID + [OBJETIVO]
+
+
+def claves(semilla, celda, anio, mes):
+    """Hash splitmix64 de (semilla, celda, mes absoluto): uint64 uniforme y reproducible."""
+    x = (celda.astype(np.uint64) << np.uint64(24)) | (anio.astype(np.uint64) * np.uint64(12)
+                                                      + mes.astype(np.uint64))
+    x += np.uint64(0x9E3779B97F4A7C15 * (semilla + 1) % 2**64)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def estratos(latitud, anio, land_mask, ancho_banda=ANCHO_BANDA):
+    """Identificador entero del estrato (década, banda de latitud, tierra)."""
+    banda = np.clip((np.asarray(latitud) + 90) // ancho_banda, 0, 180 // ancho_banda - 1).astype(np.int64)
+    decada = np.asarray(anio).astype(np.int64) // 10
+    return (decada * 100 + banda) * 2 + (np.asarray(land_mask) >= UMBRAL_TIERRA)
+
+
+def describir_estrato(estrato, ancho_banda=ANCHO_BANDA):
+    """(década, latitud inicial de la banda, tierra) de un identificador de `estratos`."""
+    estrato = int(estrato)
+    return (estrato // 200) * 10, (estrato // 2 % 100) * ancho_banda - 90, bool(estrato % 2)
+
+
+def _por_estrato(valores, estrato, dtype=np.int64):
+    """Array con el valor de {estrato: valor} de cada elemento de `estrato`."""
+    ids = np.array(sorted(valores), dtype=np.int64)
+    return np.array([valores[e] for e in ids.tolist()], dtype=dtype)[np.searchsorted(ids, estrato)]
+
+
+class MuestraEstratificada:
+    """
+    Bottom-k por estrato con hasta `capacidad` filas en cada uno; se actualiza
+    por lotes de columnas y se fusiona con otras muestras.
+    """
+
+    def __init__(self, capacidad, semilla=0, uniforme=False, ancho_banda=ANCHO_BANDA):
+        self.capacidad = int(capacidad)
+        self.semilla = semilla
+        self.uniforme = uniforme
+        self.ancho_banda = ancho_banda
+        self.poblacion = {}
+        # Filas guardadas (clave, estrato, columnas) y lotes pendientes de compactar
+        self.clave = np.empty(0, dtype=np.uint64)
+        self.estrato = np.empty(0, dtype=np.int64)
+        self.columnas = None
+        self._pendientes = []
+        self._filas_pendientes = 0
+        # Clave máxima guardada de los estratos llenos: lo que no esté por debajo no entra
+        self._umbral = {}
+
+    def _estratos(self, columnas):
+        if self.uniforme:
+            return np.zeros(len(columnas['anio']), dtype=np.int64)
+        return estratos(columnas['latitud'], columnas['anio'], columnas['land_mask'], self.ancho_banda)
+
+    def _anadir(self, clave, estrato, columnas):
+        if self._umbral:
+            umbral = {e: self._umbral.get(e, np.iinfo(np.uint64).max) for e in np.unique(estrato).tolist()}
+            entran = clave < _por_estrato(umbral, estrato, np.uint64)
+            clave, estrato = clave[entran], estrato[entran]
+            columnas = {c: v[entran] for c, v in columnas.items()}
+        if not len(clave):
+            return
+        self._pendientes.append((clave, estrato, columnas))
+        self._filas_pendientes += len(clave)
+        if self._filas_pendientes > max(len(self.clave), self.capacidad):
+            self._compactar()
+
+    def _compactar(self, cuotas=None):
+        partes = [(self.clave, self.estrato, self.columnas)] if self.columnas is not None else []
+        partes += self._pendientes
+        self._pendientes, self._filas_pendientes = [], 0
+        if not partes:
+            return
+        clave = np.concatenate([p[0] for p in partes])
+        estrato = np.concatenate([p[1] for p in partes])
+        # Orden por (estrato, clave) y rango dentro del estrato, sin bucles por estrato
+        orden = np.lexsort((clave, estrato))
+        ordenado = estrato[orden]
+        inicio = np.r_[0, np.flatnonzero(np.diff(ordenado)) + 1]
+        tamano = np.diff(np.r_[inicio, len(ordenado)])
+        rango = np.arange(len(ordenado)) - np.repeat(inicio, tamano)
+        limite = self.capacidad if cuotas is None else _por_estrato(cuotas, ordenado)
+        elegidas = orden[rango < limite]
+        self.clave, self.estrato = clave[elegidas], estrato[elegidas]
+        self.columnas = {c: np.concatenate([p[2][c] for p in partes])[elegidas] for c in partes[0][2]}
+        llenos = tamano >= self.capacidad
+        ultima = orden[inicio[llenos] + self.capacidad - 1]
+        self._umbral = dict(zip(ordenado[inicio[llenos]].tolist(), clave[ultima].tolist()))
+
+    def actualizar(self, columnas):
+        """Añade un lote {columna: array}; necesita celda, anio y mes (y latitud y land_mask si se estratifica)."""
+        estrato = self._estratos(columnas)
+        ids, cuenta = np.unique(estrato, return_counts=True)
+        for e, n in zip(ids.tolist(), cuenta.tolist()):
+            self.poblacion[e] = self.poblacion.get(e, 0) + n
+        clave = claves(self.semilla, columnas['celda'], columnas['anio'], columnas['mes'])
+        self._anadir(clave, estrato, columnas)
+        return self
+
+    def fusionar(self, otra):
+        for e, n in otra.poblacion.items():
+            self.poblacion[e] = self.poblacion.get(e, 0) + n
+        otra._compactar()
+        if otra.columnas is not None:
+            self._anadir(otra.clave, otra.estrato, otra.columnas)
+        return self
+
+    def cuotas(self, filas):
+        """
+        Filas por estrato que suman `filas`: asignación igual y, lo que no
+        caben en los estratos pequeños, repartido entre los demás.
+        """
+        disponibles = {e: min(n, self.capacidad) for e, n in self.poblacion.items()}
+        cuotas = dict.fromkeys(disponibles, 0)
+        restantes = min(filas, sum(disponibles.values()))
+        abiertos = sorted(disponibles, key=lambda e: (disponibles[e], e))
+        while restantes > 0 and abiertos:
+            parte = restantes // len(abiertos) or 1
+            e = abiertos[0]
+            if disponibles[e] - cuotas[e] <= parte:
+                restantes -= disponibles[e] - cuotas[e]
+                cuotas[e] = disponibles[e]
+                abiertos.pop(0)
+            else:
+                for e in abiertos:
+                    n = min(parte, restantes)
+                    cuotas[e] += n
+                    restantes -= n
+                abiertos = [e for e in abiertos if cuotas[e] < disponibles[e]]
+        return cuotas
+
+    def resultado(self, filas):
+        """Columnas de la muestra final de `filas` filas, con `estrato` y `peso`."""
+        cuotas = self.cuotas(filas)
+        self._compactar(cuotas)
+        peso = _por_estrato(self.poblacion, self.estrato) / np.maximum(_por_estrato(cuotas, self.estrato), 1)
+        return {**self.columnas, 'estrato': self.estrato, 'peso': peso.astype(np.float32)}
+
+
+def _muestrear_ficheros(args):
+    rutas, capacidad, semilla, uniforme, columnas, anio_desde, anio_hasta, filas_por_lote = args
+    import pyarrow.dataset as pads
+
+    muestra = MuestraEstratificada(capacidad, semilla, uniforme)
+    filtro = None
+    if anio_desde is not None:
+        filtro = pads.field('anio') >= anio_desde
+    if anio_hasta is not None:
+        condicion = pads.field('anio') < anio_hasta
+        filtro = condicion if filtro is None else filtro & condicion
+    necesarias = list(dict.fromkeys(list(columnas) + ['celda', 'anio', 'mes', 'latitud', 'land_mask']))
+    # Sin lectura anticipada: pyarrow tendría decenas de lotes en memoria a la vez
+    lotes = pads.dataset(rutas, format='parquet').to_batches(columns=necesarias, filter=filtro,
+                                                              batch_size=filas_por_lote, batch_readahead=0,
+                                                              fragment_readahead=0, use_threads=False)
+    for lote in lotes:
+        if lote.num_rows:
+            muestra.actualizar({c: lote.column(c).to_numpy() for c in necesarias})
+    # Solo se devuelve al proceso principal lo que puede acabar en la muestra
+    muestra._compactar()
+    return muestra
+
+
+def numero_estratos(rutas, anio_desde=None, anio_hasta=None, ancho_banda=ANCHO_BANDA):
+    """Estratos posibles según las estadísticas de 'anio' de los row groups (sin leer datos)."""
+    import pyarrow.parquet as pq
+
+    minimo, maximo = None, None
+    for ruta in rutas:
+        fichero = pq.ParquetFile(ruta)
+        columna = fichero.schema_arrow.get_field_index('anio')
+        for g in range(fichero.num_row_groups):
+            estadisticas = fichero.metadata.row_group(g).column(columna).statistics
+            minimo = estadisticas.min if minimo is None else min(minimo, estadisticas.min)
+            maximo = estadisticas.max if maximo is None else max(maximo, estadisticas.max)
+    if minimo is None:
+        return 1
+    minimo = max(minimo, anio_desde) if anio_desde is not None else minimo
+    maximo = min(maximo, anio_hasta - 1) if anio_hasta is not None else maximo
+    return max(1, (maximo // 10 - minimo // 10 + 1) * (180 // ancho_banda) * 2)
+
+
+def muestrear(directorio_features, filas, semilla=0, uniforme=False, columnas=COLUMNAS, anio_desde=None,
+              anio_hasta=None, procesos=1, sobremuestreo=SOBREMUESTREO, filas_por_lote=FILAS_POR_LOTE):
+    """
+    Muestra de `filas` filas del almacén en una pasada, repartida en
+    `procesos` grupos de ficheros. Devuelve (columnas, MuestraEstratificada).
+    """
+    rutas = partes(directorio_features)
+    n_estratos = 1 if uniforme else numero_estratos(rutas, anio_desde, anio_hasta)
+    capacidad = filas if uniforme else int(np.ceil(filas / n_estratos * sobremuestreo))
+    grupos = [rutas[k::procesos] for k in range(procesos) if rutas[k::procesos]]
+    tareas = [(g, capacidad, semilla, uniforme, columnas, anio_desde, anio_hasta, filas_por_lote) for g in grupos]
+    if procesos > 1:
+        with ProcessPoolExecutor(procesos) as pool:
+            parciales = list(pool.map(_muestrear_ficheros, tareas))
+    else:
+        parciales = [_muestrear_ficheros(t) for t in tareas]
+    muestra = parciales[0] if parciales else MuestraEstratificada(capacidad, semilla, uniforme)
+    for parcial in parciales[1:]:
+        muestra.fusionar(parcial)
+    if not muestra.poblacion:
+        return {}, muestra
+    resultado = muestra.resultado(filas)
+    return {c: resultado[c] for c in list(columnas) + ['estrato', 'peso']}, muestra
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('features')
+    parser.add_argument('salida', help='Parquet con la muestra, su estrato y su peso')
+    parser.add_argument('--filas', type=int, default=8_000_000)
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--uniforme', action='store_true', help='sin estratos: muestreo de reservorio simple')
+    parser.add_argument('--anio-desde', type=int)
+    parser.add_argument('--anio-hasta', type=int)
+    parser.add_argument('--procesos', type=int, default=1)
+    args = parser.parse_args()
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    logging.basicConfig(level=logging.INFO)
+    t0 = time.perf_counter()
+    columnas, muestra = muestrear(args.features, args.filas, args.semilla, args.uniforme,
+                                  anio_desde=args.anio_desde, anio_hasta=args.anio_hasta, procesos=args.procesos)
+    pq.write_table(pa.table(columnas), args.salida, compression='zstd')
+    total = sum(muestra.poblacion.values())
+    print(f"{len(columnas.get('peso', [])):,} de {total:,} filas en {len(muestra.poblacion)} estratos, "
+          f"{time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
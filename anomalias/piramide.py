@@ -0,0 +1,216 @@
+"""
+Pirámide multi-resolución de los mapas de anomalías.
+
+Paso offline que lee el NetCDF por bloques de 12 meses y escribe, en un
+directorio, un array binario por nivel (1°, 2°, 5°) con disposición
+(tiempo, lat, lon) en float16, más las medias zonales y globales en float32
+y un `meta.json` con formas y coordenadas. Cada mes de cada nivel es un bloque
+contiguo, así que servir un fotograma es una lectura de memmap sin
+descompresión ni recorrido de la rejilla completa. Los meses de una
+publicación nueva se añaden al final de cada array con `anexar_piramide`.
+
+    python -m anomalias.piramide data/Land_and_Ocean_LatLong1.nc data/piramide
+"""
+import argparse
+import functools
+import json
+import os
+import tempfile
+
+import numpy as np
+
+from anomalias.datos import anexar_npy
+
+NIVELES = (1, 2, 5)
+RUTA_POR_DEFECTO = os.path.join('data', 'piramide')
+
+# Columnas visibles a partir de las cuales se prefiere un nivel más grueso
+COLUMNAS_OBJETIVO = 180
+
+
+def ruta_piramide():
+    return os.environ.get('ANOMALIAS_PIRAMIDE', RUTA_POR_DEFECTO)
+
+
+def agregar_bloques(bloque, factor):
+    """Media por bloques factor × factor ignorando NaN; bloque (t, lat, lon)."""
+    if factor == 1:
+        return bloque
+    t, nlat, nlon = bloque.shape
+    trozos = bloque.reshape(t, nlat // factor, factor, nlon // factor, factor)
+    validos = ~np.isnan(trozos)
+    suma = np.where(validos, trozos, 0).sum(axis=(2, 4), dtype=np.float64)
+    cuenta = validos.sum(axis=(2, 4))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return (suma / cuenta).astype(np.float32)
+
+
+def medias_zonal_global(bloque, lat):
+    """Media zonal (t, lat) y global ponderada por cos(lat) (t,), ignorando NaN."""
+    validos = ~np.isnan(bloque)
+    valores = np.where(validos, bloque, 0)
+    suma_lon = valores.sum(axis=2, dtype=np.float64)
+    cuenta_lon = validos.sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        zonal = suma_lon / cuenta_lon
+    pesos = np.cos(np.radians(lat))[None, :] * cuenta_lon
+    with np.errstate(invalid='ignore', divide='ignore'):
+        global_ = (suma_lon * np.cos(np.radians(lat))[None, :]).sum(axis=1) / pesos.sum(axis=1)
+    return zonal.astype(np.float32), global_.astype(np.float32)
+
+
+def construir_piramide(ruta_netcdf, destino, niveles=NIVELES, meses_por_bloque=12):
+    """Construye la pirámide completa en `destino`. La memoria es O(meses_por_bloque × rejilla)."""
+    import xarray as xr
+
+    os.makedirs(destino, exist_ok=True)
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        tiempo = ds['time'].values
+        lat = ds['latitude'].values.astype(np.float64)
+        lon = ds['longitude'].values.astype(np.float64)
+        nt, nlat, nlon = ds['temperature'].shape
+        niveles = [k for k in niveles if nlat % k == 0 and nlon % k == 0]
+
+        salidas = {
+            k: np.lib.format.open_memmap(os.path.join(destino, f'nivel_{k}.npy'), mode='w+',
+                                         dtype=np.float16, shape=(nt, nlat // k, nlon // k))
+            for k in niveles
+        }
+        zonal = np.lib.format.open_memmap(os.path.join(destino, 'zonal.npy'), mode='w+',
+                                          dtype=np.float32, shape=(nt, nlat))
+        global_ = np.lib.format.open_memmap(os.path.join(destino, 'global.npy'), mode='w+',
+                                            dtype=np.float32, shape=(nt,))
+
+        for inicio in range(0, nt, meses_por_bloque):
+            fin = min(inicio + meses_por_bloque, nt)
+            bloque = ds['temperature'][inicio:fin].values.astype(np.float32)
+            for k, salida in salidas.items():
+                salida[inicio:fin] = agregar_bloques(bloque, k)
+            zonal[inicio:fin], global_[inicio:fin] = medias_zonal_global(bloque, lat)
+
+        for salida in (*salidas.values(), zonal, global_):
+            salida.flush()
+
+    meta = {
+        'version': 1,
+        'niveles': niveles,
+        'tiempo': tiempo.tolist(),
+        'coordenadas': {
+            str(k): {'lat': lat.reshape(-1, k).mean(axis=1).tolist(),
+                     'lon': lon.reshape(-1, k).mean(axis=1).tolist()}
+            for k in niveles
+        },
+    }
+    _escribir_meta(destino, meta)
+    return destino
+
+
+def _escribir_meta(destino, meta):
+    descriptor, temporal = tempfile.mkstemp(dir=destino, suffix='.json')
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(temporal, os.path.join(destino, 'meta.json'))
+
+
+def anexar_piramide(ruta_netcdf, destino, meses_por_bloque=12):
+    """
+    Añade a una pirámide existente los meses del NetCDF posteriores a los que
+    ya tiene, sin reescribir los anteriores. Devuelve cuántos meses añade.
+    """
+    import xarray as xr
+
+    with open(os.path.join(destino, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        tiempo = ds['time'].values
+        lat = ds['latitude'].values.astype(np.float64)
+        desde = len(meta['tiempo'])
+        if len(tiempo) <= desde:
+            return 0
+        if not np.allclose(tiempo[:desde], meta['tiempo']):
+            raise ValueError(f"Los meses de '{ruta_netcdf}' no continúan la pirámide de '{destino}'")
+        for inicio in range(desde, len(tiempo), meses_por_bloque):
+            bloque = ds['temperature'][inicio:inicio + meses_por_bloque].values.astype(np.float32)
+            for k in meta['niveles']:
+                anexar_npy(os.path.join(destino, f'nivel_{k}.npy'), agregar_bloques(bloque, k).astype(np.float16))
+            zonal, global_ = medias_zonal_global(bloque, lat)
+            anexar_npy(os.path.join(destino, 'zonal.npy'), zonal)
+            anexar_npy(os.path.join(destino, 'global.npy'), global_)
+    meta['tiempo'] = tiempo.tolist()
+    _escribir_meta(destino, meta)
+    return len(tiempo) - desde
+
+
+class Piramide:
+    """Lectura de una pirámide ya construida; los arrays se abren como memmap."""
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+        with open(os.path.join(directorio, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        self.niveles = meta['niveles']
+        self.tiempo = np.asarray(meta['tiempo'])
+        self.coordenadas = {int(k): (np.asarray(c['lat']), np.asarray(c['lon']))
+                            for k, c in meta['coordenadas'].items()}
+        # Los arrays pueden tener ya meses de una actualización en curso: manda meta.json
+        nt = len(self.tiempo)
+        self._arrays = {k: np.load(os.path.join(directorio, f'nivel_{k}.npy'), mmap_mode='r')[:nt]
+                        for k in self.niveles}
+        self.zonal = np.load(os.path.join(directorio, 'zonal.npy'), mmap_mode='r')[:nt]
+        self.global_ = np.load(os.path.join(directorio, 'global.npy'), mmap_mode='r')[:nt]
+
+    def indice_tiempo(self, anio, mes):
+        objetivo = anio + (mes - 0.5) / 12
+        return int(np.abs(self.tiempo - objetivo).argmin())
+
+    def elegir_nivel(self, extension_lon=360.0, arrastrando=False):
+        """
+        Nivel para el estado del mapa: el más grueso mientras se arrastra el
+        slider; si no, el más grueso que aún dibuja COLUMNAS_OBJETIVO columnas
+        en la extensión de longitud visible.
+        """
+        if arrastrando:
+            return max(self.niveles)
+        candidatos = [k for k in self.niveles if extension_lon / k >= COLUMNAS_OBJETIVO]
+        return max(candidatos) if candidatos else min(self.niveles)
+
+    def mapa(self, anio, mes, nivel):
+        """(lat, lon, z) del mes en el nivel pedido; z en float32."""
+        lat, lon = self.coordenadas[nivel]
+        z = np.asarray(self._arrays[nivel][self.indice_tiempo(anio, mes)], dtype=np.float32)
+        return lat, lon, z
+
+
+@functools.lru_cache(maxsize=2)
+def _abrir(directorio, _mtime):
+    return Piramide(directorio)
+
+
+def abrir_piramide(directorio=None):
+    """
+    La pirámide configurada, o None si aún no se ha construido. Se vuelve a
+    abrir cuando cambia `meta.json` (lo último que escribe una actualización).
+    """
+    directorio = directorio or ruta_piramide()
+    try:
+        mtime = os.stat(os.path.join(directorio, 'meta.json')).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _abrir(directorio, mtime)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('netcdf')
+    parser.add_argument('destino', nargs='?', default=RUTA_POR_DEFECTO)
+    parser.add_argument('--niveles', type=int, nargs='+', default=list(NIVELES))
+    parser.add_argument('--anexar', action='store_true', help='solo añade los meses nuevos del NetCDF')
+    args = parser.parse_args()
+    if args.anexar:
+        anexar_piramide(args.netcdf, args.destino)
+    else:
+        construir_piramide(args.netcdf, args.destino, tuple(args.niveles))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,303 @@
+"""
+Ensemble de modelos por región con un enrutador en la predicción.
+
+Un único XGBoost global tiene que repartir sus árboles entre regiones con
+comportamientos muy distintos (polos frente a trópicos, tierra frente a
+océano). Aquí se entrena un booster independiente por región, todos a la vez
+en un pool de procesos (cada uno con cpu / procesos hilos):
+
+- `latitud`: seis bandas de 30°;
+- `tierra`: tierra (land_mask >= 0.5) y océano;
+- `latitud_tierra`: las doce combinaciones.
+
+Cada región lee del almacén solo sus filas (filtros de pyarrow sobre
+`latitud` y `land_mask`; como los Parquet son bandas de latitud, la mayoría de
+ficheros se descartan por sus estadísticas). El resultado es un
+`regiones.json` con la partición y los boosters, que `EnsembleRegional` carga
+y usa como un booster más: `inplace_predict` calcula la región de cada fila a
+partir de sus columnas `latitud` y `land_mask` y predice cada grupo con su
+booster de una vez. Cada fila recorre los árboles de un solo modelo, pero el
+reparto no es gratis: si las filas llegan agrupadas por región (los lotes del
+almacén) cada grupo es una vista de la matriz; si llegan mezcladas hay que
+ordenarlas y copiarlas una vez, y cada booster predice un lote más pequeño
+(`benchmarks.bench_regiones` mide ambos casos frente al modelo global).
+
+    python -m anomalias.regiones data/features data/modelo_regiones --particion latitud_tierra \\
+        --procesos 4 --comparar --manifiesto resultados/manifiesto.json
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from anomalias.entrenamiento import (ANIO_CORTE, PARAMETROS_POR_DEFECTO, _clase_iterador, evaluar, partes,
+                                     publicar_metricas)
+from anomalias.features import COLUMNAS_FEATURES, rss_max_mb
+
+logger = logging.getLogger(__name__)
+
+BANDAS_LATITUD = (-90, -60, -30, 0, 30, 60, 90)
+UMBRAL_TIERRA = 0.5
+PARTICIONES = ('latitud', 'tierra', 'latitud_tierra')
+
+
+def definir_regiones(particion, bandas=BANDAS_LATITUD):
+    """[(id, nombre, filtros de pyarrow)] de las regiones de `particion`."""
+    if particion not in PARTICIONES:
+        raise ValueError(f"Partición desconocida: {particion!r} (opciones: {', '.join(PARTICIONES)})")
+    # La última banda incluye el polo norte
+    tramos = [(k, f'lat{lo}_{hi}', [('latitud', '>=', lo), ('latitud', '<=' if hi == bandas[-1] else '<', hi)])
+              for k, (lo, hi) in enumerate(zip(bandas[:-1], bandas[1:]))]
+    superficies = [(0, 'oceano', [('land_mask', '<', UMBRAL_TIERRA)]),
+                   (1, 'tierra', [('land_mask', '>=', UMBRAL_TIERRA)])]
+    if particion == 'latitud':
+        return tramos
+    if particion == 'tierra':
+        return superficies
+    return [(k * 2 + t, f'{banda}-{superficie}', filtros_banda + filtros_superficie)
+            for k, banda, filtros_banda in tramos for t, superficie, filtros_superficie in superficies]
+
+
+def region_filas(X, particion, bandas=BANDAS_LATITUD):
+    """Identificador de región (int8) de cada fila de X (columnas de COLUMNAS_FEATURES), vectorizado."""
+    banda = np.searchsorted(np.asarray(bandas[1:-1], dtype=X.dtype), X[:, COLUMNAS_FEATURES.index('latitud')],
+                            side='right').astype(np.int8)
+    tierra = (X[:, COLUMNAS_FEATURES.index('land_mask')] >= UMBRAL_TIERRA).view(np.int8)
+    if particion == 'latitud':
+        return banda
+    if particion == 'tierra':
+        return tierra
+    return banda * 2 + tierra
+
+
+class EnsembleRegional:
+    """Boosters por región detrás de la interfaz de predicción de un `xgb.Booster`."""
+
+    def __init__(self, particion, boosters, bandas=BANDAS_LATITUD, filas=None, version=None):
+        self.particion = particion
+        self.boosters = boosters
+        self.bandas = tuple(bandas)
+        self.filas = filas or {}
+        self.version = version
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Carga un `regiones.json`; la versión es el hash de la descripción y de los boosters."""
+        import xgboost as xgb
+
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        descripcion = json.loads(contenido)
+        huella = hashlib.sha256(contenido)
+        boosters, filas = {}, {}
+        for region in descripcion['regiones'].values():
+            with open(os.path.join(os.path.dirname(ruta), region['artefacto']), 'rb') as f:
+                modelo = f.read()
+            huella.update(modelo)
+            boosters[region['id']] = xgb.Booster(model_file=bytearray(modelo))
+            filas[region['id']] = region['filas_entrenamiento']
+        return cls(descripcion['particion'], boosters, descripcion['bandas'], filas, huella.hexdigest()[:12])
+
+    def set_param(self, parametros):
+        for booster in self.boosters.values():
+            booster.set_param(parametros)
+
+    def num_features(self):
+        return next(iter(self.boosters.values())).num_features()
+
+    def inplace_predict(self, X):
+        return self.por_region(X, lambda booster, parte: booster.inplace_predict(parte))
+
+    def por_region(self, X, funcion):
+        """
+        Aplica `funcion(booster, filas)` a las filas de cada región con su booster
+        y devuelve los resultados (una fila por fila de X) en el orden de X.
+        """
+        X = np.asarray(X)
+        if not len(X):
+            return funcion(self._booster(next(iter(self.boosters))), X)
+        region = region_filas(X, self.particion, self.bandas)
+        cambios = np.flatnonzero(region[1:] != region[:-1]) + 1
+        inicios, fines = np.r_[0, cambios], np.r_[cambios, len(X)]
+        if not len(cambios):
+            return funcion(self._booster(region[0]), X)
+        if len(inicios) <= len(self.boosters):
+            # Filas ya agrupadas por región (p. ej. un Parquet por banda): cada tramo es una vista de X
+            orden, tramos = None, [(region[a], slice(a, b)) for a, b in zip(inicios, fines)]
+        else:
+            # Filas mezcladas: una ordenación estable (radix para enteros) y una sola copia de X
+            orden = np.argsort(region, kind='stable')
+            cortes = np.cumsum(np.bincount(region))
+            X = X.take(orden, axis=0)
+            tramos = [(k, slice(a, b)) for k, (a, b) in enumerate(zip(np.r_[0, cortes[:-1]], cortes)) if b > a]
+        resultado = None
+        for k, filas in tramos:
+            parte = funcion(self._booster(k), X[filas])
+            if resultado is None:
+                resultado = np.empty((len(X),) + parte.shape[1:], dtype=parte.dtype)
+            resultado[filas if orden is None else orden[filas]] = parte
+        return resultado
+
+    def _booster(self, region):
+        try:
+            return self.boosters[int(region)]
+        except KeyError:
+            raise ValueError(f"El ensemble no tiene modelo para la región {int(region)}") from None
+
+    def get_score(self, importance_type='gain'):
+        """Importancia de cada característica: media de las regiones ponderada por sus filas."""
+        total = sum(self.filas.values()) or 1
+        resultado = {}
+        for region, booster in self.boosters.items():
+            peso = self.filas.get(region, 0) / total
+            for f, v in booster.get_score(importance_type=importance_type).items():
+                resultado[f] = resultado.get(f, 0.0) + peso * v
+        return resultado
+
+
+def cargar_modelo(ruta):
+    """`xgb.Booster` de un .ubj o `EnsembleRegional` de un regiones.json."""
+    if ruta.endswith('.json'):
+        return EnsembleRegional.cargar(ruta)
+    import xgboost as xgb
+
+    return xgb.Booster(model_file=ruta)
+
+
+def _entrenar_region(args):
+    rutas, destino, identificador, nombre, filtros, anio_corte, parametros, num_rondas = args
+    import xgboost as xgb
+
+    t0 = time.perf_counter()
+    IteradorParquet = _clase_iterador()
+    with tempfile.TemporaryDirectory(prefix=f'cache-{nombre}-', dir=destino) as cache:
+        iterador = IteradorParquet(rutas, anio_hasta=anio_corte, filtros=filtros,
+                                   cache_prefix=os.path.join(cache, 'cache'))
+        dtrain = xgb.ExtMemQuantileDMatrix(iterador, max_bin=parametros['max_bin'], nthread=parametros['nthread'])
+        booster = xgb.train(parametros, dtrain, num_boost_round=num_rondas)
+        filas_entrenamiento = dtrain.num_row()
+        del dtrain
+    segundos = time.perf_counter() - t0
+    artefacto = f'region-{nombre}.ubj'
+    booster.save_model(os.path.join(destino, artefacto))
+    return {
+        'id': identificador,
+        'artefacto': artefacto,
+        'filtros': filtros,
+        'filas_entrenamiento': filas_entrenamiento,
+        'segundos': segundos,
+        'prueba': evaluar(booster, rutas, anio_desde=anio_corte, filtros=filtros),
+        'entrenamiento': evaluar(booster, rutas, anio_hasta=anio_corte, filtros=filtros),
+        'rss_max_mb': rss_max_mb(),
+    }
+
+
+def entrenar_regiones(directorio_features, destino, particion='latitud', anio_corte=ANIO_CORTE, parametros=None,
+                      num_rondas=500, procesos=None, ruta_manifiesto=None):
+    """
+    Entrena un booster por región en `procesos` procesos, los guarda junto con
+    `regiones.json` en `destino` y evalúa el ensemble completo. Devuelve (ensemble, resumen).
+    """
+    os.makedirs(destino, exist_ok=True)
+    rutas = partes(directorio_features)
+    if not rutas:
+        raise FileNotFoundError(f"No hay ficheros Parquet en '{directorio_features}'")
+    regiones = definir_regiones(particion)
+    procesos = procesos or min(len(regiones), os.cpu_count() or 1)
+    parametros = {**PARAMETROS_POR_DEFECTO, **(parametros or {})}
+    parametros['nthread'] = max(1, (os.cpu_count() or 1) // procesos)
+    tareas = [(rutas, destino, identificador, nombre, filtros, anio_corte, parametros, num_rondas)
+              for identificador, nombre, filtros in regiones]
+
+    t0 = time.perf_counter()
+    if procesos > 1:
+        with ProcessPoolExecutor(procesos) as pool:
+            resultados = list(pool.map(_entrenar_region, tareas))
+    else:
+        resultados = [_entrenar_region(t) for t in tareas]
+    t_entrenamiento = time.perf_counter() - t0
+    vacias = [t[3] for t, r in zip(tareas, resultados) if not r['filas_entrenamiento']]
+    if vacias:
+        raise ValueError(f"Regiones sin filas de entrenamiento: {', '.join(vacias)}")
+
+    descripcion = {
+        'particion': particion,
+        'bandas': list(BANDAS_LATITUD),
+        'anio_corte': anio_corte,
+        'num_rondas': num_rondas,
+        'regiones': {t[3]: r for t, r in zip(tareas, resultados)},
+    }
+    ruta = os.path.join(destino, 'regiones.json')
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(descripcion, f, indent=2)
+
+    ensemble = EnsembleRegional.cargar(ruta)
+    ensemble.set_param({'nthread': os.cpu_count() or 1})
+    metricas_regiones = {nombre: {**r['prueba'], 'filas_entrenamiento': r['filas_entrenamiento'],
+                                  'segundos': r['segundos']}
+                         for nombre, r in descripcion['regiones'].items()}
+    resumen = {
+        'prueba': evaluar(ensemble, rutas, anio_desde=anio_corte),
+        'entrenamiento': evaluar(ensemble, rutas, anio_hasta=anio_corte),
+        'regiones': metricas_regiones,
+        'particion': particion,
+        'anio_corte': anio_corte,
+        'filas_entrenamiento': sum(r['filas_entrenamiento'] for r in resultados),
+        'parametros': parametros,
+        'num_rondas': num_rondas,
+        'procesos': procesos,
+        'segundos': {'entrenamiento': t_entrenamiento, 'total': time.perf_counter() - t0},
+        'rss_max_mb': max(r['rss_max_mb'] for r in resultados),
+    }
+    with open(os.path.join(destino, 'metricas.json'), 'w', encoding='utf-8') as f:
+        json.dump(resumen, f, indent=2)
+    if ruta_manifiesto:
+        publicar_metricas(resumen, ruta, ruta_manifiesto, regiones=metricas_regiones)
+    return ensemble, resumen
+
+
+def main():
+    from anomalias.componentes import formato
+    from anomalias.entrenamiento import cargar_parametros, cargar_rondas, entrenar
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('features')
+    parser.add_argument('destino')
+    parser.add_argument('--particion', choices=PARTICIONES, default='latitud')
+    parser.add_argument('--anio-corte', type=int, default=ANIO_CORTE)
+    parser.add_argument('--rondas', type=int,
+                        help='por defecto, las mejores_rondas de --parametros si es una búsqueda, o 500')
+    parser.add_argument('--parametros',
+                        help='JSON en línea o ruta a un JSON (p. ej. la salida de anomalias.busqueda)')
+    parser.add_argument('--procesos', type=int)
+    parser.add_argument('--comparar', action='store_true', help='entrena también el modelo global para comparar')
+    parser.add_argument('--manifiesto', help='publica el ensemble y sus métricas en el manifiesto')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    parametros = cargar_parametros(args.parametros)
+    rondas = args.rondas or cargar_rondas(args.parametros) or 500
+    _, resumen = entrenar_regiones(args.features, args.destino, args.particion, args.anio_corte, parametros,
+                                   rondas, args.procesos, args.manifiesto)
+    print(f"{'región':<22}{'filas':>12}{'s':>8}{'MAE':>9}{'R²':>8}")
+    for nombre, r in resumen['regiones'].items():
+        print(f"{nombre:<22}{r['filas_entrenamiento']:>12,}{r['segundos']:>8.1f}"
+              f"{formato(r['mae'], '.4f'):>9}{formato(r['r2'], '.4f'):>8}")
+    prueba = resumen['prueba']
+    print(f"\nEnsemble ({resumen['procesos']} procesos): {resumen['segundos']['entrenamiento']:.1f} s, "
+          f"MAE {formato(prueba['mae'], '.4f')}, R² {formato(prueba['r2'], '.4f')}")
+    if args.comparar:
+        _, global_ = entrenar(args.features, os.path.join(args.destino, 'global'), args.anio_corte, parametros,
+                              rondas)
+        print(f"Modelo global: {global_['segundos']['entrenamiento']:.1f} s, "
+              f"MAE {formato(global_['prueba']['mae'], '.4f')}, R² {formato(global_['prueba']['r2'], '.4f')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""
+Relleno de huecos del cubo de anomalías, sin pasar por pandas.
+
+Dos pasos, vectorizados sobre trozos completos (ningún bucle por celda):
+
+1. temporal: interpolación lineal a lo largo del tiempo de los huecos
+   interiores de hasta `max_hueco` meses seguidos (los más largos y los de
+   los extremos de la serie se dejan);
+2. espacial: cada NaN que queda se sustituye por la media de sus 8 vecinos
+   con dato en el mismo mes (con la longitud circular), si tiene al menos
+   `min_vecinos` y la celda está en la máscara: celdas con climatología y,
+   con `tierra_min`, fracción de tierra suficiente.
+
+El cubo se parte en teselas de una banda de latitud por un bloque de meses,
+alineadas con los trozos del NetCDF para no descomprimir varias veces los
+mismos. Cada tesela se lee con `max_hueco` + 1 meses de margen por cada lado
+(un hueco interpolable nunca necesita más) y una fila de latitud por arriba y
+por abajo, así que el resultado es el mismo que con el cubo entero. Los
+vecinos se toman de los valores originales o interpolados en el tiempo, nunca
+de otros rellenos espaciales. Las teselas se procesan en paralelo y el
+proceso principal las escribe en un NetCDF nuevo con la misma estructura y
+una variable `origen_relleno` (0 dato original o NaN, 1 temporal, 2 espacial).
+Como mucho hay 2 × procesos teselas enviadas sin escribir, así que la memoria
+del proceso principal también queda acotada aunque escribir sea más lento
+que rellenar.
+
+    python -m anomalias.relleno data/Land_and_Ocean_LatLong1.nc data/best_relleno.nc --procesos 4
+"""
+import argparse
+import collections
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from anomalias.features import rss_max_mb
+
+logger = logging.getLogger(__name__)
+
+MAX_HUECO = 3
+MIN_VECINOS = 3
+# Valores (meses × celdas) por tesela: acota la memoria de cada proceso
+MAX_VALORES_TESELA = 8_000_000
+ORIGINAL, TEMPORAL, ESPACIAL = 0, 1, 2
+
+
+def interpolar_tiempo(x, max_hueco=MAX_HUECO):
+    """
+    Interpola linealmente en el eje 0 de `x` (tiempo, ...) los huecos
+    interiores de hasta `max_hueco` valores. Devuelve (x rellenado, máscara de rellenos).
+    """
+    nt = x.shape[0]
+    validos = ~np.isnan(x)
+    t = np.arange(nt, dtype=np.int32).reshape((nt,) + (1,) * (x.ndim - 1))
+    # Último índice válido hasta cada posición y primero desde ella
+    anterior = np.maximum.accumulate(np.where(validos, t, -1), axis=0)
+    siguiente = np.flip(np.minimum.accumulate(np.flip(np.where(validos, t, nt), axis=0), axis=0), axis=0)
+    rellenar = ~validos & (anterior >= 0) & (siguiente < nt) & (siguiente - anterior - 1 <= max_hueco)
+    a = np.take_along_axis(x, np.clip(anterior, 0, nt - 1), axis=0)
+    b = np.take_along_axis(x, np.clip(siguiente, 0, nt - 1), axis=0)
+    peso = (t - anterior) / np.maximum(siguiente - anterior, 1)
+    return np.where(rellenar, a + (b - a) * peso.astype(x.dtype), x), rellenar
+
+
+def rellenar_espacio(x, mascara, min_vecinos=MIN_VECINOS, margen=(0, 0)):
+    """
+    Media de los 8 vecinos con dato para los NaN de `x` (tiempo, lat, lon) en
+    las celdas de `mascara` (lat - margen, lon). `margen` son las filas de `x`
+    por arriba y por abajo que solo sirven de vecinos y no se devuelven.
+    Devuelve (x sin el margen, máscara de rellenos).
+    """
+    arriba, abajo = margen
+    nlat = x.shape[1]
+    validos = ~np.isnan(x)
+    ceros = np.where(validos, x, 0)
+    # Sin margen en los bordes de la rejilla: una fila de NaN que no cuenta
+    relleno_0 = np.pad(ceros, ((0, 0), (1 - arriba, 1 - abajo), (0, 0)))
+    relleno_v = np.pad(validos, ((0, 0), (1 - arriba, 1 - abajo), (0, 0)))
+    suma = np.zeros((x.shape[0], nlat - arriba - abajo, x.shape[2]), dtype=np.float32)
+    cuenta = np.zeros(suma.shape, dtype=np.int8)
+    filas = suma.shape[1]
+    for di in (0, 1, 2):
+        bloque_0 = relleno_0[:, di:di + filas]
+        bloque_v = relleno_v[:, di:di + filas]
+        for dj in (-1, 0, 1):
+            if di == 1 and dj == 0:
+                continue
+            suma += np.roll(bloque_0, dj, axis=2)
+            cuenta += np.roll(bloque_v, dj, axis=2)
+    centro = x[:, arriba:nlat - abajo]
+    rellenar = np.isnan(centro) & (cuenta >= min_vecinos) & mascara
+    return np.where(rellenar, suma / np.maximum(cuenta, 1), centro), rellenar
+
+
+def _rellenar_tesela(args):
+    ruta_netcdf, i0, i1, t0, t1, max_hueco, min_vecinos, tierra_min = args
+    import xarray as xr
+
+    with xr.open_dataset(ruta_netcdf, decode_times=False, cache=False) as ds:
+        nt, nlat, _ = ds['temperature'].shape
+        a, b = max(i0 - 1, 0), min(i1 + 1, nlat)
+        s0, s1 = max(t0 - max_hueco - 1, 0), min(t1 + max_hueco + 1, nt)
+        x = ds['temperature'][s0:s1, a:b, :].values.astype(np.float32)
+        mascara = ~np.isnan(ds['climatology'][:, i0:i1, :].values).all(axis=0)
+        if tierra_min is not None:
+            mascara &= ds['land_mask'][i0:i1, :].values >= tierra_min
+    margen = (i0 - a, b - i1)
+    meses, centro = slice(t0 - s0, t1 - s0), slice(margen[0], x.shape[1] - margen[1])
+    antes = int(np.isnan(x[meses, centro]).sum())
+
+    x, temporal = interpolar_tiempo(x, max_hueco)
+    resultado, espacial = rellenar_espacio(x[meses], mascara, min_vecinos, margen)
+    temporal = temporal[meses, centro]
+    origen = np.where(temporal, TEMPORAL, np.where(espacial, ESPACIAL, ORIGINAL)).astype(np.int8)
+    conteos = {
+        'nan_antes': antes,
+        'temporal': int(temporal.sum()),
+        'espacial': int(espacial.sum()),
+        'nan_despues': int(np.isnan(resultado).sum()),
+        'nan_despues_en_mascara': int((np.isnan(resultado) & mascara).sum()),
+    }
+    return i0, i1, t0, t1, resultado, origen, conteos, rss_max_mb()
+
+
+def teselas(forma, trozos=None, max_valores=MAX_VALORES_TESELA, filas_banda=None):
+    """
+    [(i0, i1, t0, t1)] que cubren el cubo (tiempo, lat, lon) de `forma`: bandas
+    de los trozos de latitud del NetCDF (o `filas_banda`) y bloques de meses
+    múltiplos de los suyos y de 12 (los de la salida) con a lo sumo
+    `max_valores` valores.
+    """
+    nt, nlat, nlon = forma
+    trozo_t, trozo_lat = (trozos or (1, nlat))[:2]
+    trozo_t = int(np.lcm(trozo_t, 12))
+    filas = filas_banda or min(trozo_lat, max(1, max_valores // (trozo_t * nlon)))
+    meses = max(trozo_t, max_valores // (filas * nlon) // trozo_t * trozo_t)
+    return [(i0, min(i0 + filas, nlat), t0, min(t0 + meses, nt))
+            for i0 in range(0, nlat, filas) for t0 in range(0, nt, meses)]
+
+
+def _copiar_estructura(origen, destino, filas_banda):
+    """Dimensiones, atributos y variables de `origen` en `destino`; los datos de temperature no."""
+    destino.setncatts({k: origen.getncattr(k) for k in origen.ncattrs()})
+    for nombre, dimension in origen.dimensions.items():
+        destino.createDimension(nombre, None if dimension.isunlimited() else len(dimension))
+    nt, nlat, nlon = origen['temperature'].shape
+    trozos = (min(12, nt), filas_banda, min(nlon, 90))
+    for nombre, variable in origen.variables.items():
+        atributos = {k: variable.getncattr(k) for k in variable.ncattrs() if k != '_FillValue'}
+        relleno = getattr(variable, '_FillValue', None)
+        if nombre == 'temperature':
+            nueva = destino.createVariable(nombre, variable.dtype, variable.dimensions, zlib=True, complevel=1,
+                                           shuffle=True, fill_value=relleno, chunksizes=trozos)
+        else:
+            filtros = variable.filters() or {}
+            trozos_var = variable.chunking()
+            nueva = destino.createVariable(nombre, variable.dtype, variable.dimensions,
+                                           zlib=bool(filtros.get('zlib')), complevel=filtros.get('complevel', 4),
+                                           fill_value=relleno,
+                                           chunksizes=None if trozos_var == 'contiguous' else trozos_var)
+            nueva[:] = variable[:]
+        nueva.setncatts(atributos)
+    origen_relleno = destino.createVariable('origen_relleno', 'i1', ('time', 'latitude', 'longitude'),
+                                            zlib=True, complevel=1, shuffle=True, chunksizes=trozos)
+    origen_relleno.long_name = '0: dato original o NaN, 1: interpolación temporal, 2: vecinos'
+
+
+def _mapa_acotado(pool, funcion, tareas, en_vuelo):
+    """Como `pool.map` (resultados en orden), con a lo sumo `en_vuelo` tareas enviadas y no consumidas."""
+    pendientes = collections.deque()
+    for tarea in tareas:
+        if len(pendientes) >= en_vuelo:
+            yield pendientes.popleft().result()
+        pendientes.append(pool.submit(funcion, tarea))
+    while pendientes:
+        yield pendientes.popleft().result()
+
+
+def rellenar_netcdf(ruta_netcdf, destino, max_hueco=MAX_HUECO, min_vecinos=MIN_VECINOS, procesos=1,
+                    tierra_min=None, filas_banda=None, max_valores=MAX_VALORES_TESELA):
+    """
+    Rellena los huecos de `ruta_netcdf` y escribe el resultado en el NetCDF
+    `destino`. Devuelve los conteos de NaN antes y después de cada paso.
+    """
+    import netCDF4
+
+    t0 = time.perf_counter()
+    with netCDF4.Dataset(ruta_netcdf) as nc:
+        forma = nc['temperature'].shape
+        trozos = nc['temperature'].chunking()
+    lista = teselas(forma, None if trozos == 'contiguous' else trozos, max_valores, filas_banda)
+    tareas = [(ruta_netcdf, i0, i1, t0_, t1, max_hueco, min_vecinos, tierra_min) for i0, i1, t0_, t1 in lista]
+
+    temporal = destino + '.tmp'
+    conteos, rss = {}, rss_max_mb()
+    with netCDF4.Dataset(ruta_netcdf) as nc, netCDF4.Dataset(temporal, 'w') as salida:
+        nc.set_auto_mask(False)
+        salida.set_auto_mask(False)
+        _copiar_estructura(nc, salida, lista[0][1] - lista[0][0])
+        pool = ProcessPoolExecutor(procesos) if procesos > 1 else None
+        try:
+            resultados = (_mapa_acotado(pool, _rellenar_tesela, tareas, 2 * procesos) if pool
+                          else map(_rellenar_tesela, tareas))
+            for i0, i1, t0_, t1, datos, origen, parciales, rss_tesela in resultados:
+                salida['temperature'][t0_:t1, i0:i1, :] = datos
+                salida['origen_relleno'][t0_:t1, i0:i1, :] = origen
+                for clave, valor in parciales.items():
+                    conteos[clave] = conteos.get(clave, 0) + valor
+                rss = max(rss, rss_tesela)
+                logger.debug("Filas %d-%d, meses %d-%d: %s", i0, i1, t0_, t1, parciales)
+        finally:
+            if pool:
+                pool.shutdown()
+    os.replace(temporal, destino)
+    nt, nlat, nlon = forma
+    return {**conteos, 'valores': nt * nlat * nlon, 'teselas': len(tareas),
+            'segundos': time.perf_counter() - t0, 'rss_max_mb': rss}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('netcdf')
+    parser.add_argument('destino')
+    parser.add_argument('--max-hueco', type=int, default=MAX_HUECO, help='meses seguidos a interpolar como máximo')
+    parser.add_argument('--min-vecinos', type=int, default=MIN_VECINOS)
+    parser.add_argument('--procesos', type=int, default=1)
+    parser.add_argument('--tierra-min', type=float, help='rellena con vecinos solo celdas con esta fracción de tierra')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    r = rellenar_netcdf(args.netcdf, args.destino, args.max_hueco, args.min_vecinos, args.procesos, args.tierra_min)
+    total = r['valores']
+    print(f"NaN antes:              {r['nan_antes']:>12,} ({r['nan_antes'] / total:.2%})")
+    print(f"rellenos temporales:    {r['temporal']:>12,}")
+    print(f"rellenos espaciales:    {r['espacial']:>12,}")
+    print(f"NaN después:            {r['nan_despues']:>12,} ({r['nan_despues'] / total:.2%}), "
+          f"{r['nan_despues_en_mascara']:,} en celdas con datos")
+    print(f"{r['teselas']} teselas, {r['segundos']:.1f} s, RSS máx. {r['rss_max_mb']:.0f} MB")
+
+
+if __name__ == '__main__':
+    main()
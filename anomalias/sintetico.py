@@ -0,0 +1,117 @@
+"""
+Generador de un NetCDF sintético con la misma estructura que el producto
+Berkeley Earth Land+Ocean 1° × 1° mensual (variables temperature, climatology
+y land_mask; tiempo en años decimales).
+
+Se escribe año a año con netCDF4, así que el tamaño de la rejilla o del rango
+de años no condiciona la memoria del proceso.
+
+    python -m anomalias.sintetico data/sintetico.nc --anio-inicio 1850 --anio-fin 1870
+"""
+import argparse
+
+import numpy as np
+
+
+def coordenadas(resolucion=1.0):
+    """Centros de celda de una rejilla global regular, como en BEST."""
+    lat = np.arange(-90 + resolucion / 2, 90, resolucion)
+    lon = np.arange(-180 + resolucion / 2, 180, resolucion)
+    return lat, lon
+
+
+def mascara_tierra(lat, lon):
+    # Continentes aproximados con un patrón suave: ~30% de celdas de tierra
+    lat2d, lon2d = np.meshgrid(np.radians(lat), np.radians(lon), indexing='ij')
+    patron = np.sin(2 * lon2d) * np.cos(lat2d) + 0.6 * np.sin(3 * lat2d + lon2d)
+    return np.clip(patron, 0, 1).astype(np.float32)
+
+
+def climatologia(lat, lon, mascara):
+    meses = np.arange(12)[:, None, None]
+    lat3d = lat[None, :, None]
+    base = 27.0 - 0.45 * np.abs(lat3d) - 10.0 * mascara[None] * (np.abs(lat3d) / 90)
+    amplitud = (0.05 + 0.15 * mascara[None]) * np.abs(lat3d)
+    estacion = -np.cos(2 * np.pi * (meses + 0.5) / 12) * np.sign(lat3d)
+    clima = base + amplitud * estacion + np.zeros_like(lon)[None, None, :]
+    return clima.astype(np.float32)
+
+
+def crear_netcdf_sintetico(ruta, anio_inicio=1850, anio_fin=1860, resolucion=1.0, semilla=0):
+    """
+    Escribe en `ruta` un NetCDF BEST-like con anomalías mensuales entre
+    `anio_inicio` y `anio_fin` (incluidos). Devuelve la ruta.
+    """
+    import netCDF4
+
+    rng = np.random.default_rng(semilla)
+    lat, lon = coordenadas(resolucion)
+    nlat, nlon = len(lat), len(lon)
+    mascara = mascara_tierra(lat, lon)
+    anios = np.arange(anio_inicio, anio_fin + 1)
+
+    with netCDF4.Dataset(ruta, 'w') as nc:
+        nc.createDimension('time', None)
+        nc.createDimension('latitude', nlat)
+        nc.createDimension('longitude', nlon)
+        nc.createDimension('month_number', 12)
+        nc.title = 'Sintético con estructura Berkeley Earth Land+Ocean'
+
+        v_lat = nc.createVariable('latitude', 'f4', ('latitude',))
+        v_lat.units = 'degrees_north'
+        v_lat[:] = lat
+        v_lon = nc.createVariable('longitude', 'f4', ('longitude',))
+        v_lon.units = 'degrees_east'
+        v_lon[:] = lon
+        v_mes = nc.createVariable('month_number', 'i4', ('month_number',))
+        v_mes[:] = np.arange(1, 13)
+        v_time = nc.createVariable('time', 'f8', ('time',))
+        v_time.units = 'year A.D.'
+
+        v_mask = nc.createVariable('land_mask', 'f4', ('latitude', 'longitude'))
+        v_mask[:] = mascara
+        v_clim = nc.createVariable('climatology', 'f4', ('month_number', 'latitude', 'longitude'))
+        v_clim.units = 'degree C'
+        v_clim[:] = climatologia(lat, lon, mascara)
+
+        # Trozos de un año × rejilla completa: lecturas de un mes o de una serie
+        # por celda tocan pocos bloques
+        v_temp = nc.createVariable('temperature', 'f4', ('time', 'latitude', 'longitude'),
+                                   zlib=True, complevel=1, fill_value=np.float32(np.nan),
+                                   chunksizes=(12, min(nlat, 90), min(nlon, 90)))
+        v_temp.units = 'degree C'
+
+        amplificacion = (1 + 1.5 * (np.abs(lat) / 90) ** 2)[:, None] * (1 + 0.5 * mascara)
+        persistencia = np.zeros((nlat, nlon), dtype=np.float32)
+        for k, anio in enumerate(anios):
+            tendencia = 0.008 * (anio - 1850) + 1.2e-4 * max(anio - 1950, 0) ** 2
+            bloque = np.empty((12, nlat, nlon), dtype=np.float32)
+            for mes in range(12):
+                persistencia = 0.6 * persistencia + rng.normal(0, 0.6, (nlat, nlon)).astype(np.float32)
+                bloque[mes] = tendencia * amplificacion + persistencia * amplificacion
+            # Cobertura escasa en los polos y en los primeros años
+            cobertura = np.clip((anio - anio_inicio) / 60 + 0.3, 0, 1)
+            polar = np.abs(lat)[:, None] > 60 + 30 * cobertura
+            bloque[:, np.broadcast_to(polar, (nlat, nlon))] = np.nan
+            faltantes = rng.random((12, nlat, nlon)) < 0.02 * (1 - cobertura)
+            bloque[faltantes] = np.nan
+
+            inicio = 12 * k
+            v_time[inicio:inicio + 12] = anio + (np.arange(12) + 0.5) / 12
+            v_temp[inicio:inicio + 12] = bloque
+    return ruta
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('ruta')
+    parser.add_argument('--anio-inicio', type=int, default=1850)
+    parser.add_argument('--anio-fin', type=int, default=1860)
+    parser.add_argument('--resolucion', type=float, default=1.0)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    crear_netcdf_sintetico(args.ruta, args.anio_inicio, args.anio_fin, args.resolucion, args.semilla)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2 @@
+# Benchmarks del dashboard y del pipeline. Ejecutar desde la raíz del repositorio:
+#   python -m benchmarks.bench_layouts
@@ -0,0 +1,129 @@
+"""
+Actualización mensual incremental frente a reconstruirlo todo.
+
+Genera una serie sintética y una copia sin sus últimos `--meses-nuevos` meses
+(la publicación anterior), construye sobre la copia todos los artefactos
+(características, índice, pirámide, cubo de series regionales, tabla del EDA,
+figuras y un modelo pequeño) y mide `actualizacion.actualizar` con la serie completa frente a
+reconstruir cada artefacto desde cero. Después comprueba que ambos caminos dan
+lo mismo.
+
+    python -m benchmarks.bench_actualizacion --anio-fin 2000 --meses-nuevos 1
+"""
+import argparse
+import glob
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias import actualizacion
+from anomalias.cubo import construir_cubo
+from anomalias.entrenamiento import entrenar
+from anomalias.estadisticas import actualizar_estadisticas
+from anomalias.features import construir_features
+from anomalias.figuras import construir_figuras
+from anomalias.indice import Indice, construir_indice
+from anomalias.manifiesto import publicar
+from anomalias.piramide import construir_piramide
+from anomalias.sintetico import crear_netcdf_sintetico
+
+
+def construir_todo(ruta, directorio, anio_corte, rondas=0, procesos=1):
+    """Pipeline completo; devuelve los segundos de cada paso."""
+    manifiesto = os.path.join(directorio, 'resultados', 'manifiesto.json')
+    rutas = {nombre: os.path.join(directorio, nombre)
+             for nombre in ('features', 'indice', 'piramide', 'cubo', 'modelo')}
+    pasos = {
+        'features': lambda: construir_features(ruta, rutas['features']),
+        'indice': lambda: construir_indice(ruta, rutas['indice']),
+        'piramide': lambda: construir_piramide(ruta, rutas['piramide']),
+        'cubo': lambda: construir_cubo(ruta, rutas['cubo']),
+        'estadisticas': lambda: publicar({'eda': {'temperature': actualizar_estadisticas(
+            ruta, os.path.join(directorio, 'resultados', 'agregados', 'eda_temperature.npz'),
+            procesos=procesos)[0].tabla()}}, manifiesto),
+        'modelo': lambda: entrenar(rutas['features'], rutas['modelo'], anio_corte, num_rondas=rondas,
+                                   ruta_manifiesto=manifiesto) if rondas else None,
+        'figuras': lambda: construir_figuras(ruta, rutas['features'], ruta_manifiesto=manifiesto,
+                                             directorio=os.path.join(directorio, 'figuras')),
+    }
+    segundos = {}
+    for nombre, paso in pasos.items():
+        t0 = time.perf_counter()
+        paso()
+        segundos[nombre] = time.perf_counter() - t0
+    return rutas, manifiesto, segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--anio-inicio', type=int, default=1850)
+    parser.add_argument('--anio-fin', type=int, default=1950)
+    parser.add_argument('--resolucion', type=float, default=2.0)
+    parser.add_argument('--meses-nuevos', type=int, default=1)
+    parser.add_argument('--rondas', type=int, default=50, help='rondas del modelo base')
+    parser.add_argument('--continuar', type=int, default=0, help='rondas de la continuación del modelo')
+    parser.add_argument('--procesos', type=int, default=1, help='procesos de la tabla del EDA')
+    args = parser.parse_args()
+
+    import xarray as xr
+
+    directorio = tempfile.mkdtemp()
+    completo = crear_netcdf_sintetico(os.path.join(directorio, 'best.nc'), args.anio_inicio, args.anio_fin,
+                                      args.resolucion)
+    anterior = os.path.join(directorio, 'best_anterior.nc')
+    with xr.open_dataset(completo, decode_times=False) as ds:
+        nt = ds.sizes['time']
+        ds.isel(time=slice(0, nt - args.meses_nuevos)).to_netcdf(anterior)
+    # Las características empiezan en 1900 (anio_min por defecto)
+    anio_corte = (max(args.anio_inicio, 1900) + args.anio_fin) // 2
+
+    # Artefactos de la publicación anterior, que luego se actualizan
+    incremental = os.path.join(directorio, 'incremental')
+    rutas, manifiesto, _ = construir_todo(anterior, incremental, anio_corte, args.rondas, args.procesos)
+    # La publicación nueva apunta a la misma ruta que la anterior
+    shutil.copy(completo, anterior)
+    t0 = time.perf_counter()
+    resumen = actualizacion.actualizar(anterior, rutas['features'], rutas['indice'], rutas['piramide'],
+                                       manifiesto, args.continuar, procesos=args.procesos,
+                                       dir_figuras=os.path.join(incremental, 'figuras'), dir_cubo=rutas['cubo'])
+    t_incremental = time.perf_counter() - t0
+
+    desde_cero = os.path.join(directorio, 'desde_cero')
+    rutas_cero, _, segundos = construir_todo(completo, desde_cero, anio_corte, args.rondas, args.procesos)
+
+    print(f"{nt} meses, {args.meses_nuevos} nuevos, rejilla {args.resolucion}°\n")
+    print(f"{'paso':<14}{'desde cero s':>14}{'incremental s':>15}")
+    for nombre, s in segundos.items():
+        incremento = resumen.get(nombre, {}).get('segundos')
+        print(f"{nombre:<14}{s:>14.2f}{incremento if incremento is not None else float('nan'):>15.2f}")
+    print(f"{'total':<14}{sum(segundos.values()):>14.2f}{t_incremental:>15.2f}")
+
+    # Comprobación: los dos caminos llegan a los mismos artefactos
+    import pyarrow.parquet as pq
+
+    def filas(directorio_features):
+        tabla = pq.read_table(sorted(glob.glob(os.path.join(directorio_features, '*.parquet')))).to_pandas()
+        return tabla.sort_values(['celda', 'anio', 'mes']).reset_index(drop=True)
+
+    a, b = filas(rutas['features']), filas(rutas_cero['features'])
+    diferencia = max(float(np.nanmax(np.abs(a[c].to_numpy(np.float64) - b[c].to_numpy(np.float64))))
+                     for c in a.columns)
+    print(f"\nCaracterísticas: {len(a):,} / {len(b):,} filas, máx. |diferencia| {diferencia:.2g}")
+    ia, ib = Indice(rutas['indice']), Indice(rutas_cero['indice'])
+    print(f"Índice igual: {np.array_equal(ia.temperatura, ib.temperatura, equal_nan=True)}; "
+          f"historia igual: {np.array_equal(ia.historia(10, 20)[1], ib.historia(10, 20)[1], equal_nan=True)}")
+    piramides = [np.array_equal(np.load(os.path.join(rutas['piramide'], f)),
+                                np.load(os.path.join(rutas_cero['piramide'], f)), equal_nan=True)
+                 for f in ('nivel_2.npy', 'zonal.npy', 'global.npy') if os.path.exists(
+                     os.path.join(rutas['piramide'], f))]
+    print(f"Pirámide igual: {all(piramides)}")
+    cubos = [np.allclose(np.load(os.path.join(rutas['cubo'], f)), np.load(os.path.join(rutas_cero['cubo'], f)),
+                         equal_nan=True) for f in ('series.npy', 'cobertura.npy')]
+    print(f"Cubo igual: {all(cubos)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Tamaño en disco, tiempo de carga y memoria pico del dataset limpio (una fila
+por celda y mes con anomalía) según de dónde se lea:
+
+- CSV del DataFrame float64 (time, latitude, longitude, temperature,
+  climatology, land_mask);
+- NetCDF, construyendo ese mismo DataFrame;
+- almacén columnar, entero y solo una década y una columna (poda de
+  particiones, row groups y columnas).
+
+Cada carga se mide en un proceso aparte (VmHWM). Al final se comprueba la ida
+y vuelta del almacén contra el NetCDF.
+
+    python -m benchmarks.bench_almacen --anio-inicio 1850 --anio-fin 2024 --resolucion 1
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias.almacen import Almacen, comprobar, construir_almacen
+from anomalias.sintetico import crear_netcdf_sintetico
+from benchmarks.bench_estadisticas import pico_rss_mb
+
+
+def limpio_netcdf(ruta):
+    import pandas as pd
+    import xarray as xr
+
+    with xr.open_dataset(ruta, decode_times=False) as ds:
+        tiempo = ds['time'].values
+        temperatura = ds['temperature'].values
+        validos = ~np.isnan(temperatura)
+        tt, ii, jj = np.nonzero(validos)
+        mes = np.floor((tiempo - np.floor(tiempo)) * 12).astype(int).clip(0, 11)
+        return pd.DataFrame({
+            'time': tiempo[tt].astype(np.float64),
+            'latitude': ds['latitude'].values[ii].astype(np.float64),
+            'longitude': ds['longitude'].values[jj].astype(np.float64),
+            'temperature': temperatura[validos].astype(np.float64),
+            'climatology': ds['climatology'].values[mes[tt], ii, jj].astype(np.float64),
+            'land_mask': ds['land_mask'].values[ii, jj].astype(np.float64),
+        })
+
+
+def interno(modo, ruta):
+    import pandas as pd
+
+    t0 = time.perf_counter()
+    if modo == 'csv':
+        filas = len(pd.read_csv(ruta))
+    elif modo == 'netcdf':
+        filas = len(limpio_netcdf(ruta))
+    elif modo == 'almacen':
+        filas = len(Almacen(ruta).leer().to_pandas(split_blocks=True, self_destruct=True))
+    elif modo == 'almacen-decada':
+        almacen = Almacen(ruta)
+        anio = int(almacen.anio_inicial) // 10 * 10 + 10
+        filas = len(almacen.leer(['anomalia'], (anio, 1), (anio + 9, 12)).to_pandas())
+    else:
+        filas = 0
+    print(json.dumps({'filas': filas, 'segundos': time.perf_counter() - t0, 'rss': pico_rss_mb()}))
+
+
+def tamano(ruta):
+    if os.path.isfile(ruta):
+        return os.path.getsize(ruta)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(ruta) for f in fs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--netcdf')
+    parser.add_argument('--anio-inicio', type=int, default=1850)
+    parser.add_argument('--anio-fin', type=int, default=1900)
+    parser.add_argument('--resolucion', type=float, default=2.0)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--interno', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.interno:
+        interno(*args.interno)
+        return
+
+    directorio = tempfile.mkdtemp()
+    ruta = args.netcdf or crear_netcdf_sintetico(os.path.join(directorio, 'best.nc'), args.anio_inicio,
+                                                 args.anio_fin, args.resolucion)
+    csv = os.path.join(directorio, 'limpio.csv')
+    t0 = time.perf_counter()
+    limpio_netcdf(ruta).to_csv(csv, index=False)
+    print(f"CSV escrito en {time.perf_counter() - t0:.1f} s")
+    almacen = os.path.join(directorio, 'almacen')
+    resumen = construir_almacen(ruta, almacen)
+    print(f"Almacén escrito en {resumen['segundos']:.1f} s, {resumen['filas']:,} filas\n")
+
+    casos = [
+        ('CSV', 'csv', csv),
+        ('NetCDF', 'netcdf', ruta),
+        ('almacén', 'almacen', almacen),
+        ('almacén, 1 década y col.', 'almacen-decada', almacen),
+    ]
+    base = None
+    print(f"{'fuente':<26}{'disco MB':>10}{'filas':>12}{'carga s':>9}{'RSS MB':>8}{'Δ RSS MB':>10}")
+    for nombre, modo, fuente in [('(solo imports)', 'vacio', '')] + casos:
+        medidas = []
+        for _ in range(args.repeticiones):
+            salida = subprocess.run([sys.executable, '-m', 'benchmarks.bench_almacen', '--interno', modo, fuente],
+                                    check=True, capture_output=True, text=True).stdout
+            medidas.append(json.loads(salida))
+        r = min(medidas, key=lambda m: m['segundos'])
+        base = r['rss'] if base is None else base
+        disco = f"{tamano(fuente) / 2**20:.1f}" if fuente else ''
+        print(f"{nombre:<26}{disco:>10}{r['filas']:>12,}{r['segundos']:>9.2f}{r['rss']:>8.0f}{r['rss'] - base:>10.0f}")
+
+    resultado = comprobar(almacen, ruta)
+    print("\nIda y vuelta: " + ", ".join(f"{c} {'igual' if v else 'DISTINTO'}" for c, v in resultado.items()))
+    if not all(resultado.values()):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,199 @@
+"""
+Prueba de carga de `/api/predict`: levanta gunicorn (un worker con hilos) y
+lanza clientes concurrentes con conexiones keep-alive. Compara la ventana de
+micro-lotes desactivada (0 ms: solo se agrupa lo que ya está en cola) con la
+por defecto y mide p50/p99 por petición y puntos por segundo. Antes, sin
+HTTP, compara la predicción directa por petición con los micro-lotes para
+aislar su efecto.
+
+Sin `--indice`/`--modelo` genera un NetCDF sintético, su índice y un modelo
+pequeño entrenado con el pipeline.
+
+    python -m benchmarks.bench_api --clientes 32 --segundos 10
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def preparar(directorio):
+    from anomalias.entrenamiento import entrenar
+    from anomalias.features import construir_features
+    from anomalias.indice import construir_indice
+    from anomalias.sintetico import crear_netcdf_sintetico
+
+    ruta = crear_netcdf_sintetico(os.path.join(directorio, 'best.nc'), 1850, 1900, resolucion=2.0)
+    indice = construir_indice(ruta, os.path.join(directorio, 'indice'))
+    construir_features(ruta, os.path.join(directorio, 'features'), anio_min=1852)
+    entrenar(os.path.join(directorio, 'features'), os.path.join(directorio, 'modelo'), anio_corte=1890,
+             num_rondas=100)
+    return indice, os.path.join(directorio, 'modelo', 'modelo.ubj')
+
+
+def puerto_libre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def peticion(conexion, cuerpo):
+    conexion.request('POST', '/api/predict', body=json.dumps(cuerpo), headers={'Content-Type': 'application/json'})
+    respuesta = conexion.getresponse()
+    datos = respuesta.read()
+    if respuesta.status != 200:
+        raise RuntimeError(f"HTTP {respuesta.status}: {datos[:200]!r}")
+    return datos
+
+
+def arrancar_servidor(indice, modelo, ventana_ms, hilos):
+    puerto = puerto_libre()
+    entorno = {**os.environ, 'ANOMALIAS_INDICE': indice, 'ANOMALIAS_MODELO': modelo,
+               'ANOMALIAS_VENTANA_MS': str(ventana_ms)}
+    proceso = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:server', '-w', '1', '--threads', str(hilos),
+                                '-b', f'127.0.0.1:{puerto}', '--log-level', 'warning'], cwd=RAIZ, env=entorno)
+    limite = time.monotonic() + 120
+    while time.monotonic() < limite:
+        try:
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=5)
+            peticion(conexion, {'lat': [0], 'lon': [0], 'anio': 1899, 'mes': 1})
+            conexion.close()
+            return proceso, puerto
+        except (ConnectionRefusedError, OSError):
+            time.sleep(0.5)
+    proceso.kill()
+    raise RuntimeError("El servidor no arrancó")
+
+
+def carga(puerto, clientes, segundos, generar):
+    latencias, puntos, errores = [], [0], []
+    lock = threading.Lock()
+    fin = time.monotonic() + segundos
+
+    def cliente(semilla):
+        rng = random.Random(semilla)
+        conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=30)
+        propias, n = [], 0
+        try:
+            while time.monotonic() < fin:
+                cuerpo = generar(rng)
+                t0 = time.perf_counter()
+                datos = peticion(conexion, cuerpo)
+                propias.append((time.perf_counter() - t0) * 1000)
+                n += len(json.loads(datos)['prediccion'])
+        except Exception as e:
+            errores.append(e)
+        with lock:
+            latencias.extend(propias)
+            puntos[0] += n
+
+    t0 = time.perf_counter()
+    hilos = [threading.Thread(target=cliente, args=(s,)) for s in range(clientes)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    duracion = time.perf_counter() - t0
+    if errores:
+        raise errores[0]
+    return {
+        'peticiones': len(latencias),
+        'p50_ms': float(np.percentile(latencias, 50)),
+        'p99_ms': float(np.percentile(latencias, 99)),
+        'peticiones_s': len(latencias) / duracion,
+        'puntos_s': puntos[0] / duracion,
+    }
+
+
+def en_proceso(indice, modelo, clientes, segundos):
+    # Hilos que piden un punto cada uno, llamando al predictor directamente o vía micro-lotes
+    os.environ.update(ANOMALIAS_INDICE=indice, ANOMALIAS_MODELO=modelo)
+    from anomalias import api
+
+    api.registro.cargar()
+    nceldas = api.abrir_indice().temperatura.shape[1]
+    t_min, t_max = api.abrir_indice().rango_prediccion()
+    casos = {'directo': api.predecir_celdas}
+    for ventana in (0, 2):
+        casos[f'micro-lotes {ventana} ms'] = api.MicroLotes(api.predecir_celdas, ventana_ms=ventana)
+
+    print(f"{'predictor':<20}{'pet/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'filas/lote':>12}")
+    for nombre, funcion in casos.items():
+        latencias = []
+        fin = time.monotonic() + segundos
+
+        def cliente(semilla):
+            rng = np.random.default_rng(semilla)
+            propias = []
+            while time.monotonic() < fin:
+                t0 = time.perf_counter()
+                funcion(rng.integers(0, nceldas, 1), rng.integers(t_min, t_max, 1))
+                propias.append((time.perf_counter() - t0) * 1000)
+            latencias.extend(propias)
+
+        hilos = [threading.Thread(target=cliente, args=(s,)) for s in range(clientes)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        por_lote = funcion.filas / funcion.lotes if isinstance(funcion, api.MicroLotes) else 1
+        print(f"{nombre:<20}{len(latencias) / segundos:>9.0f}{np.percentile(latencias, 50):>9.2f}"
+              f"{np.percentile(latencias, 99):>9.2f}{por_lote:>12.1f}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--indice')
+    parser.add_argument('--modelo')
+    parser.add_argument('--anio', type=int, default=1895, help='año de las peticiones (con historia en el índice)')
+    parser.add_argument('--clientes', type=int, default=32)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--puntos', type=int, default=1, help='puntos por petición en el escenario de puntos')
+    parser.add_argument('--ventanas', type=float, nargs='+', default=[0, 2])
+    args = parser.parse_args()
+
+    if args.indice and args.modelo:
+        indice, modelo = args.indice, args.modelo
+    else:
+        indice, modelo = preparar(tempfile.mkdtemp())
+
+    en_proceso(indice, modelo, args.clientes, min(args.segundos, 3))
+
+    def puntos(rng):
+        return {'puntos': [{'lat': rng.uniform(-89, 89), 'lon': rng.uniform(-179, 179), 'anio': args.anio,
+                            'mes': rng.randint(1, 12)} for _ in range(args.puntos)]}
+
+    def caja(rng):
+        lat, lon = rng.randrange(-80, 80, 10), rng.randrange(-180, 170, 10)
+        return {'bbox': [lat, lat + 10, lon, lon + 10], 'anio': args.anio, 'mes': rng.randint(1, 12)}
+
+    escenarios = {f'{args.puntos} punto(s)': puntos, 'caja 10°×10°': caja}
+
+    print(f"{'ventana':>8}  {'escenario':<14}{'peticiones':>11}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'pet/s':>9}{'puntos/s':>11}")
+    for ventana in args.ventanas:
+        proceso, puerto = arrancar_servidor(indice, modelo, ventana, args.clientes)
+        try:
+            for nombre, generar in escenarios.items():
+                r = carga(puerto, args.clientes, args.segundos, generar)
+                print(f"{ventana:>6g}ms  {nombre:<14}{r['peticiones']:>11,}{r['p50_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+                      f"{r['peticiones_s']:>9.0f}{r['puntos_s']:>11,.0f}")
+        finally:
+            proceso.terminate()
+            proceso.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Presupuesto de arranque: lo que cuesta `import app` por encima de Dash.
+
+Mide con `python -X importtime` (mejor de `--rondas` subprocesos) el tiempo
+acumulado de `import app` y le descuenta el de los paquetes del marco (dash,
+dash_bootstrap_components, flask y sus dependencias) allí donde aparezcan en
+el árbol de importaciones; lo que queda es lo que añade el propio dashboard:
+sus módulos, numpy y el cuerpo de `app.py`. Comprueba además que la carcasa
+no carga los subsistemas pesados (xarray, pandas, xgboost, plotly.express...),
+que deben llegar de forma diferida (`anomalias.arranque`), e informa de la
+memoria residente y de lo que tarda el calentamiento en segundo plano.
+
+Sale con código 1 si se supera el presupuesto o se importa un módulo prohibido.
+
+    python -m benchmarks.bench_arranque [--presupuesto-ms 200]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRESUPUESTO_MS = 200
+
+# Paquetes del marco: su coste se descuenta esté donde esté en el árbol de importaciones de `app`
+MARCO = ('dash', 'dash_bootstrap_components', 'flask', 'werkzeug', 'jinja2', 'click', 'plotly', '_plotly_utils',
+         'certifi')
+PROHIBIDOS = ('xarray', 'pandas', 'xgboost', 'plotly.express', 'pyarrow', 'matplotlib', 'scipy', 'netCDF4')
+
+# Subproceso: qué deja cargado `import app` y cuánto pesa el proceso antes y después del calentamiento
+INFORME = """
+import json, resource, sys
+import app as dashboard
+cargados = sorted(m for m in {prohibidos!r} if m in sys.modules)
+rss_import = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+from anomalias.arranque import registrar_arranque
+calentamiento = registrar_arranque(dashboard.server, dashboard.registro)
+calentamiento.iniciar()
+calentamiento.terminado.wait(300)
+print(json.dumps(dict(cargados=cargados, rss_import=rss_import,
+                      rss_calentado=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                      calentamiento=calentamiento.segundos)))
+"""
+
+
+def costes(salida):
+    """
+    (total, marco) en µs de `import app` a partir de la salida de `-X importtime`:
+    el tiempo acumulado de `app` y el de los subárboles del MARCO que cuelgan de él.
+    """
+    total = marco = 0
+    ancestros = []
+    # Los hijos se escriben antes que su padre: al revés, cada línea llega después de sus ancestros
+    for linea in reversed(salida.splitlines()):
+        m = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)$', linea)
+        if not m:
+            continue
+        acumulado, nivel, nombre = int(m.group(1)), len(m.group(2)) // 2, m.group(3)
+        del ancestros[nivel:]
+        ancestros.append(nombre.split('.')[0])
+        if nivel == 0 and nombre == 'app':
+            total = acumulado
+        elif ancestros[0] == 'app' and ancestros[-1] in MARCO and not set(ancestros[1:-1]) & set(MARCO):
+            marco += acumulado
+    return total, marco
+
+
+def medir(rondas):
+    """Mejor (menor coste propio) de `rondas` subprocesos: (total, marco) en ms."""
+    resultados = []
+    for _ in range(rondas):
+        salida = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                                capture_output=True, text=True, check=True, cwd=RAIZ).stderr
+        total, marco = costes(salida)
+        resultados.append((total / 1000, marco / 1000))
+    return min(resultados, key=lambda r: r[0] - r[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--presupuesto-ms', type=float, default=PRESUPUESTO_MS,
+                        help='máximo que puede añadir `import app` sobre el marco')
+    parser.add_argument('--rondas', type=int, default=5)
+    args = parser.parse_args()
+
+    total, marco = medir(args.rondas)
+    propio = total - marco
+
+    salida = subprocess.run([sys.executable, '-c', INFORME.format(prohibidos=PROHIBIDOS)],
+                            capture_output=True, text=True, check=True, cwd=RAIZ)
+    informe = json.loads(salida.stdout.strip().splitlines()[-1])
+
+    print(f"import app:               {total:8.0f} ms")
+    print(f"del marco (dash, flask…): {marco:8.0f} ms")
+    print(f"añadido por la app:       {propio:8.0f} ms   (presupuesto {args.presupuesto_ms:.0f} ms)")
+    print(f"memoria residente:        {informe['rss_import']:8.0f} MB   "
+          f"({informe['rss_calentado']:.0f} MB tras el calentamiento)")
+    print("calentamiento:            " + ', '.join(f'{n} {s * 1000:.0f} ms' for n, s in informe['calentamiento'].items()))
+
+    errores = []
+    if propio > args.presupuesto_ms:
+        errores.append(f"import app añade {propio:.0f} ms, más que el presupuesto de {args.presupuesto_ms:.0f} ms")
+    if informe['cargados']:
+        errores.append(f"import app carga módulos que deberían ser diferidos: {', '.join(informe['cargados'])}")
+    for error in errores:
+        print(f"ERROR: {error}", file=sys.stderr)
+    sys.exit(1 if errores else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Contribuciones TreeSHAP (`anomalias.contribuciones`) sobre un almacén de
+características sintético y un modelo pequeño: filas/s de `pred_contribs`
+exacto con 1 y con todos los hilos y aproximado (Saabas), el paso offline
+completo sobre el periodo de prueba, y la latencia de una explicación en el
+dashboard: leída de los agregados, calculada al vuelo para una celda y un mes
+con el índice, o recalculada sobre todas las filas de una región y década.
+
+    python -m benchmarks.bench_contribuciones --anio-fin 1970 --rondas 100
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias import cubo
+from anomalias.contribuciones import Contribuciones, calcular_contribuciones, contribuciones_filas, explicar
+from anomalias.entrenamiento import entrenar, leer_lotes, partes
+from anomalias.features import COLUMNAS_FEATURES, construir_features
+from anomalias.indice import Indice, construir_indice
+from anomalias.sintetico import crear_netcdf_sintetico
+
+
+def medir(funcion, repeticiones):
+    latencias = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        latencias.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--anio-inicio', type=int, default=1900)
+    parser.add_argument('--anio-fin', type=int, default=1960)
+    parser.add_argument('--resolucion', type=float, default=5.0)
+    parser.add_argument('--rondas', type=int, default=50)
+    parser.add_argument('--profundidad', type=int, default=6)
+    parser.add_argument('--filas', type=int, default=20_000, help='filas de la medida de filas/s')
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    ruta = crear_netcdf_sintetico(os.path.join(directorio, 'best.nc'), args.anio_inicio, args.anio_fin,
+                                  args.resolucion)
+    features = os.path.join(directorio, 'features')
+    construir_features(ruta, features, anio_min=args.anio_inicio)
+    anio_corte = args.anio_fin - 10
+    booster, _ = entrenar(features, os.path.join(directorio, 'modelo'), anio_corte, num_rondas=args.rondas,
+                          parametros={'max_depth': args.profundidad})
+    ruta_modelo = os.path.join(directorio, 'modelo', 'modelo.ubj')
+    hilos = os.cpu_count() or 1
+
+    X = np.concatenate([X for X, _ in leer_lotes(partes(features), anio_desde=anio_corte)])
+    muestra = X[:args.filas]
+    print(f"{len(X):,} filas de prueba; modelo de {args.rondas} árboles de profundidad {args.profundidad}")
+    print(f"\n{'pred_contribs':<26}{'filas/s':>12}")
+    variantes = [('exacto, 1 hilo', 1, False)]
+    if hilos > 1:
+        variantes.append((f'exacto, {hilos} hilos', hilos, False))
+    variantes.append((f'aproximado, {hilos} hilo{"s" if hilos > 1 else ""}', hilos, True))
+    for nombre, nthread, aproximadas in variantes:
+        booster.set_param({'nthread': nthread})
+        t0 = time.perf_counter()
+        contribuciones_filas(booster, muestra, nthread, aproximadas)
+        print(f"{nombre:<26}{len(muestra) / (time.perf_counter() - t0):>12,.0f}")
+    t0 = time.perf_counter()
+    booster.inplace_predict(muestra)
+    print(f"{'(solo predicción)':<26}{len(muestra) / (time.perf_counter() - t0):>12,.0f}")
+
+    destino = os.path.join(directorio, 'contribuciones.npz')
+    r = calcular_contribuciones(features, ruta_modelo, destino, anio_corte, hilos)
+    print(f"\nPaso offline: {r['filas']:,} filas en {r['segundos']:.1f} s ({r['filas_por_segundo']:,.0f} filas/s), "
+          f"{r['bytes'] / 2**20:.1f} MB, RSS máx. {r['rss_max_mb']:.0f} MB")
+
+    contribuciones = Contribuciones(destino)
+    indice = Indice(construir_indice(ruta, os.path.join(directorio, 'indice')))
+    region, decada = 'europa', contribuciones.decadas[-1]
+    _, (lat_min, lat_max, lon_min, lon_max), _ = cubo.REGIONES[region]
+    latitud, longitud = X[:, COLUMNAS_FEATURES.index('latitud')], X[:, COLUMNAS_FEATURES.index('longitud')]
+    filas_region = X[(latitud >= lat_min) & (latitud <= lat_max) & (longitud >= lon_min) & (longitud <= lon_max)
+                     & (X[:, COLUMNAS_FEATURES.index('anio')] >= decada)]
+    booster.set_param({'nthread': hilos})
+    recalculo = medir(lambda: contribuciones_filas(booster, filas_region, hilos), 1)
+    booster.set_param({'nthread': 1})
+    latencias = {
+        'región y década, de los agregados': medir(lambda: contribuciones.resumen(region, decada), args.repeticiones),
+        'serie mensual de la región, de los agregados': medir(lambda: contribuciones.serie(region),
+                                                              args.repeticiones),
+        'celda y década, de los agregados': medir(lambda: contribuciones.celda(48.0, 2.0, decada), args.repeticiones),
+        'celda y mes, al vuelo con el índice': medir(lambda: explicar(booster, indice, 48.0, 2.0, args.anio_fin, 6),
+                                                     args.repeticiones),
+        f'región y década, recalculando {len(filas_region):,} filas': recalculo,
+        f'todo el periodo, recalculando {len(X):,} filas': r['segundos'] * 1000,
+    }
+    print(f"\n{'explicación':<48}{'ms':>12}")
+    for nombre, ms in latencias.items():
+        print(f"{nombre:<48}{ms:>12,.2f}")
+
+
+if __name__ == '__main__':
+    main()
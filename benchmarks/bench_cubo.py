@@ -0,0 +1,63 @@
+"""
+Serie regional bajo demanda frente al cubo precalculado (`anomalias.cubo`).
+
+Para varias regiones mide cuánto cuesta obtener la serie mensual completa
+ponderada por cos(lat): calculándola sobre la rejilla del NetCDF o del índice
+espacio-temporal en cada petición (sin caché), y leyéndola del cubo. También
+informa del tiempo de construcción y del tamaño del cubo.
+
+    python -m benchmarks.bench_cubo --anio-fin 1950
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from anomalias import cubo
+from anomalias.indice import Indice, construir_indice
+from anomalias.sintetico import crear_netcdf_sintetico
+
+REGIONES = ('global', 'tierra', 'hemisferio_norte', 'lat30_60', 'nino34', 'europa')
+
+
+def medir(funcion, repeticiones):
+    latencias = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        latencias.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--netcdf')
+    parser.add_argument('--anio-inicio', type=int, default=1850)
+    parser.add_argument('--anio-fin', type=int, default=1900)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    ruta = args.netcdf or crear_netcdf_sintetico(os.path.join(directorio, 'best.nc'),
+                                                 args.anio_inicio, args.anio_fin)
+    t0 = time.perf_counter()
+    destino = cubo.construir_cubo(ruta, os.path.join(directorio, 'cubo'))
+    construccion = time.perf_counter() - t0
+    tamano = sum(os.path.getsize(os.path.join(destino, f)) for f in os.listdir(destino))
+    print(f"Construcción del cubo: {construccion:.1f} s, {len(cubo.REGIONES)} regiones, {tamano / 1024:.0f} KB")
+
+    indice = Indice(construir_indice(ruta, os.path.join(directorio, 'indice')))
+    cubo_abierto = cubo.Cubo(destino)
+    print(f"\n{'región':<18}{'NetCDF ms':>11}{'índice ms':>11}{'cubo ms':>10}")
+    for nombre in REGIONES:
+        _, caja, superficie = cubo.REGIONES[nombre]
+        # __wrapped__: sin la caché LRU, como si cada petición pidiera una caja nueva
+        netcdf = medir(lambda: cubo._serie_caja.__wrapped__(ruta, caja, superficie), args.repeticiones)
+        por_indice = medir(lambda: cubo._serie_caja.__wrapped__(indice, caja, superficie), args.repeticiones)
+        en_cubo = medir(lambda: cubo_abierto.serie(nombre), args.repeticiones * 100)
+        print(f"{nombre:<18}{netcdf:>11.1f}{por_indice:>11.1f}{en_cubo:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
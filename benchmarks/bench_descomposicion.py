@@ -0,0 +1,78 @@
+"""
+Celdas/s de la descomposición estacional por celda (`anomalias.descomposicion`):
+un bucle de Python que descompone cada serie por separado (medido sobre
+`--muestra` celdas) frente a la descomposición por lotes de la matriz
+(tiempo, celda), solo el cálculo y el paso completo (lectura del NetCDF por
+teselas y escritura de las capas) con 1 y con `--procesos` procesos.
+
+    python -m benchmarks.bench_descomposicion --anio-fin 1950 --procesos 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias import datos
+from anomalias.descomposicion import capas_celdas, descomponer_rejilla
+from anomalias.sintetico import crear_netcdf_sintetico
+
+
+def por_celda(tiempo, matriz):
+    # La forma directa: una descomposición y un ajuste lineal por serie
+    tasas = np.full(matriz.shape[1], np.nan)
+    for k in range(matriz.shape[1]):
+        serie = matriz[:, k]
+        _, estacional, _ = datos.descomponer(serie)
+        sin_estacion = serie - estacional
+        validos = ~np.isnan(sin_estacion)
+        if validos.sum() > 1:
+            tasas[k] = np.polyfit(tiempo[validos], sin_estacion[validos], 1)[0] * 10
+    return tasas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--netcdf')
+    parser.add_argument('--anio-inicio', type=int, default=1850)
+    parser.add_argument('--anio-fin', type=int, default=1950)
+    parser.add_argument('--muestra', type=int, default=2000, help='celdas del bucle por celda')
+    parser.add_argument('--procesos', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    ruta = args.netcdf or crear_netcdf_sintetico(os.path.join(directorio, 'best.nc'),
+                                                 args.anio_inicio, args.anio_fin)
+    ds = datos.abrir_dataset(ruta)
+    tiempo = ds['time'].values
+    nt, nlat, nlon = ds['temperature'].shape
+    filas = max(1, -(-args.muestra // nlon))
+    matriz = ds['temperature'][:, nlat // 2 - filas // 2:][:, :filas].values.reshape(nt, -1)[:, :args.muestra]
+    print(f"Rejilla {nlat} × {nlon} = {nlat * nlon:,} celdas, {nt:,} meses")
+
+    resultados = {}
+    t0 = time.perf_counter()
+    lento = por_celda(tiempo, matriz)
+    resultados['bucle por celda'] = matriz.shape[1] / (time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    rapido = capas_celdas(tiempo, matriz, 2)['tendencia']
+    resultados['lotes, solo cálculo'] = matriz.shape[1] / (time.perf_counter() - t0)
+    diferencia = np.nanmax(np.abs(lento - rapido))
+
+    for procesos in sorted({1, args.procesos}):
+        r = descomponer_rejilla(ruta, os.path.join(directorio, 'tendencias.npz'), anio_min=args.anio_inicio,
+                                min_anios=1, procesos=procesos)
+        resultados[f'paso completo, {procesos} proc.'] = r['celdas_por_segundo']
+
+    base = resultados['bucle por celda']
+    print(f"{'variante':<26}{'celdas/s':>12}{'× bucle':>9}")
+    for nombre, celdas_s in resultados.items():
+        print(f"{nombre:<26}{celdas_s:>12,.0f}{celdas_s / base:>9.1f}")
+    print(f"máx. diferencia de tendencia entre bucle y lotes: {diferencia:.2e} °C/década")
+    print(f"rejilla completa con el bucle por celda: ~{nlat * nlon / base:,.0f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Memoria del motor de estadísticas al crecer el dataset: se generan NetCDF
+sintéticos con cada vez más años y se mide el RSS máximo de un proceso nuevo
+que calcula la tabla del EDA. Para el menor se compara además con el cálculo
+exacto en memoria (numpy).
+
+    python -m benchmarks.bench_estadisticas --anios 10 20 40 80
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias.estadisticas import CUANTILES
+from anomalias.sintetico import crear_netcdf_sintetico
+
+
+def exacta(ruta):
+    import xarray as xr
+
+    with xr.open_dataset(ruta, decode_times=False) as ds:
+        v = ds['temperature'].values.ravel()
+    v = v[~np.isnan(v)].astype(np.float64)
+    tabla = {'count': v.size, 'mean': v.mean(), 'std': v.std(ddof=1), 'min': v.min(), 'max': v.max()}
+    tabla.update(zip(CUANTILES, np.quantile(v, list(CUANTILES.values()))))
+    return tabla, v
+
+
+def pico_rss_mb():
+    # VmHWM es propio de la imagen del proceso; ru_maxrss se hereda del padre a través de fork/exec
+    with open('/proc/self/status') as f:
+        linea = next(l for l in f if l.startswith('VmHWM:'))
+    return int(linea.split()[1]) / 1024
+
+
+def interno(ruta):
+    from anomalias.estadisticas import estadisticas_netcdf
+
+    t0 = time.perf_counter()
+    estadisticas, _ = estadisticas_netcdf(ruta)
+    print(json.dumps({'tabla': estadisticas.tabla(), 'rss': pico_rss_mb(), 'segundos': time.perf_counter() - t0}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--anios', type=int, nargs='+', default=[10, 20, 40, 80])
+    parser.add_argument('--resolucion', type=float, default=1.0)
+    parser.add_argument('--interno', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.interno:
+        interno(args.interno)
+        return
+
+    directorio = tempfile.mkdtemp()
+    print(f"{'años':>5}{'valores':>14}{'s':>8}{'RSS MB':>9}")
+    for i, anios in enumerate(sorted(args.anios)):
+        ruta = crear_netcdf_sintetico(os.path.join(directorio, f'{anios}.nc'), 1850, 1850 + anios - 1,
+                                      args.resolucion)
+        salida = subprocess.run([sys.executable, '-m', 'benchmarks.bench_estadisticas', '--interno', ruta],
+                                check=True, capture_output=True, text=True).stdout
+        r = json.loads(salida)
+        print(f"{anios:>5}{r['tabla']['count']:>14,}{r['segundos']:>8.1f}{r['rss']:>9.0f}")
+        if i == 0:
+            referencia, valores = exacta(ruta)
+            errores = {}
+            for clave, q in CUANTILES.items():
+                # Error de rango: fracción de valores entre el cuantil exacto y el estimado
+                rango = np.searchsorted(np.sort(valores), r['tabla'][clave]) / valores.size
+                errores[clave] = abs(rango - q)
+            print("  diferencia con numpy: " + ", ".join(
+                f"{c} {abs(r['tabla'][c] - referencia[c]):.2e}" for c in ('mean', 'std', 'min', 'max')))
+            print("  error de rango de los cuantiles: " + ", ".join(f"{c} {e:.4%}" for c, e in errores.items()))
+        os.remove(ruta)
+
+
+if __name__ == '__main__':
+    main()
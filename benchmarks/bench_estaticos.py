@@ -0,0 +1,120 @@
+"""
+Bytes transferidos en una primera visita a la pestaña Resultados, antes y
+después del pipeline de recursos estáticos (`anomalias.estaticos`).
+
+Antes: sin compresión y con los PNG originales. Después: con gzip/brotli
+(Accept-Encoding) y con la variante AVIF que elegiría el navegador para una
+ventana de `--ancho-ventana` px, con densidad 1 y 2. Las imágenes se cuentan
+todas, aunque con la carga diferida las que no llegan a verse no se descargan.
+
+Ejecutar antes `python -m anomalias.estaticos` para generar las variantes.
+
+    python -m benchmarks.bench_estaticos
+"""
+import argparse
+import json
+import re
+
+import app as dashboard
+from anomalias.componentes import TAMANOS_FIGURA
+from anomalias.estaticos import variantes_estaticas
+from benchmarks.bench_layouts import payload_callback
+
+RECURSOS = re.compile(r'<(?:script|link)[^>]+(?:src|href)="([^"]+)"')
+
+
+def imagenes(nodo):
+    """(src, {tipo: srcSet}, sizes) de cada <picture> del árbol de componentes."""
+    if isinstance(nodo, list):
+        for hijo in nodo:
+            yield from imagenes(hijo)
+    elif isinstance(nodo, dict):
+        if nodo.get('type') == 'Picture':
+            hijos = nodo['props']['children']
+            img = hijos[-1]['props']
+            fuentes = {h['props']['type']: h['props']['srcSet'] for h in hijos[:-1]}
+            sizes = hijos[0]['props'].get('sizes', TAMANOS_FIGURA) if len(hijos) > 1 else TAMANOS_FIGURA
+            yield img['src'], fuentes, sizes
+            return
+        for valor in nodo.values():
+            yield from imagenes(valor)
+
+
+def elegir(srcset, ancho_px):
+    """Candidato que elegiría el navegador: el menor con ancho >= ancho_px, o el mayor."""
+    candidatos = sorted((int(w.rstrip('w')), url) for url, w in (c.strip().split(' ') for c in srcset.split(',')))
+    return next((url for w, url in candidatos if w >= ancho_px), candidatos[-1][1])
+
+
+def ancho_presentacion(sizes, ventana):
+    # Solo entiende las dos formas que usan los componentes: '100vw' y '(min-width: Npx) 50vw, 100vw'
+    m = re.match(r'\(min-width: (\d+)px\) (\d+)vw', sizes)
+    if m and ventana >= int(m.group(1)):
+        return ventana * int(m.group(2)) / 100
+    return ventana
+
+
+def medir(cliente, codificacion, ancho_ventana, densidad):
+    cabeceras = {'Accept-Encoding': codificacion} if codificacion else {}
+    por_tipo = {}
+
+    def pedir(tipo, ruta, metodo='get', **kwargs):
+        respuesta = getattr(cliente, metodo)(ruta, headers=cabeceras, **kwargs)
+        por_tipo[tipo] = por_tipo.get(tipo, 0) + len(respuesta.data)
+        return respuesta
+
+    # Qué enlaza la página y la pestaña se lee sin compresión; lo que se cuenta, con las cabeceras del escenario
+    referencia = dashboard.server.test_client()
+    recursos = RECURSOS.findall(referencia.get('/').get_data(as_text=True))
+    contenido = referencia.post('/_dash-update-component', data=json.dumps(payload_callback('tab-resultados')),
+                                content_type='application/json').get_json()
+
+    pedir('html', '/')
+    for recurso in recursos:
+        if recurso.startswith('/'):
+            pedir('css' if '.css' in recurso else 'js', recurso)
+    pedir('layout', '/_dash-layout')
+    pedir('layout', '/_dash-dependencies')
+    pedir('callback', '/_dash-update-component', metodo='post',
+          data=json.dumps(payload_callback('tab-resultados')), content_type='application/json')
+
+    originales = {entrada['src']: nombre for nombre, entrada in variantes_estaticas().items()}
+    for src, fuentes, sizes in imagenes(contenido):
+        if codificacion is None:
+            # Antes: el PNG original que enlazaba la pestaña
+            png = src[len('/assets/'):]
+            pedir('imagenes', '/assets/' + originales.get(png, png))
+        elif 'image/avif' in fuentes:
+            pedir('imagenes', elegir(fuentes['image/avif'], ancho_presentacion(sizes, ancho_ventana) * densidad))
+        else:
+            pedir('imagenes', src)
+    return por_tipo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ancho-ventana', type=int, default=1280)
+    args = parser.parse_args()
+
+    cliente = dashboard.server.test_client()
+    codificacion = 'br, gzip'
+    escenarios = {
+        'antes': medir(cliente, None, args.ancho_ventana, 1),
+        'después (1x)': medir(cliente, codificacion, args.ancho_ventana, 1),
+        'después (2x)': medir(cliente, codificacion, args.ancho_ventana, 2),
+    }
+    tipos = list(escenarios['antes'])
+    print(f"{'escenario':<15}" + ''.join(f'{t:>12}' for t in tipos) + f"{'total':>12}")
+    for nombre, por_tipo in escenarios.items():
+        print(f"{nombre:<15}" + ''.join(f'{por_tipo.get(t, 0):>12,}' for t in tipos)
+              + f"{sum(por_tipo.values()):>12,}")
+
+    usada = cliente.get('/_dash-layout', headers={'Accept-Encoding': codificacion}).headers.get('Content-Encoding')
+    print(f"\ncodificación del servidor: {usada}")
+    for ruta in ('/assets/custom.css?m=1', '/assets/' + next(iter(variantes_estaticas().values()), {}).get('src', '')):
+        respuesta = cliente.get(ruta, headers={'Accept-Encoding': 'gzip'})
+        print(f"{ruta[:50]:<52}{respuesta.headers.get('Cache-Control', '-')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Latencia de los callbacks del explorador y memoria del worker frente al tamaño
+del cubo. Si no se indica --netcdf se genera uno sintético en un directorio temporal.
+
+    python -m benchmarks.bench_explorador --anio-fin 1950
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+
+from anomalias.sintetico import crear_netcdf_sintetico
+
+
+def rss_max_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def peticion(output, inputs):
+    componente, propiedad = output.split('.')
+    return json.dumps({
+        'output': output,
+        'outputs': {'id': componente, 'property': propiedad},
+        'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+        'changedPropIds': [],
+        'state': [],
+    })
+
+
+def percentiles(latencias):
+    latencias = sorted(latencias)
+    return statistics.median(latencias), latencias[min(len(latencias) - 1, int(0.99 * len(latencias)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--netcdf')
+    parser.add_argument('--anio-inicio', type=int, default=1850)
+    parser.add_argument('--anio-fin', type=int, default=1900)
+    parser.add_argument('--repeticiones', type=int, default=30)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    ruta = args.netcdf or crear_netcdf_sintetico(os.path.join(directorio, 'best.nc'),
+                                                 args.anio_inicio, args.anio_fin)
+    os.environ['ANOMALIAS_NETCDF'] = ruta
+
+    import app as dashboard
+    from anomalias import datos, explorador
+
+    ds = datos.abrir_dataset()
+    anio_min, anio_max = datos.rango_anios(ds)
+    tamano_cubo_mb = ds['temperature'].size * 4 / 2 ** 20
+    cliente = dashboard.server.test_client()
+    cliente.get('/')
+    rss_inicial = rss_max_mb()
+
+    rng = random.Random(0)
+    mapa, serie = [], []
+    for _ in range(args.repeticiones):
+        anio, mes = rng.randint(anio_min, anio_max), rng.randint(1, 12)
+        t0 = time.perf_counter()
+        respuesta = cliente.post('/_dash-update-component', content_type='application/json', data=peticion(
+            'explorador-mapa.figure',
+            [('explorador-anio', 'value', anio), ('explorador-anio', 'drag_value', anio),
+             ('explorador-mes', 'value', mes), ('explorador-mapa', 'relayoutData', None),
+             ('explorador-capa', 'value', 'anomalia')]))
+        assert respuesta.status_code == 200, respuesta.status_code
+        mapa.append((time.perf_counter() - t0) * 1000)
+
+        click = {'points': [{'y': rng.uniform(-60, 60), 'x': rng.uniform(-180, 180)}]}
+        t0 = time.perf_counter()
+        respuesta = cliente.post('/_dash-update-component', content_type='application/json', data=peticion(
+            'explorador-serie.figure',
+            [('explorador-mapa', 'clickData', click),
+             ('explorador-anio', 'value', anio), ('explorador-mes', 'value', mes)]))
+        assert respuesta.status_code == 200, respuesta.status_code
+        serie.append((time.perf_counter() - t0) * 1000)
+
+    print(f"Cubo: {ds['temperature'].shape} ({tamano_cubo_mb:.0f} MB en float32)")
+    print(f"Presupuesto: {explorador.PRESUPUESTO_MS:.0f} ms")
+    for nombre, latencias in (('mapa', mapa), ('serie', serie)):
+        p50, p99 = percentiles(latencias)
+        print(f"{nombre:<6} p50 {p50:7.1f} ms   p99 {p99:7.1f} ms")
+    print(f"RSS máximo: {rss_max_mb():.0f} MB (con la app cargada, antes de consultar: {rss_inicial:.0f} MB)")
+
+
+if __name__ == '__main__':
+    main()
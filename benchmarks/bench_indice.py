@@ -0,0 +1,154 @@
+"""
+Consultas sobre el índice espacio-temporal frente al NetCDF: historia completa
+de una celda (2100 meses con el rango por defecto), un mes de todo el globo,
+una caja de 10° × 10° durante 10 años y su media regional. Para cada consulta
+se mide también el orden "equivocado" del índice, para ver qué aporta tener
+los dos.
+
+En frío, antes de cada consulta se descarta la caché de páginas de los
+ficheros (posix_fadvise) y se vuelven a abrir, fuera de la medida, para que
+no quede nada en memmaps ni en la caché de chunks de HDF5.
+
+    python -m benchmarks.bench_indice --anio-inicio 1850 --anio-fin 2024
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias import datos
+from anomalias.indice import Indice, construir_indice
+from anomalias.sintetico import crear_netcdf_sintetico
+
+
+def descartar_cache(rutas):
+    for ruta in rutas:
+        descriptor = os.open(ruta, os.O_RDONLY)
+        try:
+            os.posix_fadvise(descriptor, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(descriptor)
+
+
+def cerrar(fuente):
+    # Los Dataset de xarray comparten el fichero abierto (y su caché de chunks)
+    # mientras quede alguno sin cerrar
+    if hasattr(fuente, 'close'):
+        fuente.close()
+
+
+def medir(abrir, consulta, argumentos, rutas, frio):
+    """Mediana en ms. En caliente cada consulta se repite y se mide la segunda."""
+    latencias = []
+    fuente = None if frio else abrir()
+    for args in argumentos:
+        if frio:
+            descartar_cache(rutas)
+            fuente = abrir()
+        else:
+            consulta(fuente, *args)
+        t0 = time.perf_counter()
+        consulta(fuente, *args)
+        latencias.append((time.perf_counter() - t0) * 1000)
+        if frio:
+            # posix_fadvise no descarta páginas que sigan mapeadas
+            cerrar(fuente)
+            fuente = None
+    if not frio:
+        cerrar(fuente)
+    return statistics.median(latencias)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--netcdf')
+    parser.add_argument('--indice')
+    parser.add_argument('--anio-inicio', type=int, default=1850)
+    parser.add_argument('--anio-fin', type=int, default=2024)
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    ruta = args.netcdf or crear_netcdf_sintetico(os.path.join(directorio, 'best.nc'),
+                                                 args.anio_inicio, args.anio_fin)
+    if args.indice:
+        destino = args.indice
+    else:
+        t0 = time.perf_counter()
+        destino = construir_indice(ruta, os.path.join(directorio, 'indice'))
+        print(f"Construcción del índice: {time.perf_counter() - t0:.1f} s")
+
+    with datos.abrir_dataset(ruta) as ds:
+        anio_min, anio_max = datos.rango_anios(ds)
+    indice = Indice(destino)
+    nlat, nlon = len(indice.lat), len(indice.lon)
+    por_tiempo = os.path.join(destino, 'temperatura.npy')
+    por_celda = os.path.join(destino, 'temperatura_celdas.npy')
+    print(f"Rejilla {nlat}×{nlon}, {indice.meses} meses\n")
+
+    def puntos(rng):
+        return [(rng.uniform(-60, 60), rng.uniform(-180, 180)) for _ in range(args.repeticiones)]
+
+    def fechas(rng):
+        return [(rng.randint(anio_min, anio_max), rng.randint(1, 12)) for _ in range(args.repeticiones)]
+
+    def cajas(rng):
+        resultado = []
+        for _ in range(args.repeticiones):
+            lat, lon = rng.randrange(-60, 50, 10), rng.randrange(-180, 170, 10)
+            anio = rng.randint(anio_min, anio_max - 10)
+            resultado.append((lat, lat + 10, lon, lon + 10, (anio, 1), (anio + 9, 12)))
+        return resultado
+
+    def caja_netcdf(ds, lat_min, lat_max, lon_min, lon_max, desde, hasta):
+        t0, t1 = indice.rango_tiempo(desde, hasta)
+        return ds['temperature'][t0:t1].sel(latitude=slice(lat_min, lat_max), longitude=slice(lon_min, lon_max)).values
+
+    def historia_por_tiempo(ind, lat, lon):
+        return np.array(ind.temperatura[:, ind.celdas(lat, lon)[2]])
+
+    def mes_por_celda(ind, anio, mes):
+        return np.array(ind.temperatura_celdas[:, int(ind.indices_tiempo(anio, mes))])
+
+    def netcdf():
+        return datos.abrir_dataset(ruta)
+
+    def abrir():
+        return Indice(destino)
+
+    casos = [
+        ('historia de una celda', [
+            ('NetCDF', netcdf, datos.serie_celda, [ruta]),
+            ('índice por celda', abrir, Indice.historia, [por_celda]),
+            ('índice por tiempo', abrir, historia_por_tiempo, [por_tiempo]),
+        ], puntos),
+        ('mes global', [
+            ('NetCDF', netcdf, datos.mapa_mes, [ruta]),
+            ('índice por tiempo', abrir, Indice.mes, [por_tiempo]),
+            ('índice por celda', abrir, mes_por_celda, [por_celda]),
+        ], fechas),
+        ('caja 10°×10°, 10 años', [
+            ('NetCDF', netcdf, caja_netcdf, [ruta]),
+            ('índice (caja)', abrir, Indice.caja, [por_tiempo, por_celda]),
+        ], cajas),
+        ('media regional', [
+            ('índice (media_region)', abrir, Indice.media_region, [por_tiempo, por_celda]),
+        ], cajas),
+    ]
+
+    # El NetCDF conserva chunks descomprimidos aunque se cierre el Dataset: cada
+    # medida usa argumentos nuevos para que en frío nada esté ya leído
+    rng = random.Random(0)
+    print(f"{'consulta':<24}{'fuente':<24}{'caliente ms':>12}{'frío ms':>10}")
+    for consulta, fuentes, muestras in casos:
+        for nombre, abrir_fuente, funcion, rutas in fuentes:
+            caliente = medir(abrir_fuente, funcion, muestras(rng), rutas, frio=False)
+            frio = medir(abrir_fuente, funcion, muestras(rng), rutas, frio=True)
+            print(f"{consulta:<24}{nombre:<24}{caliente:>12.2f}{frio:>10.2f}")
+
+if __name__ == '__main__':
+    main()
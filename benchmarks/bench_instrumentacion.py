@@ -0,0 +1,81 @@
+"""
+Coste de la instrumentación: latencia del callback de pestañas y de /_dash-layout
+con y sin métricas (ANOMALIAS_METRICAS), y coste de generar /metrics.
+
+Cada variante corre en un subproceso porque las métricas se registran al
+importar `app`.
+
+    python -m benchmarks.bench_instrumentacion
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_layouts import payload_callback
+
+
+def medir(repeticiones):
+    import app as dashboard
+
+    cliente = dashboard.server.test_client()
+    pestanas = dashboard.registro.valores()
+    cuerpos = [json.dumps(payload_callback(tab)) for tab in pestanas]
+    for cuerpo in cuerpos:
+        cliente.post('/_dash-update-component', data=cuerpo, content_type='application/json')
+
+    resultado = {}
+    t0 = time.perf_counter()
+    for k in range(repeticiones):
+        cliente.post('/_dash-update-component', data=cuerpos[k % len(cuerpos)], content_type='application/json')
+    resultado['callback_us'] = (time.perf_counter() - t0) / repeticiones * 1e6
+    t0 = time.perf_counter()
+    for _ in range(repeticiones):
+        cliente.get('/_dash-layout')
+    resultado['layout_us'] = (time.perf_counter() - t0) / repeticiones * 1e6
+    if dashboard.instrumentacion.metricas_activas():
+        t0 = time.perf_counter()
+        for _ in range(20):
+            texto = cliente.get('/metrics').get_data()
+        resultado['metrics_ms'] = (time.perf_counter() - t0) / 20 * 1000
+        resultado['metrics_bytes'] = len(texto)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeticiones', type=int, default=3000)
+    parser.add_argument('--rondas', type=int, default=3, help='subprocesos alternos por variante; se toma el mejor')
+    parser.add_argument('--interno', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        print(json.dumps(medir(args.repeticiones)))
+        return
+
+    mejores = {}
+    for _ in range(args.rondas):
+        for variante, valor in (('sin métricas', '0'), ('con métricas', '1')):
+            entorno = dict(os.environ, ANOMALIAS_METRICAS=valor)
+            salida = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_instrumentacion', '--interno',
+                 '--repeticiones', str(args.repeticiones)],
+                env=entorno, capture_output=True, text=True, check=True)
+            r = json.loads(salida.stdout.strip().splitlines()[-1])
+            previo = mejores.get(variante)
+            mejores[variante] = r if previo is None else {
+                k: min(v, previo[k]) if k.endswith('us') else v for k, v in r.items()}
+
+    print(f"{'variante':<14}{'callback µs':>13}{'layout µs':>12}")
+    for variante, r in mejores.items():
+        print(f"{variante:<14}{r['callback_us']:>13.0f}{r['layout_us']:>12.0f}")
+    base, medido = mejores['sin métricas'], mejores['con métricas']
+    print(f"sobrecoste por petición: {medido['callback_us'] - base['callback_us']:.0f} µs (callback), "
+          f"{medido['layout_us'] - base['layout_us']:.0f} µs (layout)")
+    print(f"/metrics: {medido['metrics_ms']:.2f} ms, {medido['metrics_bytes']:,} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Latencia y CPU del callback `render_content` con y sin el registro de layouts.
+
+Cada iteración hace un POST real a /_dash-update-component con el cliente de
+pruebas de Flask, así que el tiempo incluye la serialización que hace Dash.
+
+    python -m benchmarks.bench_layouts --repeticiones 200
+"""
+import argparse
+import json
+import statistics
+import time
+
+import app as dashboard
+
+
+def payload_callback(tab):
+    return {
+        'output': 'main-content.children',
+        'outputs': {'id': 'main-content', 'property': 'children'},
+        'inputs': [{'id': 'tabs-proyecto', 'property': 'value', 'value': tab}],
+        'changedPropIds': ['tabs-proyecto.value'],
+        'state': [],
+    }
+
+
+def medir(cliente, tab, repeticiones):
+    cuerpo = json.dumps(payload_callback(tab))
+    latencias = []
+    cpu_inicio = time.process_time()
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        respuesta = cliente.post('/_dash-update-component', data=cuerpo,
+                                 content_type='application/json')
+        latencias.append((time.perf_counter() - t0) * 1000)
+        assert respuesta.status_code == 200, respuesta.status_code
+    cpu_ms = (time.process_time() - cpu_inicio) * 1000 / repeticiones
+    latencias.sort()
+    return {
+        'p50_ms': statistics.median(latencias),
+        'p99_ms': latencias[min(len(latencias) - 1, int(0.99 * len(latencias)))],
+        'cpu_ms': cpu_ms,
+        'bytes': len(respuesta.data),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeticiones', type=int, default=100)
+    args = parser.parse_args()
+
+    cliente = dashboard.server.test_client()
+    cliente.get('/')  # dispara la inicialización perezosa de Dash
+
+    resultados = {}
+    for modo, reconstruir in (('antes (reconstruir)', True), ('después (caché)', False)):
+        dashboard.registro.reconstruir = reconstruir
+        dashboard.registro.invalidar()
+        resultados[modo] = {tab: medir(cliente, tab, args.repeticiones)
+                            for tab in dashboard.registro.valores()}
+
+    print(f"{'pestaña':<18}{'modo':<22}{'p50 ms':>9}{'p99 ms':>9}{'CPU ms':>9}{'bytes':>9}")
+    for tab in dashboard.registro.valores():
+        for modo, por_tab in resultados.items():
+            r = por_tab[tab]
+            print(f"{tab:<18}{modo:<22}{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+                  f"{r['cpu_ms']:>9.2f}{r['bytes']:>9}")
+    for modo, por_tab in resultados.items():
+        total = sum(r['cpu_ms'] for r in por_tab.values()) / len(por_tab)
+        print(f"CPU media por clic, {modo}: {total:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Peticiones por vista de página y tiempo hasta interactivo: modo servidor vs cliente.
+
+Simula una visita que carga el dashboard y recorre las ocho pestañas. Cada modo
+se mide en un subproceso porque el modo se decide al importar `app`.
+
+El "tiempo hasta interactivo" es el tiempo de servidor de las peticiones que el
+navegador necesita antes de poder mostrar la primera pestaña (/, _dash-layout,
+_dash-dependencies y, en modo servidor, el callback inicial). No incluye la
+descarga de los bundles JS de Dash, que es igual en ambos modos.
+
+    python -m benchmarks.bench_modo_cliente
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_layouts import payload_callback
+
+
+def visitar(repeticiones):
+    import app as dashboard
+
+    cliente = dashboard.server.test_client()
+    cliente.get('/')
+    pestanas = dashboard.registro.valores()
+
+    tti, peticiones, bytes_totales = [], 0, 0
+    for _ in range(repeticiones):
+        peticiones, bytes_totales = 0, 0
+        t0 = time.perf_counter()
+        for ruta in ('/', '/_dash-layout', '/_dash-dependencies'):
+            respuesta = cliente.get(ruta)
+            peticiones += 1
+            bytes_totales += len(respuesta.data)
+        if not dashboard.MODO_CLIENTE:
+            respuesta = cliente.post('/_dash-update-component',
+                                     data=json.dumps(payload_callback(pestanas[0])),
+                                     content_type='application/json')
+            peticiones += 1
+            bytes_totales += len(respuesta.data)
+        tti.append((time.perf_counter() - t0) * 1000)
+
+        # Recorrido por el resto de pestañas
+        if not dashboard.MODO_CLIENTE:
+            for tab in pestanas[1:]:
+                respuesta = cliente.post('/_dash-update-component',
+                                         data=json.dumps(payload_callback(tab)),
+                                         content_type='application/json')
+                peticiones += 1
+                bytes_totales += len(respuesta.data)
+
+    tti.sort()
+    return {
+        'peticiones_por_vista': peticiones,
+        'peticiones_por_cambio_de_pestana': 0 if dashboard.MODO_CLIENTE else 1,
+        'bytes_por_vista': bytes_totales,
+        'tti_p50_ms': tti[len(tti) // 2],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeticiones', type=int, default=50)
+    parser.add_argument('--interno', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        print(json.dumps(visitar(args.repeticiones)))
+        return
+
+    print(f"{'modo':<10}{'peticiones/vista':>18}{'por clic':>10}{'bytes/vista':>13}{'TTI p50 ms':>12}")
+    for modo, valor in (('servidor', '0'), ('cliente', '1')):
+        entorno = dict(os.environ, ANOMALIAS_MODO_CLIENTE=valor)
+        salida = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_modo_cliente', '--interno',
+             '--repeticiones', str(args.repeticiones)],
+            env=entorno, capture_output=True, text=True, check=True)
+        r = json.loads(salida.stdout.strip().splitlines()[-1])
+        print(f"{modo:<10}{r['peticiones_por_vista']:>18}{r['peticiones_por_cambio_de_pestana']:>10}"
+              f"{r['bytes_por_vista']:>13}{r['tti_p50_ms']:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Muestreo en streaming frente a cargar la tabla entera y sacar de ella una
+muestra aleatoria simple (lo que hacía el notebook con las 8M filas).
+
+Mide tiempo y memoria pico (cada variante en un proceso aparte, VmHWM) y
+compara la representación de los estratos escasos (celdas polares y primera
+década) y la media de la temperatura estimada con cada muestra. Comprueba
+además que la muestra estratificada es la misma con 1 y N procesos.
+
+    python -m benchmarks.bench_muestreo --anio-fin 2000 --filas 200000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias.features import OBJETIVO, construir_features
+from anomalias.muestreo import claves, muestrear
+from anomalias.sintetico import crear_netcdf_sintetico
+from benchmarks.bench_estadisticas import pico_rss_mb
+
+
+def tabla_completa(directorio, filas, semilla):
+    import pyarrow.parquet as pq
+
+    from anomalias.entrenamiento import partes
+
+    tabla = pq.read_table(partes(directorio)).to_pandas()
+    return tabla.sample(n=min(filas, len(tabla)), random_state=semilla)
+
+
+def resumen(latitud, anio, temperatura, peso=None):
+    peso = np.ones(len(latitud)) if peso is None else peso
+    return {
+        'polares': float(np.mean(np.abs(latitud) > 60)),
+        'primera_decada': float(np.mean(anio < anio.min() // 10 * 10 + 10)),
+        'media': float(np.average(temperatura, weights=peso)),
+    }
+
+
+def interno(modo, directorio, filas, procesos):
+    t0 = time.perf_counter()
+    if modo == 'tabla':
+        muestra = tabla_completa(directorio, filas, 0)
+        r = resumen(muestra['latitud'].to_numpy(), muestra['anio'].to_numpy(), muestra[OBJETIVO].to_numpy())
+    else:
+        columnas, _ = muestrear(directorio, filas, uniforme=modo == 'uniforme', procesos=procesos)
+        r = resumen(columnas['latitud'], columnas['anio'], columnas[OBJETIVO], columnas['peso'])
+    print(json.dumps({**r, 'segundos': time.perf_counter() - t0, 'rss': pico_rss_mb()}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--features')
+    parser.add_argument('--anio-inicio', type=int, default=1850)
+    parser.add_argument('--anio-fin', type=int, default=1960)
+    parser.add_argument('--resolucion', type=float, default=1.0)
+    parser.add_argument('--filas', type=int, default=200_000)
+    parser.add_argument('--procesos', type=int, default=os.cpu_count())
+    parser.add_argument('--interno', nargs=4, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.interno:
+        modo, directorio, filas, procesos = args.interno
+        interno(modo, directorio, int(filas), int(procesos))
+        return
+
+    import pyarrow.dataset as pads
+
+    directorio = args.features
+    if not directorio:
+        temporal = tempfile.mkdtemp()
+        ruta = crear_netcdf_sintetico(os.path.join(temporal, 'best.nc'), args.anio_inicio, args.anio_fin,
+                                      args.resolucion)
+        directorio = os.path.join(temporal, 'features')
+        # Desde el primer año: en el sintético, como en BEST, los polos y las
+        # primeras décadas tienen pocas celdas con dato
+        construir_features(ruta, directorio, anio_min=args.anio_inicio)
+    tabla = pads.dataset(directorio).to_table(columns=['latitud', 'anio', OBJETIVO])
+    poblacion = resumen(tabla.column('latitud').to_numpy(), tabla.column('anio').to_numpy(),
+                        tabla.column(OBJETIVO).to_numpy())
+    print(f"{tabla.num_rows:,} filas, muestra de {args.filas:,}\n")
+    print(f"{'variante':<26}{'s':>7}{'RSS MB':>8}{'% polares':>11}{'% 1.ª década':>14}{'media':>9}")
+    print(f"{'(población)':<26}{'':>7}{'':>8}{poblacion['polares']:>11.2%}{poblacion['primera_decada']:>14.2%}"
+          f"{poblacion['media']:>9.4f}")
+    del tabla
+    for nombre, modo in [('tabla entera + sample()', 'tabla'), ('reservorio (uniforme)', 'uniforme'),
+                         ('estratificado', 'estratificado')]:
+        salida = subprocess.run([sys.executable, '-m', 'benchmarks.bench_muestreo', '--interno', modo, directorio,
+                                 str(args.filas), str(args.procesos)],
+                                check=True, capture_output=True, text=True).stdout
+        r = json.loads(salida)
+        print(f"{nombre:<26}{r['segundos']:>7.2f}{r['rss']:>8.0f}{r['polares']:>11.2%}{r['primera_decada']:>14.2%}"
+              f"{r['media']:>9.4f}")
+
+    muestras = []
+    for procesos in sorted({1, max(args.procesos, 2)}):
+        columnas, _ = muestrear(directorio, args.filas, procesos=procesos, filas_por_lote=100_000 * procesos)
+        muestras.append(set(claves(0, columnas['celda'], columnas['anio'], columnas['mes']).tolist()))
+    print(f"\nMisma muestra con 1 y {max(args.procesos, 2)} procesos: {muestras[0] == muestras[-1]}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Tiempo por fotograma del mapa: lectura a resolución completa del NetCDF frente
+a cada nivel de la pirámide. Un fotograma = leer el mes, construir la figura
+Heatmap y serializarla a JSON, que es lo que hace el callback del explorador.
+
+    python -m benchmarks.bench_piramide --anio-fin 1950
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import plotly.graph_objects as go
+from plotly.io.json import to_json_plotly
+
+from anomalias import datos
+from anomalias.piramide import Piramide, construir_piramide
+from anomalias.sintetico import crear_netcdf_sintetico
+
+
+def fotograma(lat, lon, z):
+    return to_json_plotly(go.Figure(go.Heatmap(z=z, x=lon, y=lat, colorscale='RdBu_r', zmid=0)))
+
+
+def medir(funcion, fechas):
+    latencias, tamano = [], 0
+    for anio, mes in fechas:
+        t0 = time.perf_counter()
+        tamano = len(funcion(anio, mes))
+        latencias.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(latencias), max(latencias), tamano
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--netcdf')
+    parser.add_argument('--anio-inicio', type=int, default=1850)
+    parser.add_argument('--anio-fin', type=int, default=1900)
+    parser.add_argument('--fotogramas', type=int, default=50)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    ruta = args.netcdf or crear_netcdf_sintetico(os.path.join(directorio, 'best.nc'),
+                                                 args.anio_inicio, args.anio_fin)
+    t0 = time.perf_counter()
+    piramide = Piramide(construir_piramide(ruta, os.path.join(directorio, 'piramide')))
+    print(f"Construcción de la pirámide: {time.perf_counter() - t0:.1f} s")
+
+    ds = datos.abrir_dataset(ruta)
+    anio_min, anio_max = datos.rango_anios(ds)
+    rng = random.Random(0)
+    fechas = [(rng.randint(anio_min, anio_max), rng.randint(1, 12)) for _ in range(args.fotogramas)]
+
+    casos = {'NetCDF 1°': lambda a, m: fotograma(ds['latitude'].values, ds['longitude'].values,
+                                                  datos.mapa_mes(ds, a, m))}
+    for k in piramide.niveles:
+        casos[f'pirámide {k}°'] = lambda a, m, k=k: fotograma(*piramide.mapa(a, m, k))
+
+    print(f"{'fuente':<14}{'p50 ms':>9}{'máx ms':>9}{'KB JSON':>10}")
+    for nombre, funcion in casos.items():
+        p50, maximo, tamano = medir(funcion, fechas)
+        print(f"{nombre:<14}{p50:>9.2f}{maximo:>9.2f}{tamano / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Ensemble por regiones frente al modelo global: tiempo de entrenamiento (el
+ensemble entrena sus regiones en paralelo), error global y por región en el
+periodo de prueba, y rendimiento de inferencia (filas/s) del enrutador frente
+al booster único con el mismo número de hilos, con las filas mezcladas y en el
+orden del almacén.
+
+    python -m benchmarks.bench_regiones --anio-fin 2000 --particion latitud_tierra --rondas 100
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias.entrenamiento import entrenar, leer_lotes, partes
+from anomalias.features import construir_features
+from anomalias.regiones import PARTICIONES, entrenar_regiones
+from anomalias.sintetico import crear_netcdf_sintetico
+
+
+def filas_por_segundo(modelos, X, repeticiones):
+    """Filas/s de cada modelo; se alternan en cada repetición y se toma la mejor para quitar ruido."""
+    tiempos = {nombre: [] for nombre in modelos}
+    for modelo in modelos.values():
+        modelo.inplace_predict(X[:1000])
+    for _ in range(repeticiones):
+        for nombre, modelo in modelos.items():
+            t0 = time.perf_counter()
+            modelo.inplace_predict(X)
+            tiempos[nombre].append(time.perf_counter() - t0)
+    return {nombre: len(X) / min(t) for nombre, t in tiempos.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--features')
+    parser.add_argument('--anio-inicio', type=int, default=1850)
+    parser.add_argument('--anio-fin', type=int, default=1960)
+    parser.add_argument('--resolucion', type=float, default=2.0)
+    parser.add_argument('--particion', choices=PARTICIONES, default='latitud')
+    parser.add_argument('--rondas', type=int, default=100)
+    parser.add_argument('--procesos', type=int)
+    parser.add_argument('--filas-inferencia', type=int, default=200_000)
+    parser.add_argument('--repeticiones', type=int, default=15)
+    args = parser.parse_args()
+
+    directorio = tempfile.mkdtemp()
+    features = args.features
+    if not features:
+        ruta = crear_netcdf_sintetico(os.path.join(directorio, 'best.nc'), args.anio_inicio, args.anio_fin,
+                                      args.resolucion)
+        features = os.path.join(directorio, 'features')
+        construir_features(ruta, features)
+    anio_corte = (max(args.anio_inicio, 1900) + args.anio_fin) // 2
+    hilos = os.cpu_count() or 1
+
+    booster, global_ = entrenar(features, os.path.join(directorio, 'global'), anio_corte, num_rondas=args.rondas,
+                                nthread=hilos)
+    ensemble, regional = entrenar_regiones(features, os.path.join(directorio, 'regiones'), args.particion,
+                                           anio_corte, num_rondas=args.rondas, procesos=args.procesos)
+
+    print(f"{global_['filas_entrenamiento']:,} filas de entrenamiento, {args.rondas} rondas, {hilos} CPU\n")
+    print(f"{'modelo':<26}{'entrenamiento s':>16}{'MAE':>9}{'RMSE':>9}{'R²':>8}")
+    for nombre, r in [('global', global_), (f"regiones ({regional['procesos']} proc.)", regional)]:
+        p = r['prueba']
+        print(f"{nombre:<26}{r['segundos']['entrenamiento']:>16.1f}{p['mae']:>9.4f}{p['rmse']:>9.4f}{p['r2']:>8.4f}")
+
+    print(f"\n{'región':<22}{'filas':>11}{'MAE región':>12}{'MAE global':>12}")
+    from anomalias.entrenamiento import evaluar
+    from anomalias.regiones import definir_regiones
+
+    filtros = {nombre: f for _, nombre, f in definir_regiones(args.particion)}
+    for nombre, r in regional['regiones'].items():
+        mae_global = evaluar(booster, partes(features), anio_desde=anio_corte, filtros=filtros[nombre])['mae']
+        mae = f"{r['mae']:.4f}" if r['mae'] is not None else '—'
+        print(f"{nombre:<22}{r['filas_entrenamiento']:>11,}{mae:>12}"
+              f"{mae_global if mae_global is not None else float('nan'):>12.4f}")
+
+    lotes = []
+    for X, _ in leer_lotes(partes(features), anio_desde=anio_corte):
+        lotes.append(X)
+    X = np.concatenate(lotes)
+    muestra = np.random.default_rng(0).permutation(len(X))[:args.filas_inferencia]
+    booster.set_param({'nthread': hilos})
+    ensemble.set_param({'nthread': hilos})
+    # En el orden del almacén las filas llegan agrupadas por banda; mezcladas, el enrutador ordena y copia
+    for descripcion, filas in (('mezcladas de todas las regiones', X[muestra]),
+                               ('en el orden del almacén', X[np.sort(muestra)])):
+        print(f"\nInferencia ({len(filas):,} filas {descripcion}, {hilos} hilos):")
+        fps = filas_por_segundo({'global': booster, 'enrutador': ensemble}, filas, args.repeticiones)
+        for nombre, valor in fps.items():
+            print(f"  {nombre:<10}{valor:>14,.0f} filas/s ({valor / fps['global']:.0%} del global)")
+
+
+if __name__ == '__main__':
+    main()
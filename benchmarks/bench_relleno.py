@@ -0,0 +1,101 @@
+"""
+Relleno de huecos vectorizado frente a un bucle por celda (np.interp en cada
+serie y media de vecinos celda a celda) sobre una banda de latitud, y el
+NetCDF completo con 1 y N procesos. Comprueba que ambos caminos coinciden y que
+el resultado no depende del tamaño de las bandas.
+
+    python -m benchmarks.bench_relleno --anio-fin 2024 --procesos 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from anomalias.relleno import MAX_HUECO, MIN_VECINOS, interpolar_tiempo, rellenar_espacio, rellenar_netcdf
+from anomalias.sintetico import crear_netcdf_sintetico
+
+
+def por_celda(x, max_hueco=MAX_HUECO, min_vecinos=MIN_VECINOS):
+    """Referencia con bucles: x (tiempo, lat, lon) sin margen."""
+    nt, nlat, nlon = x.shape
+    y = x.copy()
+    t = np.arange(nt)
+    for i in range(nlat):
+        for j in range(nlon):
+            serie = x[:, i, j]
+            validos = np.flatnonzero(~np.isnan(serie))
+            if len(validos) < 2:
+                continue
+            huecos = np.flatnonzero(np.diff(validos) - 1 > 0)
+            for h in huecos:
+                a, b = validos[h], validos[h + 1]
+                if b - a - 1 <= max_hueco:
+                    y[a + 1:b, i, j] = np.interp(t[a + 1:b], [a, b], serie[[a, b]])
+    mascara = (~np.isnan(x)).any(axis=0)
+    z = y.copy()
+    for i in range(nlat):
+        for j in range(nlon):
+            if not mascara[i, j]:
+                continue
+            for k in np.flatnonzero(np.isnan(y[:, i, j])):
+                vecinos = [y[k, i + di, (j + dj) % nlon] for di in (-1, 0, 1) for dj in (-1, 0, 1)
+                           if (di or dj) and 0 <= i + di < nlat]
+                vecinos = [v for v in vecinos if not np.isnan(v)]
+                if len(vecinos) >= min_vecinos:
+                    z[k, i, j] = np.mean(vecinos, dtype=np.float32)
+    return z
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--netcdf')
+    parser.add_argument('--anio-inicio', type=int, default=1850)
+    parser.add_argument('--anio-fin', type=int, default=1950)
+    parser.add_argument('--resolucion', type=float, default=1.0)
+    parser.add_argument('--filas', type=int, default=20, help='filas de latitud de la comparación por celda')
+    parser.add_argument('--procesos', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    import xarray as xr
+
+    directorio = tempfile.mkdtemp()
+    ruta = args.netcdf or crear_netcdf_sintetico(os.path.join(directorio, 'best.nc'), args.anio_inicio,
+                                                 args.anio_fin, args.resolucion)
+    with xr.open_dataset(ruta, decode_times=False) as ds:
+        # Las filas más al norte: las que más huecos tienen
+        x = ds['temperature'][:, -args.filas:, :].values.astype(np.float32)
+    print(f"Banda de {x.shape[1]}×{x.shape[2]} celdas × {x.shape[0]} meses, {int(np.isnan(x).sum()):,} NaN")
+
+    t0 = time.perf_counter()
+    referencia = por_celda(x)
+    t_bucle = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    y, _ = interpolar_tiempo(x)
+    z, _ = rellenar_espacio(y, (~np.isnan(x)).any(axis=0))
+    t_vector = time.perf_counter() - t0
+    diferencia = float(np.nanmax(np.abs(z - referencia)))
+    iguales = np.array_equal(np.isnan(z), np.isnan(referencia))
+    print(f"  bucle por celda {t_bucle:8.2f} s\n  vectorizado     {t_vector:8.2f} s  ({t_bucle / t_vector:.0f}×)")
+    print(f"  mismos NaN: {iguales}, máx. |diferencia| {diferencia:.2g}\n")
+
+    print(f"{'NetCDF completo':<22}{'s':>8}{'RSS MB':>9}{'NaN antes':>13}{'después':>12}")
+    salidas = {}
+    for procesos, filas_banda in [(1, None), (args.procesos, None), (1, 7)]:
+        destino = os.path.join(directorio, f'relleno-{procesos}-{filas_banda}.nc')
+        r = rellenar_netcdf(ruta, destino, procesos=procesos, filas_banda=filas_banda)
+        salidas[destino] = r
+        nombre = f"{procesos} proc., {r['teselas']} teselas"
+        print(f"{nombre:<22}{r['segundos']:>8.2f}{r['rss_max_mb']:>9.0f}{r['nan_antes']:>13,}{r['nan_despues']:>12,}")
+    rutas = list(salidas)
+    with xr.open_dataset(rutas[0], decode_times=False) as a:
+        iguales = []
+        for otra in rutas[1:]:
+            with xr.open_dataset(otra, decode_times=False) as b:
+                iguales.append(np.array_equal(a['temperature'].values, b['temperature'].values, equal_nan=True))
+    print(f"Mismo resultado con otros procesos y bandas: {all(iguales)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""
+Arranque y memoria de gunicorn con N workers: con `--preload` (la
+configuración de `gunicorn.conf.py`: app y modelo cargados una vez en el
+maestro y compartidos copy-on-write) frente a cargar la app y el modelo en
+cada worker. Mide el tiempo hasta que todos los workers responden y el RSS,
+PSS y USS de cada uno (PSS reparte las páginas compartidas).
+
+Sin `--modelo` entrena un modelo sintético de tamaño parecido al de producción.
+Con `--comprobar` termina con código 1 si la configuración servida (preload)
+supera los límites de arranque o de memoria por worker, o si el modelo no se
+carga una sola vez.
+
+    python -m benchmarks.bench_workers --workers 4
+    python -m benchmarks.bench_workers --comprobar --max-arranque 10 --max-rss-mb 300 --max-uss-mb 64
+"""
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_api import puerto_libre
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Límites de --comprobar (y de tests/test_workers.py) para la configuración servida
+MIN_WORKERS = 4
+MAX_ARRANQUE = 10.0
+MAX_RSS_MB = 300.0
+MAX_USS_MB = 64.0
+
+
+def modelo_sintetico(ruta, rondas, profundidad):
+    import xgboost as xgb
+
+    from anomalias.features import COLUMNAS_FEATURES
+
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200_000, len(COLUMNAS_FEATURES))).astype(np.float32)
+    y = X[:, 0] + np.sin(X[:, 3] * 3) + rng.normal(scale=0.5, size=len(X))
+    booster = xgb.train({'tree_method': 'hist', 'max_depth': profundidad, 'learning_rate': 0.05},
+                        xgb.DMatrix(X, y), num_boost_round=rondas)
+    booster.save_model(ruta)
+    return ruta
+
+
+def arrancar(modelo, workers, preload):
+    puerto = puerto_libre()
+    orden = [sys.executable, '-m', 'gunicorn', 'app:server', '-w', str(workers), '-b', f'127.0.0.1:{puerto}',
+             '--log-level', 'warning']
+    if not preload:
+        # Configuración vacía en lugar de gunicorn.conf.py: sin preload ni post_fork
+        vacia = os.path.join(tempfile.mkdtemp(), 'gunicorn_vacio.conf.py')
+        open(vacia, 'w').close()
+        orden += ['-c', vacia]
+    t0 = time.perf_counter()
+    proceso = subprocess.Popen(orden, cwd=RAIZ, env={**os.environ, 'ANOMALIAS_MODELO': modelo})
+    vistos = {}
+    limite = time.monotonic() + 300
+    while len(vistos) < workers and time.monotonic() < limite:
+        try:
+            conexion = http.client.HTTPConnection('127.0.0.1', puerto, timeout=10)
+            conexion.request('GET', '/api/modelo')
+            info = json.loads(conexion.getresponse().read())
+            conexion.close()
+            vistos[info['pid']] = info
+        except (ConnectionRefusedError, OSError):
+            time.sleep(0.05)
+    segundos = time.perf_counter() - t0
+    if len(vistos) < workers:
+        proceso.kill()
+        raise RuntimeError("No respondieron todos los workers")
+    return proceso, segundos, vistos
+
+
+def memoria_proceso(pid):
+    # RSS, PSS y USS (páginas privadas) en MB, de /proc/<pid>/smaps_rollup
+    campos = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) == 3 and partes[2] == 'kB':
+                campos[partes[0].rstrip(':')] = int(partes[1]) / 1024
+    return campos['Rss'], campos['Pss'], campos['Private_Clean'] + campos['Private_Dirty']
+
+
+def memoria(proceso):
+    with open(f'/proc/{proceso.pid}/task/{proceso.pid}/children') as f:
+        hijos = [int(p) for p in f.read().split()]
+    return [('maestro', memoria_proceso(proceso.pid))] + [(f'worker {p}', memoria_proceso(p)) for p in hijos]
+
+
+def medir(modelo, workers, preload):
+    """Arranca gunicorn, mide y lo para: {segundos, cargas, carga, calentamiento, filas de memoria}."""
+    proceso, segundos, infos = arrancar(modelo, workers, preload)
+    try:
+        time.sleep(1)
+        filas = memoria(proceso)
+    finally:
+        proceso.terminate()
+        proceso.wait()
+    return {
+        'segundos': segundos,
+        'cargas': {i['pid_carga'] for i in infos.values()},
+        'carga': max(i['segundos_carga'] for i in infos.values()),
+        'calentamiento': max(i['segundos_calentamiento'] for i in infos.values()),
+        'filas': filas,
+    }
+
+
+def fallos_preload(medida, max_arranque=MAX_ARRANQUE, max_rss_mb=MAX_RSS_MB, max_uss_mb=MAX_USS_MB):
+    """Límites que incumple la medida de la configuración servida (preload); lista vacía si ninguno."""
+    fallos = []
+    workers = [m for nombre, m in medida['filas'] if nombre != 'maestro']
+    if medida['segundos'] > max_arranque:
+        fallos.append(f"arranque {medida['segundos']:.1f} s > {max_arranque:.1f} s")
+    if len(medida['cargas']) != 1:
+        fallos.append(f"modelo cargado en {len(medida['cargas'])} procesos con preload")
+    for limite, k, nombre in ((max_rss_mb, 0, 'RSS'), (max_uss_mb, 2, 'USS')):
+        maximo = max(m[k] for m in workers)
+        if maximo > limite:
+            fallos.append(f"{nombre} de un worker {maximo:.0f} MB > {limite:.0f} MB")
+    return fallos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--modelo')
+    parser.add_argument('--workers', type=int, default=MIN_WORKERS)
+    parser.add_argument('--rondas', type=int, default=500)
+    parser.add_argument('--profundidad', type=int, default=10)
+    parser.add_argument('--comprobar', action='store_true', help='falla si preload supera los límites')
+    parser.add_argument('--max-arranque', type=float, default=MAX_ARRANQUE,
+                        help='s hasta que responden todos los workers')
+    parser.add_argument('--max-rss-mb', type=float, default=MAX_RSS_MB, help='RSS máximo por worker')
+    parser.add_argument('--max-uss-mb', type=float, default=MAX_USS_MB, help='memoria privada máxima por worker')
+    args = parser.parse_args()
+    if args.comprobar and args.workers < MIN_WORKERS:
+        parser.error(f'--comprobar necesita al menos {MIN_WORKERS} workers')
+
+    modelo = args.modelo or modelo_sintetico(os.path.join(tempfile.mkdtemp(), 'modelo.ubj'),
+                                             args.rondas, args.profundidad)
+    print(f"Modelo: {modelo} ({os.path.getsize(modelo) / 2**20:.1f} MB)\n")
+
+    fallos = []
+    for preload in (True, False):
+        medida = medir(modelo, args.workers, preload)
+        filas = medida['filas']
+        print(f"{'preload' if preload else 'sin preload'}: {args.workers} workers listos en "
+              f"{medida['segundos']:.1f} s; modelo cargado en {len(medida['cargas'])} proceso(s) "
+              f"({medida['carga'] * 1000:.0f} ms c/u), calentamiento máx. {medida['calentamiento'] * 1000:.1f} ms")
+        print(f"  {'proceso':<16}{'RSS MB':>9}{'PSS MB':>9}{'USS MB':>9}")
+        for nombre, (rss, pss, uss) in filas:
+            print(f"  {nombre:<16}{rss:>9.0f}{pss:>9.0f}{uss:>9.0f}")
+        totales = np.sum([m for _, m in filas], axis=0)
+        print(f"  {'total':<16}{totales[0]:>9.0f}{totales[1]:>9.0f}{totales[2]:>9.0f}\n")
+        if preload:
+            fallos = fallos_preload(medida, args.max_arranque, args.max_rss_mb, args.max_uss_mb)
+
+    if args.comprobar:
+        for fallo in fallos:
+            print(f"FALLO: {fallo}")
+        if fallos:
+            raise SystemExit(1)
+        print(f"Dentro de los límites con {args.workers} workers")
+
+
+if __name__ == '__main__':
+    main()
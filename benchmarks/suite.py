@@ -0,0 +1,283 @@
+"""
+Suite de rendimiento del dashboard, el pipeline y el modelo sobre un NetCDF
+sintético BEST-like (`anomalias.sintetico`) de la resolución y años pedidos.
+
+Etapas, cada una en su propio subproceso para medir su pico de memoria (VmHWM):
+
+- estadisticas: tabla EDA en una pasada (`estadisticas_netcdf`), publicada en
+  el manifiesto;
+- features: `construir_features`, filas/s;
+- entrenamiento: `entrenar` (memoria externa), filas × rondas / s;
+- inferencia: `inplace_predict` sobre las filas de prueba, filas/s;
+- dashboard: latencia p50 del callback `render_content` y tamaño del JSON de
+  cada pestaña, y tamaño de /_dash-layout. Usa el modelo y el manifiesto que
+  acaban de escribir las etapas anteriores.
+
+Los resultados se escriben en JSON (`--salida`). `--guardar-base` los guarda
+como base de la máquina y `--comprobar` compara con ella: sale con código 1 si
+alguna métrica empeora más que su tolerancia o si falta alguna de las de la base
+(con `--etapas`, la base debe medirse con las mismas etapas).
+
+    python -m benchmarks.suite --guardar-base
+    python -m benchmarks.suite --comprobar
+    python -m benchmarks.suite --resolucion 2 --anio-inicio 1850 --anio-fin 1950 --salida grande.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_estadisticas import pico_rss_mb
+
+RUTA_BASE = os.path.join(os.path.dirname(__file__), 'base.json')
+VERSION_FORMATO = 1
+ETAPAS = ('estadisticas', 'features', 'entrenamiento', 'inferencia', 'dashboard')
+# Cada etapa necesita los artefactos que escriben las anteriores
+REQUISITOS = {'estadisticas': (), 'features': (), 'entrenamiento': ('features',), 'inferencia': ('features', 'entrenamiento'),
+              'dashboard': ('estadisticas', 'features', 'entrenamiento')}
+# Tolerancia relativa por unidad: los tiempos son mucho más ruidosos que los tamaños
+TOLERANCIAS = {'ms': 0.30, 'filas/s': 0.30, 'MB': 0.15, 'bytes': 0.05, 'filas': 0.0}
+# Holgura absoluta: por debajo de un milisegundo el ruido supera cualquier tolerancia relativa
+HOLGURAS = {'ms': 1.0}
+
+
+def metrica(valor, unidad, mejor):
+    return {'valor': valor, 'unidad': unidad, 'mejor': mejor, 'tolerancia': TOLERANCIAS[unidad],
+            'holgura': HOLGURAS.get(unidad, 0)}
+
+
+def rutas(directorio):
+    return {
+        'netcdf': os.path.join(directorio, 'best.nc'),
+        'features': os.path.join(directorio, 'features'),
+        'modelo': os.path.join(directorio, 'modelo'),
+        'manifiesto': os.path.join(directorio, 'manifiesto.json'),
+    }
+
+
+# =====================================
+# Etapas (en subproceso)
+# =====================================
+def etapa_estadisticas(config, r):
+    from anomalias.estadisticas import estadisticas_netcdf
+    from anomalias.manifiesto import publicar
+
+    t0 = time.perf_counter()
+    estadisticas, _ = estadisticas_netcdf(r['netcdf'])
+    segundos = time.perf_counter() - t0
+    publicar({'eda': {'temperature': estadisticas.tabla()}}, r['manifiesto'])
+    return {'estadisticas.ms': metrica(segundos * 1000, 'ms', 'menor')}
+
+
+def etapa_features(config, r):
+    from anomalias.features import construir_features
+
+    resumen = construir_features(r['netcdf'], r['features'], anio_min=config['anio_inicio'] + 2)
+    return {
+        'features.filas_por_segundo': metrica(resumen['filas_por_segundo'], 'filas/s', 'mayor'),
+        'features.filas': metrica(resumen['filas'], 'filas', 'igual'),
+    }
+
+
+def etapa_entrenamiento(config, r):
+    from anomalias.entrenamiento import entrenar
+
+    _, resumen = entrenar(r['features'], r['modelo'], anio_corte=config['anio_corte'],
+                          num_rondas=config['rondas'], nthread=1, ruta_manifiesto=r['manifiesto'])
+    segundos = resumen['segundos']['entrenamiento'] - resumen['segundos']['matriz']
+    return {
+        'entrenamiento.filas_rondas_por_segundo': metrica(
+            resumen['filas_entrenamiento'] * config['rondas'] / segundos, 'filas/s', 'mayor'),
+        'entrenamiento.matriz_ms': metrica(resumen['segundos']['matriz'] * 1000, 'ms', 'menor'),
+    }
+
+
+def etapa_inferencia(config, r):
+    import numpy as np
+    import xgboost as xgb
+
+    from anomalias.entrenamiento import leer_lotes, partes
+
+    booster = xgb.Booster(model_file=os.path.join(r['modelo'], 'modelo.ubj'))
+    booster.set_param({'nthread': 1})
+    X = np.concatenate([x for x, _ in leer_lotes(partes(r['features']), anio_desde=config['anio_corte'])])
+    booster.inplace_predict(X[:1])
+    tiempos = []
+    for _ in range(config['repeticiones_inferencia']):
+        t0 = time.perf_counter()
+        booster.inplace_predict(X)
+        tiempos.append(time.perf_counter() - t0)
+    return {'inferencia.filas_por_segundo': metrica(len(X) / min(tiempos), 'filas/s', 'mayor')}
+
+
+def etapa_dashboard(config, r):
+    # El entorno (ANOMALIAS_NETCDF, ANOMALIAS_MANIFIESTO, ...) lo fija el proceso padre
+    import app as dashboard
+    from benchmarks.bench_layouts import payload_callback
+
+    cliente = dashboard.server.test_client()
+    cliente.get('/')
+    resultado = {'dashboard.layout_bytes': metrica(len(cliente.get('/_dash-layout').data), 'bytes', 'menor')}
+    for tab in dashboard.registro.valores():
+        cuerpo = json.dumps(payload_callback(tab))
+        latencias = []
+        for _ in range(config['repeticiones_callback']):
+            t0 = time.perf_counter()
+            respuesta = cliente.post('/_dash-update-component', data=cuerpo, content_type='application/json')
+            latencias.append((time.perf_counter() - t0) * 1000)
+            if respuesta.status_code != 200:
+                raise RuntimeError(f"render_content('{tab}') devolvió HTTP {respuesta.status_code}")
+        resultado[f'dashboard.render_content.{tab}.ms'] = metrica(statistics.median(latencias), 'ms', 'menor')
+        resultado[f'dashboard.render_content.{tab}.bytes'] = metrica(len(respuesta.data), 'bytes', 'menor')
+    return resultado
+
+
+def interno(etapa, config, directorio):
+    resultado = globals()['etapa_' + etapa](config, rutas(directorio))
+    resultado[f'{etapa}.pico_rss_mb'] = metrica(pico_rss_mb(), 'MB', 'menor')
+    return resultado
+
+
+# =====================================
+# Ejecución y comparación
+# =====================================
+def entorno_dashboard(r, directorio):
+    # Sin pirámide ni índice: el explorador lee el NetCDF sintético
+    return dict(os.environ, ANOMALIAS_NETCDF=r['netcdf'], ANOMALIAS_MANIFIESTO=r['manifiesto'],
+                ANOMALIAS_PIRAMIDE=os.path.join(directorio, 'sin_piramide'),
+                ANOMALIAS_INDICE=os.path.join(directorio, 'sin_indice'),
+                ANOMALIAS_MODELO=os.path.join(r['modelo'], 'modelo.ubj'), ANOMALIAS_METRICAS='0')
+
+
+def ejecutar(config, etapas=ETAPAS):
+    """Genera el NetCDF sintético y ejecuta las etapas en orden; devuelve {configuracion, metricas}."""
+    from anomalias.sintetico import crear_netcdf_sintetico
+
+    necesarias = set(etapas).union(*(REQUISITOS[e] for e in etapas))
+    metricas = {}
+    with tempfile.TemporaryDirectory() as directorio:
+        r = rutas(directorio)
+        t0 = time.perf_counter()
+        crear_netcdf_sintetico(r['netcdf'], config['anio_inicio'], config['anio_fin'], config['resolucion'])
+        print(f"NetCDF sintético {config['resolucion']}°, {config['anio_inicio']}-{config['anio_fin']}: "
+              f"{time.perf_counter() - t0:.1f} s", file=sys.stderr)
+        for etapa in ETAPAS:
+            if etapa not in necesarias:
+                continue
+            t0 = time.perf_counter()
+            salida = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.suite', '--interno', etapa,
+                 '--config', json.dumps(config), '--directorio', directorio],
+                env=entorno_dashboard(r, directorio) if etapa == 'dashboard' else None,
+                capture_output=True, text=True)
+            if salida.returncode:
+                raise RuntimeError(f"La etapa '{etapa}' falló:\n{salida.stderr}")
+            print(f"{etapa}: {time.perf_counter() - t0:.1f} s", file=sys.stderr)
+            if etapa in etapas:
+                metricas.update(json.loads(salida.stdout.strip().splitlines()[-1]))
+    return {'version': VERSION_FORMATO, 'configuracion': config, 'maquina': maquina(), 'metricas': metricas}
+
+
+def maquina():
+    import numpy as np
+    import xgboost as xgb
+
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'xgboost': xgb.__version__,
+            'cpu': os.cpu_count(), 'plataforma': platform.platform()}
+
+
+def comparar(base, actual):
+    """
+    Lista de (nombre, base, actual, cambio relativo, regresión) para cada
+    métrica de la base. Un cambio en la dirección 'mejor' nunca es regresión, ni
+    uno que no supere la holgura absoluta de la métrica. Una métrica de la base
+    que falta en `actual` (etapa no ejecutada, o renombrada) sí lo es.
+    """
+    if base.get('configuracion') != actual['configuracion']:
+        raise ValueError(f"La base se midió con otra configuración: {base.get('configuracion')}")
+    filas = []
+    for nombre, b in base['metricas'].items():
+        a = actual['metricas'].get(nombre)
+        if a is None:
+            filas.append((nombre, b['valor'], None, None, True))
+            continue
+        cambio = (a['valor'] - b['valor']) / b['valor'] if b['valor'] else 0.0
+        if b['mejor'] == 'menor':
+            regresion = cambio > b['tolerancia']
+        elif b['mejor'] == 'mayor':
+            regresion = -cambio > b['tolerancia']
+        else:
+            regresion = abs(cambio) > b['tolerancia']
+        regresion = regresion and abs(a['valor'] - b['valor']) > b.get('holgura', 0)
+        filas.append((nombre, b['valor'], a['valor'], cambio, regresion))
+    return filas
+
+
+def imprimir(resultado):
+    print(f"{'métrica':<48}{'valor':>16}  unidad")
+    for nombre, m in resultado['metricas'].items():
+        print(f"{nombre:<48}{m['valor']:>16,.2f}  {m['unidad']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--resolucion', type=float, default=5.0)
+    parser.add_argument('--anio-inicio', type=int, default=1850)
+    parser.add_argument('--anio-fin', type=int, default=1930)
+    parser.add_argument('--rondas', type=int, default=30)
+    parser.add_argument('--etapas', nargs='+', choices=ETAPAS, default=list(ETAPAS))
+    parser.add_argument('--salida', help='JSON con los resultados')
+    parser.add_argument('--base', default=RUTA_BASE)
+    parser.add_argument('--guardar-base', action='store_true', help='guarda los resultados como base')
+    parser.add_argument('--comprobar', action='store_true', help='compara con la base; código 1 si hay regresiones')
+    parser.add_argument('--interno', choices=ETAPAS, help=argparse.SUPPRESS)
+    parser.add_argument('--config', help=argparse.SUPPRESS)
+    parser.add_argument('--directorio', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.interno:
+        print(json.dumps(interno(args.interno, json.loads(args.config), args.directorio)))
+        return
+
+    config = {
+        'resolucion': args.resolucion, 'anio_inicio': args.anio_inicio, 'anio_fin': args.anio_fin,
+        'anio_corte': args.anio_fin - (args.anio_fin - args.anio_inicio) // 5, 'rondas': args.rondas,
+        'repeticiones_callback': 50, 'repeticiones_inferencia': 5,
+    }
+    resultado = ejecutar(config, args.etapas)
+    imprimir(resultado)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2)
+    if args.guardar_base:
+        with open(args.base, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, indent=2)
+        print(f"Base guardada en {args.base}")
+    if args.comprobar:
+        with open(args.base, encoding='utf-8') as f:
+            base = json.load(f)
+        filas = comparar(base, resultado)
+        print(f"\n{'métrica':<48}{'base':>14}{'actual':>14}{'cambio':>9}")
+        for nombre, b, a, cambio, regresion in filas:
+            if a is None:
+                print(f"{nombre:<48}{b:>14,.2f}{'—':>14}{'':>9}  FALTA")
+                continue
+            print(f"{nombre:<48}{b:>14,.2f}{a:>14,.2f}{cambio:>+9.1%}{'  REGRESIÓN' if regresion else ''}")
+        regresiones = [f[0] for f in filas if f[4] and f[2] is not None]
+        faltan = [f[0] for f in filas if f[2] is None]
+        if regresiones:
+            print(f"\n{len(regresiones)} regresiones: {', '.join(regresiones)}")
+        if faltan:
+            print(f"\n{len(faltan)} métricas de la base sin medir: {', '.join(faltan)}")
+        if regresiones or faltan:
+            raise SystemExit(1)
+        print("\nSin regresiones respecto a la base")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+# Configuración de gunicorn (se lee automáticamente desde el directorio de trabajo)
+preload_app = True
+
+
+def when_ready(server):
+    # Con --preload la app ya está importada en el maestro: el modelo se carga aquí una vez
+    # y los workers lo heredan copy-on-write
+    from anomalias.arranque import precargar
+    precargar()
+
+
+def post_fork(server, worker):
+    # El modelo viene cargado del maestro; se calienta en el worker antes de aceptar conexiones
+    # y el resto (índice, pirámide, NetCDF, pestañas diferidas) se carga en segundo plano
+    from anomalias.arranque import calentamiento
+    from anomalias.modelos import registro
+    registro.calentar()
+    calentamiento.iniciar()
@@ -0,0 +1,20 @@
+"""
+Fixtures compartidas de las pruebas: un NetCDF sintético pequeño con la
+estructura de Berkeley Earth (`anomalias.sintetico`).
+"""
+import pytest
+
+from anomalias.sintetico import crear_netcdf_sintetico
+
+# Dos décadas, para las particiones del almacén
+ANIO_INICIO, ANIO_FIN = 1855, 1862
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'slow: arranca procesos o entrena modelos (excluir con -m "not slow")')
+
+
+@pytest.fixture(scope='session')
+def netcdf_sintetico(tmp_path_factory):
+    return crear_netcdf_sintetico(str(tmp_path_factory.mktemp('best') / 'best.nc'), ANIO_INICIO, ANIO_FIN,
+                                  resolucion=2.0)
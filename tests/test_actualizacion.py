@@ -0,0 +1,86 @@
+"""
+Actualización incremental (`anomalias.actualizacion`) frente a reconstruir:
+características, índice y pirámide construidos sobre la serie sin sus
+últimos meses y actualizados con la completa son iguales a los construidos
+directamente con la completa.
+"""
+import glob
+import os
+import shutil
+
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+import xarray as xr
+
+from anomalias import actualizacion
+from anomalias.features import construir_features
+from anomalias.indice import Indice, construir_indice
+from anomalias.piramide import construir_piramide
+
+# Meses nuevos: de noviembre de 1860 a diciembre de 1862 (cruzan un año y la década)
+MESES_NUEVOS = 26
+ANIO_MIN = 1855
+
+
+def construir(ruta, directorio):
+    rutas = {nombre: os.path.join(directorio, nombre) for nombre in ('features', 'indice', 'piramide')}
+    construir_features(ruta, rutas['features'], anio_min=ANIO_MIN)
+    construir_indice(ruta, rutas['indice'])
+    construir_piramide(ruta, rutas['piramide'])
+    return rutas
+
+
+@pytest.fixture(scope='module')
+def artefactos(netcdf_sintetico, tmp_path_factory):
+    directorio = tmp_path_factory.mktemp('actualizacion')
+    publicacion = str(directorio / 'best.nc')
+    with xr.open_dataset(netcdf_sintetico, decode_times=False) as ds:
+        ds.isel(time=slice(0, ds.sizes['time'] - MESES_NUEVOS)).load().to_netcdf(publicacion)
+    incremental = construir(publicacion, str(directorio / 'incremental'))
+    # La publicación nueva sustituye a la anterior en la misma ruta
+    shutil.copy(netcdf_sintetico, publicacion)
+    resumen = actualizacion.actualizar(publicacion, incremental['features'], incremental['indice'],
+                                       incremental['piramide'], anio_min=ANIO_MIN)
+    return resumen, incremental, construir(netcdf_sintetico, str(directorio / 'desde_cero'))
+
+
+def test_meses_anadidos(artefactos):
+    resumen, _, _ = artefactos
+    for paso in ('features', 'indice', 'piramide'):
+        assert resumen[paso]['meses'] == MESES_NUEVOS, paso
+
+
+def test_features_iguales(artefactos):
+    _, incremental, desde_cero = artefactos
+
+    def filas(directorio):
+        tabla = pq.read_table(sorted(glob.glob(os.path.join(directorio, '*.parquet')))).to_pandas()
+        return tabla.sort_values(['celda', 'anio', 'mes']).reset_index(drop=True)
+
+    a, b = filas(incremental['features']), filas(desde_cero['features'])
+    assert list(a.columns) == list(b.columns) and len(a) == len(b)
+    for columna in a.columns:
+        np.testing.assert_array_equal(a[columna].to_numpy(), b[columna].to_numpy(), err_msg=columna)
+
+
+def test_indice_igual(artefactos):
+    _, incremental, desde_cero = artefactos
+    a, b = Indice(incremental['indice']), Indice(desde_cero['indice'])
+    assert a.meses == b.meses
+    np.testing.assert_array_equal(a.tiempo, b.tiempo)
+    np.testing.assert_array_equal(a.temperatura, b.temperatura)
+    # Historias completas por celda: en el incremental, los meses nuevos aún son cola del orden por tiempo
+    assert a.meses_celdas < a.meses
+    celdas = np.arange(len(a.lat) * len(a.lon))
+    np.testing.assert_array_equal(a._por_celda(celdas, 0, a.meses), b._por_celda(celdas, 0, b.meses))
+
+
+def test_piramide_igual(artefactos):
+    _, incremental, desde_cero = artefactos
+    ficheros = sorted(os.path.basename(f) for f in glob.glob(os.path.join(desde_cero['piramide'], '*.npy')))
+    assert ficheros
+    assert ficheros == sorted(os.path.basename(f) for f in glob.glob(os.path.join(incremental['piramide'], '*.npy')))
+    for fichero in ficheros:
+        np.testing.assert_array_equal(np.load(os.path.join(incremental['piramide'], fichero)),
+                                      np.load(os.path.join(desde_cero['piramide'], fichero)), err_msg=fichero)
@@ -0,0 +1,59 @@
+"""Ida y vuelta del almacén columnar (`anomalias.almacen`) frente al NetCDF sintético."""
+import numpy as np
+import pyarrow as pa
+import pytest
+import xarray as xr
+
+from anomalias.almacen import Almacen, comprobar, construir_almacen, esquema
+
+
+@pytest.fixture(scope='module')
+def referencia(netcdf_sintetico):
+    with xr.open_dataset(netcdf_sintetico, decode_times=False) as ds:
+        yield ds.load()
+
+
+@pytest.fixture(scope='module')
+def almacen(netcdf_sintetico, tmp_path_factory):
+    destino = str(tmp_path_factory.mktemp('almacen'))
+    construir_almacen(netcdf_sintetico, destino)
+    return Almacen(destino)
+
+
+def test_rejilla_identica(almacen, referencia):
+    original = referencia['temperature'].values
+    rejilla = almacen.rejilla()
+    assert rejilla.dtype == np.float32 and rejilla.shape == original.shape
+    assert np.isnan(original).any()
+    np.testing.assert_array_equal(np.isnan(rejilla), np.isnan(original))
+    np.testing.assert_array_equal(rejilla, original)
+
+
+def test_rango_entre_decadas(almacen, referencia):
+    # 1858-06 .. 1861-03 cruza la partición decada=1860
+    original = referencia['temperature'].values[(1858 - 1855) * 12 + 5:(1861 - 1855) * 12 + 3]
+    np.testing.assert_array_equal(almacen.rejilla((1858, 6), (1861, 3)), original)
+
+
+def test_tipos(almacen):
+    tabla = almacen.leer()
+    for campo in esquema():
+        assert tabla.schema.field(campo.name).type == campo.type, campo.name
+    assert tabla.schema.field('decada').type == pa.int16()
+    assert sorted(set(tabla.column('decada').to_pylist())) == [1850, 1860]
+
+
+def test_filas_sin_nan(almacen, referencia):
+    # Solo se guardan las celdas con dato: tantas filas como valores no nulos
+    tabla = almacen.leer(['anomalia'])
+    assert tabla.num_rows == int(np.count_nonzero(~np.isnan(referencia['temperature'].values)))
+    assert not np.isnan(tabla.column('anomalia').to_numpy()).any()
+
+
+def test_comprobar(almacen, netcdf_sintetico, referencia):
+    assert comprobar(almacen.directorio, netcdf_sintetico) == dict.fromkeys(
+        ('anomalia', 'climatologia', 'tierra', 'mascara'), True)
+    assert almacen.mascara.dtype == np.float32
+    np.testing.assert_array_equal(almacen.mascara, referencia['land_mask'].values)
+    np.testing.assert_array_equal(almacen.lat, referencia['latitude'].values)
+    np.testing.assert_array_equal(almacen.lon, referencia['longitude'].values)
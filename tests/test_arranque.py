@@ -0,0 +1,17 @@
+"""Presupuesto de arranque de `import app` (el mismo que `benchmarks.bench_arranque`)."""
+import subprocess
+import sys
+
+from benchmarks.bench_arranque import PRESUPUESTO_MS, PROHIBIDOS, RAIZ, medir
+
+
+def test_import_app_dentro_del_presupuesto():
+    total, marco = medir(rondas=3)
+    assert total - marco <= PRESUPUESTO_MS, (
+        f"import app añade {total - marco:.0f} ms sobre el marco (presupuesto {PRESUPUESTO_MS} ms)")
+
+
+def test_import_app_no_carga_subsistemas_pesados():
+    codigo = f"import sys, app; print(' '.join(m for m in {PROHIBIDOS!r} if m in sys.modules))"
+    salida = subprocess.run([sys.executable, '-c', codigo], capture_output=True, text=True, check=True, cwd=RAIZ)
+    assert salida.stdout.split() == []
@@ -0,0 +1,44 @@
+"""Cubo de series regionales (`anomalias.cubo`): climatología y actualización incremental."""
+import os
+
+import numpy as np
+import pytest
+
+from anomalias.cubo import Cubo, anexar_cubo, construir_cubo
+from anomalias.sintetico import crear_netcdf_sintetico
+
+
+@pytest.fixture(scope='module')
+def netcdf_ampliado(tmp_path_factory):
+    # Los mismos meses que el NetCDF de las pruebas más dos años
+    return crear_netcdf_sintetico(str(tmp_path_factory.mktemp('ampliado') / 'best.nc'), 1855, 1864,
+                                  resolucion=2.0)
+
+
+def test_serie_absoluta(netcdf_sintetico, tmp_path):
+    cubo = Cubo(construir_cubo(netcdf_sintetico, str(tmp_path)))
+    tiempo, anomalia = cubo.serie('global')
+    _, absoluta = cubo.serie('global', absoluta=True)
+    k = list(cubo.regiones).index('global')
+    np.testing.assert_allclose(absoluta - anomalia, cubo.climatologia[np.arange(len(tiempo)) % 12, k])
+
+
+def test_sin_climatologia(netcdf_sintetico, tmp_path):
+    destino = construir_cubo(netcdf_sintetico, str(tmp_path))
+    os.remove(os.path.join(destino, 'climatologia.npy'))
+    with pytest.raises(ValueError, match='climatología'):
+        Cubo(destino).serie('global', absoluta=True)
+    # La actualización se la devuelve aunque no haya meses nuevos
+    assert anexar_cubo(netcdf_sintetico, destino) == 0
+    assert Cubo(destino).serie('global', absoluta=True)[1].shape == (8 * 12,)
+
+
+def test_anexar_igual_que_construir(netcdf_sintetico, netcdf_ampliado, tmp_path):
+    anexado = construir_cubo(netcdf_sintetico, str(tmp_path / 'anexado'))
+    assert anexar_cubo(netcdf_ampliado, anexado) == 2 * 12
+    completo = Cubo(construir_cubo(netcdf_ampliado, str(tmp_path / 'completo')))
+    anexado = Cubo(anexado)
+    np.testing.assert_array_equal(anexado.tiempo, completo.tiempo)
+    np.testing.assert_array_equal(anexado.series[8 * 12:], completo.series[8 * 12:])
+    np.testing.assert_array_equal(anexado.cobertura[8 * 12:], completo.cobertura[8 * 12:])
+    np.testing.assert_array_equal(anexado.climatologia, completo.climatologia)
@@ -0,0 +1,53 @@
+"""Lecturas de `anomalias.datos` frente a los mismos cortes hechos directamente con xarray."""
+import numpy as np
+import pytest
+import xarray as xr
+
+from anomalias import datos
+
+
+@pytest.fixture(scope='module')
+def ds(netcdf_sintetico):
+    return datos.abrir_dataset(netcdf_sintetico)
+
+
+@pytest.fixture(scope='module')
+def referencia(netcdf_sintetico):
+    with xr.open_dataset(netcdf_sintetico, decode_times=False) as ds:
+        yield ds.load()
+
+
+# El NetCDF de conftest cubre 1855-1862
+@pytest.mark.parametrize('anio, mes', [(1855, 1), (1858, 7), (1862, 12)])
+def test_mapa_mes(ds, referencia, anio, mes):
+    esperado = referencia['temperature'].sel(time=anio + (mes - 0.5) / 12, method='nearest').values
+    mapa = datos.mapa_mes(ds, anio, mes)
+    assert mapa.shape == (referencia.sizes['latitude'], referencia.sizes['longitude'])
+    np.testing.assert_array_equal(mapa, esperado)
+
+
+def test_mapa_mes_fuera_de_rango(ds, referencia):
+    # Fuera del rango se devuelve el mes más cercano
+    np.testing.assert_array_equal(datos.mapa_mes(ds, 1845, 1), referencia['temperature'][0].values)
+    np.testing.assert_array_equal(datos.mapa_mes(ds, 1870, 12), referencia['temperature'][-1].values)
+
+
+@pytest.mark.parametrize('lat, lon', [(11.0, -74.8), (-89.0, 179.0), (75.3, 0.2)])
+def test_serie_celda(ds, referencia, lat, lon):
+    celda = dict(latitude=lat, longitude=lon, method='nearest')
+    anomalia = referencia['temperature'].sel(**celda).values
+    clima = referencia['climatology'].sel(**celda).values
+    tiempo, serie, absoluta = datos.serie_celda(ds, lat, lon)
+    np.testing.assert_array_equal(tiempo, referencia['time'].values)
+    np.testing.assert_array_equal(serie, anomalia)
+    # La serie sintética empieza en enero: el mes de cada registro es su posición módulo 12
+    np.testing.assert_array_equal(absoluta, anomalia + clima[np.arange(len(tiempo)) % 12])
+
+
+def test_serie_celda_conserva_huecos(ds, referencia):
+    # Los polos tienen meses sin dato en el sintético: los NaN llegan tal cual
+    _, serie, absoluta = datos.serie_celda(ds, -89.0, 1.0)
+    esperado = np.isnan(referencia['temperature'].sel(latitude=-89.0, longitude=1.0, method='nearest').values)
+    assert esperado.any()
+    np.testing.assert_array_equal(np.isnan(serie), esperado)
+    np.testing.assert_array_equal(np.isnan(absoluta), esperado)
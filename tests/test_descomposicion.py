@@ -0,0 +1,48 @@
+"""Teselas de la descomposición por celda (`anomalias.descomposicion`) con distintos troceados del NetCDF."""
+import netCDF4
+import numpy as np
+import pytest
+import xarray as xr
+
+from anomalias.descomposicion import descomponer_rejilla, teselas
+
+# 96 meses × 2000 celdas: varias teselas en la rejilla de 2° (90 × 180)
+MAX_VALORES = 96 * 2000
+
+
+def retrocear(ruta, destino, **codificacion):
+    with xr.open_dataset(ruta, decode_times=False) as ds:
+        ds.load().to_netcdf(destino, encoding={'temperature': codificacion}, unlimited_dims=[])
+    return destino
+
+
+@pytest.mark.parametrize('trozos', [(1, 90, 180), (12, 30, 30), None])
+def test_teselas_acotadas(trozos):
+    forma = (96, 90, 180)
+    lista = teselas(forma, trozos, MAX_VALORES)
+    assert len(lista) > 1
+    assert all((i1 - i0) * (j1 - j0) <= MAX_VALORES // 96 for i0, i1, j0, j1 in lista)
+    cubiertas = np.zeros(forma[1:], dtype=int)
+    for i0, i1, j0, j1 in lista:
+        cubiertas[i0:i1, j0:j1] += 1
+    assert (cubiertas == 1).all()
+    if trozos:
+        # Cada tesela está dentro de un trozo o es un múltiplo alineado de ellos
+        for i0, i1, j0, j1 in lista:
+            for a, b, trozo, n in ((i0, i1, trozos[1], forma[1]), (j0, j1, trozos[2], forma[2])):
+                assert a // trozo == (b - 1) // trozo or (a % trozo == 0 and (b % trozo == 0 or b == n))
+
+
+@pytest.mark.parametrize('codificacion', [{'chunksizes': (1, 90, 180), 'zlib': True}, {'contiguous': True}])
+def test_capas_iguales(netcdf_sintetico, tmp_path, codificacion):
+    ruta = retrocear(netcdf_sintetico, str(tmp_path / 'best.nc'), **codificacion)
+    with netCDF4.Dataset(ruta) as nc:
+        assert nc['temperature'].chunking() == ('contiguous' if 'contiguous' in codificacion
+                                                else list(codificacion['chunksizes']))
+    base = descomponer_rejilla(netcdf_sintetico, str(tmp_path / 'base.npz'), anio_min=1855, min_anios=1)
+    r = descomponer_rejilla(ruta, str(tmp_path / 'capas.npz'), anio_min=1855, min_anios=1,
+                            max_valores=MAX_VALORES // 4, max_valores_tesela=MAX_VALORES)
+    assert r['teselas'] > 1 and base['teselas'] >= 1
+    with np.load(tmp_path / 'base.npz') as esperado, np.load(tmp_path / 'capas.npz') as obtenido:
+        for nombre in ('tendencia', 'amplitud_estacional', 'residuo_std', 'meses'):
+            np.testing.assert_array_equal(obtenido[nombre], esperado[nombre])
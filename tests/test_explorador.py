@@ -0,0 +1,104 @@
+"""
+Callbacks del explorador servidos por la app sobre el NetCDF sintético.
+
+`con_presupuesto` solo registra un aviso cuando un callback supera
+PRESUPUESTO_MS (es orientativo en producción); aquí el presupuesto se exige.
+"""
+import json
+import logging
+import statistics
+import time
+
+import numpy as np
+import pytest
+
+from anomalias import explorador
+from anomalias.indice import Indice, construir_indice
+from anomalias.sintetico import crear_netcdf_sintetico
+from benchmarks.bench_explorador import peticion
+
+REPETICIONES = 5
+
+
+@pytest.fixture(scope='module')
+def cliente(netcdf_sintetico):
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('ANOMALIAS_NETCDF', netcdf_sintetico)
+        mp.setenv('ANOMALIAS_METRICAS', '0')
+        import app as dashboard
+
+        cliente = dashboard.server.test_client()
+        cliente.get('/')
+        yield cliente
+
+
+def llamar(cliente, output, inputs):
+    t0 = time.perf_counter()
+    respuesta = cliente.post('/_dash-update-component', content_type='application/json',
+                             data=peticion(output, inputs))
+    ms = (time.perf_counter() - t0) * 1000
+    assert respuesta.status_code == 200, respuesta.get_data(as_text=True)[:500]
+    componente, propiedad = output.split('.')
+    return json.loads(respuesta.data)['response'][componente][propiedad], ms
+
+
+def entradas_mapa(anio, mes, capa='anomalia'):
+    return [('explorador-anio', 'value', anio), ('explorador-anio', 'drag_value', anio),
+            ('explorador-mes', 'value', mes), ('explorador-mapa', 'relayoutData', None),
+            ('explorador-capa', 'value', capa)]
+
+
+def entradas_serie(lat, lon, anio, mes):
+    return [('explorador-mapa', 'clickData', {'points': [{'y': lat, 'x': lon}]}),
+            ('explorador-anio', 'value', anio), ('explorador-mes', 'value', mes)]
+
+
+def test_mapa_dentro_del_presupuesto(cliente):
+    llamar(cliente, 'explorador-mapa.figure', entradas_mapa(1855, 1))
+    latencias = []
+    for k in range(REPETICIONES):
+        figura, ms = llamar(cliente, 'explorador-mapa.figure', entradas_mapa(1856 + k, 1 + 2 * k))
+        assert figura['data']
+        latencias.append(ms)
+    assert statistics.median(latencias) < explorador.PRESUPUESTO_MS, latencias
+
+
+def test_serie_dentro_del_presupuesto(cliente):
+    llamar(cliente, 'explorador-serie.figure', entradas_serie(0.0, 0.0, 1855, 1))
+    latencias = []
+    for k in range(REPETICIONES):
+        figura, ms = llamar(cliente, 'explorador-serie.figure', entradas_serie(-60 + 30 * k, -150 + 70 * k, 1858, 6))
+        assert figura['data']
+        latencias.append(ms)
+    assert statistics.median(latencias) < explorador.PRESUPUESTO_MS, latencias
+
+
+@pytest.fixture(scope='module')
+def indice_atrasado(tmp_path_factory):
+    # Índice construido antes de los dos últimos años del NetCDF de las pruebas (1855-1862)
+    directorio = tmp_path_factory.mktemp('indice')
+    ruta = crear_netcdf_sintetico(str(directorio / 'best.nc'), 1855, 1860, resolucion=2.0)
+    return construir_indice(ruta, str(directorio / 'indice'))
+
+
+def test_mapa_fuera_del_indice(cliente, indice_atrasado, monkeypatch):
+    monkeypatch.setenv('ANOMALIAS_INDICE', indice_atrasado)
+    indice = Indice(indice_atrasado)
+    np.testing.assert_array_equal(indice.mes(1862, 6)[2], indice.mes(1860, 12)[2])
+    np.testing.assert_array_equal(indice.mes(1800, 1)[2], indice.mes(1855, 1)[2])
+    for anio, mes in ((1862, 6), (1860, 12), (1855, 1)):
+        figura, _ = llamar(cliente, 'explorador-mapa.figure', entradas_mapa(anio, mes))
+        assert figura['data'][0]['type'] == 'heatmap'
+
+
+def test_presupuesto_solo_avisa(monkeypatch, caplog):
+    monkeypatch.setattr(explorador, 'PRESUPUESTO_MS', 5)
+
+    @explorador.con_presupuesto('lento')
+    def lento():
+        time.sleep(0.02)
+        return 'hecho'
+
+    with caplog.at_level(logging.WARNING, logger=explorador.logger.name):
+        assert lento() == 'hecho'
+    assert any('lento' in r.getMessage() and 'presupuesto' in r.getMessage() for r in caplog.records)
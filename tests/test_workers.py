@@ -0,0 +1,16 @@
+"""
+Arranque y memoria de gunicorn con la configuración servida (preload): los
+límites de `benchmarks.bench_workers --comprobar` con MIN_WORKERS workers.
+"""
+import pytest
+
+from benchmarks.bench_workers import MIN_WORKERS, fallos_preload, medir, modelo_sintetico
+
+
+@pytest.mark.slow
+def test_workers_con_preload(tmp_path):
+    # Menos rondas que el benchmark (500 tardan ~45 s en entrenarse); el modelo sigue ocupando varios MB
+    modelo = modelo_sintetico(str(tmp_path / 'modelo.ubj'), rondas=100, profundidad=10)
+    medida = medir(modelo, MIN_WORKERS, preload=True)
+    assert len(medida['filas']) == MIN_WORKERS + 1
+    assert fallos_preload(medida) == []